@@ -123,6 +123,14 @@ class Types(helpers.Container):
         sizes = ((32, 128, 4),)
         depths = (2, 3, 4, 5, 6, 7, 8, 9)
 
+    class matrix(object):
+        """Tests every combination of a range of channels and depths. This is the range over which the vectorised CPU
+        kernels make the greatest difference; compare the results against those when run with the environment variable
+        ATEN_CPU_CAPABILITY=default to see the gain.
+        """
+        sizes = ((32, 128, 4), (32, 128, 6), (32, 128, 8), (32, 128, 12), (32, 128, 16))
+        depths = (2, 3, 4)
+
     class small(object):
         """Tests on very small data. This doesn't given meaningful results - the overhead of PyTorch/NumPy/etc. ends up
         giving a greater noise than there is signal - but it serves to test the benchmark framework itself.
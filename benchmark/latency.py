@@ -0,0 +1,75 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Measures the per-call latency of Signatory on small inputs, for which the Python overhead around the computation is
+a large part of the total cost.
+
+Each case is timed several ways: with an input that requires gradients (so that autograd is used), with one that
+doesn't (so that autograd is skipped), and via a plan prepared in advance with signatory.plan.
+"""
+
+import collections as co
+import timeit
+import torch
+
+import signatory
+
+
+# (batch, stream, channel) sizes and depths to test
+sizes = ((1, 8, 4), (8, 16, 4), (8, 64, 4))
+depths = (2, 3)
+
+
+def _time(fn, number, repeat):
+    # Returns the best time per call, in microseconds.
+    fn()  # warm up
+    return min(timeit.Timer(stmt=fn).repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def _cases(size, depth):
+    path = torch.rand(size)
+    grad_path = path.clone().requires_grad_()
+    signature_plan = signatory.plan(*size, depth=depth)
+    reuse_plan = signatory.plan(*size, depth=depth, reuse_output=True)
+
+    cases = co.OrderedDict()
+    cases['signature (grad)'] = lambda: signatory.signature(grad_path, depth)
+    cases['signature'] = lambda: signatory.signature(path, depth)
+    cases['plan'] = lambda: signature_plan(path)
+    cases['plan (reuse output)'] = lambda: reuse_plan(path)
+    cases['logsignature (grad)'] = lambda: signatory.logsignature(grad_path, depth)
+    cases['logsignature'] = lambda: signatory.logsignature(path, depth)
+    return cases
+
+
+def run(number=1000, repeat=5):
+    """Times every case, and prints the results as a table of microseconds per call."""
+    results = co.OrderedDict()
+    for size in sizes:
+        for depth in depths:
+            results[(size, depth)] = co.OrderedDict((name, _time(fn, number, repeat))
+                                                    for name, fn in _cases(size, depth).items())
+
+    names = list(next(iter(results.values())).keys())
+    row_labels = ['size={}, depth={}'.format(size, depth) for size, depth in results]
+    first_width = max(len(label) for label in row_labels)
+    widths = [max(len(name), 8) for name in names]
+
+    print('Per-call latency in microseconds, using {} thread(s).'.format(torch.get_num_threads()))
+    print(' ' * first_width + ' | ' + ' | '.join(name.rjust(width) for name, width in zip(names, widths)))
+    print('-' * first_width + '-+-' + '-+-'.join('-' * width for width in widths))
+    for label, row in zip(row_labels, results.values()):
+        print(label.ljust(first_width) + ' | ' + ' | '.join('{:.1f}'.format(row[name]).rjust(width)
+                                                            for name, width in zip(names, widths)))
+    return results
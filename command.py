@@ -46,6 +46,7 @@ def main():
     version_parser = subparsers.add_parser('version', description="Prints the version")
     test_parser = subparsers.add_parser('test', parents=[deviceparser], description="Run tests")
     benchmark_parser = subparsers.add_parser('benchmark', parents=[deviceparser], description="Run speed benchmarks")
+    latency_parser = subparsers.add_parser('latency', description="Run per-call latency benchmarks on small inputs")
     docs_parser = subparsers.add_parser('docs', description="Build documentation")
     readme_parser = subparsers.add_parser('readme', description="Generate the README from the documentation.")
     workflows_parser = subparsers.add_parser('workflows', description="Generate the GitHub workflows from templates.")
@@ -55,6 +56,7 @@ def main():
     version_parser.set_defaults(cmd=version)
     test_parser.set_defaults(cmd=test)
     benchmark_parser.set_defaults(cmd=benchmark)
+    latency_parser.set_defaults(cmd=latency)
     docs_parser.set_defaults(cmd=docs)
     readme_parser.set_defaults(cmd=readme)
     workflows_parser.set_defaults(cmd=workflows)
@@ -76,12 +78,14 @@ def main():
     benchmark_parser.add_argument('-f', '--fns', choices=('all', 'sigf', 'sigb', 'logsigf', 'logsigb'), default='all',
                                   help="Which functions to run: signature forwards, signature backwards, logsignature "
                                        "forwards, logsignature backwards, or all of them. Defaults to all.")
-    benchmark_parser.add_argument('-t', '--type', choices=('typical', 'depths', 'channels', 'small'), default='typical',
+    benchmark_parser.add_argument('-t', '--type', choices=('typical', 'depths', 'channels', 'matrix', 'small'),
+                                  default='typical',
                                   help="What kind of benchmark to run. 'typical' tests on two typical size/depth "
                                        "combinations and prints the results as a table to stdout. 'depth' and "
                                        "'channels' are more thorough benchmarks (and will taking correspondingly "
                                        "longer to run!) testing multiple depths or multiple channels respectively. "
-                                       "Defaults to typical.")
+                                       "'matrix' tests every combination of a range of channels and depths, and can "
+                                       "only be output as a table. Defaults to typical.")
     benchmark_parser.add_argument('-o', '--output', choices=('table', 'graph', 'graphtable', 'none'), default='table',
                                   help="How to format the output. 'table' formats as a table, 'graph' formats as a "
                                        "graph. 'graphtable' does both. 'none' prints no output at all (perhaps if "
@@ -92,6 +96,11 @@ def main():
                                                                             'printed to stdout and graphs are opened '
                                                                             'in a new window.)')
                                   
+    latency_parser.add_argument('-n', '--number', type=int, default=1000,
+                                help="How many calls to make for each timing. Defaults to 1000.")
+    latency_parser.add_argument('-r', '--repeat', type=int, default=5,
+                                help="How many timings to take the best of. Defaults to 5.")
+
     docs_parser.add_argument('-o', '--open', action='store_true',
                              help="Open the documentation in a web browser as soon as it is built.")
 
@@ -189,6 +198,8 @@ def benchmark(args):
         type_ = bench.Types.depths
     elif args.type == 'channels':
         type_ = bench.Types.channels
+    elif args.type == 'matrix':
+        type_ = bench.Types.matrix
     elif args.type == 'small':
         type_ = bench.Types.small
     else:
@@ -217,6 +228,14 @@ def benchmark(args):
 
         return runner
 
+
+def latency(args):
+    """Run per-call latency benchmarks, comparing the overhead of the various ways of computing signatures of small
+    inputs.
+    """
+    import benchmark.latency as latency_
+    return latency_.run(number=args.number, repeat=args.repeat)
+
     
 def docs(args=()):
     """Build the documentation. After it has been built then it can be found in ./docs/_build/html/index.html/
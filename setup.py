@@ -15,6 +15,7 @@
 """setup.py - hopefully you know what this does without me telling you..."""
 
 
+import platform
 import setuptools
 import sys
 try:
@@ -35,18 +36,67 @@ if sys.platform.startswith('win'):  # windows
 else:  # linux or mac
     extra_compile_args.append('-fopenmp')
 
+# The CPU kernels in src/cpu_kernels_*.cpp are written in terms of ATen's Vectorized, and each is compiled for a
+# different instruction set. Which one is used is decided at runtime, according to what the CPU supports. (This is the
+# same approach that PyTorch takes for its own CPU kernels.) setuptools doesn't support compiler flags that differ
+# between files, so these are compiled separately; see BuildExtension below.
+if sys.platform.startswith('win'):
+    avx2_flags = ['/arch:AVX2']
+    avx512_flags = ['/arch:AVX512']
+else:
+    avx2_flags = ['-mavx2', '-mfma', '-mf16c']
+    avx512_flags = ['-mavx512f', '-mavx512bw', '-mavx512vl', '-mavx512dq', '-mfma', '-mf16c']
+cpu_kernels = [('src/cpu_kernels_DEFAULT.cpp', ['-DCPU_CAPABILITY=DEFAULT', '-DCPU_CAPABILITY_DEFAULT'])]
+if platform.machine().lower() in ('x86_64', 'amd64'):
+    cpu_kernels.append(('src/cpu_kernels_AVX2.cpp', ['-DCPU_CAPABILITY=AVX2', '-DCPU_CAPABILITY_AVX2'] + avx2_flags))
+    cpu_kernels.append(('src/cpu_kernels_AVX512.cpp',
+                        ['-DCPU_CAPABILITY=AVX512', '-DCPU_CAPABILITY_AVX512'] + avx512_flags))
+    extra_compile_args.append('-DSIGNATORY_CPU_CAPABILITY_AVX')
+
+
+class BuildExtension(cpp.BuildExtension):
+    def build_extension(self, ext):
+        # Compile each of the CPU kernels with the flags for its instruction set, and link them in with everything
+        # else. They don't share any symbols with each other or with the rest of the extension (see
+        # src/cpu_kernels.hpp), so the linker never has to choose between copies compiled for different instruction
+        # sets.
+        extra_objects = ext.extra_objects
+        objects = []
+        for source, flags in cpu_kernels:
+            objects.extend(self.compiler.compile([source],
+                                                 output_dir=self.build_temp,
+                                                 macros=ext.define_macros,
+                                                 include_dirs=ext.include_dirs,
+                                                 debug=self.debug,
+                                                 extra_postargs=list(ext.extra_compile_args) + flags,
+                                                 depends=ext.depends))
+        ext.extra_objects = list(extra_objects or []) + objects
+        try:
+            super(BuildExtension, self).build_extension(ext)
+        finally:
+            ext.extra_objects = extra_objects
+
+
 ext_modules = [cpp.CppExtension(name='_impl',
-                                sources=['src/logsignature.cpp',
+                                sources=['src/cpu_kernels.cpp',
+                                         'src/logsignature.cpp',
                                          'src/lyndon.cpp',
                                          'src/misc.cpp',
+                                         'src/ops.cpp',
+                                         'src/parallelism.cpp',
                                          'src/pytorchbind.cpp',
                                          'src/signature.cpp',
-                                         'src/tensor_algebra_ops.cpp'],
-                                depends=['src/logsignature.hpp',
+                                         'src/tensor_algebra_ops.cpp',
+                                         'src/workspace.cpp'],
+                                depends=['src/cpu_kernels.hpp',
+                                         'src/cpu_kernels_impl.hpp',
+                                         'src/logsignature.hpp',
                                          'src/lyndon.hpp',
                                          'src/misc.hpp',
+                                         'src/parallelism.hpp',
                                          'src/signature.hpp',
-                                         'src/tensor_algebra_ops.hpp'],
+                                         'src/tensor_algebra_ops.hpp',
+                                         'src/workspace.hpp'],
                                 extra_compile_args=extra_compile_args)]
 
 
@@ -68,4 +118,4 @@ setuptools.setup(name=metadata.project,
                  ext_package=metadata.project,
                  package_dir={'': 'src'},
                  ext_modules=ext_modules,
-                 cmdclass={'build_ext': cpp.BuildExtension})
+                 cmdclass={'build_ext': BuildExtension})
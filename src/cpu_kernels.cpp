@@ -0,0 +1,76 @@
+/* Copyright 2019 Patrick Kidger. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *    http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ * ========================================================================= */
+
+
+#include <torch/extension.h>
+#include <ATen/Version.h>  // at::get_cpu_capability
+#include <string>            // std::string
+
+#include "cpu_kernels.hpp"
+
+
+namespace signatory {
+    namespace ta_ops {
+        namespace detail {
+            namespace {
+                enum class CPUCapability { DEFAULT, AVX2, AVX512 };
+
+                // The instruction set that PyTorch uses for its own CPU kernels: the best one that this CPU supports,
+                // unless overridden by ATEN_CPU_CAPABILITY. (at::native::get_cpu_capability isn't exported by
+                // PyTorch, so we go via the name of the instruction set instead.) This is fixed for the lifetime of
+                // the process, so it only needs looking up once.
+                CPUCapability get_cpu_capability() {
+                    static const CPUCapability capability = [] {
+                        std::string name = at::get_cpu_capability();
+                        if (name == "AVX512") {
+                            return CPUCapability::AVX512;
+                        }
+                        if (name == "AVX2") {
+                            return CPUCapability::AVX2;
+                        }
+                        return CPUCapability::DEFAULT;
+                    }();
+                    return capability;
+                }
+            }  // anonymous namespace
+
+            template <typename scalar_t>
+            mult_fused_restricted_exp_cpu_inner_fn<scalar_t> mult_fused_restricted_exp_cpu_inner_dispatch() {
+                // setup.py only compiles the AVX2 and AVX-512 kernels when building for x86-64, in which case it
+                // defines SIGNATORY_CPU_CAPABILITY_AVX.
+                #ifdef SIGNATORY_CPU_CAPABILITY_AVX
+                    switch (get_cpu_capability()) {
+                        case CPUCapability::AVX512:
+                            return AVX512::mult_fused_restricted_exp_cpu_inner;
+                        case CPUCapability::AVX2:
+                            return AVX2::mult_fused_restricted_exp_cpu_inner;
+                        default:
+                            break;
+                    }
+                #endif
+                return DEFAULT::mult_fused_restricted_exp_cpu_inner;
+            }
+
+            template mult_fused_restricted_exp_cpu_inner_fn<float>
+            mult_fused_restricted_exp_cpu_inner_dispatch<float>();
+            template mult_fused_restricted_exp_cpu_inner_fn<double>
+            mult_fused_restricted_exp_cpu_inner_dispatch<double>();
+            template mult_fused_restricted_exp_cpu_inner_fn<at::Half>
+            mult_fused_restricted_exp_cpu_inner_dispatch<at::Half>();
+            template mult_fused_restricted_exp_cpu_inner_fn<at::BFloat16>
+            mult_fused_restricted_exp_cpu_inner_dispatch<at::BFloat16>();
+        }  // namespace signatory::ta_ops::detail
+    }  // namespace signatory::ta_ops
+}  // namespace signatory
@@ -0,0 +1,121 @@
+/* Copyright 2019 Patrick Kidger. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *    http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ * ========================================================================= */
+ // Provides the parts of the CPU implementation of ta_ops::mult_fused_restricted_exp that are compiled once for every
+ // instruction set that we support, with the best one that the CPU supports being picked at runtime. This is the same
+ // approach as PyTorch itself takes for its CPU kernels (see ATen's DispatchStub).
+ //
+ // Everything that depends on the instruction set is in cpu_kernels_impl.hpp, which is compiled by each of
+ // cpu_kernels_DEFAULT.cpp, cpu_kernels_AVX2.cpp and cpu_kernels_AVX512.cpp, with the compiler flags for that
+ // instruction set; see setup.py.
+ //
+ // Those files must not share any symbols with each other, or with the rest of the extension: if the same inline
+ // function were compiled in more than one of them, then the linker would keep just one copy, which might use
+ // instructions that this CPU doesn't have. So everything that they define is either in an anonymous namespace, or
+ // (just the functions declared below) in the namespace named after their instruction set. That includes what they
+ // pull in from headers, which is why this header doesn't include all of PyTorch: the kernels get only plain pointers
+ // and strides, rather than TensorAccessors.
+
+
+#ifndef SIGNATORY_CPU_KERNELS_HPP
+#define SIGNATORY_CPU_KERNELS_HPP
+
+#include <c10/util/BFloat16.h>  // c10::BFloat16
+#include <c10/util/Half.h>      // c10::Half
+#include <cstdint>              // int64_t
+
+
+namespace signatory {
+    namespace ta_ops {
+        namespace detail {
+            // The type that computations are performed in, for tensors of type scalar_t. This is just scalar_t itself,
+            // except for the reduced precision floating point types, which are accumulated in float32 and then only
+            // rounded when storing the result.
+            template <typename scalar_t>
+            struct accumulate_type { using type = scalar_t; };
+            template <>
+            struct accumulate_type<c10::Half> { using type = float; };
+            template <>
+            struct accumulate_type<c10::BFloat16> { using type = float; };
+
+            // The arguments to mult_fused_restricted_exp_cpu_inner that are the same for every batch element: the
+            // memory of the tensors 'next', 'prev' and 'reciprocals' of mult_fused_restricted_exp_cpu. 'next' and
+            // every element of 'prev' are of shape (batch, channel); 'reciprocals' is one-dimensional.
+            template <typename scalar_t>
+            struct mult_fused_restricted_exp_cpu_args {
+                const scalar_t* next;
+                int64_t next_batch_stride;
+                int64_t next_channel_stride;
+                // 'depth' many of each of these.
+                scalar_t* const* prev;
+                const int64_t* prev_batch_strides;
+                const int64_t* prev_channel_strides;
+                const scalar_t* reciprocals;
+                int64_t reciprocals_stride;
+                int64_t reciprocals_size;
+                int64_t input_channel_size;
+                int64_t depth;
+                bool inverse;
+                // Whether to use the explicitly vectorised loops. Requires that scalar_t and its accumulate_type be
+                // the same, and that next_channel_stride and every element of prev_channel_strides be 1.
+                bool vectorise;
+            };
+
+            // Computes mult_fused_restricted_exp for the single batch element 'batch_index'; see
+            // mult_fused_restricted_exp_cpu_inner_impl in cpu_kernels_impl.hpp.
+            template <typename scalar_t>
+            using mult_fused_restricted_exp_cpu_inner_fn =
+                    void (*)(const mult_fused_restricted_exp_cpu_args<scalar_t>& args,
+                             int64_t batch_index,
+                             typename accumulate_type<scalar_t>::type* next_divided,
+                             typename accumulate_type<scalar_t>::type*& new_scratch,
+                             typename accumulate_type<scalar_t>::type*& old_scratch);
+
+            // Returns the version of mult_fused_restricted_exp_cpu_inner compiled for the best instruction set that
+            // this CPU supports. As with PyTorch, this may be overridden by setting the ATEN_CPU_CAPABILITY
+            // environment variable to 'default', 'avx2' or 'avx512'.
+            // Instantiated for float, double, c10::Half and c10::BFloat16.
+            template <typename scalar_t>
+            mult_fused_restricted_exp_cpu_inner_fn<scalar_t> mult_fused_restricted_exp_cpu_inner_dispatch();
+
+            // The versions for each instruction set. Each of the cpu_kernels_*.cpp files defines just the ones in the
+            // namespace named by its CPU_CAPABILITY. These are overloads rather than a template, so that they aren't
+            // inline (COMDAT) symbols either.
+            #define SIGNATORY_DECLARE_CPU_KERNEL(scalar_t)                                                            \
+            void mult_fused_restricted_exp_cpu_inner(const mult_fused_restricted_exp_cpu_args<scalar_t>& args,      \
+                                                     int64_t batch_index,                                            \
+                                                     accumulate_type<scalar_t>::type* next_divided,                  \
+                                                     accumulate_type<scalar_t>::type*& new_scratch,                  \
+                                                     accumulate_type<scalar_t>::type*& old_scratch);
+            #define SIGNATORY_DECLARE_CPU_KERNELS                                                                     \
+            SIGNATORY_DECLARE_CPU_KERNEL(float)                                                                       \
+            SIGNATORY_DECLARE_CPU_KERNEL(double)                                                                      \
+            SIGNATORY_DECLARE_CPU_KERNEL(c10::Half)                                                                   \
+            SIGNATORY_DECLARE_CPU_KERNEL(c10::BFloat16)
+            namespace DEFAULT {
+                SIGNATORY_DECLARE_CPU_KERNELS
+            }  // namespace signatory::ta_ops::detail::DEFAULT
+            namespace AVX2 {
+                SIGNATORY_DECLARE_CPU_KERNELS
+            }  // namespace signatory::ta_ops::detail::AVX2
+            namespace AVX512 {
+                SIGNATORY_DECLARE_CPU_KERNELS
+            }  // namespace signatory::ta_ops::detail::AVX512
+            #undef SIGNATORY_DECLARE_CPU_KERNELS
+            #undef SIGNATORY_DECLARE_CPU_KERNEL
+        }  // namespace signatory::ta_ops::detail
+    }  // namespace signatory::ta_ops
+}  // namespace signatory
+
+#endif //SIGNATORY_CPU_KERNELS_HPP
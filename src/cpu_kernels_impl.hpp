@@ -0,0 +1,278 @@
+/* Copyright 2019 Patrick Kidger. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *    http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ * ========================================================================= */
+ // The instruction set dependent part of the CPU implementation of ta_ops::mult_fused_restricted_exp; see
+ // cpu_kernels.hpp.
+ //
+ // This is not a normal header: it is included by exactly one of each of the cpu_kernels_*.cpp files, each of which is
+ // compiled with CPU_CAPABILITY defined to the name of its instruction set, along with the corresponding compiler
+ // flags. (Just as for PyTorch's own CPU kernels.) Everything here is then placed in the namespace of that name, and
+ // everything except the functions declared in cpu_kernels.hpp is in an anonymous namespace within it, so that none
+ // of it is shared between instruction sets. For the same reason, this mustn't include anything beyond ATen's
+ // vectorisation headers and the standard library; see cpu_kernels.hpp.
+
+
+#ifndef SIGNATORY_CPU_KERNELS_IMPL_HPP
+#define SIGNATORY_CPU_KERNELS_IMPL_HPP
+
+#ifndef CPU_CAPABILITY
+#error "CPU_CAPABILITY must be defined when compiling the CPU kernels; see setup.py."
+#endif
+
+#include <ATen/cpu/vec/vec.h>  // at::vec::Vectorized
+#include <cstdint>  // int64_t
+#include <utility>  // std::swap
+
+#include "cpu_kernels.hpp"
+
+
+namespace signatory {
+    namespace ta_ops {
+        namespace detail {
+            namespace CPU_CAPABILITY {
+                namespace {
+                    // Explicitly vectorised helpers for the hot loops of mult_fused_restricted_exp_cpu_inner_impl,
+                    // written in terms of ATen's Vectorized, which uses the instruction set that this file is being
+                    // compiled for. These are only available when scalar_t and acc_t agree (i.e. float32 and
+                    // float64); in the mixed precision case the scalar loops are used instead.
+                    template <typename scalar_t, typename acc_t>
+                    struct vectorised {
+                        static constexpr bool available = false;
+
+                        // Never called; exists so that the code calling it still compiles.
+                        template <typename out_t, typename x_t, typename b_t>
+                        static void add_scaled(out_t* /*out*/, const x_t* /*x*/, acc_t /*a*/, const b_t* /*b*/,
+                                               int64_t /*size*/) {}
+                    };
+
+                    template <typename scalar_t>
+                    struct vectorised<scalar_t, scalar_t> {
+                        static constexpr bool available = true;
+
+                        // Computes out[i] = x[i] + a * b[i] for 0 <= i < size. 'out' may be the same as 'x'.
+                        static void add_scaled(scalar_t* out, const scalar_t* x, scalar_t a, const scalar_t* b,
+                                               int64_t size) {
+                            using Vec = at::vec::Vectorized<scalar_t>;
+                            Vec a_vec {a};
+                            int64_t index = 0;
+                            for (; index + Vec::size() <= size; index += Vec::size()) {
+                                Vec result = Vec::loadu(x + index) + a_vec * Vec::loadu(b + index);
+                                result.store(out + index);
+                            }
+                            for (; index < size; ++index) {
+                                out[index] = x[index] + a * b[index];
+                            }
+                        }
+                    };
+
+                    // This describes the forward operation for a single batch element on the CPU.
+                    // No parallelisation is performed in this computation at the moment. We could probably add it on
+                    // but it probably won't give a huge advantage.
+                    // We already parallelise over the batch and stream dimensions. So to see a speedup from
+                    // parallelisation here, we'd need to be computing signatures of just a few short paths, to high
+                    // depths. Still, worth thinking about.
+                    // The scratch space is of type acc_t, which may be of higher precision than scalar_t; see
+                    // accumulate_type.
+                    // If args.vectorise is true then the hot loops use the helpers in 'vectorised'.
+                    template <typename scalar_t, typename acc_t, bool inverse>
+                    void mult_fused_restricted_exp_cpu_inner_impl(
+                            const mult_fused_restricted_exp_cpu_args<scalar_t>& args,
+                            int64_t batch_index,
+                            acc_t* next_divided,
+                            acc_t*& new_scratch,
+                            acc_t*& old_scratch) {
+                        using vec = vectorised<scalar_t, acc_t>;
+
+                        int64_t input_channel_size = args.input_channel_size;
+                        int64_t depth = args.depth;
+                        // The memory for this batch element. The channel dimension is indexed by multiplying by
+                        // next_stride and prev_strides[depth_index], which are 1 if args.vectorise is true.
+                        const scalar_t* next = args.next + batch_index * args.next_batch_stride;
+                        int64_t next_stride = args.next_channel_stride;
+                        auto prev = [&](int64_t depth_index) -> scalar_t* {
+                            return args.prev[depth_index] + batch_index * args.prev_batch_strides[depth_index];
+                        };
+                        const int64_t* prev_strides = args.prev_channel_strides;
+
+                        int64_t next_divided_index = 0;
+                        for (int64_t reciprocal_index = 0; reciprocal_index < args.reciprocals_size;
+                             ++reciprocal_index) {
+                            acc_t reciprocal = static_cast<acc_t>(args.reciprocals[reciprocal_index *
+                                                                                   args.reciprocals_stride]);
+                            for (int64_t channel_index = 0; channel_index < input_channel_size; ++channel_index) {
+                                next_divided[next_divided_index] =
+                                        reciprocal * static_cast<acc_t>(next[channel_index * next_stride]);
+                                ++next_divided_index;
+                            }
+                        }
+
+                        scalar_t* prev_at_zero = prev(0);
+                        for (int64_t depth_index = depth - 1; depth_index >= 1; --depth_index) {
+                            int64_t scratch_size = input_channel_size;
+
+                            int64_t next_divided_index_part = (depth_index - 1) * input_channel_size;
+
+                            for (int64_t scratch_index = 0; scratch_index < input_channel_size; ++scratch_index) {
+                                new_scratch[scratch_index] =
+                                        static_cast<acc_t>(prev_at_zero[scratch_index * prev_strides[0]]) +
+                                        next_divided[next_divided_index_part + scratch_index];
+                            }
+
+                            for (int64_t j = 1, k = depth_index - 2; j < depth_index; ++j, --k) {
+                                std::swap(old_scratch, new_scratch);
+                                int64_t next_divided_index_part2 = k * input_channel_size;
+                                const scalar_t* prev_at_j = prev(j);
+                                if (args.vectorise) {
+                                    // Same as below, just with the innermost loop over whichever index is contiguous.
+                                    if (inverse) {
+                                        for (int64_t channel_index = 0; channel_index < input_channel_size;
+                                             ++channel_index) {
+                                            int64_t offset = channel_index * scratch_size;
+                                            vec::add_scaled(new_scratch + offset, prev_at_j + offset,
+                                                            next_divided[next_divided_index_part2 + channel_index],
+                                                            old_scratch, scratch_size);
+                                        }
+                                    }
+                                    else {
+                                        for (int64_t old_scratch_index = 0; old_scratch_index < scratch_size;
+                                             ++old_scratch_index) {
+                                            int64_t offset = old_scratch_index * input_channel_size;
+                                            vec::add_scaled(new_scratch + offset, prev_at_j + offset,
+                                                            old_scratch[old_scratch_index],
+                                                            next_divided + next_divided_index_part2,
+                                                            input_channel_size);
+                                        }
+                                    }
+                                }
+                                else {
+                                    for (int64_t old_scratch_index = 0; old_scratch_index < scratch_size;
+                                         ++old_scratch_index) {
+                                        for (int64_t channel_index = 0; channel_index < input_channel_size;
+                                             ++channel_index) {
+                                            int64_t new_scratch_index;
+                                            if (inverse) {
+                                                new_scratch_index = channel_index * scratch_size + old_scratch_index;
+                                            }
+                                            else {
+                                                new_scratch_index = old_scratch_index * input_channel_size +
+                                                                    channel_index;
+                                            }
+                                            new_scratch[new_scratch_index] =
+                                                    static_cast<acc_t>(prev_at_j[new_scratch_index * prev_strides[j]]) +
+                                                    old_scratch[old_scratch_index] *
+                                                    next_divided[next_divided_index_part2 + channel_index];
+                                        }
+                                    }
+                                }
+
+                                scratch_size *= input_channel_size;
+                            }
+
+                            scalar_t* prev_at_depth = prev(depth_index);
+                            if (args.vectorise) {
+                                // Same as below, just with the innermost loop over whichever index is contiguous.
+                                if (inverse) {
+                                    for (int64_t next_index = 0; next_index < input_channel_size; ++next_index) {
+                                        int64_t offset = next_index * scratch_size;
+                                        vec::add_scaled(prev_at_depth + offset, prev_at_depth + offset,
+                                                        static_cast<acc_t>(next[next_index]), new_scratch,
+                                                        scratch_size);
+                                    }
+                                }
+                                else {
+                                    for (int64_t new_scratch_index = 0; new_scratch_index < scratch_size;
+                                         ++new_scratch_index) {
+                                        int64_t offset = new_scratch_index * input_channel_size;
+                                        vec::add_scaled(prev_at_depth + offset, prev_at_depth + offset,
+                                                        new_scratch[new_scratch_index], next, input_channel_size);
+                                    }
+                                }
+                            }
+                            else {
+                                int64_t prev_stride = prev_strides[depth_index];
+                                for (int64_t new_scratch_index = 0; new_scratch_index < scratch_size;
+                                     ++new_scratch_index) {
+                                    for (int64_t next_index = 0; next_index < input_channel_size; ++next_index) {
+                                        int64_t prev_index;
+                                        if (inverse) {
+                                            prev_index = next_index * scratch_size + new_scratch_index;
+                                        }
+                                        else {
+                                            prev_index = new_scratch_index * input_channel_size + next_index;
+                                        }
+                                        prev_index *= prev_stride;
+                                        prev_at_depth[prev_index] = static_cast<scalar_t>(
+                                                static_cast<acc_t>(prev_at_depth[prev_index]) +
+                                                new_scratch[new_scratch_index] *
+                                                static_cast<acc_t>(next[next_index * next_stride]));
+                                    }
+                                }
+                            }
+                        }
+
+                        for (int64_t channel_index = 0; channel_index < input_channel_size; ++channel_index) {
+                            prev_at_zero[channel_index * prev_strides[0]] = static_cast<scalar_t>(
+                                    static_cast<acc_t>(prev_at_zero[channel_index * prev_strides[0]]) +
+                                    static_cast<acc_t>(next[channel_index * next_stride]));
+                        }
+
+                        // This corresponds to whether the triangle number of index 'depth' is odd.
+                        // In this case we have performed an odd number of swaps above, so we perform one more here to
+                        // leave the memory size unchanged.
+                        auto depth_mod = depth % 4;
+                        if (depth_mod == 0 || depth_mod == 3) {
+                            std::swap(old_scratch, new_scratch);
+                        }
+                    }
+
+                    template <typename scalar_t>
+                    void mult_fused_restricted_exp_cpu_inner_impl(
+                            const mult_fused_restricted_exp_cpu_args<scalar_t>& args,
+                            int64_t batch_index,
+                            typename accumulate_type<scalar_t>::type* next_divided,
+                            typename accumulate_type<scalar_t>::type*& new_scratch,
+                            typename accumulate_type<scalar_t>::type*& old_scratch) {
+                        using acc_t = typename accumulate_type<scalar_t>::type;
+                        if (args.inverse) {
+                            mult_fused_restricted_exp_cpu_inner_impl<scalar_t, acc_t, /*inverse=*/true>(
+                                    args, batch_index, next_divided, new_scratch, old_scratch);
+                        }
+                        else {
+                            mult_fused_restricted_exp_cpu_inner_impl<scalar_t, acc_t, /*inverse=*/false>(
+                                    args, batch_index, next_divided, new_scratch, old_scratch);
+                        }
+                    }
+                }  // anonymous namespace
+
+                // As declared in cpu_kernels.hpp.
+                #define SIGNATORY_DEFINE_CPU_KERNEL(scalar_t)                                                         \
+                void mult_fused_restricted_exp_cpu_inner(const mult_fused_restricted_exp_cpu_args<scalar_t>& args,  \
+                                                         int64_t batch_index,                                        \
+                                                         accumulate_type<scalar_t>::type* next_divided,              \
+                                                         accumulate_type<scalar_t>::type*& new_scratch,              \
+                                                         accumulate_type<scalar_t>::type*& old_scratch) {            \
+                    mult_fused_restricted_exp_cpu_inner_impl<scalar_t>(args, batch_index, next_divided, new_scratch, \
+                                                                       old_scratch);                                 \
+                }
+                SIGNATORY_DEFINE_CPU_KERNEL(float)
+                SIGNATORY_DEFINE_CPU_KERNEL(double)
+                SIGNATORY_DEFINE_CPU_KERNEL(c10::Half)
+                SIGNATORY_DEFINE_CPU_KERNEL(c10::BFloat16)
+                #undef SIGNATORY_DEFINE_CPU_KERNEL
+            }  // namespace signatory::ta_ops::detail::CPU_CAPABILITY
+        }  // namespace signatory::ta_ops::detail
+    }  // namespace signatory::ta_ops
+}  // namespace signatory
+
+#endif //SIGNATORY_CPU_KERNELS_IMPL_HPP
@@ -15,20 +15,25 @@
  
 
 #include <torch/extension.h>
+#include <algorithm>  // std::fill
 #include <cstdint>    // int64_t
-#include <memory>     // std::unique_ptr
+#include <map>        // std::map
+#include <memory>     // std::shared_ptr, std::unique_ptr
+#include <mutex>      // std::mutex, std::lock_guard
 #include <omp.h>
 #include <stdexcept>  // std::invalid_argument
-#include <tuple>      // std::tie, std::tuple
+#include <tuple>      // std::make_tuple, std::tie, std::tuple
 #include <utility>     // std::pair
 #include <vector>     // std::vector
 
 #include "logsignature.hpp"
 #include "lyndon.hpp"
 #include "misc.hpp"
+#include "parallelism.hpp"
 #include "pycapsule.hpp"
 #include "signature.hpp"
 #include "tensor_algebra_ops.hpp"
+#include "workspace.hpp"
 
 
 namespace signatory {
@@ -66,7 +71,9 @@ namespace signatory {
             // In the tensor algebra it is represented by coefficients of all words. This just extracts the coefficients
             // of all the Lyndon words.
             // The list of all Lyndon words must have already been computed, and passed in as an argument.
-            torch::Tensor compress(const lyndon::LyndonWords& lyndon_words, torch::Tensor input)
+            // If 'out' is defined then the result is written into it.
+            torch::Tensor compress(const lyndon::LyndonWords& lyndon_words, torch::Tensor input,
+                                   torch::Tensor out=torch::Tensor())
             {
                 // TODO: avoid the need for this copy operation entirely by having all of the `tensor_algebra_index`s be
                 //       a std::vector<int64_t> attribute of lyndon_words instead, and then just use torch::from_blob.
@@ -79,6 +86,9 @@ namespace signatory {
                 }
                 indices = indices.to(input.device());
 
+                if (out.defined()) {
+                    return torch::index_select_out(out, input, /*dim=*/channel_dim, /*index=*/indices);
+                }
                 return torch::index_select(input, /*dim=*/channel_dim, /*index=*/indices);
             }
 
@@ -145,134 +155,718 @@ namespace signatory {
                     throw std::invalid_argument("Argument 'signature' must be of floating point type.");
                 }
             }
-        }  // namespace signatory::logsignature::detail
-    }  // namespace signatory::logsignature
 
-    py::object make_lyndon_info(int64_t channels, s_size_type depth, LogSignatureMode mode) {
-        misc::checkargs_channels_depth(channels, depth);
+            // The structure constants of the free Lie algebra, in the coordinates of the "words" mode of the
+            // logsignature. Each row (left, right, target) of 'bch_indices', with corresponding coefficient c in
+            // 'bch_coefficients', represents the contribution c * x[left] * y[right] to [x, y][target].
+            // The first 'num_letter_triples' rows are precisely those for which 'right' is a letter, i.e. of depth
+            // one.
+            template <typename scalar_t>
+            struct BCHBrackets {
+                BCHBrackets(torch::Tensor bch_indices, torch::Tensor bch_coefficients, int64_t num_letter_triples) :
+                indices_a{bch_indices.accessor<int64_t, 2>()},
+                coefficients_a{bch_coefficients.accessor<scalar_t, 1>()},
+                num_letter_triples{num_letter_triples},
+                num_triples{bch_indices.size(0)}
+                {}
 
-        py::gil_scoped_release release;
+                // out += scale * [x, y], using just the rows [start, end)
+                template <typename X, typename Y, typename Out>
+                void bracket(const X& x, const Y& y, Out&& out, scalar_t scale, int64_t start, int64_t end) const {
+                    for (int64_t index = start; index < end; ++index) {
+                        out[indices_a[index][2]] += scale * coefficients_a[index] * x[indices_a[index][0]] *
+                                                    y[indices_a[index][1]];
+                    }
+                }
 
-        std::unique_ptr<lyndon::LyndonWords> lyndon_words;
-        std::vector<std::vector<std::tuple<int64_t, int64_t, int64_t>>> transforms;
-        std::vector<std::vector<std::tuple<int64_t, int64_t, int64_t>>> transforms_backward;
+                // Backward through bracket(x, y, out, scale, start, end). Accumulates into grad_x and grad_y.
+                template <typename GradOut, typename X, typename Y, typename GradX, typename GradY>
+                void bracket_backward(const GradOut& grad_out, const X& x, const Y& y, GradX&& grad_x, GradY&& grad_y,
+                                      scalar_t scale, int64_t start, int64_t end) const {
+                    for (int64_t index = start; index < end; ++index) {
+                        int64_t left = indices_a[index][0];
+                        int64_t right = indices_a[index][1];
+                        scalar_t grad = scale * coefficients_a[index] * grad_out[indices_a[index][2]];
+                        grad_x[left] += grad * y[right];
+                        grad_y[right] += grad * x[left];
+                    }
+                }
 
-        // no make_unique in C++11
-        if (mode == LogSignatureMode::Words) {
-            lyndon_words.reset(new lyndon::LyndonWords(channels, depth, lyndon::LyndonWords::word_tag));
-        }
-        else if (mode == LogSignatureMode::Brackets) {
-            lyndon_words.reset(new lyndon::LyndonWords(channels, depth, lyndon::LyndonWords::bracket_tag));
-            lyndon_words->to_lyndon_basis(transforms, transforms_backward);
-            lyndon_words->delete_extra();
-        }
+                torch::TensorAccessor<int64_t, 2> indices_a;
+                torch::TensorAccessor<scalar_t, 1> coefficients_a;
+                int64_t num_letter_triples;
+                int64_t num_triples;
+            };
 
-        return misc::wrap_capsule<logsignature::detail::LyndonInfo>(std::move(lyndon_words),
-                                                                    std::move(transforms),
-                                                                    std::move(transforms_backward));
-    }
+            // Computes a = [x, b] and d = [x, [x, b]], where b is of depth one.
+            template <typename scalar_t, typename X, typename B>
+            void bch_commutators(const BCHBrackets<scalar_t>& brackets, const X& x, const B& b,
+                                 std::vector<scalar_t>& a, std::vector<scalar_t>& d) {
+                std::fill(a.begin(), a.end(), 0);
+                std::fill(d.begin(), d.end(), 0);
+                brackets.bracket(x, b, a, 1, 0, brackets.num_letter_triples);
+                // a has no component of depth one, so only the rows for which 'right' is not a letter are needed.
+                brackets.bracket(x, a, d, 1, brackets.num_letter_triples, brackets.num_triples);
+            }
 
-    std::tuple<torch::Tensor, py::object>
-    signature_to_logsignature_forward(torch::Tensor signature, int64_t input_channel_size, s_size_type depth,
-                                      bool stream, LogSignatureMode mode, py::object lyndon_info_capsule,
-                                      bool scalar_term) {
-        logsignature::detail::logsignature_checkargs(signature, input_channel_size, depth, stream, scalar_term);
+            // Computes x <- log(exp(x) exp(b)), where b is of depth one, via the Baker-Campbell-Hausdorff formula
+            // log(exp(x) exp(b)) = x + b + 1/2 [x, b] + 1/12 [x, [x, b]] - 1/12 [b, [x, b]] - 1/24 [b, [x, [x, b]]]
+            // which is exact up to depth four. 'a' and 'd' are scratch space.
+            template <typename scalar_t, typename X, typename B>
+            void bch_step(const BCHBrackets<scalar_t>& brackets, X&& x, const B& b, std::vector<scalar_t>& a,
+                          std::vector<scalar_t>& d, int64_t input_channel_size) {
+                bch_commutators(brackets, x, b, a, d);
+                for (int64_t index = 0; index < static_cast<int64_t>(a.size()); ++index) {
+                    x[index] += a[index] / 2 + d[index] / 12;
+                }
+                for (int64_t channel_index = 0; channel_index < input_channel_size; ++channel_index) {
+                    x[channel_index] += b[channel_index];
+                }
+                // -[b, y] = [y, b]
+                brackets.bracket(a, b, x, scalar_t(1) / 12, 0, brackets.num_letter_triples);
+                brackets.bracket(d, b, x, scalar_t(1) / 24, 0, brackets.num_letter_triples);
+            }
 
-        // must finish using Python objects before we release the GIL
-        if (lyndon_info_capsule.is_none()) {
-            lyndon_info_capsule = make_lyndon_info(input_channel_size, depth, mode);
-        }
-        logsignature::detail::LyndonInfo* lyndon_info =
-                misc::unwrap_capsule<logsignature::detail::LyndonInfo>(lyndon_info_capsule);
+            // Backward through bch_step. On entry 'x' should hold the value of x before the step, 'a' and 'd' should
+            // hold the values computed by bch_commutators for this x, and 'grad' should hold the gradient through
+            // the value of x after the step. On exit 'grad' holds the gradient through the value of x before the
+            // step, and the gradient through b is written into 'grad_b'. 'grad_a' and 'grad_d' are scratch space.
+            template <typename scalar_t, typename X, typename B, typename GradB>
+            void bch_step_backward(const BCHBrackets<scalar_t>& brackets, const X& x, const B& b,
+                                   const std::vector<scalar_t>& a, const std::vector<scalar_t>& d,
+                                   std::vector<scalar_t>& grad, GradB&& grad_b, std::vector<scalar_t>& grad_a,
+                                   std::vector<scalar_t>& grad_d, int64_t input_channel_size) {
+                for (int64_t channel_index = 0; channel_index < input_channel_size; ++channel_index) {
+                    grad_b[channel_index] = grad[channel_index];
+                }
+                for (int64_t index = 0; index < static_cast<int64_t>(grad.size()); ++index) {
+                    grad_a[index] = grad[index] / 2;
+                    grad_d[index] = grad[index] / 12;
+                }
+                brackets.bracket_backward(grad, d, b, grad_d, grad_b, scalar_t(1) / 24, 0,
+                                          brackets.num_letter_triples);
+                brackets.bracket_backward(grad, a, b, grad_a, grad_b, scalar_t(1) / 12, 0,
+                                          brackets.num_letter_triples);
+                brackets.bracket_backward(grad_d, x, a, grad, grad_a, 1, brackets.num_letter_triples,
+                                          brackets.num_triples);
+                brackets.bracket_backward(grad_a, x, b, grad, grad_b, 1, 0, brackets.num_letter_triples);
+            }
 
-        torch::Tensor logsignature;
-        {  // release GIL
-            py::gil_scoped_release release;
+            template <typename scalar_t>
+            void logsignature_bch_forward_cpu(torch::Tensor path_increments, torch::Tensor logsignature,
+                                              const BCHBrackets<scalar_t>& brackets, bool stream) {
+                auto path_increments_a = path_increments.accessor<scalar_t, 3>();
+                int64_t input_stream_size = path_increments.size(stream_dim);
+                int64_t batch_size = path_increments.size(batch_dim);
+                int64_t input_channel_size = path_increments.size(channel_dim);
+                int64_t output_channel_size = logsignature.size(channel_dim);
 
-            if (scalar_term) {
-                signature = signature.narrow(/*dim=*/channel_dim, /*start=*/1,
-                                             /*length=*/signature.size(channel_dim) - 1);
+                #pragma omp parallel for default(none) \
+                                         num_threads(parallelism::max_threads()) \
+                                         shared(path_increments_a, logsignature, brackets, stream, input_stream_size, \
+                                                batch_size, input_channel_size, output_channel_size)
+                for (int64_t batch_index = 0; batch_index < batch_size; ++batch_index) {
+                    std::vector<scalar_t> a (output_channel_size);
+                    std::vector<scalar_t> d (output_channel_size);
+                    if (stream) {
+                        auto logsignature_a = logsignature.accessor<scalar_t, 3>();
+                        for (int64_t stream_index = 0; stream_index < input_stream_size; ++stream_index) {
+                            auto x = logsignature_a[stream_index][batch_index];
+                            for (int64_t index = 0; index < output_channel_size; ++index) {
+                                x[index] = (stream_index == 0) ? 0 :
+                                           logsignature_a[stream_index - 1][batch_index][index];
+                            }
+                            bch_step(brackets, x, path_increments_a[stream_index][batch_index], a, d,
+                                     input_channel_size);
+                        }
+                    }
+                    else {
+                        auto x = logsignature.accessor<scalar_t, 2>()[batch_index];
+                        for (int64_t index = 0; index < output_channel_size; ++index) {
+                            x[index] = 0;
+                        }
+                        for (int64_t stream_index = 0; stream_index < input_stream_size; ++stream_index) {
+                            bch_step(brackets, x, path_increments_a[stream_index][batch_index], a, d,
+                                     input_channel_size);
+                        }
+                    }
+                }
             }
 
-            // Don't need to track gradients when we have a custom backward
-            signature = signature.detach();
+            template <typename scalar_t>
+            void logsignature_bch_backward_cpu(torch::Tensor grad_logsignature, torch::Tensor logsignature,
+                                               torch::Tensor path_increments, torch::Tensor grad_path_increments,
+                                               const BCHBrackets<scalar_t>& brackets, bool stream) {
+                auto path_increments_a = path_increments.accessor<scalar_t, 3>();
+                auto grad_path_increments_a = grad_path_increments.accessor<scalar_t, 3>();
+                int64_t input_stream_size = path_increments.size(stream_dim);
+                int64_t batch_size = path_increments.size(batch_dim);
+                int64_t input_channel_size = path_increments.size(channel_dim);
+                int64_t output_channel_size = logsignature.size(channel_dim);
 
-            torch::TensorOptions opts = signature.options();
-            torch::Tensor reciprocals = misc::make_reciprocals(depth, opts);
-            int64_t output_stream_size = stream ? signature.size(stream_dim) : -1;
+                #pragma omp parallel for default(none) \
+                                         num_threads(parallelism::max_threads()) \
+                                         shared(grad_logsignature, logsignature, path_increments_a, \
+                                                grad_path_increments_a, brackets, stream, input_stream_size, \
+                                                batch_size, input_channel_size, output_channel_size)
+                for (int64_t batch_index = 0; batch_index < batch_size; ++batch_index) {
+                    std::vector<scalar_t> x (output_channel_size);
+                    std::vector<scalar_t> grad (output_channel_size);
+                    std::vector<scalar_t> a (output_channel_size);
+                    std::vector<scalar_t> d (output_channel_size);
+                    std::vector<scalar_t> grad_a (output_channel_size);
+                    std::vector<scalar_t> grad_d (output_channel_size);
+                    std::vector<scalar_t> negative_b (input_channel_size);
 
-            // and allocate memory for the logsignature
-            logsignature = torch::empty_like(signature);
-            std::vector <torch::Tensor> signature_by_term;
-            std::vector <torch::Tensor> logsignature_by_term;
-            misc::slice_by_term(signature, signature_by_term, input_channel_size, depth);
-            misc::slice_by_term(logsignature, logsignature_by_term, input_channel_size, depth);
+                    if (stream) {
+                        auto grad_logsignature_a = grad_logsignature.accessor<scalar_t, 3>();
+                        auto logsignature_a = logsignature.accessor<scalar_t, 3>();
+                        for (int64_t index = 0; index < output_channel_size; ++index) {
+                            grad[index] = grad_logsignature_a[input_stream_size - 1][batch_index][index];
+                        }
+                        for (int64_t stream_index = input_stream_size - 1; stream_index >= 0; --stream_index) {
+                            // We saved the value before this step as part of the output, so just look it up.
+                            for (int64_t index = 0; index < output_channel_size; ++index) {
+                                x[index] = (stream_index == 0) ? 0 :
+                                           logsignature_a[stream_index - 1][batch_index][index];
+                            }
+                            auto b = path_increments_a[stream_index][batch_index];
+                            bch_commutators(brackets, x, b, a, d);
+                            bch_step_backward(brackets, x, b, a, d, grad,
+                                              grad_path_increments_a[stream_index][batch_index], grad_a, grad_d,
+                                              input_channel_size);
+                            if (stream_index > 0) {
+                                for (int64_t index = 0; index < output_channel_size; ++index) {
+                                    grad[index] += grad_logsignature_a[stream_index - 1][batch_index][index];
+                                }
+                            }
+                        }
+                    }
+                    else {
+                        auto grad_logsignature_a = grad_logsignature.accessor<scalar_t, 2>();
+                        auto logsignature_a = logsignature.accessor<scalar_t, 2>();
+                        for (int64_t index = 0; index < output_channel_size; ++index) {
+                            grad[index] = grad_logsignature_a[batch_index][index];
+                            x[index] = logsignature_a[batch_index][index];
+                        }
+                        for (int64_t stream_index = input_stream_size - 1; stream_index >= 0; --stream_index) {
+                            auto b = path_increments_a[stream_index][batch_index];
+                            // Recompute the value before this step, using log(exp(x) exp(b) exp(-b)) = x, as in
+                            // signature_backward.
+                            for (int64_t channel_index = 0; channel_index < input_channel_size; ++channel_index) {
+                                negative_b[channel_index] = -b[channel_index];
+                            }
+                            bch_step(brackets, x, negative_b, a, d, input_channel_size);
+                            bch_commutators(brackets, x, b, a, d);
+                            bch_step_backward(brackets, x, b, a, d, grad,
+                                              grad_path_increments_a[stream_index][batch_index], grad_a, grad_d,
+                                              input_channel_size);
+                        }
+                    }
+                }
+            }
 
-            if (stream) {
-                std::vector <torch::Tensor> signature_by_term_at_stream;
+            void logsignature_bch_checkargs(torch::Tensor path_increments, s_size_type depth,
+                                            torch::Tensor bch_indices, torch::Tensor bch_coefficients,
+                                            int64_t num_letter_triples) {
+                if (path_increments.ndimension() != 3) {
+                    throw std::invalid_argument("Argument 'path_increments' must be a 3-dimensional tensor.");
+                }
+                if (path_increments.size(stream_dim) == 0 || path_increments.size(batch_dim) == 0 ||
+                    path_increments.size(channel_dim) == 0) {
+                    throw std::invalid_argument("Argument 'path_increments' cannot have dimensions of size zero.");
+                }
+                if (path_increments.is_cuda()) {
+                    throw std::invalid_argument("Argument 'path_increments' must be on the CPU.");
+                }
+                if (!path_increments.is_floating_point()) {
+                    throw std::invalid_argument("Argument 'path_increments' must be of floating point type.");
+                }
+                if (depth < 1 || depth > 4) {
+                    throw std::invalid_argument("Argument 'depth' must be an integer between one and four.");
+                }
+                if (bch_indices.ndimension() != 2 || bch_indices.size(1) != 3 ||
+                    bch_indices.scalar_type() != torch::kInt64) {
+                    throw std::invalid_argument("Argument 'bch_indices' must be a 2-dimensional tensor of shape "
+                                                "(num_triples, 3) and of dtype int64.");
+                }
+                if (bch_coefficients.ndimension() != 1 || bch_coefficients.size(0) != bch_indices.size(0)) {
+                    throw std::invalid_argument("Argument 'bch_coefficients' must be a 1-dimensional tensor with one "
+                                                "entry for each row of 'bch_indices'.");
+                }
+                if (num_letter_triples < 0 || num_letter_triples > bch_indices.size(0)) {
+                    throw std::invalid_argument("Argument 'num_letter_triples' must be between zero and the number of "
+                                                "rows of 'bch_indices'.");
+                }
+            }
 
-                // The if statement is for safety's sake... we haven't had issues with this one, but there have been
-                // other issues we've run into with OpenMP+GPU on other for loops.
-                // (even though presumably those threads are just scheduling work for the GPU to do... ?)
-                #pragma omp parallel for default(none) \
-                                     if(!signature.is_cuda()) \
-                                     shared(output_stream_size, logsignature_by_term, signature_by_term, reciprocals)
-                for (int64_t stream_index = 0;
-                     stream_index < output_stream_size;
-                     ++stream_index) {
-                    std::vector <torch::Tensor> signature_by_term_at_stream;
-                    std::vector <torch::Tensor> logsignature_by_term_at_stream;
+            // Brackets and Words are the two possible compressed forms of the logsignature. This performs the
+            // compression (if any) corresponding to 'mode', of a logsignature in the expanded form.
+            // If 'out' is defined then the result is written into it. (If mode == LogSignatureMode::Expand then it is
+            // assumed that 'logsignature' is already 'out'.)
+            torch::Tensor compress_by_mode(torch::Tensor logsignature, LogSignatureMode mode, LyndonInfo* lyndon_info,
+                                           torch::Tensor out=torch::Tensor()) {
+                if (mode == LogSignatureMode::Words) {
+                    logsignature = compress(*lyndon_info->lyndon_words, logsignature, out);
+                }
+                else if (mode == LogSignatureMode::Brackets) {
+                    logsignature = compress(*lyndon_info->lyndon_words, logsignature, out);
+                    // This is essentially solving a sparse linear system... and it's horrendously slow on a GPU.
+                    // There may well be ways of speeding this up beyond what's done here, but the brackets mode is
+                    // definitely the least favoured child out of the mode options we provide. (It's typically a
+                    // strange choice in machine learning anyway, when the words mode is available.)
+                    // iisignature does manage to provide this mode efficiently on the CPU by collecting together
+                    // Lyndon anagrams and then using pseudoinverses, which is an approach that might well work
+                    // efficiently on the GPU, so that is a possibility
+                    auto device = logsignature.device();
+                    logsignature = logsignature.cpu();
+                    // Then apply the transforms. We rely on the triangularity property of the Lyndon basis for this to
+                    // work.
+                    #pragma omp parallel for default(none) \
+                                         num_threads(parallelism::max_threads()) \
+                                         shared(lyndon_info, logsignature) schedule(dynamic, 1)
+                    for (s_size_type transform_class_index = 0;
+                         transform_class_index < static_cast<s_size_type>(lyndon_info->transforms.size());
+                         ++transform_class_index) {
+                        // Note that it is very important that this inner loop operate serially!
+                        for (const auto& transform : lyndon_info->transforms[transform_class_index]) {
+                            int64_t source_index = std::get<0>(transform);
+                            int64_t target_index = std::get<1>(transform);
+                            int64_t coefficient = std::get<2>(transform);
+                            torch::Tensor source = logsignature.narrow(/*dim=*/channel_dim,
+                                                                       /*start=*/source_index,
+                                                                       /*length=*/1);
+                            torch::Tensor target = logsignature.narrow(/*dim=*/channel_dim,
+                                                                       /*start=*/target_index,
+                                                                       /*length=*/1);
+                            target.sub_(source, coefficient);
+                        }
+                    }
+                    logsignature = logsignature.to(device);
+                    if (out.defined() && !logsignature.is_same(out)) {
+                        // We were on the GPU, so the transforms were applied to a copy.
+                        out.copy_(logsignature);
+                        logsignature = out;
+                    }
+                }
+                return logsignature;
+            }
 
-                    misc::slice_at_stream(signature_by_term, signature_by_term_at_stream, stream_index);
-                    misc::slice_at_stream(logsignature_by_term, logsignature_by_term_at_stream, stream_index);
+            // Backwards through compress_by_mode: takes a gradient with respect to the compressed logsignature and
+            // returns the gradient with respect to the expanded logsignature, which has 'output_channel_size' channels.
+            // The result never shares memory with 'grad_logsignature', so may be safely modified in-place.
+            torch::Tensor decompress_by_mode(torch::Tensor grad_logsignature, LogSignatureMode mode,
+                                             LyndonInfo* lyndon_info, torch::TensorOptions opts, bool stream,
+                                             int64_t output_channel_size) {
+                if (mode == LogSignatureMode::Expand) {
+                    // Clone so we don't leak changes through grad_logsignature.
+                    grad_logsignature = grad_logsignature.clone();
+                }
+                else if (mode == LogSignatureMode::Words){
+                    grad_logsignature = compress_backward(grad_logsignature, *lyndon_info->lyndon_words, opts, stream,
+                                                          output_channel_size);
+                }
+                else {  // mode == LogSignatureMode::Brackets
+                    grad_logsignature = compress_backward(grad_logsignature, *lyndon_info->lyndon_words, opts, stream,
+                                                          output_channel_size);
 
-                    ta_ops::log(logsignature_by_term_at_stream, signature_by_term_at_stream, reciprocals);
+                    /* This is a deliberate asymmetry between the forwards and backwards: in the forwards pass we
+                     * applied the linear transformation after compression, but on the backwards we don't apply the
+                     * transforms before decompressing. Instead we apply a different (equivalent) transformation after
+                     * decompressing. This is because otherwise we would have to clone the grad_logsignature we were
+                     * given, to be sure that the transformations (which necessarily operate in-place) don't leak out.
+                     * By doing it this way the memory that we operate on is internal memory that we've claimed, not
+                     * memory that we've been given in an input.
+                     */
+                    auto device = grad_logsignature.device();
+                    grad_logsignature = grad_logsignature.cpu();
+                    // This is essentially solving a sparse linear system... and it's horrendously slow on a GPU.
+                    #pragma omp parallel for default(none) \
+                                             num_threads(parallelism::max_threads()) \
+                                             shared(lyndon_info, grad_logsignature) schedule(dynamic,1)
+                    for (s_size_type transform_class_index = 0;
+                         transform_class_index < static_cast<s_size_type>(lyndon_info->transforms_backward.size());
+                         ++transform_class_index) {
+                        for (auto tptr = lyndon_info->transforms_backward[transform_class_index].rbegin();
+                             tptr != lyndon_info->transforms_backward[transform_class_index].rend();
+                             ++tptr)  {
+                            int64_t source_index = std::get<0>(*tptr);
+                            int64_t target_index = std::get<1>(*tptr);
+                            int64_t coefficient = std::get<2>(*tptr);
+                            torch::Tensor grad_source = grad_logsignature.narrow(/*dim=*/channel_dim,
+                                                                                 /*start=*/source_index,
+                                                                                 /*length=*/1);
+                            torch::Tensor grad_target = grad_logsignature.narrow(/*dim=*/channel_dim,
+                                                                                 /*start=*/target_index,
+                                                                                 /*length=*/1);
+                            grad_source.sub_(grad_target, coefficient);
+                        }
+                    }
+                    grad_logsignature = grad_logsignature.to(device);
                 }
+                return grad_logsignature;
             }
-            else {
-                ta_ops::log(logsignature_by_term, signature_by_term, reciprocals);
+
+            // Computes the LyndonInfo for the given arguments. Doesn't need the GIL.
+            std::unique_ptr<LyndonInfo> compute_lyndon_info(int64_t channels, s_size_type depth,
+                                                            LogSignatureMode mode) {
+                std::unique_ptr<lyndon::LyndonWords> lyndon_words;
+                std::vector<std::vector<std::tuple<int64_t, int64_t, int64_t>>> transforms;
+                std::vector<std::vector<std::tuple<int64_t, int64_t, int64_t>>> transforms_backward;
+
+                // no make_unique in C++11
+                if (mode == LogSignatureMode::Words) {
+                    lyndon_words.reset(new lyndon::LyndonWords(channels, depth, lyndon::LyndonWords::word_tag));
+                }
+                else if (mode == LogSignatureMode::Brackets) {
+                    lyndon_words.reset(new lyndon::LyndonWords(channels, depth, lyndon::LyndonWords::bracket_tag));
+                    lyndon_words->to_lyndon_basis(transforms, transforms_backward);
+                    lyndon_words->delete_extra();
+                }
+
+                return std::unique_ptr<LyndonInfo>(new LyndonInfo(std::move(lyndon_words), std::move(transforms),
+                                                                  std::move(transforms_backward)));
             }
 
-            // Brackets and Words are the two possible compressed forms of the logsignature. So here we perform the
-            // compression.
-            if (mode == LogSignatureMode::Words) {
-                logsignature = logsignature::detail::compress(*lyndon_info->lyndon_words, logsignature);
+            // The custom operators can't be passed a PyCapsule, so instead they use this, which computes the
+            // LyndonInfo just the first time it is asked for with any particular arguments, and then keeps it for the
+            // rest of the program.
+            std::shared_ptr<LyndonInfo> cached_lyndon_info(int64_t channels, s_size_type depth,
+                                                           LogSignatureMode mode) {
+                using Key = std::tuple<int64_t, s_size_type, int>;
+                static std::mutex mutex;
+                static std::map<Key, std::shared_ptr<LyndonInfo>> cache;
+
+                std::lock_guard<std::mutex> lock {mutex};
+                Key key = std::make_tuple(channels, depth, static_cast<int>(mode));
+                auto found = cache.find(key);
+                if (found != cache.end()) {
+                    return found->second;
+                }
+                std::shared_ptr<LyndonInfo> lyndon_info {compute_lyndon_info(channels, depth, mode)};
+                cache[key] = lyndon_info;
+                return lyndon_info;
             }
-            else if (mode == LogSignatureMode::Brackets) {
-                logsignature = logsignature::detail::compress(*lyndon_info->lyndon_words, logsignature);
-                // This is essentially solving a sparse linear system... and it's horrendously slow on a GPU.
-                // There may well be ways of speeding this up beyond what's done here, but the brackets mode is
-                // definitely the least favoured child out of the mode options we provide. (It's typically a strange
-                // choice in machine learning anyway, when the words mode is available.)
-                // iisignature does manage to provide this mode efficiently on the CPU by collecting together Lyndon
-                // anagrams and then using pseudoinverses, which is an approach that might well work efficiently on the
-                // GPU, so that is a possibility
-                auto device = logsignature.device();
-                logsignature = logsignature.cpu();
-                // Then apply the transforms. We rely on the triangularity property of the Lyndon basis for this to work.
-                #pragma omp parallel for default(none) \
-                                     shared(lyndon_info, logsignature) schedule(dynamic, 1)
-                for (s_size_type transform_class_index = 0;
-                     transform_class_index < static_cast<s_size_type>(lyndon_info->transforms.size());
-                     ++transform_class_index) {
-                    // Note that it is very important that this inner loop operate serially!
-                    for (const auto& transform : lyndon_info->transforms[transform_class_index]) {
-                        int64_t source_index = std::get<0>(transform);
-                        int64_t target_index = std::get<1>(transform);
-                        int64_t coefficient = std::get<2>(transform);
-                        torch::Tensor source = logsignature.narrow(/*dim=*/channel_dim,
-                                                                   /*start=*/source_index,
-                                                                   /*length=*/1);
-                        torch::Tensor target = logsignature.narrow(/*dim=*/channel_dim,
-                                                                   /*start=*/target_index,
-                                                                   /*length=*/1);
-                        target.sub_(source, coefficient);
+
+            // The computation of signature_to_logsignature_forward, once the Lyndon information has been found.
+            torch::Tensor signature_to_logsignature_forward_inner(torch::Tensor signature,
+                                                                  int64_t input_channel_size,
+                                                                  s_size_type depth, bool stream,
+                                                                  LogSignatureMode mode,
+                                                                  LyndonInfo* lyndon_info, bool scalar_term,
+                                                                  bool out, torch::Tensor out_value) {
+                misc::GILRelease release;
+
+                torch::Tensor logsignature;
+                if (scalar_term) {
+                    signature = signature.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                 /*length=*/signature.size(channel_dim) - 1);
+                }
+
+                // Don't need to track gradients when we have a custom backward
+                signature = signature.detach();
+
+                torch::TensorOptions opts = signature.options();
+                torch::Tensor reciprocals = workspace::reciprocals(depth, opts);
+                int64_t output_stream_size = stream ? signature.size(stream_dim) : -1;
+
+                // and allocate memory for the logsignature
+                if (out && mode == LogSignatureMode::Expand) {
+                    logsignature = out_value;
+                }
+                else {
+                    logsignature = torch::empty_like(signature);
+                }
+                if (!out) {
+                    // So that compress_by_mode knows not to use it.
+                    out_value = torch::Tensor();
+                }
+                std::vector <torch::Tensor> signature_by_term;
+                std::vector <torch::Tensor> logsignature_by_term;
+                misc::slice_by_term(signature, signature_by_term, input_channel_size, depth);
+                misc::slice_by_term(logsignature, logsignature_by_term, input_channel_size, depth);
+
+                if (stream) {
+                    std::vector <torch::Tensor> signature_by_term_at_stream;
+
+                    // The if statement is for safety's sake... we haven't had issues with this one, but there have
+                    // been other issues we've run into with OpenMP+GPU on other for loops.
+                    // (even though presumably those threads are just scheduling work for the GPU to do... ?)
+                    #pragma omp parallel for default(none) \
+                                         num_threads(parallelism::max_threads()) \
+                                         if(!signature.is_cuda()) \
+                                         shared(output_stream_size, logsignature_by_term, signature_by_term, \
+                                                reciprocals)
+                    for (int64_t stream_index = 0;
+                         stream_index < output_stream_size;
+                         ++stream_index) {
+                        std::vector <torch::Tensor> signature_by_term_at_stream;
+                        std::vector <torch::Tensor> logsignature_by_term_at_stream;
+
+                        misc::slice_at_stream(signature_by_term, signature_by_term_at_stream, stream_index);
+                        misc::slice_at_stream(logsignature_by_term, logsignature_by_term_at_stream, stream_index);
+
+                        ta_ops::log(logsignature_by_term_at_stream, signature_by_term_at_stream, reciprocals);
                     }
                 }
-                logsignature = logsignature.to(device);
+                else {
+                    ta_ops::log(logsignature_by_term, signature_by_term, reciprocals);
+                }
+
+                return compress_by_mode(logsignature, mode, lyndon_info, out_value);
             }
+
+            // The computation of signature_to_logsignature_backward, once the Lyndon information has been found.
+            torch::Tensor signature_to_logsignature_backward_inner(torch::Tensor grad_logsignature,
+                                                                   torch::Tensor signature,
+                                                                   int64_t input_channel_size,
+                                                                   s_size_type depth,
+                                                                   bool stream,
+                                                                   LogSignatureMode mode,
+                                                                   LyndonInfo* lyndon_info,
+                                                                   bool scalar_term) {
+                misc::GILRelease release;
+
+                if (scalar_term) {
+                    signature = signature.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                 /*length=*/signature.size(channel_dim) - 1);
+                }
+
+                grad_logsignature = grad_logsignature.detach();
+                signature = signature.detach();
+
+                torch::TensorOptions opts = signature.options();
+                torch::Tensor reciprocals = workspace::reciprocals(depth, opts);
+                int64_t output_stream_size = stream ? signature.size(stream_dim) : -1;
+                int64_t output_channel_size = signature.size(channel_dim);
+
+                std::vector<torch::Tensor> signature_by_term;
+                misc::slice_by_term(signature, signature_by_term, input_channel_size, depth);
+
+                grad_logsignature = decompress_by_mode(grad_logsignature, mode, lyndon_info, opts, stream,
+                                                       output_channel_size);
+
+                torch::Tensor grad_signature;
+                torch::Tensor grad_signature_with_scalar;
+                if (scalar_term) {
+                    if (stream) {
+                        grad_signature_with_scalar = torch::zeros({grad_logsignature.size(stream_dim),
+                                                                   grad_logsignature.size(batch_dim),
+                                                                   grad_logsignature.size(channel_dim) + 1},
+                                                                  opts);
+                    }
+                    else {
+                        grad_signature_with_scalar = torch::zeros({grad_logsignature.size(batch_dim),
+                                                                   grad_logsignature.size(channel_dim) + 1},
+                                                                  opts);
+                    }
+                    grad_signature = grad_signature_with_scalar.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                                       /*length=*/grad_logsignature.size(channel_dim));
+                }
+                else {
+                    grad_signature = torch::zeros_like(grad_logsignature);
+                    grad_signature_with_scalar = grad_signature;
+                }
+
+                std::vector<torch::Tensor> grad_logsignature_by_term;
+                std::vector<torch::Tensor> grad_signature_by_term;
+                misc::slice_by_term(grad_logsignature, grad_logsignature_by_term, input_channel_size, depth);
+                misc::slice_by_term(grad_signature, grad_signature_by_term, input_channel_size, depth);
+
+                if (stream) {
+                    // The if statement is because this sometimes hangs on the GPU... for some reason.
+                    #pragma omp parallel for default(none) \
+                                             num_threads(parallelism::max_threads()) \
+                                             if(!grad_logsignature.is_cuda()) \
+                                             shared(grad_logsignature_by_term, \
+                                                    grad_signature_by_term, \
+                                                    signature_by_term, \
+                                                    reciprocals, \
+                                                    output_stream_size)
+                    for (int64_t stream_index = 0; stream_index < output_stream_size; ++stream_index) {
+                        std::vector<torch::Tensor> grad_logsignature_by_term_at_stream;
+                        std::vector<torch::Tensor> grad_signature_by_term_at_stream;
+                        std::vector<torch::Tensor> signature_by_term_at_stream;
+
+                        misc::slice_at_stream(grad_logsignature_by_term,
+                                              grad_logsignature_by_term_at_stream,
+                                              stream_index);
+                        misc::slice_at_stream(grad_signature_by_term,
+                                              grad_signature_by_term_at_stream,
+                                              stream_index);
+                        misc::slice_at_stream(signature_by_term,
+                                              signature_by_term_at_stream,
+                                              stream_index);
+
+                        ta_ops::log_backward(grad_logsignature_by_term_at_stream, grad_signature_by_term_at_stream,
+                                             signature_by_term_at_stream, reciprocals);
+                    }
+                }
+                else {
+                    ta_ops::log_backward(grad_logsignature_by_term, grad_signature_by_term, signature_by_term,
+                                         reciprocals);
+                }
+
+                return grad_signature_with_scalar;
+            }
+
+            // The computation of signature_to_logsignature_double_backward, once the Lyndon information has been found.
+            std::tuple<torch::Tensor, torch::Tensor>
+            signature_to_logsignature_double_backward_inner(torch::Tensor grad_logsignature,
+                                                            torch::Tensor signature,
+                                                            torch::Tensor tangent_signature,
+                                                            int64_t input_channel_size,
+                                                            s_size_type depth,
+                                                            bool stream,
+                                                            LogSignatureMode mode,
+                                                            LyndonInfo* lyndon_info,
+                                                            bool scalar_term) {
+                misc::GILRelease release;
+
+                if (scalar_term) {
+                    signature = signature.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                 /*length=*/signature.size(channel_dim) - 1);
+                    tangent_signature = tangent_signature.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                                 /*length=*/tangent_signature.size(channel_dim) - 1);
+                }
+
+                grad_logsignature = grad_logsignature.detach();
+                signature = signature.detach();
+                tangent_signature = tangent_signature.detach();
+
+                torch::TensorOptions opts = signature.options();
+                torch::Tensor reciprocals = workspace::reciprocals(depth, opts);
+                int64_t output_stream_size = stream ? signature.size(stream_dim) : -1;
+                int64_t output_channel_size = signature.size(channel_dim);
+
+                grad_logsignature = decompress_by_mode(grad_logsignature, mode, lyndon_info, opts, stream,
+                                                       output_channel_size);
+
+                // The logsignature itself isn't needed, but is computed alongside its perturbation anyway.
+                torch::Tensor logsignature = torch::empty_like(signature);
+                torch::Tensor tangent_logsignature = torch::empty_like(signature);
+                // The gradient through the perturbation to the signature; it's computed alongside the gradient through
+                // the signature, but isn't needed.
+                torch::Tensor grad_tangent_signature = torch::zeros_like(signature);
+                torch::Tensor grad_signature_with_scalar;
+                if (scalar_term) {
+                    std::vector<int64_t> sizes (signature.sizes().begin(), signature.sizes().end());
+                    ++sizes.back();
+                    grad_signature_with_scalar = torch::zeros(sizes, opts);
+                }
+                else {
+                    grad_signature_with_scalar = torch::zeros_like(signature);
+                }
+                torch::Tensor grad_signature = grad_signature_with_scalar.narrow(/*dim=*/channel_dim,
+                                                                                 /*start=*/scalar_term ? 1 : 0,
+                                                                                 /*length=*/output_channel_size);
+
+                std::vector<torch::Tensor> signature_by_term;
+                std::vector<torch::Tensor> tangent_signature_by_term;
+                std::vector<torch::Tensor> logsignature_by_term;
+                std::vector<torch::Tensor> tangent_logsignature_by_term;
+                std::vector<torch::Tensor> grad_logsignature_by_term;
+                std::vector<torch::Tensor> grad_signature_by_term;
+                std::vector<torch::Tensor> grad_tangent_signature_by_term;
+                misc::slice_by_term(signature, signature_by_term, input_channel_size, depth);
+                misc::slice_by_term(tangent_signature, tangent_signature_by_term, input_channel_size, depth);
+                misc::slice_by_term(logsignature, logsignature_by_term, input_channel_size, depth);
+                misc::slice_by_term(tangent_logsignature, tangent_logsignature_by_term, input_channel_size, depth);
+                misc::slice_by_term(grad_logsignature, grad_logsignature_by_term, input_channel_size, depth);
+                misc::slice_by_term(grad_signature, grad_signature_by_term, input_channel_size, depth);
+                misc::slice_by_term(grad_tangent_signature, grad_tangent_signature_by_term, input_channel_size,
+                                    depth);
+
+                if (stream) {
+                    // The if statement is for the same reason as in signature_to_logsignature_backward.
+                    #pragma omp parallel for default(none) \
+                                             num_threads(parallelism::max_threads()) \
+                                             if(!signature.is_cuda()) \
+                                             shared(signature_by_term, \
+                                                    tangent_signature_by_term, \
+                                                    logsignature_by_term, \
+                                                    tangent_logsignature_by_term, \
+                                                    grad_logsignature_by_term, \
+                                                    grad_signature_by_term, \
+                                                    grad_tangent_signature_by_term, \
+                                                    reciprocals, \
+                                                    output_stream_size)
+                    for (int64_t stream_index = 0; stream_index < output_stream_size; ++stream_index) {
+                        std::vector<torch::Tensor> signature_by_term_at_stream;
+                        std::vector<torch::Tensor> tangent_signature_by_term_at_stream;
+                        std::vector<torch::Tensor> logsignature_by_term_at_stream;
+                        std::vector<torch::Tensor> tangent_logsignature_by_term_at_stream;
+                        std::vector<torch::Tensor> grad_logsignature_by_term_at_stream;
+                        std::vector<torch::Tensor> grad_signature_by_term_at_stream;
+                        std::vector<torch::Tensor> grad_tangent_signature_by_term_at_stream;
+
+                        misc::slice_at_stream(signature_by_term, signature_by_term_at_stream, stream_index);
+                        misc::slice_at_stream(tangent_signature_by_term, tangent_signature_by_term_at_stream,
+                                              stream_index);
+                        misc::slice_at_stream(logsignature_by_term, logsignature_by_term_at_stream, stream_index);
+                        misc::slice_at_stream(tangent_logsignature_by_term, tangent_logsignature_by_term_at_stream,
+                                              stream_index);
+                        misc::slice_at_stream(grad_logsignature_by_term, grad_logsignature_by_term_at_stream,
+                                              stream_index);
+                        misc::slice_at_stream(grad_signature_by_term, grad_signature_by_term_at_stream, stream_index);
+                        misc::slice_at_stream(grad_tangent_signature_by_term, grad_tangent_signature_by_term_at_stream,
+                                              stream_index);
+
+                        ta_ops::log_tangent(tangent_logsignature_by_term_at_stream, logsignature_by_term_at_stream,
+                                            signature_by_term_at_stream, tangent_signature_by_term_at_stream,
+                                            reciprocals);
+                        ta_ops::log_tangent_backward(grad_logsignature_by_term_at_stream,
+                                                     grad_signature_by_term_at_stream,
+                                                     grad_tangent_signature_by_term_at_stream,
+                                                     signature_by_term_at_stream,
+                                                     tangent_signature_by_term_at_stream, reciprocals);
+                    }
+                }
+                else {
+                    ta_ops::log_tangent(tangent_logsignature_by_term, logsignature_by_term, signature_by_term,
+                                        tangent_signature_by_term, reciprocals);
+                    ta_ops::log_tangent_backward(grad_logsignature_by_term, grad_signature_by_term,
+                                                 grad_tangent_signature_by_term, signature_by_term,
+                                                 tangent_signature_by_term, reciprocals);
+                }
+
+                // Compression is linear, so the perturbation to the compressed logsignature is just the compressed
+                // perturbation.
+                tangent_logsignature = compress_by_mode(tangent_logsignature, mode, lyndon_info);
+
+                return std::tuple<torch::Tensor, torch::Tensor> {tangent_logsignature, grad_signature_with_scalar};
+            }
+        }  // namespace signatory::logsignature::detail
+    }  // namespace signatory::logsignature
+
+    py::object make_lyndon_info(int64_t channels, s_size_type depth, LogSignatureMode mode) {
+        misc::checkargs_channels_depth(channels, depth);
+
+        std::unique_ptr<logsignature::detail::LyndonInfo> lyndon_info;
+        {  // release GIL
+            misc::GILRelease release;
+            lyndon_info = logsignature::detail::compute_lyndon_info(channels, depth, mode);
         }  // finish released GIL
 
+        return misc::wrap_capsule<logsignature::detail::LyndonInfo>(std::move(*lyndon_info));
+    }
+
+    std::tuple<torch::Tensor, py::object>
+    signature_to_logsignature_forward(torch::Tensor signature, int64_t input_channel_size, s_size_type depth,
+                                      bool stream, LogSignatureMode mode, py::object lyndon_info_capsule,
+                                      bool scalar_term, bool out, torch::Tensor out_value) {
+        logsignature::detail::logsignature_checkargs(signature, input_channel_size, depth, stream, scalar_term);
+
+        // must finish using Python objects before we release the GIL
+        if (lyndon_info_capsule.is_none()) {
+            lyndon_info_capsule = make_lyndon_info(input_channel_size, depth, mode);
+        }
+        logsignature::detail::LyndonInfo* lyndon_info =
+                misc::unwrap_capsule<logsignature::detail::LyndonInfo>(lyndon_info_capsule);
+
+        torch::Tensor logsignature = logsignature::detail::signature_to_logsignature_forward_inner(
+                signature, input_channel_size, depth, stream, mode, lyndon_info, scalar_term, out, out_value);
+
         return std::tuple<torch::Tensor, py::object> {logsignature, lyndon_info_capsule};
     }
 
@@ -289,129 +883,216 @@ namespace signatory {
         logsignature::detail::LyndonInfo* lyndon_info =
                 misc::unwrap_capsule<logsignature::detail::LyndonInfo>(lyndon_info_capsule);
 
-        py::gil_scoped_release release;
+        return logsignature::detail::signature_to_logsignature_backward_inner(grad_logsignature, signature,
+                                                                           input_channel_size, depth, stream,
+                                                                           mode, lyndon_info, scalar_term);
+    }
+
+    torch::Tensor signature_to_logsignature_forward_op(torch::Tensor signature, int64_t input_channel_size,
+                                                       s_size_type depth, bool stream, LogSignatureMode mode,
+                                                       bool scalar_term) {
+        logsignature::detail::logsignature_checkargs(signature, input_channel_size, depth, stream, scalar_term);
+        std::shared_ptr<logsignature::detail::LyndonInfo> lyndon_info =
+                logsignature::detail::cached_lyndon_info(input_channel_size, depth, mode);
+        return logsignature::detail::signature_to_logsignature_forward_inner(signature, input_channel_size, depth,
+                                                                            stream, mode, lyndon_info.get(),
+                                                                            scalar_term, /*out=*/false,
+                                                                            /*out_value=*/torch::Tensor());
+    }
+
+    torch::Tensor signature_to_logsignature_backward_op(torch::Tensor grad_logsignature,
+                                                        torch::Tensor signature,
+                                                        int64_t input_channel_size,
+                                                        s_size_type depth,
+                                                        bool stream,
+                                                        LogSignatureMode mode,
+                                                        bool scalar_term) {
+        std::shared_ptr<logsignature::detail::LyndonInfo> lyndon_info =
+                logsignature::detail::cached_lyndon_info(input_channel_size, depth, mode);
+        return logsignature::detail::signature_to_logsignature_backward_inner(grad_logsignature, signature,
+                                                                           input_channel_size, depth, stream,
+                                                                           mode, lyndon_info.get(), scalar_term);
+    }
+
+    int64_t logsignature_output_channels(int64_t input_channel_size, s_size_type depth, LogSignatureMode mode) {
+        if (mode == LogSignatureMode::Expand) {
+            return signature_channels(input_channel_size, depth, /*scalar_term=*/false);
+        }
+        misc::checkargs_channels_depth(input_channel_size, depth);
+        return logsignature::detail::cached_lyndon_info(input_channel_size, depth, mode)->lyndon_words->amount;
+    }
+
+    torch::Tensor signature_to_logsignature_jvp(torch::Tensor signature,
+                                                torch::Tensor tangent_signature,
+                                                int64_t input_channel_size,
+                                                s_size_type depth,
+                                                bool stream,
+                                                LogSignatureMode mode,
+                                                py::object lyndon_info_capsule,
+                                                bool scalar_term) {
+        // Must do this before releasing the GIL.
+        logsignature::detail::LyndonInfo* lyndon_info =
+                misc::unwrap_capsule<logsignature::detail::LyndonInfo>(lyndon_info_capsule);
+
+        misc::GILRelease release;
 
         if (scalar_term) {
             signature = signature.narrow(/*dim=*/channel_dim, /*start=*/1, /*length=*/signature.size(channel_dim) - 1);
+            tangent_signature = tangent_signature.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                         /*length=*/tangent_signature.size(channel_dim) - 1);
         }
 
-        grad_logsignature = grad_logsignature.detach();
         signature = signature.detach();
+        tangent_signature = tangent_signature.detach();
 
         torch::TensorOptions opts = signature.options();
-        torch::Tensor reciprocals = misc::make_reciprocals(depth, opts);
+        torch::Tensor reciprocals = workspace::reciprocals(depth, opts);
         int64_t output_stream_size = stream ? signature.size(stream_dim) : -1;
-        int64_t output_channel_size = signature.size(channel_dim);
+
+        // The logsignature itself isn't needed, but is computed alongside its perturbation anyway.
+        torch::Tensor logsignature = torch::empty_like(signature);
+        torch::Tensor tangent_logsignature = torch::empty_like(signature);
 
         std::vector<torch::Tensor> signature_by_term;
+        std::vector<torch::Tensor> tangent_signature_by_term;
+        std::vector<torch::Tensor> logsignature_by_term;
+        std::vector<torch::Tensor> tangent_logsignature_by_term;
         misc::slice_by_term(signature, signature_by_term, input_channel_size, depth);
-
-        // Decompress the logsignature
-        if (mode == LogSignatureMode::Expand) {
-            grad_logsignature = grad_logsignature.clone();  // Clone so we don't leak changes through grad_logsignature.
-        }
-        else if (mode == LogSignatureMode::Words){
-            grad_logsignature = logsignature::detail::compress_backward(grad_logsignature, *lyndon_info->lyndon_words,
-                                                                        opts, stream,
-                                                                        output_channel_size);
-        }
-        else {  // mode == LogSignatureMode::Brackets
-            grad_logsignature = logsignature::detail::compress_backward(grad_logsignature, *lyndon_info->lyndon_words,
-                                                                        opts, stream,
-                                                                        output_channel_size);
-
-            /* This is a deliberate asymmetry between the forwards and backwards: in the forwards pass we applied the
-             * linear transformation after compression, but on the backwards we don't apply the transforms before
-             * decompressing. Instead we apply a different (equivalent) transformation after decompressing. This is
-             * because otherwise we would have to clone the grad_logsignature we were given, to be sure that the
-             * transformations (which necessarily operate in-place) don't leak out. By doing it this way the memory that
-             * we operate on is internal memory that we've claimed, not memory that we've been given in an input.
-             */
-            auto device = grad_logsignature.device();
-            grad_logsignature = grad_logsignature.cpu();
-            // This is essentially solving a sparse linear system... and it's horrendously slow on a GPU.
-            #pragma omp parallel for default(none) \
-                                     shared(lyndon_info, grad_logsignature) schedule(dynamic,1)
-            for (s_size_type transform_class_index = 0;
-                 transform_class_index < static_cast<s_size_type>(lyndon_info->transforms_backward.size());
-                 ++transform_class_index) {
-                for (auto tptr = lyndon_info->transforms_backward[transform_class_index].rbegin();
-                     tptr != lyndon_info->transforms_backward[transform_class_index].rend();
-                     ++tptr)  {
-                    int64_t source_index = std::get<0>(*tptr);
-                    int64_t target_index = std::get<1>(*tptr);
-                    int64_t coefficient = std::get<2>(*tptr);
-                    torch::Tensor grad_source = grad_logsignature.narrow(/*dim=*/channel_dim,
-                                                                         /*start=*/source_index,
-                                                                         /*length=*/1);
-                    torch::Tensor grad_target = grad_logsignature.narrow(/*dim=*/channel_dim,
-                                                                         /*start=*/target_index,
-                                                                         /*length=*/1);
-                    grad_source.sub_(grad_target, coefficient);
-                }
-            }
-            grad_logsignature = grad_logsignature.to(device);
-        }
-
-        torch::Tensor grad_signature;
-        torch::Tensor grad_signature_with_scalar;
-        if (scalar_term) {
-            if (stream) {
-                grad_signature_with_scalar = torch::zeros({grad_logsignature.size(stream_dim),
-                                                           grad_logsignature.size(batch_dim),
-                                                           grad_logsignature.size(channel_dim) + 1},
-                                                          opts);
-            }
-            else {
-                grad_signature_with_scalar = torch::zeros({grad_logsignature.size(batch_dim),
-                                                           grad_logsignature.size(channel_dim) + 1},
-                                                          opts);
-            }
-            grad_signature = grad_signature_with_scalar.narrow(/*dim=*/channel_dim, /*start=*/1,
-                                                               /*length=*/grad_logsignature.size(channel_dim));
-        }
-        else {
-            grad_signature = torch::zeros_like(grad_logsignature);
-            grad_signature_with_scalar = grad_signature;
-        }
-
-        std::vector<torch::Tensor> grad_logsignature_by_term;
-        std::vector<torch::Tensor> grad_signature_by_term;
-        misc::slice_by_term(grad_logsignature, grad_logsignature_by_term, input_channel_size, depth);
-        misc::slice_by_term(grad_signature, grad_signature_by_term, input_channel_size, depth);
+        misc::slice_by_term(tangent_signature, tangent_signature_by_term, input_channel_size, depth);
+        misc::slice_by_term(logsignature, logsignature_by_term, input_channel_size, depth);
+        misc::slice_by_term(tangent_logsignature, tangent_logsignature_by_term, input_channel_size, depth);
 
         if (stream) {
-            // The if statement is because this sometimes hangs on the GPU... for some reason.
+            // The if statement is for the same reason as in signature_to_logsignature_forward.
             #pragma omp parallel for default(none) \
-                                     if(!grad_logsignature.is_cuda()) \
-                                     shared(grad_logsignature_by_term, \
-                                            grad_signature_by_term, \
-                                            signature_by_term, \
+                                     num_threads(parallelism::max_threads()) \
+                                     if(!signature.is_cuda()) \
+                                     shared(signature_by_term, \
+                                            tangent_signature_by_term, \
+                                            logsignature_by_term, \
+                                            tangent_logsignature_by_term, \
                                             reciprocals, \
                                             output_stream_size)
             for (int64_t stream_index = 0; stream_index < output_stream_size; ++stream_index) {
-                std::vector<torch::Tensor> grad_logsignature_by_term_at_stream;
-                std::vector<torch::Tensor> grad_signature_by_term_at_stream;
                 std::vector<torch::Tensor> signature_by_term_at_stream;
+                std::vector<torch::Tensor> tangent_signature_by_term_at_stream;
+                std::vector<torch::Tensor> logsignature_by_term_at_stream;
+                std::vector<torch::Tensor> tangent_logsignature_by_term_at_stream;
 
-                misc::slice_at_stream(grad_logsignature_by_term,
-                                      grad_logsignature_by_term_at_stream,
-                                      stream_index);
-                misc::slice_at_stream(grad_signature_by_term,
-                                      grad_signature_by_term_at_stream,
-                                      stream_index);
-                misc::slice_at_stream(signature_by_term,
-                                      signature_by_term_at_stream,
+                misc::slice_at_stream(signature_by_term, signature_by_term_at_stream, stream_index);
+                misc::slice_at_stream(tangent_signature_by_term, tangent_signature_by_term_at_stream, stream_index);
+                misc::slice_at_stream(logsignature_by_term, logsignature_by_term_at_stream, stream_index);
+                misc::slice_at_stream(tangent_logsignature_by_term, tangent_logsignature_by_term_at_stream,
                                       stream_index);
 
-                ta_ops::log_backward(grad_logsignature_by_term_at_stream, grad_signature_by_term_at_stream,
-                                     signature_by_term_at_stream, reciprocals);
+                ta_ops::log_tangent(tangent_logsignature_by_term_at_stream, logsignature_by_term_at_stream,
+                                    signature_by_term_at_stream, tangent_signature_by_term_at_stream, reciprocals);
             }
         }
         else {
-            ta_ops::log_backward(grad_logsignature_by_term, grad_signature_by_term, signature_by_term, reciprocals);
+            ta_ops::log_tangent(tangent_logsignature_by_term, logsignature_by_term, signature_by_term,
+                                tangent_signature_by_term, reciprocals);
         }
 
-        return grad_signature_with_scalar;
+        // Compression is linear, so the perturbation to the compressed logsignature is just the compressed
+        // perturbation.
+        return logsignature::detail::compress_by_mode(tangent_logsignature, mode, lyndon_info);
+    }
+
+    std::tuple<torch::Tensor, torch::Tensor>
+    signature_to_logsignature_double_backward(torch::Tensor grad_logsignature,
+                                              torch::Tensor signature,
+                                              torch::Tensor tangent_signature,
+                                              int64_t input_channel_size,
+                                              s_size_type depth,
+                                              bool stream,
+                                              LogSignatureMode mode,
+                                              py::object lyndon_info_capsule,
+                                              bool scalar_term) {
+        // Must do this before releasing the GIL.
+        logsignature::detail::LyndonInfo* lyndon_info =
+                misc::unwrap_capsule<logsignature::detail::LyndonInfo>(lyndon_info_capsule);
+
+        return logsignature::detail::signature_to_logsignature_double_backward_inner(grad_logsignature, signature,
+                                                                                  tangent_signature,
+                                                                                  input_channel_size, depth, stream,
+                                                                                  mode, lyndon_info, scalar_term);
+    }
+
+    std::tuple<torch::Tensor, torch::Tensor>
+    signature_to_logsignature_double_backward_op(torch::Tensor grad_logsignature,
+                                                 torch::Tensor signature,
+                                                 torch::Tensor tangent_signature,
+                                                 int64_t input_channel_size,
+                                                 s_size_type depth,
+                                                 bool stream,
+                                                 LogSignatureMode mode,
+                                                 bool scalar_term) {
+        std::shared_ptr<logsignature::detail::LyndonInfo> lyndon_info =
+                logsignature::detail::cached_lyndon_info(input_channel_size, depth, mode);
+        return logsignature::detail::signature_to_logsignature_double_backward_inner(grad_logsignature, signature,
+                                                                                  tangent_signature,
+                                                                                  input_channel_size, depth, stream,
+                                                                                  mode, lyndon_info.get(),
+                                                                                  scalar_term);
+    }
+
+    torch::Tensor logsignature_bch_forward(torch::Tensor path_increments, s_size_type depth, bool stream,
+                                           torch::Tensor bch_indices, torch::Tensor bch_coefficients,
+                                           int64_t num_letter_triples) {
+        logsignature::detail::logsignature_bch_checkargs(path_increments, depth, bch_indices, bch_coefficients,
+                                                         num_letter_triples);
+
+        misc::GILRelease release;
+
+        path_increments = path_increments.detach().contiguous();
+        bch_indices = bch_indices.contiguous();
+        bch_coefficients = bch_coefficients.to(path_increments.scalar_type()).contiguous();
+
+        int64_t input_stream_size = path_increments.size(stream_dim);
+        int64_t batch_size = path_increments.size(batch_dim);
+        int64_t output_channel_size = lyndon::LyndonWords(path_increments.size(channel_dim), depth,
+                                                          lyndon::LyndonWords::word_tag).amount;
+
+        torch::Tensor logsignature;
+        if (stream) {
+            logsignature = torch::empty({input_stream_size, batch_size, output_channel_size},
+                                        path_increments.options());
+        }
+        else {
+            logsignature = torch::empty({batch_size, output_channel_size}, path_increments.options());
+        }
+
+        AT_DISPATCH_FLOATING_TYPES(path_increments.scalar_type(), "logsignature_bch_forward", ([&] {
+            logsignature::detail::BCHBrackets<scalar_t> brackets {bch_indices, bch_coefficients, num_letter_triples};
+            logsignature::detail::logsignature_bch_forward_cpu<scalar_t>(path_increments, logsignature, brackets,
+                                                                         stream);
+        }));
+
+        return logsignature;
+    }
+
+    torch::Tensor logsignature_bch_backward(torch::Tensor grad_logsignature, torch::Tensor logsignature,
+                                            torch::Tensor path_increments, s_size_type depth, bool stream,
+                                            torch::Tensor bch_indices, torch::Tensor bch_coefficients,
+                                            int64_t num_letter_triples) {
+        misc::GILRelease release;
+
+        grad_logsignature = grad_logsignature.detach().contiguous();
+        logsignature = logsignature.detach().contiguous();
+        path_increments = path_increments.detach().contiguous();
+        bch_indices = bch_indices.contiguous();
+        bch_coefficients = bch_coefficients.to(path_increments.scalar_type()).contiguous();
+
+        torch::Tensor grad_path_increments = torch::empty_like(path_increments);
+
+        AT_DISPATCH_FLOATING_TYPES(path_increments.scalar_type(), "logsignature_bch_backward", ([&] {
+            logsignature::detail::BCHBrackets<scalar_t> brackets {bch_indices, bch_coefficients, num_letter_triples};
+            logsignature::detail::logsignature_bch_backward_cpu<scalar_t>(grad_logsignature, logsignature,
+                                                                          path_increments, grad_path_increments,
+                                                                          brackets, stream);
+        }));
+
+        return grad_path_increments;
     }
-}  // namespace signatory
\ No newline at end of file
+}  // namespace signatory
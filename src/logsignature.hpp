@@ -33,10 +33,12 @@ namespace signatory {
     py::object make_lyndon_info(int64_t channels, s_size_type depth, LogSignatureMode mode);
 
     // See signatory.signature_to_logsignature for documentation
+    // If 'out' is true then the result is written into 'out_value' (which is then returned), which must already have
+    // been checked to be of the correct shape, dtype and device.
     std::tuple<torch::Tensor, py::object>
     signature_to_logsignature_forward(torch::Tensor signature, int64_t input_channel_size, s_size_type depth,
                                       bool stream, LogSignatureMode mode, py::object lyndon_info_capsule,
-                                      bool scalar_term);
+                                      bool scalar_term, bool out, torch::Tensor out_value);
 
     // See signatory.signature_to_logsignature for documentation
     torch::Tensor signature_to_logsignature_backward(torch::Tensor grad_logsignature,
@@ -47,6 +49,76 @@ namespace signatory {
                                                      LogSignatureMode mode,
                                                      py::object lyndon_info_capsule,
                                                      bool scalar_term);
+
+    // As signature_to_logsignature_forward and signature_to_logsignature_backward, except that they don't involve any
+    // Python objects, so that they may be registered as custom operators. (See ops.cpp.) Instead of being passed a
+    // LyndonInfo PyCapsule, they compute the information the first time that any particular (input_channel_size,
+    // depth, mode) is used, and then keep it for the rest of the program.
+    torch::Tensor signature_to_logsignature_forward_op(torch::Tensor signature, int64_t input_channel_size,
+                                                       s_size_type depth, bool stream, LogSignatureMode mode,
+                                                       bool scalar_term);
+
+    torch::Tensor signature_to_logsignature_backward_op(torch::Tensor grad_logsignature,
+                                                        torch::Tensor signature,
+                                                        int64_t input_channel_size,
+                                                        s_size_type depth,
+                                                        bool stream,
+                                                        LogSignatureMode mode,
+                                                        bool scalar_term);
+
+    // The number of channels in the result of signature_to_logsignature_forward_op.
+    int64_t logsignature_output_channels(int64_t input_channel_size, s_size_type depth, LogSignatureMode mode);
+
+    // Forward-mode differentiation of signature_to_logsignature_forward. Given a perturbation 'tangent_signature' to
+    // the signature, returns the corresponding perturbation to the logsignature.
+    torch::Tensor signature_to_logsignature_jvp(torch::Tensor signature,
+                                                torch::Tensor tangent_signature,
+                                                int64_t input_channel_size,
+                                                s_size_type depth,
+                                                bool stream,
+                                                LogSignatureMode mode,
+                                                py::object lyndon_info_capsule,
+                                                bool scalar_term);
+
+    // Backwards through signature_to_logsignature_backward. Given the gradient 'grad_logsignature' and a perturbation
+    // 'tangent_signature' to the signature, returns the corresponding perturbation to the logsignature, and the
+    // gradient of <grad_logsignature, perturbation to the logsignature> with respect to the signature.
+    std::tuple<torch::Tensor, torch::Tensor>
+    signature_to_logsignature_double_backward(torch::Tensor grad_logsignature,
+                                              torch::Tensor signature,
+                                              torch::Tensor tangent_signature,
+                                              int64_t input_channel_size,
+                                              s_size_type depth,
+                                              bool stream,
+                                              LogSignatureMode mode,
+                                              py::object lyndon_info_capsule,
+                                              bool scalar_term);
+
+    // As signature_to_logsignature_double_backward, except that it doesn't involve any Python objects; as
+    // signature_to_logsignature_forward_op.
+    std::tuple<torch::Tensor, torch::Tensor>
+    signature_to_logsignature_double_backward_op(torch::Tensor grad_logsignature,
+                                                 torch::Tensor signature,
+                                                 torch::Tensor tangent_signature,
+                                                 int64_t input_channel_size,
+                                                 s_size_type depth,
+                                                 bool stream,
+                                                 LogSignatureMode mode,
+                                                 bool scalar_term);
+
+    // Computes the logsignature (in the "words" basis) of a path directly from its increments, via the
+    // Baker-Campbell-Hausdorff formula. Only valid for depth <= 4. CPU only.
+    // 'bch_indices', 'bch_coefficients' and 'num_letter_triples' describe the structure constants of the free Lie
+    // algebra; see signatory.logsignature_module._bch_structure_constants.
+    torch::Tensor logsignature_bch_forward(torch::Tensor path_increments, s_size_type depth, bool stream,
+                                           torch::Tensor bch_indices, torch::Tensor bch_coefficients,
+                                           int64_t num_letter_triples);
+
+    // Backward through logsignature_bch_forward
+    torch::Tensor logsignature_bch_backward(torch::Tensor grad_logsignature, torch::Tensor logsignature,
+                                            torch::Tensor path_increments, s_size_type depth, bool stream,
+                                            torch::Tensor bch_indices, torch::Tensor bch_coefficients,
+                                            int64_t num_letter_triples);
 }  // namespace signatory
 
 #endif //SIGNATORY_LOGSIGNATURE_HPP
@@ -32,6 +32,12 @@ namespace signatory {
                 throw std::invalid_argument("Argument 'depth' must be an integer greater than or equal to one.");
             }
         }
+
+        GILRelease::GILRelease() {
+            if (Py_IsInitialized() && PyGILState_Check()) {
+                release_.reset(new py::gil_scoped_release);
+            }
+        }
     }  // namespace signatory::misc
 
     int64_t signature_channels(int64_t input_channel_size, int64_t depth, bool scalar_term) {
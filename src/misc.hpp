@@ -20,6 +20,7 @@
 
 #include <torch/extension.h>
 #include <cstdint>      // int64_t
+#include <memory>       // std::unique_ptr
 #include <tuple>        // std::tuple
 #include <type_traits>  // std::make_signed, std::make_unsigned
 #include <vector>       // std::vector
@@ -69,6 +70,17 @@ namespace signatory {
 
         // Checks the arguments for a bunch of functions only depending on channels and depth.
         void checkargs_channels_depth(int64_t channels, s_size_type depth);
+
+        // Releases the GIL for as long as it exists, if the current thread holds the GIL.
+        // The kernels are called both from Python via pybind11 (in which case the GIL is held) and as custom operators,
+        // e.g. from TorchScript or in the autograd engine's threads (in which case it typically isn't). A plain
+        // py::gil_scoped_release may only be used in the former case.
+        class GILRelease {
+        public:
+            GILRelease();
+        private:
+            std::unique_ptr<py::gil_scoped_release> release_;
+        };
     }  // namespace signatory::misc
 }  // namespace signatory
 
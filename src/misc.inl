@@ -23,7 +23,9 @@ namespace signatory {
     namespace misc {
         torch::Tensor make_reciprocals(s_size_type depth, torch::TensorOptions opts) {
             if (depth > 1) {
-                return torch::linspace(2, depth, depth - 1, opts).reciprocal();
+                // Computed at double precision and then converted, as not every dtype (in particular the reduced
+                // precision floating point types) supports linspace, and it's more accurate anyway.
+                return torch::linspace(2, depth, depth - 1, opts.dtype(torch::kFloat64)).reciprocal().to(opts.dtype());
             }
             else {
                 return torch::ones({0}, opts);
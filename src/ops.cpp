@@ -0,0 +1,629 @@
+/* Copyright 2019 Patrick Kidger. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *    http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ * ========================================================================= */
+ // Registers the kernels as custom operators, available as torch.ops.signatory.*, so that they may be used from
+ // TorchScript and by torch.compile without going through Python.
+ //
+ // Each operator has a kernel that does the actual computation (for every device), a kernel for the Meta device that
+ // just computes the shape of the result (which is what torch.compile traces with), and an autograd kernel. The
+ // forward operators are differentiated via the corresponding backward operator. signature_backward and
+ // signature_to_logsignature_backward are themselves differentiated via signature_double_backward and
+ // signature_to_logsignature_double_backward, just as the Python functions are, so that the operators may be
+ // differentiated twice. As with signatory.multi_signature_combine, signature_combine_backward may only be
+ // differentiated once.
+ //
+ // The operators work with tensors laid out as (stream, batch, channel), just like the rest of the C++ code.
+ // See also the FAQ in the documentation.
+
+
+#include <torch/extension.h>
+#include <torch/library.h>
+#include <ATen/core/dispatch/Dispatcher.h>
+#include <cstdint>    // int64_t
+#include <stdexcept>  // std::invalid_argument
+#include <string>     // std::string
+#include <tuple>      // std::get, std::make_tuple, std::tuple
+#include <vector>     // std::vector
+
+#include "logsignature.hpp"  // signatory::LogSignatureMode,
+                             // signatory::signature_to_logsignature_forward_op,
+                             // signatory::signature_to_logsignature_backward_op,
+                             // signatory::signature_to_logsignature_double_backward_op,
+                             // signatory::logsignature_output_channels
+
+#include "misc.hpp"          // signatory::signature_channels
+
+#include "signature.hpp"     // signatory::signature_checkargs,
+                             // signatory::signature_forward,
+                             // signatory::signature_backward,
+                             // signatory::signature_double_backward
+
+#include "tensor_algebra_ops.hpp"  // signatory::signature_combine_forward,
+                                   // signatory::signature_combine_backward
+
+
+namespace signatory {
+    namespace ops {
+        namespace detail {
+            using torch::autograd::AutogradContext;
+            using torch::autograd::variable_list;
+
+            LogSignatureMode interpret_mode(c10::string_view mode) {
+                if (mode == "expand") {
+                    return LogSignatureMode::Expand;
+                }
+                else if (mode == "brackets") {
+                    return LogSignatureMode::Brackets;
+                }
+                else if (mode == "words") {
+                    return LogSignatureMode::Words;
+                }
+                throw std::invalid_argument("Invalid values for argument 'mode'. Valid values are 'expand', "
+                                            "'brackets', or 'words'.");
+            }
+
+            bool is_present(const c10::optional<torch::Tensor>& tensor) {
+                return tensor.has_value() && tensor->defined();
+            }
+
+            // The kernels represent absent basepoints and initial values as empty tensors.
+            torch::Tensor value_or_empty(const c10::optional<torch::Tensor>& tensor, torch::TensorOptions opts) {
+                if (is_present(tensor)) {
+                    return *tensor;
+                }
+                return torch::empty({0}, opts);
+            }
+
+            // Absent tensors are saved for the backward pass as undefined tensors.
+            torch::Tensor value_or_undefined(const c10::optional<torch::Tensor>& tensor) {
+                if (is_present(tensor)) {
+                    return *tensor;
+                }
+                return torch::Tensor();
+            }
+
+            c10::optional<torch::Tensor> optional_from_undefined(torch::Tensor tensor) {
+                if (tensor.defined()) {
+                    return tensor;
+                }
+                return c10::nullopt;
+            }
+
+            // The signature is accumulated in the dtype of the path, unless specified otherwise.
+            torch::Tensor make_accumulate_like(c10::optional<c10::ScalarType> accumulate_dtype,
+                                               torch::TensorOptions opts) {
+                torch::ScalarType dtype = accumulate_dtype.value_or(c10::typeMetaToScalarType(opts.dtype()));
+                return torch::empty({0}, opts.dtype(dtype));
+            }
+
+            /* signature_forward and signature_backward */
+
+            std::tuple<torch::Tensor, torch::Tensor>
+            signature_forward_kernel(const torch::Tensor& path, int64_t depth, bool stream,
+                                     const c10::optional<torch::Tensor>& basepoint, bool inverse,
+                                     const c10::optional<torch::Tensor>& initial, bool scalar_term, bool leadlag,
+                                     c10::optional<c10::ScalarType> accumulate_dtype) {
+                torch::TensorOptions opts = path.options();
+                return signature_forward(path, depth, stream, is_present(basepoint), value_or_empty(basepoint, opts),
+                                         inverse, is_present(initial), value_or_empty(initial, opts), scalar_term,
+                                         leadlag, /*from_increments=*/false, /*batch_first=*/false,
+                                         make_accumulate_like(accumulate_dtype, opts), /*out=*/false,
+                                         /*out_value=*/torch::Tensor(), /*check=*/true);
+            }
+
+            std::tuple<torch::Tensor, torch::Tensor>
+            signature_forward_meta(const torch::Tensor& path, int64_t depth, bool stream,
+                                   const c10::optional<torch::Tensor>& basepoint, bool inverse,
+                                   const c10::optional<torch::Tensor>& initial, bool scalar_term, bool leadlag,
+                                   c10::optional<c10::ScalarType> accumulate_dtype) {
+                torch::TensorOptions opts = path.options();
+                signature_checkargs(path, depth, is_present(basepoint), value_or_empty(basepoint, opts),
+                                    is_present(initial), value_or_empty(initial, opts), scalar_term, leadlag,
+                                    /*from_increments=*/false);
+
+                int64_t batch_size = path.size(batch_dim);
+                int64_t input_channel_size = path.size(channel_dim);
+                int64_t num_increments = path.size(stream_dim) - (is_present(basepoint) ? 0 : 1);
+                int64_t leadlag_factor = leadlag ? 2 : 1;
+                int64_t output_channel_size = signature_channels(leadlag_factor * input_channel_size, depth,
+                                                                 scalar_term);
+
+                torch::Tensor signature;
+                if (stream) {
+                    signature = torch::empty({leadlag_factor * num_increments, batch_size, output_channel_size}, opts);
+                }
+                else {
+                    signature = torch::empty({batch_size, output_channel_size}, opts);
+                }
+                torch::Tensor path_increments = torch::empty({num_increments, batch_size, input_channel_size}, opts);
+                return std::tuple<torch::Tensor, torch::Tensor> {signature, path_increments};
+            }
+
+            // 'path', 'basepoint' and 'initial' are the inputs to signature_forward. Their values are already encoded
+            // in 'signature' and 'path_increments', but they are passed so that autograd knows that the result depends
+            // on them. (See SignatureBackwardFunction.)
+            std::tuple<torch::Tensor, torch::Tensor, torch::Tensor>
+            signature_backward_kernel(const torch::Tensor& grad_signature, const torch::Tensor& path,
+                                      const c10::optional<torch::Tensor>& basepoint,
+                                      const c10::optional<torch::Tensor>& initial, const torch::Tensor& signature,
+                                      const torch::Tensor& path_increments, int64_t depth, bool stream, bool inverse,
+                                      bool scalar_term, bool leadlag,
+                                      c10::optional<c10::ScalarType> accumulate_dtype) {
+                torch::TensorOptions opts = path_increments.options();
+                torch::Tensor grad_path;
+                torch::Tensor grad_basepoint;
+                torch::Tensor grad_initial;
+                std::tie(grad_path, grad_basepoint, grad_initial) =
+                        signature_backward(grad_signature, signature, path_increments, depth, stream,
+                                           is_present(basepoint), inverse, is_present(initial), scalar_term, leadlag,
+                                           /*from_increments=*/false, make_accumulate_like(accumulate_dtype, opts),
+                                           /*checkpoint_every=*/0);
+                // The gradients through absent arguments are always empty, so that their shape is predictable.
+                if (!is_present(basepoint)) {
+                    grad_basepoint = torch::empty({0}, opts);
+                }
+                if (!is_present(initial)) {
+                    grad_initial = torch::empty({0}, opts);
+                }
+                return std::tuple<torch::Tensor, torch::Tensor, torch::Tensor> {grad_path, grad_basepoint,
+                                                                                 grad_initial};
+            }
+
+            std::tuple<torch::Tensor, torch::Tensor, torch::Tensor>
+            signature_backward_meta(const torch::Tensor& grad_signature, const torch::Tensor& path,
+                                    const c10::optional<torch::Tensor>& basepoint,
+                                    const c10::optional<torch::Tensor>& initial, const torch::Tensor& signature,
+                                    const torch::Tensor& path_increments, int64_t depth, bool stream, bool inverse,
+                                    bool scalar_term, bool leadlag, c10::optional<c10::ScalarType> accumulate_dtype) {
+                torch::TensorOptions opts = path_increments.options();
+                torch::Tensor grad_path = torch::empty(path.sizes(), opts);
+                torch::Tensor grad_basepoint = is_present(basepoint) ? torch::empty(basepoint->sizes(), opts)
+                                                                     : torch::empty({0}, opts);
+                torch::Tensor grad_initial = is_present(initial) ? torch::empty(initial->sizes(), opts)
+                                                                 : torch::empty({0}, opts);
+                return std::tuple<torch::Tensor, torch::Tensor, torch::Tensor> {grad_path, grad_basepoint,
+                                                                                 grad_initial};
+            }
+
+            class SignatureBackwardFunction : public torch::autograd::Function<SignatureBackwardFunction> {
+            public:
+                static variable_list forward(AutogradContext* ctx, torch::Tensor grad_signature, torch::Tensor path,
+                                             const c10::optional<torch::Tensor>& basepoint,
+                                             const c10::optional<torch::Tensor>& initial, torch::Tensor signature,
+                                             torch::Tensor path_increments, int64_t depth, bool stream,
+                                             bool inverse, bool scalar_term, bool leadlag,
+                                             c10::optional<c10::ScalarType> accumulate_dtype) {
+                    static auto op = c10::Dispatcher::singleton()
+                            .findSchemaOrThrow("signatory::signature_backward", "")
+                            .typed<decltype(signature_backward_kernel)>();
+
+                    torch::Tensor grad_path;
+                    torch::Tensor grad_basepoint;
+                    torch::Tensor grad_initial;
+                    {
+                        at::AutoDispatchBelowADInplaceOrView guard;
+                        std::tie(grad_path, grad_basepoint, grad_initial) =
+                                op.call(grad_signature, path, basepoint, initial, signature, path_increments, depth,
+                                        stream, inverse, scalar_term, leadlag, accumulate_dtype);
+                    }
+
+                    ctx->save_for_backward({grad_signature, path_increments, value_or_undefined(initial)});
+                    ctx->saved_data["depth"] = depth;
+                    ctx->saved_data["stream"] = stream;
+                    ctx->saved_data["basepoint"] = is_present(basepoint);
+                    ctx->saved_data["inverse"] = inverse;
+                    ctx->saved_data["initial"] = is_present(initial);
+                    ctx->saved_data["scalar_term"] = scalar_term;
+                    ctx->saved_data["leadlag"] = leadlag;
+                    ctx->saved_data["accumulate_dtype"] =
+                            static_cast<int64_t>(accumulate_dtype.value_or(path.scalar_type()));
+                    return {grad_path, grad_basepoint, grad_initial};
+                }
+
+                static variable_list backward(AutogradContext* ctx, variable_list grad_outputs) {
+                    variable_list saved = ctx->get_saved_variables();
+                    torch::Tensor grad_signature = saved[0];
+                    torch::Tensor path_increments = saved[1];
+                    torch::TensorOptions opts = path_increments.options();
+                    bool basepoint = ctx->saved_data["basepoint"].toBool();
+                    bool initial = ctx->saved_data["initial"].toBool();
+                    // The gradients through the outputs of the forward pass are perturbations to the inputs of the
+                    // signature; we compute the corresponding perturbation to the signature, and the Hessian-vector
+                    // products. (Undefined gradients have already been replaced with zeros by autograd.)
+                    torch::Tensor initial_value = initial ? saved[2] : torch::empty({0}, opts);
+                    torch::Tensor tangent_basepoint = basepoint ? grad_outputs[1] : torch::empty({0}, opts);
+                    torch::Tensor tangent_initial = initial ? grad_outputs[2] : torch::empty({0}, opts);
+                    torch::ScalarType accumulate_dtype =
+                            static_cast<c10::ScalarType>(ctx->saved_data["accumulate_dtype"].toInt());
+
+                    torch::Tensor tangent_signature;
+                    torch::Tensor grad_path;
+                    torch::Tensor grad_basepoint;
+                    torch::Tensor grad_initial;
+                    std::tie(tangent_signature, grad_path, grad_basepoint, grad_initial) =
+                            signature_double_backward(grad_signature, path_increments, grad_outputs[0],
+                                                      tangent_basepoint, initial_value, tangent_initial,
+                                                      ctx->saved_data["depth"].toInt(),
+                                                      ctx->saved_data["stream"].toBool(), basepoint,
+                                                      ctx->saved_data["inverse"].toBool(), initial,
+                                                      ctx->saved_data["scalar_term"].toBool(),
+                                                      ctx->saved_data["leadlag"].toBool(),
+                                                      /*from_increments=*/false,
+                                                      make_accumulate_like(accumulate_dtype, opts));
+                    if (!basepoint) {
+                        grad_basepoint = torch::Tensor();
+                    }
+                    if (!initial) {
+                        grad_initial = torch::Tensor();
+                    }
+                    // One gradient for every argument to forward.
+                    return {tangent_signature, grad_path, grad_basepoint, grad_initial, torch::Tensor(),
+                            torch::Tensor(), torch::Tensor(), torch::Tensor(), torch::Tensor(), torch::Tensor(),
+                            torch::Tensor(), torch::Tensor()};
+                }
+            };
+
+            std::tuple<torch::Tensor, torch::Tensor, torch::Tensor>
+            signature_backward_autograd(const torch::Tensor& grad_signature, const torch::Tensor& path,
+                                        const c10::optional<torch::Tensor>& basepoint,
+                                        const c10::optional<torch::Tensor>& initial, const torch::Tensor& signature,
+                                        const torch::Tensor& path_increments, int64_t depth, bool stream,
+                                        bool inverse, bool scalar_term, bool leadlag,
+                                        c10::optional<c10::ScalarType> accumulate_dtype) {
+                variable_list result = SignatureBackwardFunction::apply(grad_signature, path, basepoint, initial,
+                                                                        signature, path_increments, depth, stream,
+                                                                        inverse, scalar_term, leadlag,
+                                                                        accumulate_dtype);
+                return std::tuple<torch::Tensor, torch::Tensor, torch::Tensor> {result[0], result[1], result[2]};
+            }
+
+            class SignatureFunction : public torch::autograd::Function<SignatureFunction> {
+            public:
+                static variable_list forward(AutogradContext* ctx, torch::Tensor path, int64_t depth, bool stream,
+                                             const c10::optional<torch::Tensor>& basepoint, bool inverse,
+                                             const c10::optional<torch::Tensor>& initial,
+                                             bool scalar_term, bool leadlag,
+                                             c10::optional<c10::ScalarType> accumulate_dtype) {
+                    static auto op = c10::Dispatcher::singleton()
+                            .findSchemaOrThrow("signatory::signature_forward", "")
+                            .typed<decltype(signature_forward_kernel)>();
+
+                    torch::Tensor signature;
+                    torch::Tensor path_increments;
+                    {
+                        at::AutoDispatchBelowADInplaceOrView guard;
+                        std::tie(signature, path_increments) = op.call(path, depth, stream, basepoint, inverse,
+                                                                       initial, scalar_term, leadlag,
+                                                                       accumulate_dtype);
+                    }
+
+                    ctx->mark_non_differentiable({path_increments});
+                    // The inputs are saved (rather than just their values) so that the backward pass is itself
+                    // differentiable.
+                    ctx->save_for_backward({signature, path_increments, path, value_or_undefined(basepoint),
+                                            value_or_undefined(initial)});
+                    ctx->saved_data["depth"] = depth;
+                    ctx->saved_data["stream"] = stream;
+                    ctx->saved_data["inverse"] = inverse;
+                    ctx->saved_data["scalar_term"] = scalar_term;
+                    ctx->saved_data["leadlag"] = leadlag;
+                    ctx->saved_data["accumulate_dtype"] =
+                            static_cast<int64_t>(accumulate_dtype.value_or(path.scalar_type()));
+                    return {signature, path_increments};
+                }
+
+                static variable_list backward(AutogradContext* ctx, variable_list grad_outputs) {
+                    static auto op = c10::Dispatcher::singleton()
+                            .findSchemaOrThrow("signatory::signature_backward", "")
+                            .typed<decltype(signature_backward_kernel)>();
+
+                    variable_list saved = ctx->get_saved_variables();
+                    torch::Tensor basepoint = saved[3];
+                    torch::Tensor initial = saved[4];
+                    // Called through the dispatcher (and so through its autograd kernel), so that the backward pass is
+                    // itself differentiable.
+                    torch::Tensor grad_path;
+                    torch::Tensor grad_basepoint;
+                    torch::Tensor grad_initial;
+                    std::tie(grad_path, grad_basepoint, grad_initial) =
+                            op.call(grad_outputs[0], saved[2], optional_from_undefined(basepoint),
+                                    optional_from_undefined(initial), saved[0], saved[1],
+                                    ctx->saved_data["depth"].toInt(), ctx->saved_data["stream"].toBool(),
+                                    ctx->saved_data["inverse"].toBool(), ctx->saved_data["scalar_term"].toBool(),
+                                    ctx->saved_data["leadlag"].toBool(),
+                                    static_cast<c10::ScalarType>(ctx->saved_data["accumulate_dtype"].toInt()));
+                    if (!basepoint.defined()) {
+                        grad_basepoint = torch::Tensor();
+                    }
+                    if (!initial.defined()) {
+                        grad_initial = torch::Tensor();
+                    }
+                    // One gradient for every argument to forward.
+                    return {grad_path, torch::Tensor(), torch::Tensor(), grad_basepoint, torch::Tensor(),
+                            grad_initial, torch::Tensor(), torch::Tensor(), torch::Tensor()};
+                }
+            };
+
+            std::tuple<torch::Tensor, torch::Tensor>
+            signature_forward_autograd(const torch::Tensor& path, int64_t depth, bool stream,
+                                       const c10::optional<torch::Tensor>& basepoint, bool inverse,
+                                       const c10::optional<torch::Tensor>& initial, bool scalar_term, bool leadlag,
+                                       c10::optional<c10::ScalarType> accumulate_dtype) {
+                variable_list result = SignatureFunction::apply(path, depth, stream, basepoint, inverse, initial,
+                                                                scalar_term, leadlag, accumulate_dtype);
+                return std::tuple<torch::Tensor, torch::Tensor> {result[0], result[1]};
+            }
+
+            /* signature_combine_forward and signature_combine_backward */
+
+            torch::Tensor signature_combine_forward_kernel(at::TensorList sigtensors, int64_t input_channels,
+                                                           int64_t depth, bool scalar_term) {
+                return signature_combine_forward(sigtensors.vec(), input_channels, depth, scalar_term, /*out=*/false,
+                                                 /*out_value=*/torch::Tensor());
+            }
+
+            torch::Tensor signature_combine_forward_meta(at::TensorList sigtensors, int64_t input_channels,
+                                                         int64_t depth, bool scalar_term) {
+                if (sigtensors.size() == 0) {
+                    throw std::invalid_argument("sigtensors must be of nonzero length.");
+                }
+                return torch::empty({sigtensors[0].size(batch_dim),
+                                     signature_channels(input_channels, depth, scalar_term)},
+                                    sigtensors[0].options());
+            }
+
+            std::vector<torch::Tensor> signature_combine_backward_kernel(const torch::Tensor& grad_out,
+                                                                         at::TensorList sigtensors,
+                                                                         int64_t input_channels, int64_t depth,
+                                                                         bool scalar_term) {
+                return signature_combine_backward(grad_out, sigtensors.vec(), input_channels, depth, scalar_term);
+            }
+
+            std::vector<torch::Tensor> signature_combine_backward_meta(const torch::Tensor& grad_out,
+                                                                       at::TensorList sigtensors,
+                                                                       int64_t input_channels, int64_t depth,
+                                                                       bool scalar_term) {
+                std::vector<torch::Tensor> grad_sigtensors;
+                grad_sigtensors.reserve(sigtensors.size());
+                for (const auto& elem : sigtensors) {
+                    grad_sigtensors.push_back(torch::empty_like(elem));
+                }
+                return grad_sigtensors;
+            }
+
+            class SignatureCombineFunction : public torch::autograd::Function<SignatureCombineFunction> {
+            public:
+                static variable_list forward(AutogradContext* ctx, at::TensorList sigtensors, int64_t input_channels,
+                                             int64_t depth, bool scalar_term) {
+                    static auto op = c10::Dispatcher::singleton()
+                            .findSchemaOrThrow("signatory::signature_combine_forward", "")
+                            .typed<decltype(signature_combine_forward_kernel)>();
+
+                    torch::Tensor result;
+                    {
+                        at::AutoDispatchBelowADInplaceOrView guard;
+                        result = op.call(sigtensors, input_channels, depth, scalar_term);
+                    }
+
+                    ctx->save_for_backward(sigtensors.vec());
+                    ctx->saved_data["input_channels"] = input_channels;
+                    ctx->saved_data["depth"] = depth;
+                    ctx->saved_data["scalar_term"] = scalar_term;
+                    return {result};
+                }
+
+                static variable_list backward(AutogradContext* ctx, variable_list grad_outputs) {
+                    static auto op = c10::Dispatcher::singleton()
+                            .findSchemaOrThrow("signatory::signature_combine_backward", "")
+                            .typed<decltype(signature_combine_backward_kernel)>();
+
+                    variable_list grads = op.call(grad_outputs[0], ctx->get_saved_variables(),
+                                                  ctx->saved_data["input_channels"].toInt(),
+                                                  ctx->saved_data["depth"].toInt(),
+                                                  ctx->saved_data["scalar_term"].toBool());
+                    // One gradient for every tensor in sigtensors, and then for every other argument to forward.
+                    grads.insert(grads.end(), 3, torch::Tensor());
+                    return grads;
+                }
+            };
+
+            torch::Tensor signature_combine_forward_autograd(at::TensorList sigtensors, int64_t input_channels,
+                                                             int64_t depth, bool scalar_term) {
+                return SignatureCombineFunction::apply(sigtensors, input_channels, depth, scalar_term)[0];
+            }
+
+            /* signature_to_logsignature_forward and signature_to_logsignature_backward */
+
+            torch::Tensor signature_to_logsignature_forward_kernel(const torch::Tensor& signature,
+                                                                   int64_t input_channels, int64_t depth, bool stream,
+                                                                   c10::string_view mode, bool scalar_term) {
+                return signature_to_logsignature_forward_op(signature, input_channels, depth, stream,
+                                                            interpret_mode(mode), scalar_term);
+            }
+
+            torch::Tensor signature_to_logsignature_forward_meta(const torch::Tensor& signature,
+                                                                 int64_t input_channels, int64_t depth, bool stream,
+                                                                 c10::string_view mode, bool scalar_term) {
+                std::vector<int64_t> sizes = signature.sizes().vec();
+                sizes.back() = logsignature_output_channels(input_channels, depth, interpret_mode(mode));
+                return torch::empty(sizes, signature.options());
+            }
+
+            torch::Tensor signature_to_logsignature_backward_kernel(const torch::Tensor& grad_logsignature,
+                                                                    const torch::Tensor& signature,
+                                                                    int64_t input_channels, int64_t depth,
+                                                                    bool stream, c10::string_view mode,
+                                                                    bool scalar_term) {
+                return signature_to_logsignature_backward_op(grad_logsignature, signature, input_channels, depth,
+                                                             stream, interpret_mode(mode), scalar_term);
+            }
+
+            torch::Tensor signature_to_logsignature_backward_meta(const torch::Tensor& grad_logsignature,
+                                                                  const torch::Tensor& signature,
+                                                                  int64_t input_channels, int64_t depth,
+                                                                  bool stream, c10::string_view mode,
+                                                                  bool scalar_term) {
+                return torch::empty_like(signature);
+            }
+
+            class SignatureToLogSignatureBackwardFunction
+                    : public torch::autograd::Function<SignatureToLogSignatureBackwardFunction> {
+            public:
+                static variable_list forward(AutogradContext* ctx, torch::Tensor grad_logsignature,
+                                             torch::Tensor signature, int64_t input_channels, int64_t depth,
+                                             bool stream, c10::string_view mode, bool scalar_term) {
+                    static auto op = c10::Dispatcher::singleton()
+                            .findSchemaOrThrow("signatory::signature_to_logsignature_backward", "")
+                            .typed<decltype(signature_to_logsignature_backward_kernel)>();
+
+                    torch::Tensor grad_signature;
+                    {
+                        at::AutoDispatchBelowADInplaceOrView guard;
+                        grad_signature = op.call(grad_logsignature, signature, input_channels, depth, stream, mode,
+                                                 scalar_term);
+                    }
+
+                    ctx->save_for_backward({grad_logsignature, signature});
+                    ctx->saved_data["input_channels"] = input_channels;
+                    ctx->saved_data["depth"] = depth;
+                    ctx->saved_data["stream"] = stream;
+                    ctx->saved_data["mode"] = std::string(mode.data(), mode.size());
+                    ctx->saved_data["scalar_term"] = scalar_term;
+                    return {grad_signature};
+                }
+
+                static variable_list backward(AutogradContext* ctx, variable_list grad_outputs) {
+                    variable_list saved = ctx->get_saved_variables();
+                    // grad_outputs[0] is a perturbation to the signature; we compute the corresponding perturbation to
+                    // the logsignature, and the Hessian-vector product.
+                    torch::Tensor tangent_logsignature;
+                    torch::Tensor grad_signature;
+                    std::tie(tangent_logsignature, grad_signature) =
+                            signature_to_logsignature_double_backward_op(
+                                    saved[0], saved[1], grad_outputs[0], ctx->saved_data["input_channels"].toInt(),
+                                    ctx->saved_data["depth"].toInt(), ctx->saved_data["stream"].toBool(),
+                                    interpret_mode(ctx->saved_data["mode"].toStringRef()),
+                                    ctx->saved_data["scalar_term"].toBool());
+                    // One gradient for every argument to forward.
+                    return {tangent_logsignature, grad_signature, torch::Tensor(), torch::Tensor(), torch::Tensor(),
+                            torch::Tensor(), torch::Tensor()};
+                }
+            };
+
+            torch::Tensor signature_to_logsignature_backward_autograd(const torch::Tensor& grad_logsignature,
+                                                                      const torch::Tensor& signature,
+                                                                      int64_t input_channels, int64_t depth,
+                                                                      bool stream, c10::string_view mode,
+                                                                      bool scalar_term) {
+                return SignatureToLogSignatureBackwardFunction::apply(grad_logsignature, signature, input_channels,
+                                                                      depth, stream, mode, scalar_term)[0];
+            }
+
+            class SignatureToLogSignatureFunction
+                    : public torch::autograd::Function<SignatureToLogSignatureFunction> {
+            public:
+                static variable_list forward(AutogradContext* ctx, torch::Tensor signature, int64_t input_channels,
+                                             int64_t depth, bool stream, c10::string_view mode, bool scalar_term) {
+                    static auto op = c10::Dispatcher::singleton()
+                            .findSchemaOrThrow("signatory::signature_to_logsignature_forward", "")
+                            .typed<decltype(signature_to_logsignature_forward_kernel)>();
+
+                    torch::Tensor logsignature;
+                    {
+                        at::AutoDispatchBelowADInplaceOrView guard;
+                        logsignature = op.call(signature, input_channels, depth, stream, mode, scalar_term);
+                    }
+
+                    ctx->save_for_backward({signature});
+                    ctx->saved_data["input_channels"] = input_channels;
+                    ctx->saved_data["depth"] = depth;
+                    ctx->saved_data["stream"] = stream;
+                    ctx->saved_data["mode"] = std::string(mode.data(), mode.size());
+                    ctx->saved_data["scalar_term"] = scalar_term;
+                    return {logsignature};
+                }
+
+                static variable_list backward(AutogradContext* ctx, variable_list grad_outputs) {
+                    static auto op = c10::Dispatcher::singleton()
+                            .findSchemaOrThrow("signatory::signature_to_logsignature_backward", "")
+                            .typed<decltype(signature_to_logsignature_backward_kernel)>();
+
+                    const std::string& mode = ctx->saved_data["mode"].toStringRef();
+                    torch::Tensor grad_signature = op.call(grad_outputs[0], ctx->get_saved_variables()[0],
+                                                           ctx->saved_data["input_channels"].toInt(),
+                                                           ctx->saved_data["depth"].toInt(),
+                                                           ctx->saved_data["stream"].toBool(),
+                                                           c10::string_view(mode.data(), mode.size()),
+                                                           ctx->saved_data["scalar_term"].toBool());
+                    // One gradient for every argument to forward.
+                    return {grad_signature, torch::Tensor(), torch::Tensor(), torch::Tensor(), torch::Tensor(),
+                            torch::Tensor()};
+                }
+            };
+
+            torch::Tensor signature_to_logsignature_forward_autograd(const torch::Tensor& signature,
+                                                                     int64_t input_channels, int64_t depth,
+                                                                     bool stream, c10::string_view mode,
+                                                                     bool scalar_term) {
+                return SignatureToLogSignatureFunction::apply(signature, input_channels, depth, stream, mode,
+                                                              scalar_term)[0];
+            }
+        }  // namespace signatory::ops::detail
+    }  // namespace signatory::ops
+}  // namespace signatory
+
+
+TORCH_LIBRARY(signatory, m) {
+    m.def("signature_forward(Tensor path, int depth, bool stream=False, Tensor? basepoint=None, bool inverse=False, "
+          "Tensor? initial=None, bool scalar_term=False, bool leadlag=False, ScalarType? accumulate_dtype=None) "
+          "-> (Tensor, Tensor)");
+    m.def("signature_backward(Tensor grad_signature, Tensor path, Tensor? basepoint, Tensor? initial, "
+          "Tensor signature, Tensor path_increments, int depth, bool stream=False, bool inverse=False, "
+          "bool scalar_term=False, bool leadlag=False, ScalarType? accumulate_dtype=None) -> (Tensor, Tensor, Tensor)");
+    m.def("signature_combine_forward(Tensor[] sigtensors, int input_channels, int depth, bool scalar_term=False) "
+          "-> Tensor");
+    m.def("signature_combine_backward(Tensor grad_out, Tensor[] sigtensors, int input_channels, int depth, "
+          "bool scalar_term=False) -> Tensor[]");
+    m.def("signature_to_logsignature_forward(Tensor signature, int input_channels, int depth, bool stream=False, "
+          "str mode=\"words\", bool scalar_term=False) -> Tensor");
+    m.def("signature_to_logsignature_backward(Tensor grad_logsignature, Tensor signature, int input_channels, "
+          "int depth, bool stream=False, str mode=\"words\", bool scalar_term=False) -> Tensor");
+}
+
+TORCH_LIBRARY_IMPL(signatory, CompositeExplicitAutograd, m) {
+    m.impl("signature_forward", &signatory::ops::detail::signature_forward_kernel);
+    m.impl("signature_backward", &signatory::ops::detail::signature_backward_kernel);
+    m.impl("signature_combine_forward", &signatory::ops::detail::signature_combine_forward_kernel);
+    m.impl("signature_combine_backward", &signatory::ops::detail::signature_combine_backward_kernel);
+    m.impl("signature_to_logsignature_forward", &signatory::ops::detail::signature_to_logsignature_forward_kernel);
+    m.impl("signature_to_logsignature_backward", &signatory::ops::detail::signature_to_logsignature_backward_kernel);
+}
+
+TORCH_LIBRARY_IMPL(signatory, Meta, m) {
+    m.impl("signature_forward", &signatory::ops::detail::signature_forward_meta);
+    m.impl("signature_backward", &signatory::ops::detail::signature_backward_meta);
+    m.impl("signature_combine_forward", &signatory::ops::detail::signature_combine_forward_meta);
+    m.impl("signature_combine_backward", &signatory::ops::detail::signature_combine_backward_meta);
+    m.impl("signature_to_logsignature_forward", &signatory::ops::detail::signature_to_logsignature_forward_meta);
+    m.impl("signature_to_logsignature_backward", &signatory::ops::detail::signature_to_logsignature_backward_meta);
+}
+
+TORCH_LIBRARY_IMPL(signatory, Autograd, m) {
+    m.impl("signature_forward", &signatory::ops::detail::signature_forward_autograd);
+    m.impl("signature_backward", &signatory::ops::detail::signature_backward_autograd);
+    m.impl("signature_combine_forward", &signatory::ops::detail::signature_combine_forward_autograd);
+    m.impl("signature_to_logsignature_forward", &signatory::ops::detail::signature_to_logsignature_forward_autograd);
+    m.impl("signature_to_logsignature_backward",
+           &signatory::ops::detail::signature_to_logsignature_backward_autograd);
+}
@@ -0,0 +1,84 @@
+/* Copyright 2019 Patrick Kidger. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *    http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ * ========================================================================= */
+
+
+#include <torch/extension.h>
+#include <cstdint>    // int64_t
+#include <omp.h>
+#include <stdexcept>  // std::invalid_argument
+#include <tuple>      // std::tuple, std::make_tuple
+
+#include "parallelism.hpp"
+
+
+namespace signatory {
+    namespace parallelism {
+        namespace detail {
+            struct Settings {
+                int64_t batch_threads {0};
+                int64_t stream_threads {0};
+                int64_t max_threads {0};
+                Strategy strategy {Strategy::Auto};
+            };
+
+            // Thread local, so that separate threads (e.g. separate Python threads) each make their own choice.
+            Settings& settings() {
+                thread_local Settings settings_;
+                return settings_;
+            }
+        }  // namespace signatory::parallelism::detail
+
+        void set_limits(int64_t max_threads, Strategy strategy) {
+            if (max_threads < 0) {
+                throw std::invalid_argument("The maximum number of threads must be nonnegative.");
+            }
+            detail::settings().max_threads = max_threads;
+            detail::settings().strategy = strategy;
+        }
+
+        std::tuple<int64_t, Strategy> get_limits() {
+            return std::make_tuple(detail::settings().max_threads, detail::settings().strategy);
+        }
+
+        int64_t max_threads() {
+            int64_t omp_max_threads = omp_get_max_threads();
+            int64_t limit = detail::settings().max_threads;
+            if (limit > 0 && limit < omp_max_threads) {
+                return limit;
+            }
+            return omp_max_threads;
+        }
+
+        Strategy strategy() {
+            return detail::settings().strategy;
+        }
+
+        void set_plan(int64_t batch_threads, int64_t stream_threads) {
+            if (batch_threads < 0 || stream_threads < 0) {
+                throw std::invalid_argument("The number of threads must be nonnegative.");
+            }
+            if ((batch_threads == 0) != (stream_threads == 0)) {
+                throw std::invalid_argument("The number of batch threads and stream threads must either both be zero "
+                                            "or both be positive.");
+            }
+            detail::settings().batch_threads = batch_threads;
+            detail::settings().stream_threads = stream_threads;
+        }
+
+        std::tuple<int64_t, int64_t> get_plan() {
+            return std::make_tuple(detail::settings().batch_threads, detail::settings().stream_threads);
+        }
+    }  // namespace signatory::parallelism
+}  // namespace signatory
@@ -0,0 +1,62 @@
+/* Copyright 2019 Patrick Kidger. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *    http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ * ========================================================================= */
+ // Provides control over how much OpenMP-based parallelism is used, on a per-thread basis. (Per thread of the caller,
+ // that is, so that several callers may each have their own budget.)
+
+
+#ifndef SIGNATORY_PARALLELISM_HPP
+#define SIGNATORY_PARALLELISM_HPP
+
+#include <cstdint>  // int64_t
+#include <tuple>    // std::tuple
+
+
+namespace signatory {
+    namespace parallelism {
+        // Which dimension decide_threads prefers to parallelise along.
+        enum class Strategy {
+            Auto,    // Batch first, then any threads left over along the stream.
+            Batch,   // Only along the batch dimension.
+            Stream   // Stream first, then any threads left over along the batch.
+        };
+
+        // Limits the total number of threads used by any one computation made from the calling thread to
+        // 'max_threads', and sets the strategy used to decide how to use them. A value of zero for 'max_threads' means
+        // no limit beyond OpenMP's own. The defaults are zero and Strategy::Auto.
+        void set_limits(int64_t max_threads, Strategy strategy);
+
+        // Returns the values set by set_limits.
+        std::tuple<int64_t, Strategy> get_limits();
+
+        // The number of threads that computations made from the calling thread may use: the limit set by set_limits,
+        // or OpenMP's own limit if that is lower.
+        int64_t max_threads();
+
+        // The strategy set by set_limits.
+        Strategy strategy();
+
+        // Fixes how many threads to parallelise over the batch and stream dimensions with, for computations made from
+        // the calling thread, instead of deciding automatically. (Still subject to the number of threads being at
+        // most the size of that dimension, to max_threads(), and to those computations which cannot be parallelised
+        // along the stream.)
+        // A value of zero for both means to decide automatically, which is the default.
+        void set_plan(int64_t batch_threads, int64_t stream_threads);
+
+        // Returns the values set by set_plan, as (batch_threads, stream_threads).
+        std::tuple<int64_t, int64_t> get_plan();
+    }  // namespace signatory::parallelism
+}  // namespace signatory
+
+#endif //SIGNATORY_PARALLELISM_HPP
@@ -20,13 +20,30 @@
 #include "logsignature.hpp"  // signatory::LogSignatureMode,
                              // signatory::signature_to_logsignature_forward,
                              // signatory::signature_to_logsignature_backward,
+                             // signatory::signature_to_logsignature_double_backward,
+                             // signatory::signature_to_logsignature_jvp,
+                             // signatory::logsignature_bch_forward,
+                             // signatory::logsignature_bch_backward,
                              // signatory::make_lyndon_info
 
 #include "misc.hpp"          // signatory::signature_channels
 
+#include "parallelism.hpp"   // signatory::parallelism::Strategy,
+                             // signatory::parallelism::set_limits,
+                             // signatory::parallelism::get_limits,
+                             // signatory::parallelism::max_threads,
+                             // signatory::parallelism::set_plan,
+                             // signatory::parallelism::get_plan
+
 #include "signature.hpp"     // signatory::signature_checkargs
                              // signatory::signature_forward,
                              // signatory::signature_backward,
+                             // signatory::signature_double_backward,
+                             // signatory::signature_jvp,
+                             // signatory::ragged_signature_forward,
+                             // signatory::ragged_signature_backward,
+                             // signatory::projected_signature_forward,
+                             // signatory::projected_signature_backward
 
 #include "lyndon.hpp"        // signatory::lyndon_words,
                              // signatory::lyndon_brackets,
@@ -35,6 +52,8 @@
 #include "tensor_algebra_ops.hpp"  // signatory::signature_combine_forward,
                                    // signatory::signature_combine_backward
 
+#include "workspace.hpp"     // signatory::workspace::clear
+
 #ifndef _OPENMP
     #error OpenMP required
 #endif
@@ -44,18 +63,42 @@ PYBIND11_MODULE(TORCH_EXTENSION_NAME, m) {
           &signatory::signature_to_logsignature_forward);
     m.def("signature_to_logsignature_backward",
           &signatory::signature_to_logsignature_backward);
+    m.def("signature_to_logsignature_double_backward",
+          &signatory::signature_to_logsignature_double_backward);
+    m.def("signature_to_logsignature_jvp",
+          &signatory::signature_to_logsignature_jvp);
+    m.def("logsignature_bch_forward",
+          &signatory::logsignature_bch_forward);
+    m.def("logsignature_bch_backward",
+          &signatory::logsignature_bch_backward);
     m.def("make_lyndon_info",
           &signatory::make_lyndon_info);
     py::enum_<signatory::LogSignatureMode>(m, "LogSignatureMode")
             .value("Expand", signatory::LogSignatureMode::Expand)
             .value("Brackets", signatory::LogSignatureMode::Brackets)
             .value("Words", signatory::LogSignatureMode::Words);
+    py::enum_<signatory::parallelism::Strategy>(m, "ThreadingStrategy")
+            .value("Auto", signatory::parallelism::Strategy::Auto)
+            .value("Batch", signatory::parallelism::Strategy::Batch)
+            .value("Stream", signatory::parallelism::Strategy::Stream);
     m.def("signature_checkargs",
           &signatory::signature_checkargs);
     m.def("signature_forward",
           &signatory::signature_forward);
     m.def("signature_backward",
           &signatory::signature_backward);
+    m.def("signature_double_backward",
+          &signatory::signature_double_backward);
+    m.def("signature_jvp",
+          &signatory::signature_jvp);
+    m.def("ragged_signature_forward",
+          &signatory::ragged_signature_forward);
+    m.def("ragged_signature_backward",
+          &signatory::ragged_signature_backward);
+    m.def("projected_signature_forward",
+          &signatory::projected_signature_forward);
+    m.def("projected_signature_backward",
+          &signatory::projected_signature_backward);
     m.def("signature_channels",
           &signatory::signature_channels);
     m.def("lyndon_words",
@@ -71,4 +114,16 @@ PYBIND11_MODULE(TORCH_EXTENSION_NAME, m) {
           &signatory::signature_combine_forward);
     m.def("signature_combine_backward",
         &signatory::signature_combine_backward);
+    m.def("clear_workspace",
+          &signatory::workspace::clear);
+    m.def("set_thread_plan",
+          &signatory::parallelism::set_plan);
+    m.def("get_thread_plan",
+          &signatory::parallelism::get_plan);
+    m.def("set_thread_limits",
+          &signatory::parallelism::set_limits);
+    m.def("get_thread_limits",
+          &signatory::parallelism::get_limits);
+    m.def("get_max_threads",
+          &signatory::parallelism::max_threads);
 }
\ No newline at end of file
@@ -35,6 +35,7 @@ except ImportError as e:
 
 
 from .augment import Augment
+from .autotuning import autotune
 from .deprecated import max_parallelism
 from .logsignature_module import (signature_to_logsignature,
                                   SignatureToLogSignature,
@@ -43,17 +44,27 @@ from .logsignature_module import (signature_to_logsignature,
                                   LogSignature,
                                   Logsignature,  # alias for LogSignature
                                   logsignature_channels)
+from .parallelism import threading
 from .path import Path
+from .planning import (plan,
+                       SignaturePlan)
 from .signature_module import (signature,
                                Signature,
+                               signature_from_increments,
+                               SignatureFromIncrements,
                                signature_channels,
                                extract_signature_term,
                                signature_combine,
-                               multi_signature_combine)
+                               multi_signature_combine,
+                               ragged_signature,
+                               projected_signature,
+                               sliding_signature,
+                               signature_pyramid)
 from . import unstable  # make it available as an attribute here, but don't import any unstable objects themselves
 from .utility import (lyndon_words,
                       lyndon_brackets,
                       all_words)
+from .workspace import clear_workspace
 
 
 __version__ = "1.2.1"
@@ -0,0 +1,225 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#    http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Provides an opt-in autotuner for how signature computations are parallelised."""
+
+
+import collections as co
+import json
+import os
+import tempfile
+import timeit
+import torch
+import warnings
+
+from . import impl
+
+
+# noinspection PyUnreachableCode
+if False:
+    from typing import Any, Callable, Dict, List, Optional
+
+
+# A plan for how to perform a signature computation: how many threads to parallelise over the batch and stream
+# dimensions with (both zero meaning to decide automatically), and whether to use the batch trick (splitting the
+# stream up into pieces along the batch dimension and combining the results afterwards).
+Plan = co.namedtuple('Plan', ('batch_threads', 'stream_threads', 'batch_trick'))
+
+
+# How many times each candidate plan is timed; the best time is used.
+_repeats = 3
+
+_enabled = [False]
+_cache_path = [None]
+# The contents of the cache file, once loaded. Maps keys (as produced by _key) to plans.
+_cache = [None]
+
+
+def _default_cache_path():
+    # type: () -> str
+    return os.environ.get('SIGNATORY_AUTOTUNE_CACHE',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'signatory', 'autotune.json'))
+
+
+def autotune(enabled=None, cache_path=None):
+    # type: (Optional[bool], Optional[str]) -> bool
+    """Gets or sets whether :func:`signatory.signature` autotunes how it parallelises its computations.
+
+    By default, how many threads to parallelise over the batch and stream dimensions with is decided by fixed
+    heuristics, which may be some way from optimal on any particular machine. If autotuning is enabled then the first
+    time that :func:`signatory.signature` sees a particular problem size, it instead times every candidate plan
+    (numbers of threads, and whether or not to split up the stream dimension along the batch dimension), and uses the
+    fastest. The result is stored in a cache on disk, and reused by later calls, including those in later Python
+    sessions.
+
+    Problem sizes are considered the same if their batch size and stream length round up to the same power of two,
+    and if they have the same number of channels, depth, dtype, device, number of threads available and threading
+    strategy (see :func:`signatory.threading`), and they agree on whether gradients are being computed and on the
+    arguments :attr:`stream`, :attr:`basepoint`, :attr:`inverse`, :attr:`initial`, :attr:`leadlag`,
+    :attr:`accumulate_dtype` and :attr:`checkpoint`. (Only whether :attr:`basepoint` and :attr:`initial` are used
+    matters, not their values.) The timing is of the forward pass, and the plan chosen is also used for the backward
+    pass.
+
+    Calling without arguments will return whether autotuning is currently enabled.
+
+    Arguments:
+        enabled (None or bool, optional): Whether to enable autotuning. Defaults to None, which leaves it unchanged.
+            It is initially disabled.
+
+        cache_path (None or str, optional): Where to store the cache of plans. Defaults to None, which leaves it
+            unchanged. Initially this is the value of the environment variable :code:`SIGNATORY_AUTOTUNE_CACHE` if it
+            is set, and :code:`~/.cache/signatory/autotune.json` otherwise.
+
+    Returns:
+        Whether autotuning is enabled.
+    """
+    if cache_path is not None:
+        _cache_path[0] = cache_path
+        _cache[0] = None
+    if enabled is not None:
+        _enabled[0] = bool(enabled)
+    return _enabled[0]
+
+
+def is_enabled():
+    # type: () -> bool
+    return _enabled[0]
+
+
+def _get_cache_path():
+    # type: () -> str
+    if _cache_path[0] is None:
+        return _default_cache_path()
+    return _cache_path[0]
+
+
+def _load():
+    # type: () -> Dict[str, Plan]
+    try:
+        with open(_get_cache_path(), 'r') as f:
+            contents = json.load(f)
+        return {key: Plan(*value) for key, value in contents.items()}
+    except (IOError, OSError, ValueError, TypeError, AttributeError):
+        # Missing or corrupted: just start again.
+        return {}
+
+
+def _save(key, plan):
+    # type: (str, Plan) -> None
+    # Other processes may have added to the cache since we loaded it, so merge with whatever is there now.
+    contents = _load()
+    contents[key] = plan
+    path = _get_cache_path()
+    try:
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Write to a temporary file and then move it into place, so that the cache is never seen half-written.
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({key_: list(plan_) for key_, plan_ in contents.items()}, f, indent=0, sort_keys=True)
+        getattr(os, 'replace', os.rename)(temp_path, path)
+    except (IOError, OSError) as e:
+        warnings.warn("Could not save the autotuning cache to {}: {}. Plans will only be kept in memory."
+                      "".format(path, str(e)))
+
+
+def _bucket(size):
+    # type: (int) -> int
+    # Rounds up to a power of two, so that similar sizes share a plan.
+    bucket = 1
+    while bucket < size:
+        bucket *= 2
+    return bucket
+
+
+def _key(batch_size, stream_size, channels, depth, dtype, device, grad, stream, basepoint, inverse, initial,
+         scalar_term, leadlag, accumulate_dtype, checkpoint, layout):
+    # type: (int, int, int, int, torch.dtype, torch.device, bool, bool, bool, bool, bool, bool, bool, Optional[torch.dtype], str, str) -> str
+    _, strategy = impl.get_thread_limits()
+    accumulate_dtype = 'none' if accumulate_dtype is None else str(accumulate_dtype).replace('torch.', '')
+    return ('batch={},stream_size={},channels={},depth={},dtype={},device={},threads={},strategy={},grad={},stream={},'
+            'basepoint={},inverse={},initial={},scalar_term={},leadlag={},accumulate_dtype={},checkpoint={},layout={}'
+            ''.format(_bucket(batch_size), _bucket(stream_size), channels, depth, str(dtype).replace('torch.', ''),
+                      device.type, impl.get_max_threads(), strategy.name, grad, stream, basepoint, inverse, initial,
+                      scalar_term, leadlag, accumulate_dtype, checkpoint, layout))
+
+
+def _candidates(batch_size, stream_size, device, batch_trick):
+    # type: (int, int, torch.device, bool) -> List[Plan]
+    thread_counts = [(0, 0)]
+    if device.type == 'cpu':
+        # OpenMP is only used on the CPU.
+        max_threads = impl.get_max_threads()
+        counts = []
+        count = 1
+        while count < max_threads:
+            counts.append(count)
+            count *= 2
+        counts.append(max_threads)
+        for batch_threads in counts:
+            if batch_threads > batch_size:
+                break
+            for stream_threads in counts:
+                if batch_threads * stream_threads > max_threads or stream_threads > stream_size:
+                    break
+                thread_counts.append((batch_threads, stream_threads))
+    batch_tricks = (False, True) if batch_trick else (False,)
+    return [Plan(batch_threads, stream_threads, batch_trick_)
+            for batch_threads, stream_threads in thread_counts
+            for batch_trick_ in batch_tricks]
+
+
+def _time(run, plan, device):
+    # type: (Callable[[Plan], Any], Plan, torch.device) -> float
+    best = float('inf')
+    for _ in range(_repeats):
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+        start = timeit.default_timer()
+        run(plan)
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+        best = min(best, timeit.default_timer() - start)
+    return best
+
+
+def choose(run, batch_size, stream_size, channels, depth, dtype, device, grad, stream, basepoint, inverse, initial,
+           scalar_term, leadlag, accumulate_dtype, checkpoint, layout, batch_trick):
+    # type: (Callable[[Plan], Any], int, int, int, int, torch.dtype, torch.device, bool, bool, bool, bool, bool, bool, bool, Optional[torch.dtype], str, str, bool) -> Plan
+    """Returns the fastest plan for a signature computation, timing the candidates by calling :attr:`run` if it is not
+    already known.
+
+    Arguments:
+        run: Performs the signature computation according to the plan it is passed.
+        batch_size, stream_size, channels, depth, dtype, device, grad, stream, basepoint, inverse, initial,
+            scalar_term, leadlag, accumulate_dtype, checkpoint, layout: Describe the computation. Of these, basepoint
+            and initial are just whether they are used, checkpoint is a string describing how checkpointing is done,
+            and layout is either 'batch' or 'stream'.
+        batch_trick: Whether the batch trick may be used for this computation.
+    """
+    if _cache[0] is None:
+        _cache[0] = _load()
+    key = _key(batch_size, stream_size, channels, depth, dtype, device, grad, stream, basepoint, inverse, initial,
+               scalar_term, leadlag, accumulate_dtype, checkpoint, layout)
+    try:
+        return _cache[0][key]
+    except KeyError:
+        pass
+
+    candidates = _candidates(batch_size, stream_size, device, batch_trick)
+    plan = min(candidates, key=lambda candidate: _time(run, candidate, device))
+    _cache[0][key] = plan
+    _save(key, plan)
+    return plan
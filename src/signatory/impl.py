@@ -40,15 +40,32 @@ def _wrap(fn):
 
 
 LogSignatureMode = _impl.LogSignatureMode  # not wrapped because it's not a function
+ThreadingStrategy = _impl.ThreadingStrategy  # not wrapped because it's not a function
 signature_to_logsignature_forward = _wrap(_impl.signature_to_logsignature_forward)
 signature_to_logsignature_backward = _wrap(_impl.signature_to_logsignature_backward)
+signature_to_logsignature_double_backward = _wrap(_impl.signature_to_logsignature_double_backward)
+signature_to_logsignature_jvp = _wrap(_impl.signature_to_logsignature_jvp)
+logsignature_bch_forward = _wrap(_impl.logsignature_bch_forward)
+logsignature_bch_backward = _wrap(_impl.logsignature_bch_backward)
 make_lyndon_info = _wrap(_impl.make_lyndon_info)
 signature_forward = _wrap(_impl.signature_forward)
 signature_backward = _wrap(_impl.signature_backward)
+signature_double_backward = _wrap(_impl.signature_double_backward)
+signature_jvp = _wrap(_impl.signature_jvp)
 signature_checkargs = _wrap(_impl.signature_checkargs)
+ragged_signature_forward = _wrap(_impl.ragged_signature_forward)
+ragged_signature_backward = _wrap(_impl.ragged_signature_backward)
+projected_signature_forward = _wrap(_impl.projected_signature_forward)
+projected_signature_backward = _wrap(_impl.projected_signature_backward)
 signature_channels = _wrap(_impl.signature_channels)
 signature_combine_forward = _wrap(_impl.signature_combine_forward)
 signature_combine_backward = _wrap(_impl.signature_combine_backward)
 lyndon_words_to_basis_transform = _wrap(_impl.lyndon_words_to_basis_transform)
 lyndon_words = _wrap(_impl.lyndon_words)
 lyndon_brackets = _wrap(_impl.lyndon_brackets)
+clear_workspace = _wrap(_impl.clear_workspace)
+set_thread_plan = _wrap(_impl.set_thread_plan)
+get_thread_plan = _wrap(_impl.get_thread_plan)
+set_thread_limits = _wrap(_impl.set_thread_limits)
+get_thread_limits = _wrap(_impl.get_thread_limits)
+get_max_threads = _wrap(_impl.get_max_threads)
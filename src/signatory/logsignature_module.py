@@ -25,10 +25,11 @@ import weakref
 
 from . import signature_module as smodule
 from . import impl
+from . import parallelism
 
 # noinspection PyUnreachableCode
 if False:
-    from typing import Any, Union
+    from typing import Any, Optional, Union
 
 
 def _interpret_mode(mode):
@@ -48,43 +49,115 @@ class _SignatureToLogsignatureFunction(autograd.Function):
         mode = _interpret_mode(mode)
 
         logsignature_, lyndon_info_capsule = impl.signature_to_logsignature_forward(signature, channels, depth, stream,
-                                                                                     mode, lyndon_info, scalar_term)
-        ctx.save_for_backward(signature.detach())
+                                                                                     mode, lyndon_info, scalar_term,
+                                                                                     False, torch.Tensor())
+        ctx.save_for_backward(signature)
+        if hasattr(ctx, 'save_for_forward'):  # Forward-mode autodifferentiation only exists in newer PyTorch versions
+            ctx.save_for_forward(signature)
         ctx.channels = channels
         ctx.depth = depth
         ctx.stream = stream
         ctx.mode = mode
         ctx.lyndon_info_capsule = lyndon_info_capsule
         ctx.scalar_term = scalar_term
+        # The backward pass uses the same threads as the forward pass, even if it's run outside of the same context.
+        ctx.thread_settings = parallelism.get_settings()
 
         return logsignature_
 
     @staticmethod
-    @autograd_function.once_differentiable  # Our backward function uses in-place operations for memory efficiency
     def backward(ctx, grad_logsignature):
         signature, = ctx.saved_tensors
 
-        grad_signature = impl.signature_to_logsignature_backward(grad_logsignature, signature, ctx.channels, ctx.depth,
-                                                                 ctx.stream, ctx.mode, ctx.lyndon_info_capsule,
-                                                                 ctx.scalar_term)
+        # Computed via another autograd.Function so that the backward pass is itself differentiable.
+        with parallelism.settings(ctx.thread_settings):
+            # noinspection PyUnresolvedReferences
+            grad_signature = _SignatureToLogsignatureBackwardFunction.apply(grad_logsignature, signature, ctx.channels,
+                                                                            ctx.depth, ctx.stream, ctx.mode,
+                                                                            ctx.lyndon_info_capsule, ctx.scalar_term)
 
         return grad_signature, None, None, None, None, None, None
 
+    @staticmethod
+    def jvp(ctx, tangent_signature, _channels, _depth, _stream, _mode, _lyndon_info, _scalar_term):
+        signature, = ctx.saved_tensors
+
+        return impl.signature_to_logsignature_jvp(signature, tangent_signature, ctx.channels, ctx.depth, ctx.stream,
+                                                  ctx.mode, ctx.lyndon_info_capsule, ctx.scalar_term)
+
+
+class _SignatureToLogsignatureBackwardFunction(autograd.Function):
+    @staticmethod
+    def forward(ctx, grad_logsignature, signature, channels, depth, stream, mode, lyndon_info_capsule, scalar_term):
+        grad_signature = impl.signature_to_logsignature_backward(grad_logsignature, signature, channels, depth, stream,
+                                                                 mode, lyndon_info_capsule, scalar_term)
+        ctx.save_for_backward(grad_logsignature, signature)
+        ctx.channels = channels
+        ctx.depth = depth
+        ctx.stream = stream
+        ctx.mode = mode
+        ctx.lyndon_info_capsule = lyndon_info_capsule
+        ctx.scalar_term = scalar_term
+        ctx.thread_settings = parallelism.get_settings()
+
+        return grad_signature
+
+    @staticmethod
+    @autograd_function.once_differentiable
+    def backward(ctx, grad_grad_signature):
+        grad_logsignature, signature = ctx.saved_tensors
+
+        # grad_grad_signature is a perturbation to the signature; we compute the corresponding perturbation to the
+        # logsignature, and the Hessian-vector product.
+        with parallelism.settings(ctx.thread_settings):
+            result = impl.signature_to_logsignature_double_backward(grad_logsignature, signature, grad_grad_signature,
+                                                                     ctx.channels, ctx.depth, ctx.stream, ctx.mode,
+                                                                     ctx.lyndon_info_capsule, ctx.scalar_term)
+        tangent_logsignature, grad_signature = result
+
+        return tangent_logsignature, grad_signature, None, None, None, None, None, None
+
+
+def _signature_to_logsignature_out(signature, channels, depth, stream, mode, lyndon_info, scalar_term, out):
+    # Computes the logsignature directly into 'out', without going via autograd. 'signature' and 'out' should already
+    # be in the (stream, batch, channel) layout.
+    if mode == "expand":
+        output_channels = signature.size(-1) - int(scalar_term)
+    else:
+        output_channels = logsignature_channels(channels, depth)
+    smodule.out_checkargs(out, signature.shape[:-1] + (output_channels,), signature, (signature,))
+    out_, out_value = smodule.interpret_out(out)
+    impl.signature_to_logsignature_forward(signature, channels, depth, stream, _interpret_mode(mode), lyndon_info,
+                                           scalar_term, out_, out_value)
+
 
-def _signature_to_logsignature(signature, channels, depth, stream, mode, lyndon_info, scalar_term):
+def _signature_to_logsignature(signature, channels, depth, stream, mode, lyndon_info, scalar_term, out=None):
     if stream:
         signature = signature.transpose(0, 1)  # (batch, stream, channel) to (stream, batch, channel)
-    logsignature_ = _SignatureToLogsignatureFunction.apply(signature, channels, depth, stream, mode, lyndon_info,
-                                                           scalar_term)
+    if out is not None:
+        _signature_to_logsignature_out(signature, channels, depth, stream, mode, lyndon_info, scalar_term,
+                                       out.transpose(0, 1) if stream else out)
+        return out
+    if smodule.requires_grad((signature,)):
+        logsignature_ = _SignatureToLogsignatureFunction.apply(signature, channels, depth, stream, mode, lyndon_info,
+                                                               scalar_term)
+    else:
+        # No gradients are needed, so skip autograd entirely.
+        logsignature_, _ = impl.signature_to_logsignature_forward(signature, channels, depth, stream,
+                                                                  _interpret_mode(mode), lyndon_info, scalar_term,
+                                                                  False, torch.Tensor())
     if stream:
         logsignature_ = logsignature_.transpose(0, 1)  # (stream, batch, channel) to (batch, stream, channel)
     return logsignature_
 
 
-def signature_to_logsignature(signature, channels, depth, stream=False, mode="words", scalar_term=False):
-    # type: (torch.Tensor, int, int, bool, str, bool) -> torch.Tensor
+def signature_to_logsignature(signature, channels, depth, stream=False, mode="words", scalar_term=False, out=None):
+    # type: (torch.Tensor, int, int, bool, str, bool, Union[None, torch.Tensor]) -> torch.Tensor
     """Calculates the logsignature corresponding to a signature.
 
+    This may be differentiated twice, for example to compute Hessian-vector products. With versions of PyTorch that
+    support forward-mode automatic differentiation (:code:`torch.autograd.forward_ad`), then this is supported as well.
+
     Arguments:
         signature (:class:`torch.Tensor`): The result of a call to :func:`signatory.signature`.
 
@@ -101,6 +174,9 @@ def signature_to_logsignature(signature, channels, depth, stream=False, mode="wo
         scalar_term (bool, optional): Defaults to False. The value of :attr:`scalar_term` that
             :func:`signatory.signature` was called with.
 
+        out (None or :class:`torch.Tensor`, optional): Defaults to None. As :func:`signatory.signature`. It must have
+            the same shape as the result, and the same dtype and device as :attr:`signature`.
+
     Example:
         .. code-block:: python
 
@@ -117,7 +193,7 @@ def signature_to_logsignature(signature, channels, depth, stream=False, mode="wo
         :func:`signatory.logsignature`.
     """
     # Go via the class so that it uses a cached lyndon info capsule, if we have one already for some reason.
-    return SignatureToLogSignature(channels, depth, stream, mode, scalar_term)(signature)
+    return SignatureToLogSignature(channels, depth, stream, mode, scalar_term)(signature, out=out)
 
 
 class SignatureToLogSignature(nn.Module):
@@ -176,13 +252,15 @@ class SignatureToLogSignature(nn.Module):
             cls._lyndon_info_capsule_cache[(in_channels, depth, mode)] = lyndon_info_capsule
             return lyndon_info_capsule
 
-    def forward(self, signature):
-        # type: (torch.Tensor) -> torch.Tensor
+    def forward(self, signature, out=None):
+        # type: (torch.Tensor, Union[None, torch.Tensor]) -> torch.Tensor
         """The forward operation.
 
         Arguments:
             signature (:class:`torch.Tensor`): As :func:`signatory.signature_to_logsignature`.
 
+            out (None or :class:`torch.Tensor`, optional): As :func:`signatory.signature_to_logsignature`.
+
         Returns:
             As :func:`signatory.signature_to_logsignature`.
         """
@@ -191,7 +269,7 @@ class SignatureToLogSignature(nn.Module):
                           "slow to calculate, and the GPU offers no speedup. Consider mode='words' instead.")
 
         return _signature_to_logsignature(signature, self._channels, self._depth, self._stream, self._mode,
-                                          self._lyndon_info_capsule.item, self._scalar_term)
+                                          self._lyndon_info_capsule.item, self._scalar_term, out)
 
     def extra_repr(self):
         return ('channels={channels}, depth={depth}, stream={stream}, mode={mode}'
@@ -202,8 +280,186 @@ class SignatureToLogSignature(nn.Module):
 SignatureToLogsignature = SignatureToLogSignature
 
 
-def logsignature(path, depth, stream=False, basepoint=False, inverse=False, mode="words"):
-    # type: (torch.Tensor, int, bool, Union[bool, torch.Tensor], bool, str) -> torch.Tensor
+# The Baker-Campbell-Hausdorff formula, as used by _LogSignatureBCHFunction, is exact up to this depth.
+_bch_max_depth = 4
+
+
+# Computes [x, y] = xy - yx, where x and y are elements of the tensor algebra represented as dictionaries from words
+# (tuples of letters) to their coefficients.
+def _commutator(x, y):
+    out = {}
+    for x_word, x_coefficient in x.items():
+        for y_word, y_coefficient in y.items():
+            coefficient = x_coefficient * y_coefficient
+            xy = x_word + y_word
+            yx = y_word + x_word
+            out[xy] = out.get(xy, 0) + coefficient
+            out[yx] = out.get(yx, 0) - coefficient
+    return {word: coefficient for word, coefficient in out.items() if coefficient != 0}
+
+
+_bch_structure_constants_cache = {}
+
+
+def _bch_structure_constants(channels, depth):
+    """Computes the structure constants of the free Lie algebra with respect to the basis used by the "words" mode of
+    the logsignature. That is, if x and y are logsignatures with mode="words", then
+
+    [x, y][target] = sum over rows (left, right, target) of coefficient * x[left] * y[right]
+
+    The rows for which 'right' is a letter come first; their number is also returned.
+    """
+    try:
+        return _bch_structure_constants_cache[(channels, depth)]
+    except KeyError:
+        pass
+
+    words = [tuple(word) for word in impl.lyndon_words(channels, depth)]
+    word_to_index = {word: index for index, word in enumerate(words)}
+
+    # Expand out the standard bracketing of every Lyndon word.
+    expansions = {}
+    for word in words:
+        if len(word) == 1:
+            expansions[word] = {word: 1}
+        else:
+            for split in range(1, len(word)):
+                if word[split:] in word_to_index:
+                    break
+            expansions[word] = _commutator(expansions[word[:split]], expansions[word[split:]])
+
+    # The basis element corresponding to a Lyndon word w is the unique Lie polynomial whose only Lyndon word is w, with
+    # coefficient one. The expansion of the standard bracketing of w only involves w and lexicographically larger
+    # words in its anagram class (and has coefficient one on w), so we can find these basis elements by back
+    # substitution, working through the Lyndon words in decreasing lexicographic order.
+    basis = {}
+    for word in sorted(words, reverse=True):
+        element = dict(expansions[word])
+        for other_word, coefficient in expansions[word].items():
+            if other_word != word and other_word in basis:
+                for basis_word, basis_coefficient in basis[other_word].items():
+                    element[basis_word] = element.get(basis_word, 0) - coefficient * basis_coefficient
+        basis[word] = {basis_word: coefficient for basis_word, coefficient in element.items() if coefficient != 0}
+
+    # A Lie polynomial is determined by its coefficients of Lyndon words; this is precisely the "words" mode.
+    triples = []
+    for left_index, left in enumerate(words):
+        for right_index in range(left_index + 1, len(words)):
+            right = words[right_index]
+            if len(left) + len(right) > depth:
+                continue
+            for word, coefficient in _commutator(basis[left], basis[right]).items():
+                try:
+                    target_index = word_to_index[word]
+                except KeyError:
+                    continue
+                triples.append((left_index, right_index, target_index, coefficient))
+                triples.append((right_index, left_index, target_index, -coefficient))
+    triples.sort(key=lambda triple: triple[1] >= channels)
+    num_letter_triples = sum(1 for triple in triples if triple[1] < channels)
+
+    indices = torch.tensor([triple[:3] for triple in triples], dtype=torch.int64).reshape(-1, 3)
+    coefficients = torch.tensor([triple[3] for triple in triples], dtype=torch.float64)
+    result = (indices, coefficients, num_letter_triples)
+    _bch_structure_constants_cache[(channels, depth)] = result
+    return result
+
+
+_words_to_brackets_cache = {}
+
+
+def _words_to_brackets(channels, depth):
+    """Computes the linear map taking the "words" mode of the logsignature to the "brackets" mode, as a sparse
+    collection of (source, target, coefficient) triples."""
+    try:
+        return _words_to_brackets_cache[(channels, depth)]
+    except KeyError:
+        pass
+
+    rows = [{index: 1} for index in range(logsignature_channels(channels, depth))]
+    # Compose the transforms, which must be applied sequentially within each anagram class.
+    for transform_class in impl.lyndon_words_to_basis_transform(channels, depth):
+        for source_index, target_index, coefficient in transform_class:
+            target_row = rows[target_index]
+            for index, value in rows[source_index].items():
+                target_row[index] = target_row.get(index, 0) - coefficient * value
+    sources = []
+    targets = []
+    coefficients = []
+    for target_index, row in enumerate(rows):
+        for source_index, coefficient in row.items():
+            if coefficient != 0:
+                sources.append(source_index)
+                targets.append(target_index)
+                coefficients.append(coefficient)
+    result = (torch.tensor(sources, dtype=torch.int64), torch.tensor(targets, dtype=torch.int64),
+              torch.tensor(coefficients, dtype=torch.float64))
+    _words_to_brackets_cache[(channels, depth)] = result
+    return result
+
+
+class _LogSignatureBCHFunction(autograd.Function):
+    @staticmethod
+    def forward(ctx, path_increments, depth, stream, bch_indices, bch_coefficients, num_letter_triples):
+        logsignature_ = impl.logsignature_bch_forward(path_increments, depth, stream, bch_indices, bch_coefficients,
+                                                      num_letter_triples)
+        ctx.save_for_backward(logsignature_, path_increments.detach())
+        ctx.depth = depth
+        ctx.stream = stream
+        ctx.bch_indices = bch_indices
+        ctx.bch_coefficients = bch_coefficients
+        ctx.num_letter_triples = num_letter_triples
+        return logsignature_
+
+    @staticmethod
+    @autograd_function.once_differentiable  # Our backward function uses in-place operations for memory efficiency
+    def backward(ctx, grad_logsignature):
+        logsignature_, path_increments = ctx.saved_tensors
+        grad_path_increments = impl.logsignature_bch_backward(grad_logsignature, logsignature_, path_increments,
+                                                              ctx.depth, ctx.stream, ctx.bch_indices,
+                                                              ctx.bch_coefficients, ctx.num_letter_triples)
+        return grad_path_increments, None, None, None, None, None
+
+
+def _logsignature_bch(path, depth, stream, basepoint, inverse, mode):
+    smodule._signature_checkargs(path, depth, basepoint, None, False, False, None)
+    if depth > _bch_max_depth:
+        raise ValueError("Argument 'bch' is only supported for depth at most {}.".format(_bch_max_depth))
+    if mode not in ("words", "brackets"):
+        raise ValueError("Argument 'bch' is only supported for mode='words' and mode='brackets'.")
+
+    channels = path.size(-1)
+    basepoint, basepoint_value = smodule.interpret_basepoint(basepoint, path.size(0), channels, path.dtype,
+                                                             path.device)
+    if basepoint:
+        path = torch.cat([basepoint_value.unsqueeze(-2), path], dim=-2)
+    path_increments = path[:, 1:] - path[:, :-1]
+    # (batch, stream, channel) to (stream, batch, channel)
+    # The kernel only exists on the CPU, just like the transforms for mode="brackets".
+    path_increments = path_increments.transpose(0, 1).cpu()
+
+    bch_indices, bch_coefficients, num_letter_triples = _bch_structure_constants(channels, depth)
+    logsignature_ = _LogSignatureBCHFunction.apply(path_increments, depth, stream, bch_indices, bch_coefficients,
+                                                   num_letter_triples)
+    if stream:
+        logsignature_ = logsignature_.transpose(0, 1)  # (stream, batch, channel) to (batch, stream, channel)
+    logsignature_ = logsignature_.to(path.device)
+
+    if inverse:
+        # The logsignature of the reversed path is the negative of the logsignature.
+        logsignature_ = -logsignature_
+    if mode == "brackets":
+        sources, targets, coefficients = _words_to_brackets(channels, depth)
+        sources = sources.to(logsignature_.device)
+        targets = targets.to(logsignature_.device)
+        coefficients = coefficients.to(device=logsignature_.device, dtype=logsignature_.dtype)
+        logsignature_ = torch.zeros_like(logsignature_).index_add_(-1, targets,
+                                                                   logsignature_[..., sources] * coefficients)
+    return logsignature_
+
+
+def logsignature(path, depth, stream=False, basepoint=False, inverse=False, mode="words", bch=False, out=None):
+    # type: (torch.Tensor, int, bool, Union[bool, torch.Tensor], bool, str, bool, Union[None, torch.Tensor]) -> torch.Tensor
     """Applies the logsignature transform to a stream of data.
 
     The :attr:`modes` argument determines how the logsignature is represented.
@@ -229,6 +485,17 @@ def logsignature(path, depth, stream=False, basepoint=False, inverse=False, mode
             "Returns" section below. For machine learning applications, :code:`"words"` is the appropriate choice. The
             other two options are mostly only interesting for mathematicians.
 
+        bch (bool, optional): Defaults to False. Whether to compute the logsignature directly from the increments of
+            the path, by repeatedly applying the Baker-Campbell-Hausdorff formula in the free Lie algebra, rather than
+            by computing the signature and then taking its logarithm. This never forms the full signature, which can
+            be faster and use less memory when the number of channels is large. It is only supported for
+            :code:`depth <= 4` (for which the formula is exact) and for :code:`mode in ("words", "brackets")`. It is
+            computed on the CPU; tensors on other devices will be copied over and back.
+
+        out (None or :class:`torch.Tensor`, optional): Defaults to None. As :func:`signatory.signature`. Note that
+            the signature is still computed as an intermediate step, unless :attr:`bch` is True. (In which case the
+            result is instead copied into :attr:`out`.)
+
     Returns:
         A :class:`torch.Tensor`, of almost the same shape as the tensor returned from :func:`signatory.signature` called
         with the same arguments.
@@ -265,7 +532,7 @@ def logsignature(path, depth, stream=False, basepoint=False, inverse=False, mode
         In all cases, the ordering corresponds to the ordering on words given by first ordering the words by length,
         and then ordering each length class lexicographically.
     """
-    return LogSignature(depth, stream=stream, inverse=inverse, mode=mode)(path, basepoint=basepoint)
+    return LogSignature(depth, stream=stream, inverse=inverse, mode=mode, bch=bch)(path, basepoint=basepoint, out=out)
 
 
 class LogSignature(nn.Module):
@@ -286,15 +553,21 @@ class LogSignature(nn.Module):
         inverse (bool, optional): as :func:`signatory.logsignature`.
 
         mode (str, optional): as :func:`signatory.logsignature`.
+
+        bch (bool, optional): as :func:`signatory.logsignature`.
     """
 
-    def __init__(self, depth, stream=False, inverse=False, mode="words", **kwargs):
-        # type: (int, bool, bool, str, **Any) -> None
+    # Only used outside of TorchScript, and can't itself be scripted.
+    __jit_ignored_attributes__ = ['_signature_to_logsignature_instance']
+
+    def __init__(self, depth, stream=False, inverse=False, mode="words", bch=False, **kwargs):
+        # type: (int, bool, bool, str, bool, **Any) -> None
         super(LogSignature, self).__init__(**kwargs)
         self._depth = depth
         self._stream = stream
         self._inverse = inverse
         self._mode = mode
+        self._bch = bch
 
         self._signature_to_logsignature_instance = None
         self._last_channels = None
@@ -322,8 +595,8 @@ class LogSignature(nn.Module):
 
     # Deliberately no 'initial' argument. To support that for logsignatures we'd need to be able to expand a
     # (potentially compressed) logsignature into a signature first. (Which is possible in principle.)
-    def forward(self, path, basepoint=False):
-        # type: (torch.Tensor, Union[bool, torch.Tensor]) -> torch.Tensor
+    def forward(self, path, basepoint=False, out=None):
+        # type: (torch.Tensor, Union[bool, torch.Tensor], Union[None, torch.Tensor]) -> torch.Tensor
         """The forward operation.
 
         Arguments:
@@ -331,17 +604,55 @@ class LogSignature(nn.Module):
 
             basepoint (bool or torch.Tensor, optional): As :func:`signatory.logsignature`.
 
+            out (None or :class:`torch.Tensor`, optional): As :func:`signatory.logsignature`.
+
         Returns:
             As :func:`signatory.logsignature`.
         """
+        if torch.jit.is_scripting():
+            return self._forward_op(path, basepoint, out)
+        else:
+            return self._forward(path, basepoint, out)
+
+    @torch.jit.unused
+    def _forward(self, path, basepoint, out):
+        # type: (torch.Tensor, Union[bool, torch.Tensor], Optional[torch.Tensor]) -> torch.Tensor
+        if smodule.is_compiling():
+            return self._forward_op(path, basepoint, out)
+
+        if self._bch:
+            logsignature_ = _logsignature_bch(path, self._depth, self._stream, basepoint, self._inverse, self._mode)
+            if out is not None:
+                smodule.out_checkargs(out, logsignature_.shape, logsignature_, (path, basepoint))
+                logsignature_ = out.copy_(logsignature_)
+            return logsignature_
 
         signature = smodule.signature(path, self._depth, stream=self._stream, basepoint=basepoint,
                                       inverse=self._inverse, initial=None)
-        return self._get_signature_to_logsignature_instance(path.size(-1))(signature)
+        return self._get_signature_to_logsignature_instance(path.size(-1))(signature, out=out)
+
+    def _forward_op(self, path, basepoint, out):
+        # type: (torch.Tensor, Union[bool, torch.Tensor], Optional[torch.Tensor]) -> torch.Tensor
+        # As forward, but via the torch.ops.signatory operators, so that it may be scripted or compiled.
+        if self._bch:
+            raise ValueError("Argument 'bch' is not supported when the LogSignature module is scripted or compiled.")
+        stream_path = path.transpose(0, 1)  # (batch, stream, channel) to (stream, batch, channel)
+        basepoint_ = smodule.op_basepoint(basepoint, stream_path)
+        signature, _ = torch.ops.signatory.signature_forward(stream_path, self._depth, self._stream, basepoint_,
+                                                             self._inverse)
+        logsignature_ = torch.ops.signatory.signature_to_logsignature_forward(signature, path.size(-1), self._depth,
+                                                                              self._stream, self._mode)
+        if self._stream:
+            logsignature_ = logsignature_.transpose(0, 1)  # (stream, batch, channel) to (batch, stream, channel)
+        if out is not None:
+            smodule.op_out_checkargs(out, logsignature_, path, [path, basepoint_])
+            logsignature_ = out.copy_(logsignature_)
+        return logsignature_
 
     def extra_repr(self):
-        return ('depth={depth}, stream={stream}, inverse={inverse}, mode={mode}'
-                .format(depth=self._depth, stream=self._stream, inverse=self._inverse, mode=repr(self._mode)))
+        return ('depth={depth}, stream={stream}, inverse={inverse}, mode={mode}, bch={bch}'
+                .format(depth=self._depth, stream=self._stream, inverse=self._inverse, mode=repr(self._mode),
+                        bch=self._bch))
 
 
 # Alias
@@ -0,0 +1,139 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#    http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Provides control over how much parallelism Signatory's CPU computations use."""
+
+
+import contextlib
+
+from . import impl
+
+
+# noinspection PyUnreachableCode
+if False:
+    from typing import Any, Iterator, Optional, Tuple
+
+
+_strategies = {'auto': impl.ThreadingStrategy.Auto,
+               'batch': impl.ThreadingStrategy.Batch,
+               'stream': impl.ThreadingStrategy.Stream}
+
+
+@contextlib.contextmanager
+def threading(max_threads=None, strategy=None):
+    # type: (Optional[int], Optional[str]) -> Iterator[None]
+    r"""Within this context manager, Signatory's CPU computations made from the current thread use at most
+    :attr:`max_threads` many threads in total, and decide how to use them according to :attr:`strategy`.
+
+    This is useful when running Signatory from several threads at once (for example as part of a thread pool), to
+    share the machine's cores between them: by default every computation will try to use every core, so that
+    several computations at once will oversubscribe the machine.
+
+    This context manager only affects the thread it is used in, so each thread can be given its own budget. It may be
+    nested to override the settings for individual calls; a nested :attr:`max_threads` can only lower the limit, not
+    raise it.
+
+    The backward pass of :func:`signatory.signature` and :func:`signatory.signature_to_logsignature` uses the same
+    settings as the forward pass, even if it is run outside of this context manager.
+
+    Example:
+        .. code-block:: python
+
+            with signatory.threading(max_threads=2):
+                signature = signatory.signature(path, depth)
+
+    Arguments:
+        max_threads (None or int, optional): The maximum number of threads to use. Defaults to no limit beyond the
+            number of threads that PyTorch uses, as given by :func:`torch.get_num_threads`.
+
+        strategy (None or str, optional): How to parallelise the signature computation. May be either
+            :code:`'batch'`, to parallelise only along the batch dimension; :code:`'stream'`, to parallelise along the
+            stream dimension first and then use any threads left over along the batch dimension; or :code:`'auto'`,
+            to parallelise along the batch dimension first and then use any threads left over along the stream
+            dimension. Defaults to whatever strategy is already in use, which is :code:`'auto'` if this context manager
+            isn't nested.
+
+    Raises:
+        ValueError: if :attr:`max_threads` is not positive or :attr:`strategy` is not one of the above.
+    """
+    previous_max_threads, previous_strategy = impl.get_thread_limits()
+
+    if max_threads is None:
+        new_max_threads = previous_max_threads
+    else:
+        if max_threads < 1:
+            raise ValueError("max_threads must be positive.")
+        if previous_max_threads == 0:
+            new_max_threads = max_threads
+        else:
+            new_max_threads = min(max_threads, previous_max_threads)
+
+    if strategy is None:
+        new_strategy = previous_strategy
+    else:
+        try:
+            new_strategy = _strategies[strategy]
+        except KeyError:
+            raise ValueError("strategy must be one of {}.".format(', '.join(repr(s) for s in sorted(_strategies))))
+
+    impl.set_thread_limits(new_max_threads, new_strategy)
+    try:
+        yield
+    finally:
+        impl.set_thread_limits(previous_max_threads, previous_strategy)
+
+
+@contextlib.contextmanager
+def thread_plan(plan):
+    # type: (Tuple[int, int]) -> Iterator[None]
+    """Within this context manager, computations made from the current thread parallelise over the batch and stream
+    dimensions with the number of threads given by :attr:`plan`, which is a tuple of (batch_threads, stream_threads).
+    A plan of :code:`(0, 0)` means to decide automatically, which is the default.
+
+    This is used to make sure that the backward pass uses the same plan as the forward pass, which may have been run
+    in a different context.
+    """
+    previous_plan = impl.get_thread_plan()
+    impl.set_thread_plan(*plan)
+    try:
+        yield
+    finally:
+        impl.set_thread_plan(*previous_plan)
+
+
+def get_settings():
+    # type: () -> Tuple[Any, ...]
+    """Returns every setting made by :func:`threading` and :func:`thread_plan` for the current thread, to later be
+    passed to :func:`settings`.
+    """
+    return impl.get_thread_plan() + impl.get_thread_limits()
+
+
+@contextlib.contextmanager
+def settings(settings_):
+    # type: (Tuple[Any, ...]) -> Iterator[None]
+    """Within this context manager, computations made from the current thread use the settings :attr:`settings_`, as
+    returned by :func:`get_settings`.
+
+    This is used to make sure that the backward pass uses the same settings as the forward pass, which may have been
+    run in a different context.
+    """
+    previous_settings = get_settings()
+    impl.set_thread_plan(*settings_[:2])
+    impl.set_thread_limits(*settings_[2:])
+    try:
+        yield
+    finally:
+        impl.set_thread_plan(*previous_settings[:2])
+        impl.set_thread_limits(*previous_settings[2:])
@@ -32,7 +32,7 @@ if False:
 
 class _BackwardShortcut(autograd.Function):
     @staticmethod
-    def forward(ctx, signature, depth, scalar_term, *path_pieces):
+    def forward(ctx, signature, depth, scalar_term, accumulate_dtype, *path_pieces):
         if len(path_pieces) == 0:
             raise ValueError('path_pieces must have nonzero length')
 
@@ -42,6 +42,7 @@ class _BackwardShortcut(autograd.Function):
         ctx.save_for_backward(*save_for_backward)
         ctx.depth = depth
         ctx.scalar_term = scalar_term
+        ctx.accumulate_like = smodule.interpret_accumulate_dtype(accumulate_dtype, signature.dtype)
 
         return signature
 
@@ -84,9 +85,13 @@ class _BackwardShortcut(autograd.Function):
                                                   False,  # basepoint
                                                   False,  # inverse
                                                   False,  # initial
-                                                  ctx.scalar_term)
+                                                  ctx.scalar_term,
+                                                  False,  # leadlag
+                                                  False,  # from_increments
+                                                  ctx.accumulate_like,
+                                                  0)  # checkpoint_every
 
-        result = [None, None, None]
+        result = [None, None, None, None]
         start = 0
         end = 0
         for elem in path_pieces:
@@ -101,11 +106,11 @@ class _BackwardShortcut(autograd.Function):
 # The already-computed signature is just returned during the forward operation.
 # And the backward operation through signature is not computed in favour of shortcutting through path_pieces. (Which
 # is assumed to be the path which has this signature!)
-def _backward_shortcut(signature, path_pieces, depth, scalar_term):
+def _backward_shortcut(signature, path_pieces, depth, scalar_term, accumulate_dtype):
     # (batch, stream, channel) to (stream, batch, channel)
     path_pieces = [path_piece.transpose(0, 1) for path_piece in path_pieces]
     # .detach() so that no gradients are taken through this argument
-    return _BackwardShortcut.apply(signature.detach(), depth, scalar_term, *path_pieces)
+    return _BackwardShortcut.apply(signature.detach(), depth, scalar_term, accumulate_dtype, *path_pieces)
 
 
 class Path(object):
@@ -132,18 +137,25 @@ class Path(object):
 
         scalar_term (bool, optional): Defaults to False. Whether to include the scalar '1' when calling the
             :meth:`signatory.Path.signature` method; see also the equivalent argument for :func:`signatory.signature`.
+
+        accumulate_dtype (None or :class:`torch.dtype`, optional): As :func:`signatory.signature`. Used when computing
+            the signatures of the prefixes of :attr:`path`, and of any path passed to :meth:`signatory.Path.update`,
+            when combining them to find the signature on an interval, and in the backward pass. Note that the
+            signatures of the prefixes are stored in the dtype of :attr:`path`.
     """
 
     # !! If you change this, make sure to adjust __eq__ and __copy__ accordingly.
-    __slots__ = ('_remember_path', '_scalar_term', '_depth', '_signature', '_inverse_signature', '_path',
-                 '_length', '_signature_length', '_lengths', '_signature_lengths', '_batch_size', '_channels',
+    __slots__ = ('_remember_path', '_scalar_term', '_accumulate_dtype', '_depth', '_signature', '_inverse_signature',
+                 '_path', '_length', '_signature_length', '_lengths', '_signature_lengths', '_batch_size', '_channels',
                  '_device', '_signature_channels', '_logsignature_channels', '_end',
                  '_signature_to_logsignature_instances')
 
-    def __init__(self, path, depth, basepoint=False, remember_path=True, scalar_term=False, **kwargs):
-        # type: (torch.Tensor, int, Union[bool, torch.Tensor], bool, bool, **Any) -> None
+    def __init__(self, path, depth, basepoint=False, remember_path=True, scalar_term=False, accumulate_dtype=None,
+                 **kwargs):
+        # type: (torch.Tensor, int, Union[bool, torch.Tensor], bool, bool, Union[None, torch.dtype], **Any) -> None
         self._remember_path = remember_path  # type: bool
         self._scalar_term = scalar_term  # type: bool
+        self._accumulate_dtype = accumulate_dtype  # type: Union[None, torch.dtype]
         self._depth = depth  # type: int
 
         self._signature = []  # type: List[torch.Tensor]
@@ -302,9 +314,14 @@ class Path(object):
             index_sig_start, sig_start = self._locate(self._signature_lengths, sig_start)
             inverse_sig_at_start = self._inverse_signature[index_sig_start][:, sig_start, :]
 
-            # Find the signature on [start:end]
+            # Find the signature on [start:end]. The stored signatures are in the dtype of the path, so the combination
+            # is done in the accumulation dtype, if there is one.
+            dtype = signature.dtype
+            if self._accumulate_dtype is not None:
+                inverse_sig_at_start = inverse_sig_at_start.to(self._accumulate_dtype)
+                signature = signature.to(self._accumulate_dtype)
             signature = smodule.multi_signature_combine([inverse_sig_at_start, signature], self._channels, self.depth,
-                                                        scalar_term=self._scalar_term)
+                                                        scalar_term=self._scalar_term).to(dtype)
 
         # Find path[start:end]
         path_pieces = []
@@ -331,7 +348,7 @@ class Path(object):
         #
         # This obviously isn't desirable if start takes a large value - lots of unnecessary work - so here we insert a
         # custom backwards that shortcuts that whole procedure.
-        return _backward_shortcut(signature, path_pieces, self._depth, self._scalar_term)
+        return _backward_shortcut(signature, path_pieces, self._depth, self._scalar_term, self._accumulate_dtype)
 
     @staticmethod
     def _locate(lengths, index):
@@ -394,9 +411,10 @@ class Path(object):
 
     def _update(self, path, initial, inverse_initial):
         signature = smodule.signature(path, self._depth, stream=True, basepoint=self._end, initial=initial,
-                                      scalar_term=self._scalar_term)
+                                      scalar_term=self._scalar_term, accumulate_dtype=self._accumulate_dtype)
         inverse_signature = smodule.signature(path, self._depth, stream=True, basepoint=self._end, inverse=True,
-                                              initial=inverse_initial, scalar_term=self._scalar_term)
+                                              initial=inverse_initial, scalar_term=self._scalar_term,
+                                              accumulate_dtype=self._accumulate_dtype)
         self._signature.append(signature)
         self._inverse_signature.append(inverse_signature)
 
@@ -0,0 +1,261 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#    http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Provides signature computations that are prepared once and then performed many times."""
+
+
+import torch
+
+from . import autotuning
+from . import impl
+from . import parallelism
+from . import signature_module as smodule
+
+# noinspection PyUnreachableCode
+if False:
+    from typing import Optional, Tuple, Union
+
+
+class SignaturePlan(object):
+    """A signature computation for inputs of a fixed shape, dtype and device, which may be performed many times. See
+    :func:`signatory.plan`.
+    """
+
+    def __init__(self, batch_size, stream_size, channels, depth, dtype, device, stream, basepoint, inverse, initial,
+                 scalar_term, leadlag, accumulate_dtype, layout, reuse_output):
+        # type: (int, int, int, int, torch.dtype, torch.device, bool, bool, bool, bool, bool, bool, Optional[torch.dtype], str, bool) -> None
+        if not isinstance(basepoint, bool):
+            raise ValueError("Argument 'basepoint' must be a bool. (The value of the basepoint, if any, is instead "
+                             "passed each time the plan is called.)")
+        if not isinstance(initial, bool):
+            raise ValueError("Argument 'initial' must be a bool. (The value of the initial signature is instead "
+                             "passed each time the plan is called.)")
+
+        device = torch.device(device)
+        batch_first = layout == 'batch'
+        if batch_first:
+            path_shape = (batch_size, stream_size, channels)
+        else:
+            path_shape = (stream_size, batch_size, channels)
+        output_channels = smodule.signature_channels(2 * channels if leadlag else channels, depth, scalar_term)
+        initial_shape = (batch_size, output_channels)
+
+        # Check all the arguments now, so that we don't have to every time. This uses expanded scalars in place of the
+        # inputs, which don't take up any memory.
+        zero = torch.zeros((), dtype=dtype, device=device)
+        smodule._signature_checkargs(zero.expand(path_shape), depth, zero.expand(batch_size, channels) if basepoint
+                                     else False, zero.expand(initial_shape) if initial else None, scalar_term, leadlag,
+                                     accumulate_dtype, layout=layout)
+
+        self._batch_size = batch_size
+        self._stream_size = stream_size
+        self._channels = channels
+        self._depth = depth
+        self._dtype = dtype
+        self._device = device
+        self._stream = stream
+        self._basepoint = basepoint
+        self._inverse = inverse
+        self._initial = initial
+        self._scalar_term = scalar_term
+        self._leadlag = leadlag
+        self._accumulate_dtype = accumulate_dtype
+        self._layout = layout
+        self._batch_first = batch_first
+
+        self._path_shape = path_shape
+        self._basepoint_shape = (batch_size, channels)
+        self._initial_shape = initial_shape
+        self._shape = smodule._signature_shape(batch_size, stream_size, channels, depth, stream, basepoint, scalar_term,
+                                               leadlag, batch_first)
+        self._accumulate_like = smodule.interpret_accumulate_dtype(accumulate_dtype, dtype)
+        self._zero_basepoint = torch.zeros(self._basepoint_shape, dtype=dtype, device=device) if basepoint else None
+        self._out = self._empty() if reuse_output else None
+        # Only decided if autotuning is enabled, on the first call; else the usual heuristics are used, which cost
+        # essentially nothing.
+        self._thread_plan = None
+
+    def _empty(self):
+        # type: () -> torch.Tensor
+        # Contiguous in the requested layout, just like the result of signatory.signature.
+        return torch.empty(self._shape, dtype=self._dtype, device=self._device)
+
+    def _check_tensor(self, name, tensor, shape):
+        # type: (str, torch.Tensor, Tuple[int, ...]) -> None
+        if not isinstance(tensor, torch.Tensor):
+            raise ValueError("Argument '{}' must be a torch.Tensor.".format(name))
+        if tuple(tensor.shape) != shape:
+            raise ValueError("Argument '{}' must be of shape {}, but is of shape {}.".format(name, shape,
+                                                                                           tuple(tensor.shape)))
+        if tensor.dtype != self._dtype:
+            raise ValueError("Argument '{}' must be of dtype {}, but is of dtype {}.".format(name, self._dtype,
+                                                                                           tensor.dtype))
+        if tensor.device != self._device:
+            raise ValueError("Argument '{}' must be on device {}, but is on device {}.".format(name, self._device,
+                                                                                             tensor.device))
+
+    def __call__(self, path, basepoint=None, initial=None, out=None):
+        # type: (torch.Tensor, Optional[torch.Tensor], Optional[torch.Tensor], Optional[torch.Tensor]) -> torch.Tensor
+        """Computes the signature of :attr:`path`.
+
+        Arguments:
+            path (:class:`torch.Tensor`): The batch of input paths. It must have the shape, dtype and device that the
+                plan was made for.
+
+            basepoint (None or :class:`torch.Tensor`, optional): May only be passed if the plan was made with
+                :code:`basepoint=True`, in which case it is the value of the basepoint. Defaults to zero.
+
+            initial (None or :class:`torch.Tensor`, optional): Must be passed if and only if the plan was made with
+                :code:`initial=True`, in which case it is the signature to pre-tensor-multiply on to the signature of
+                :attr:`path`.
+
+            out (None or :class:`torch.Tensor`, optional): As :func:`signatory.signature`.
+
+        Returns:
+            As :func:`signatory.signature`. If the plan was made with :code:`reuse_output=True` and :attr:`out` is not
+            passed then this is the same tensor every time.
+        """
+        self._check_tensor('path', path, self._path_shape)
+        if basepoint is None:
+            basepoint_value = self._zero_basepoint
+        elif self._basepoint:
+            self._check_tensor('basepoint', basepoint, self._basepoint_shape)
+            basepoint_value = basepoint
+        else:
+            raise ValueError("Argument 'basepoint' may only be passed if the plan was made with basepoint=True.")
+        if self._initial:
+            if initial is None:
+                raise ValueError("Argument 'initial' must be passed, as the plan was made with initial=True.")
+            self._check_tensor('initial', initial, self._initial_shape)
+        elif initial is not None:
+            raise ValueError("Argument 'initial' may only be passed if the plan was made with initial=True.")
+
+        if smodule.requires_grad((path, basepoint, initial)):
+            # Gradients (or forward-mode derivatives) are needed, so go through autograd as usual.
+            return smodule.signature(path, self._depth, stream=self._stream,
+                                     basepoint=self._basepoint if basepoint is None else basepoint,
+                                     inverse=self._inverse, initial=initial, scalar_term=self._scalar_term,
+                                     leadlag=self._leadlag, accumulate_dtype=self._accumulate_dtype,
+                                     layout=self._layout, out=out)
+
+        if out is None:
+            out = self._empty() if self._out is None else self._out
+        else:
+            self._check_tensor('out', out, self._shape)
+
+        if self._thread_plan is None and autotuning.is_enabled():
+            def run(thread_plan):
+                with parallelism.thread_plan(thread_plan[:2]):
+                    self._compute(path, basepoint_value, initial, out)
+
+            self._thread_plan = autotuning.choose(run, self._batch_size, self._stream_size, self._channels,
+                                                  self._depth, self._dtype, self._device, False, self._stream,
+                                                  self._basepoint, self._inverse, self._initial,
+                                                  self._scalar_term, self._leadlag, self._accumulate_dtype,
+                                                  'None/None', self._layout, batch_trick=False)[:2]
+
+        if self._thread_plan is None:
+            self._compute(path, basepoint_value, initial, out)
+        else:
+            with parallelism.thread_plan(self._thread_plan):
+                self._compute(path, basepoint_value, initial, out)
+        return out
+
+    def _compute(self, path, basepoint_value, initial, out):
+        # type: (torch.Tensor, Optional[torch.Tensor], Optional[torch.Tensor], torch.Tensor) -> None
+        if self._batch_first:
+            path = path.transpose(0, 1)  # (batch, stream, channel) to (stream, batch, channel)
+            if self._stream:
+                out = out.transpose(0, 1)
+        impl.signature_forward(path, self._depth, self._stream, self._basepoint,
+                               torch.Tensor() if basepoint_value is None else basepoint_value, self._inverse,
+                               self._initial, torch.Tensor() if initial is None else initial, self._scalar_term,
+                               self._leadlag, False, self._batch_first, self._accumulate_like, True, out, False)
+
+    def __repr__(self):
+        return ('SignaturePlan(batch_size={}, stream_size={}, channels={}, depth={}, dtype={}, device={}, stream={}, '
+                'basepoint={}, inverse={}, initial={}, scalar_term={}, leadlag={}, accumulate_dtype={}, layout={!r}, '
+                'reuse_output={})'.format(self._batch_size, self._stream_size, self._channels, self._depth,
+                                          self._dtype, self._device, self._stream, self._basepoint, self._inverse,
+                                          self._initial, self._scalar_term, self._leadlag, self._accumulate_dtype,
+                                          self._layout, self._out is not None))
+
+
+def plan(batch_size, stream_size, channels, depth, dtype=torch.float32, device='cpu', stream=False, basepoint=False,
+         inverse=False, initial=False, scalar_term=False, leadlag=False, accumulate_dtype=None, layout='batch',
+         reuse_output=False):
+    # type: (int, int, int, int, torch.dtype, Union[str, torch.device], bool, bool, bool, bool, bool, bool, Optional[torch.dtype], str, bool) -> SignaturePlan
+    r"""Prepares a signature computation for inputs of a fixed shape, dtype and device, which may then be performed
+    many times.
+
+    Calling :func:`signatory.signature` repeatedly on small inputs spends a noticeable fraction of its time on work
+    that doesn't depend on the values of its inputs: checking its arguments, interpreting them, and deciding how to
+    perform the computation. This function does all of that just once, and returns a callable which performs just
+    the computation itself. For example:
+
+    .. code-block:: python
+
+        signature_plan = signatory.plan(batch_size=32, stream_size=10, channels=5, depth=4)
+        for path in paths:  # each path is of shape (32, 10, 5)
+            signature = signature_plan(path)
+
+    If gradients are required then it instead falls back to calling :func:`signatory.signature`, which handles
+    automatic differentiation, so it is mostly useful for inference.
+
+    If autotuning is enabled (see :func:`signatory.autotune`) then the first call decides how the computation is
+    parallelised, and every later call reuses that decision.
+
+    Arguments:
+        batch_size (int): The size of the batch dimension of the input paths.
+
+        stream_size (int): The size of the stream dimension of the input paths.
+
+        channels (int): The size of the channel dimension of the input paths.
+
+        depth (int): As :func:`signatory.signature`.
+
+        dtype (:class:`torch.dtype`, optional): The dtype of the input paths. Defaults to :code:`torch.float32`.
+
+        device (str or :class:`torch.device`, optional): The device of the input paths. Defaults to the CPU.
+
+        stream (bool, optional): As :func:`signatory.signature`.
+
+        basepoint (bool, optional): Defaults to False. If True then a basepoint is used, as in
+            :func:`signatory.signature`. Its value may be passed each time the plan is called, and otherwise defaults
+            to zero.
+
+        inverse (bool, optional): As :func:`signatory.signature`.
+
+        initial (bool, optional): Defaults to False. If True then the plan must be passed the value of
+            :attr:`initial` each time it is called, as in :func:`signatory.signature`.
+
+        scalar_term (bool, optional): As :func:`signatory.signature`.
+
+        leadlag (bool, optional): As :func:`signatory.signature`.
+
+        accumulate_dtype (None or :class:`torch.dtype`, optional): As :func:`signatory.signature`.
+
+        layout (str, optional): As :func:`signatory.signature`. This determines whether the input paths are of shape
+            :code:`(batch_size, stream_size, channels)` or :code:`(stream_size, batch_size, channels)`.
+
+        reuse_output (bool, optional): Defaults to False. If True then the memory for the result is allocated just
+            once, and every call returns the same tensor, overwritten with the new result. This saves an allocation
+            per call, but means that the result of a call must be used (or copied) before the plan is next called.
+
+    Returns:
+        A :class:`signatory.SignaturePlan`. Calling it with a path computes the signature of that path, in the same way
+        as :func:`signatory.signature` with the arguments above.
+    """
+    return SignaturePlan(batch_size, stream_size, channels, depth, dtype, device, stream, basepoint, inverse, initial,
+                         scalar_term, leadlag, accumulate_dtype, layout, reuse_output)
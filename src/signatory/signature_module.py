@@ -22,11 +22,13 @@ from torch import autograd
 from torch.autograd import function as autograd_function
 import warnings
 
+from . import autotuning
 from . import impl
+from . import parallelism
 
 # noinspection PyUnreachableCode
 if False:
-    from typing import Any, List, Union
+    from typing import Any, List, Optional, Union
 
 
 def interpret_basepoint(basepoint, batch_size, channel_size, dtype, device):
@@ -40,6 +42,17 @@ def interpret_basepoint(basepoint, batch_size, channel_size, dtype, device):
     return basepoint, basepoint_value
 
 
+def op_basepoint(basepoint, path):
+    # type: (Union[bool, torch.Tensor], torch.Tensor) -> Optional[torch.Tensor]
+    # As interpret_basepoint, but for the torch.ops.signatory operators, which represent the absence of a basepoint as
+    # None. 'path' should be in the (stream, batch, channel) layout. Must be scriptable.
+    if isinstance(basepoint, torch.Tensor):
+        return basepoint
+    if basepoint:
+        return torch.zeros((path.size(1), path.size(2)), dtype=path.dtype, device=path.device)
+    return None
+
+
 def interpret_initial(initial):
     if isinstance(initial, torch.Tensor):
         initial_value = initial
@@ -50,69 +63,368 @@ def interpret_initial(initial):
     return initial, initial_value
 
 
+def interpret_out(out):
+    if isinstance(out, torch.Tensor):
+        return True, out
+    else:
+        return False, torch.Tensor()
+
+
+def _has_tangent(tensor):
+    # Whether 'tensor' is a dual tensor at the current forward-mode level. Such tensors need not require grad, for
+    # example if they were made with make_dual(tensor.detach(), tangent), and forward-mode autodifferentiation
+    # happens regardless of torch.no_grad().
+    try:
+        unpack_dual = torch.autograd.forward_ad.unpack_dual
+    except AttributeError:  # Forward-mode autodifferentiation only exists in newer PyTorch versions
+        return False
+    return unpack_dual(tensor).tangent is not None
+
+
+def is_compiling():
+    # Whether we're being traced by torch.compile, in which case the torch.ops.signatory operators should be used, as
+    # they can be traced through without a graph break.
+    try:
+        return torch.compiler.is_compiling()
+    except AttributeError:
+        pass
+    try:
+        return torch._dynamo.is_compiling()
+    except AttributeError:  # torch.compile only exists in newer PyTorch versions
+        return False
+
+
+def requires_grad(tensors):
+    # Whether autograd needs to track a computation with inputs 'tensors', some of which may not be tensors: either
+    # because some of them require grad, or because some of them carry a forward-mode tangent.
+    tensors = [tensor for tensor in tensors if isinstance(tensor, torch.Tensor)]
+    if torch.is_grad_enabled() and any(tensor.requires_grad for tensor in tensors):
+        return True
+    return any(_has_tangent(tensor) for tensor in tensors)
+
+
+def out_checkargs(out, shape, like, tensors):
+    # Checks that 'out' is of shape 'shape', and of the same dtype and device as 'like'. Also checks that none of
+    # 'tensors' need gradients, as (just like PyTorch's own out= arguments) writing into 'out' isn't differentiable.
+    if out is None:
+        return
+    if not isinstance(out, torch.Tensor):
+        raise ValueError("Argument 'out' must be either None or a torch.Tensor.")
+    if tuple(out.shape) != tuple(shape):
+        raise ValueError("Argument 'out' must be of shape {}, but is of shape {}.".format(tuple(shape),
+                                                                                            tuple(out.shape)))
+    if out.dtype != like.dtype:
+        raise ValueError("Argument 'out' must be of dtype {}, but is of dtype {}.".format(like.dtype, out.dtype))
+    if out.device != like.device:
+        raise ValueError("Argument 'out' must be on device {}, but is on device {}.".format(like.device, out.device))
+    if requires_grad(tensors):
+        raise ValueError("Argument 'out' does not support automatic differentiation, but one of the arguments "
+                         "requires grad or is a forward-mode dual tensor. Either pass out=None, or call this under "
+                         "torch.no_grad() with no dual tensors.")
+
+
+def op_out_checkargs(out, result, like, tensors):
+    # type: (torch.Tensor, torch.Tensor, torch.Tensor, List[Optional[torch.Tensor]]) -> None
+    # As out_checkargs, for when the torch.ops.signatory operators have computed 'result', which is to be written into
+    # 'out'. Must be scriptable: when scripted there are no forward-mode dual tensors to check for, but the checks are
+    # otherwise the same.
+    if not torch.jit.is_scripting():
+        out_checkargs(out, result.shape, like, tensors)
+    else:
+        if out.shape != result.shape:
+            raise ValueError("Argument 'out' must be of shape {}, but is of shape {}.".format(result.shape,
+                                                                                                out.shape))
+        if out.dtype != like.dtype:
+            raise ValueError("Argument 'out' must be of dtype {}, but is of dtype {}.".format(like.dtype, out.dtype))
+        if out.device != like.device:
+            raise ValueError("Argument 'out' must be on device {}, but is on device {}.".format(like.device,
+                                                                                                  out.device))
+        if torch.is_grad_enabled():
+            for tensor in tensors:
+                if tensor is not None and tensor.requires_grad:
+                    raise ValueError("Argument 'out' does not support automatic differentiation, but one of the "
+                                     "arguments requires grad or is a forward-mode dual tensor. Either pass "
+                                     "out=None, or call this under torch.no_grad() with no dual tensors.")
+
+
+def interpret_accumulate_dtype(accumulate_dtype, dtype):
+    # The C++ side reads the dtype off of a tensor, whose values are not used.
+    if accumulate_dtype is None:
+        accumulate_dtype = dtype
+    return torch.empty(0, dtype=accumulate_dtype)
+
+
+def interpret_checkpoint(checkpoint, checkpoint_budget, signature_):
+    # Returns how often the output should be checkpointed along the stream dimension; 0 means that it isn't, and that
+    # the whole of it is saved for the backward pass instead.
+    if checkpoint is None:
+        return 0
+    if checkpoint != "auto":
+        return checkpoint
+    stream_size = signature_.size(0)
+    if checkpoint_budget is not None and signature_.numel() * signature_.element_size() <= checkpoint_budget:
+        return 0
+    # Saving every k-th signature, and then recomputing one segment of length k at a time, means holding about
+    # stream_size / k + k signatures in memory at once. This is minimised at k = sqrt(stream_size). The amount of
+    # recomputation doesn't depend on k: it's always one extra forward pass.
+    return max(1, int(math.ceil(math.sqrt(stream_size))))
+
+
 class _SignatureFunction(autograd.Function):
     @staticmethod
-    def forward(ctx, path, depth, stream, basepoint, inverse, initial, scalar_term):
+    def forward(ctx, path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag, from_increments,
+                batch_first, accumulate_dtype, checkpoint, checkpoint_budget):
 
         ctx.basepoint_is_tensor = isinstance(basepoint, torch.Tensor)
         ctx.initial_is_tensor = isinstance(initial, torch.Tensor)
         basepoint, basepoint_value = interpret_basepoint(basepoint, path.size(-2), path.size(-1), path.dtype,
                                                          path.device)
         initial, initial_value = interpret_initial(initial)
+        accumulate_like = interpret_accumulate_dtype(accumulate_dtype, path.dtype)
 
+        # Every caller has already checked the arguments with _signature_checkargs, so they're not checked again.
         signature_, path_increments = impl.signature_forward(path, depth, stream, basepoint, basepoint_value, inverse,
-                                                             initial, initial_value, scalar_term)
-        ctx.save_for_backward(signature_, path_increments)
+                                                             initial, initial_value, scalar_term, leadlag,
+                                                             from_increments, batch_first, accumulate_like, False,
+                                                             torch.Tensor(), False)
+        checkpoint_every = interpret_checkpoint(checkpoint, checkpoint_budget, signature_) if stream else 0
+        # The inputs are saved (rather than just their values) so that the backward pass is itself differentiable.
+        saved_basepoint = basepoint_value if ctx.basepoint_is_tensor else None
+        saved_initial = initial_value if initial else None
+        if checkpoint_every > 0:
+            # Clone so that we don't hold on to the memory for the whole output.
+            ctx.save_for_backward(signature_[::checkpoint_every].clone(), path_increments, path, saved_basepoint,
+                                  saved_initial)
+        else:
+            ctx.save_for_backward(signature_, path_increments, path, saved_basepoint, saved_initial)
+        if hasattr(ctx, 'save_for_forward'):  # Forward-mode autodifferentiation only exists in newer PyTorch versions
+            ctx.save_for_forward(path_increments, saved_initial)
+        ctx.path_size = path.size()
         ctx.depth = depth
         ctx.stream = stream
         ctx.basepoint = basepoint
         ctx.inverse = inverse
         ctx.initial = initial
         ctx.scalar_term = scalar_term
+        ctx.leadlag = leadlag
+        ctx.from_increments = from_increments
+        ctx.accumulate_like = accumulate_like
+        ctx.checkpoint_every = checkpoint_every
+        # The backward pass uses the same threads as the forward pass, even if it's run outside of the same context.
+        ctx.thread_settings = parallelism.get_settings()
 
         return signature_
 
     @staticmethod
-    @autograd_function.once_differentiable  # Our backward function uses in-place operations for memory efficiency
     def backward(ctx, grad_result):
-        signature_, path_increments = ctx.saved_tensors
+        signature_, path_increments, path, basepoint_value, initial_value = ctx.saved_tensors
+
+        # Computed via another autograd.Function so that the backward pass is itself differentiable.
+        with parallelism.settings(ctx.thread_settings):
+            # noinspection PyUnresolvedReferences
+            grad_path, grad_basepoint, grad_initial = _SignatureBackwardFunction.apply(grad_result, path,
+                                                                                       basepoint_value, initial_value,
+                                                                                       signature_, path_increments,
+                                                                                       ctx.depth, ctx.stream,
+                                                                                       ctx.basepoint, ctx.inverse,
+                                                                                       ctx.initial, ctx.scalar_term,
+                                                                                       ctx.leadlag,
+                                                                                       ctx.from_increments,
+                                                                                       ctx.accumulate_like,
+                                                                                       ctx.checkpoint_every)
+
+        if not ctx.basepoint_is_tensor:
+            grad_basepoint = None
+        if not ctx.initial_is_tensor:
+            grad_initial = None
 
+        return grad_path, None, None, grad_basepoint, None, grad_initial, None, None, None, None, None, None, None
+
+    @staticmethod
+    def jvp(ctx, tangent_path, _depth, _stream, tangent_basepoint, _inverse, tangent_initial, _scalar_term, _leadlag,
+            _from_increments, _batch_first, _accumulate_dtype, _checkpoint, _checkpoint_budget):
+        path_increments, initial_value = ctx.saved_tensors
+
+        if tangent_path is None:
+            tangent_path = torch.zeros(ctx.path_size, dtype=path_increments.dtype, device=path_increments.device)
+        if not ctx.basepoint:
+            tangent_basepoint = torch.Tensor()
+        elif tangent_basepoint is None:
+            tangent_basepoint = torch.zeros(ctx.path_size[-2:], dtype=path_increments.dtype,
+                                            device=path_increments.device)
+        if not ctx.initial:
+            initial_value = torch.Tensor()
+            tangent_initial = torch.Tensor()
+        elif tangent_initial is None:
+            tangent_initial = torch.zeros_like(initial_value)
+
+        return impl.signature_jvp(path_increments, tangent_path, tangent_basepoint, initial_value, tangent_initial,
+                                  ctx.depth, ctx.stream, ctx.basepoint, ctx.inverse, ctx.initial, ctx.scalar_term,
+                                  ctx.leadlag, ctx.from_increments, ctx.accumulate_like)
+
+
+class _SignatureBackwardFunction(autograd.Function):
+    @staticmethod
+    def forward(ctx, grad_result, path, basepoint_value, initial_value, signature_, path_increments, depth, stream,
+                basepoint, inverse, initial, scalar_term, leadlag, from_increments, accumulate_like, checkpoint_every):
+        # 'path', 'basepoint_value' and 'initial_value' are only passed so that autograd knows that the output depends
+        # on them. (Their values are already encoded in 'signature_' and 'path_increments'.)
         grad_path, grad_basepoint, grad_initial = impl.signature_backward(grad_result, signature_, path_increments,
-                                                                          ctx.depth, ctx.stream, ctx.basepoint,
-                                                                          ctx.inverse, ctx.initial, ctx.scalar_term)
+                                                                          depth, stream, basepoint, inverse, initial,
+                                                                          scalar_term, leadlag, from_increments,
+                                                                          accumulate_like, checkpoint_every)
+
+        ctx.basepoint_is_tensor = basepoint_value is not None
+        ctx.initial_is_tensor = initial_value is not None
+        if initial_value is None:
+            initial_value = torch.Tensor()
+        ctx.save_for_backward(grad_result, path_increments, initial_value)
+        ctx.depth = depth
+        ctx.stream = stream
+        ctx.basepoint = basepoint
+        ctx.inverse = inverse
+        ctx.initial = initial
+        ctx.scalar_term = scalar_term
+        ctx.leadlag = leadlag
+        ctx.from_increments = from_increments
+        ctx.accumulate_like = accumulate_like
+        ctx.path_size = path.size()
+        ctx.thread_settings = parallelism.get_settings()
+
+        return grad_path, grad_basepoint, grad_initial
+
+    @staticmethod
+    @autograd_function.once_differentiable
+    def backward(ctx, grad_grad_path, grad_grad_basepoint, grad_grad_initial):
+        grad_result, path_increments, initial_value = ctx.saved_tensors
+
+        # The gradients through the outputs of the forward pass are perturbations to the inputs of the signature; we
+        # compute the corresponding perturbation to the signature, and the Hessian-vector products.
+        if grad_grad_path is None:
+            grad_grad_path = torch.zeros(ctx.path_size, dtype=grad_result.dtype, device=grad_result.device)
+        if not ctx.basepoint:
+            grad_grad_basepoint = torch.Tensor()
+        elif grad_grad_basepoint is None or not ctx.basepoint_is_tensor:
+            grad_grad_basepoint = torch.zeros(ctx.path_size[-2:], dtype=grad_result.dtype, device=grad_result.device)
+        if not ctx.initial:
+            grad_grad_initial = torch.Tensor()
+        elif grad_grad_initial is None:
+            grad_grad_initial = torch.zeros_like(initial_value)
+
+        with parallelism.settings(ctx.thread_settings):
+            result = impl.signature_double_backward(grad_result, path_increments, grad_grad_path, grad_grad_basepoint,
+                                                    initial_value, grad_grad_initial, ctx.depth, ctx.stream,
+                                                    ctx.basepoint, ctx.inverse, ctx.initial, ctx.scalar_term,
+                                                    ctx.leadlag, ctx.from_increments, ctx.accumulate_like)
+        tangent_signature, grad_path, grad_basepoint, grad_initial = result
 
         if not ctx.basepoint_is_tensor:
             grad_basepoint = None
         if not ctx.initial_is_tensor:
             grad_initial = None
 
-        return grad_path, None, None, grad_basepoint, None, grad_initial, None, None
+        return (tangent_signature, grad_path, grad_basepoint, grad_initial, None, None, None, None, None, None, None,
+                None, None, None, None, None)
 
 
-def _signature_checkargs(path, depth, basepoint, initial, scalar_term):
-    path = path.transpose(0, 1)  # (batch, stream, channel) to (stream, batch, channel)
+def _signature_function(path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag, from_increments,
+                        batch_first, accumulate_dtype, checkpoint, checkpoint_budget):
+    # As _SignatureFunction.apply, except that if no gradients are needed then autograd is skipped entirely: the C++
+    # forward is called directly and nothing is saved for a backward pass. For small inputs the overhead of going
+    # through autograd.Function is otherwise a large part of the cost.
+    if requires_grad((path, basepoint, initial)):
+        # noinspection PyUnresolvedReferences
+        return _SignatureFunction.apply(path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag,
+                                        from_increments, batch_first, accumulate_dtype, checkpoint, checkpoint_budget)
     basepoint, basepoint_value = interpret_basepoint(basepoint, path.size(-2), path.size(-1), path.dtype, path.device)
     initial, initial_value = interpret_initial(initial)
-    impl.signature_checkargs(path, depth, basepoint, basepoint_value, initial, initial_value, scalar_term)
+    accumulate_like = interpret_accumulate_dtype(accumulate_dtype, path.dtype)
+    # As with _SignatureFunction, every caller has already checked the arguments.
+    signature_, _ = impl.signature_forward(path, depth, stream, basepoint, basepoint_value, inverse, initial,
+                                           initial_value, scalar_term, leadlag, from_increments, batch_first,
+                                           accumulate_like, False, torch.Tensor(), False)
+    return signature_
+
+
+def _signature_checkargs(path, depth, basepoint, initial, scalar_term, leadlag, accumulate_dtype,
+                         from_increments=False, layout='batch'):
+    if layout not in ('batch', 'stream'):
+        raise ValueError("Argument 'layout' must be either 'batch' or 'stream'.")
+    if layout == 'batch':
+        path = path.transpose(0, 1)  # (batch, stream, channel) to (stream, batch, channel)
+    basepoint, basepoint_value = interpret_basepoint(basepoint, path.size(-2), path.size(-1), path.dtype, path.device)
+    initial, initial_value = interpret_initial(initial)
+    impl.signature_checkargs(path, depth, basepoint, basepoint_value, initial, initial_value, scalar_term, leadlag,
+                             from_increments)
+    if accumulate_dtype is not None and not accumulate_dtype.is_floating_point:
+        raise ValueError("Argument 'accumulate_dtype' must be a floating point dtype.")
+
+
+def _signature_checkpoint_checkargs(checkpoint, checkpoint_budget):
+    if checkpoint is not None and checkpoint != "auto":
+        if not isinstance(checkpoint, int) or isinstance(checkpoint, bool) or checkpoint < 1:
+            raise ValueError("Argument 'checkpoint' must be None, 'auto', or a positive integer.")
+    if checkpoint_budget is not None:
+        if checkpoint != "auto":
+            raise ValueError("Argument 'checkpoint_budget' may only be passed if checkpoint='auto'.")
+        if checkpoint_budget < 0:
+            raise ValueError("Argument 'checkpoint_budget' must be nonnegative.")
+
+
+def _signature_shape(batch_size, stream_size, channel_size, depth, stream, basepoint, scalar_term, leadlag,
+                     batch_first):
+    # Returns the shape of the result of a signature computation. 'basepoint' should be a bool.
+    output_channels = signature_channels(2 * channel_size if leadlag else channel_size, depth, scalar_term)
+    if stream:
+        output_stream_size = stream_size - 1
+        if basepoint:
+            output_stream_size += 1
+        if leadlag:
+            output_stream_size *= 2
+        if batch_first:
+            return batch_size, output_stream_size, output_channels
+        else:
+            return output_stream_size, batch_size, output_channels
+    else:
+        return batch_size, output_channels
+
+
+def _signature_out(path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag, batch_first,
+                   accumulate_dtype, out):
+    # Computes the signature directly into 'out', without going via autograd. 'path' should already be in the
+    # (stream, batch, channel) layout.
+    stream_size, batch_size, channel_size = path.shape
+    shape = _signature_shape(batch_size, stream_size, channel_size, depth, stream,
+                             basepoint is True or isinstance(basepoint, torch.Tensor), scalar_term, leadlag,
+                             batch_first)
+    out_checkargs(out, shape, path, (path, basepoint, initial))
+
+    basepoint, basepoint_value = interpret_basepoint(basepoint, batch_size, channel_size, path.dtype, path.device)
+    initial, initial_value = interpret_initial(initial)
+    accumulate_like = interpret_accumulate_dtype(accumulate_dtype, path.dtype)
+    out_, out_value = interpret_out(out)
+    if stream and batch_first:
+        out_value = out_value.transpose(0, 1)  # (batch, stream, channel) to (stream, batch, channel)
+    impl.signature_forward(path, depth, stream, basepoint, basepoint_value, inverse, initial, initial_value,
+                           scalar_term, leadlag, False, batch_first, accumulate_like, out_, out_value, False)
+    return out
 
 
-def _signature_batch_trick(path, depth, stream, basepoint, inverse, initial, scalar_term):
+def _signature_batch_trick(path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag, accumulate_dtype,
+                           force=False):
     if stream:
         # We can't use this trick in this case
         return
 
-    if path.is_cuda:
-        # A somewhat arbitrary limit for the maximum amount we're willing to try and use a GPU to parallelise.
-        # Increasing this value increases the amount of memory we use, but potentially increases speed.
-        threshold = 2048
-    else:
-        if not path.requires_grad:
-            # If we're on the CPU then parallelisation will automatically occur more efficiently than this trick allows.
-            # However that parallelisation will not generate certain intermediate tensors needed to perform an efficient
-            # backward pass (whilst the batch trick does), so we don't use it if we're going to perform a backward
-            # operation.
-            return
-        threshold = torch.get_num_threads()
+    if not path.is_cuda and not force:
+        # If we're on the CPU then parallelisation along the stream will automatically occur, in both the forward and
+        # backward passes, more efficiently than this trick allows. (Typically. The autotuner may discover otherwise,
+        # in which case it forces the trick to be used.)
+        return
+
+    # A somewhat arbitrary limit for the maximum amount we're willing to try and use a GPU to parallelise.
+    # Increasing this value increases the amount of memory we use, but potentially increases speed.
+    threshold = 2048
 
     batch_size, stream_size, channel_size = path.shape
 
@@ -147,9 +459,8 @@ def _signature_batch_trick(path, depth, stream, basepoint, inverse, initial, sca
     path_bulk = path_bulk.reshape(batch_size * mult, reduced_bulk_length, channel_size)
     basepoint = ends.view(batch_size * mult, channel_size)
 
-    # noinspection PyUnresolvedReferences
-    result_bulk = _SignatureFunction.apply(path_bulk.transpose(0, 1), depth, stream, basepoint, inverse, None,
-                                           scalar_term)
+    result_bulk = _signature_function(path_bulk.transpose(0, 1), depth, stream, basepoint, inverse, None, scalar_term,
+                                      leadlag, False, False, accumulate_dtype, None, None)
     result_bulk = result_bulk.view(batch_size, mult, result_bulk.size(-1))
     chunks = []
     if isinstance(initial, torch.Tensor):
@@ -158,16 +469,26 @@ def _signature_batch_trick(path, depth, stream, basepoint, inverse, initial, sca
     if remainder != 0:
         # transpose to go from Python convention of (batch, stream, channel) to autograd/C++ convention of
         # (stream, batch, channel)
-        # noinspection PyUnresolvedReferences
-        result_remainder = _SignatureFunction.apply(path_remainder.transpose(0, 1), depth, stream, basepoint_remainder,
-                                                    inverse, None, scalar_term)
+        result_remainder = _signature_function(path_remainder.transpose(0, 1), depth, stream, basepoint_remainder,
+                                               inverse, None, scalar_term, leadlag, False, False, accumulate_dtype,
+                                               None, None)
         chunks.append(result_remainder)
 
-    return multi_signature_combine(chunks, channel_size, depth, inverse, scalar_term)
+    # The lead-lag transform of the whole path is the concatenation of the lead-lag transforms of each chunk, so this
+    # works in the leadlag case as well.
+    if leadlag:
+        channel_size *= 2
+    if accumulate_dtype is None:
+        return multi_signature_combine(chunks, channel_size, depth, inverse, scalar_term)
+    else:
+        chunks = [chunk.to(accumulate_dtype) for chunk in chunks]
+        result = multi_signature_combine(chunks, channel_size, depth, inverse, scalar_term)
+        return result.to(path.dtype)
 
 
-def signature(path, depth, stream=False, basepoint=False, inverse=False, initial=None, scalar_term=False):
-    # type: (torch.Tensor, int, bool, Union[bool, torch.Tensor], bool, Union[None, torch.Tensor], bool) -> torch.Tensor
+def signature(path, depth, stream=False, basepoint=False, inverse=False, initial=None, scalar_term=False,
+              leadlag=False, accumulate_dtype=None, checkpoint=None, checkpoint_budget=None, layout='batch', out=None):
+    # type: (torch.Tensor, int, bool, Union[bool, torch.Tensor], bool, Union[None, torch.Tensor], bool, bool, Union[None, torch.dtype], Union[None, int, str], Union[None, int], str, Union[None, torch.Tensor]) -> torch.Tensor
 
     r"""Applies the signature transform to a stream of data.
 
@@ -188,6 +509,15 @@ def signature(path, depth, stream=False, basepoint=False, inverse=False, initial
     .. math::
         (N, C + C^2 + \cdots + C^\text{depth}).
 
+    The signature may be differentiated twice, for example to compute Hessian-vector products. This is done by
+    recomputing the signature alongside its derivative during the backward pass, in the same way as the backward pass
+    itself, and so uses about as little memory as the backward pass does. With versions of PyTorch that support
+    forward-mode automatic differentiation (:code:`torch.autograd.forward_ad`), then this is supported as well, and a
+    directional derivative costs about as much as one extra forward pass. (The exception to both of these is that if
+    :attr:`path` is on the GPU and :attr:`stream` is False, then the computation may be split up into pieces which are
+    then put together with :func:`signatory.signature_combine`, which only supports reverse-mode differentiation,
+    once.)
+
     Arguments:
         path (:class:`torch.Tensor`): The batch of input paths to apply the signature transform to.
 
@@ -218,6 +548,56 @@ def signature(path, depth, stream=False, basepoint=False, inverse=False, initial
             be filled with the constant 1 (in accordance with the usual mathematical definition). If False then this
             channel is omitted (in accordance with useful machine learning practice).
 
+        leadlag (bool, optional): Defaults to False. If True then the signature of the lead-lag transform of the path
+            is computed instead. This is the path in :math:`\mathbb{R}^{2C}` given by
+
+            .. math::
+                (x_1, x_1), (x_2, x_1), (x_2, x_2), (x_3, x_2), \ldots, (x_L, x_L),
+
+            whose first :math:`C` channels are the 'lead' and whose last :math:`C` channels are the 'lag'. (If
+            :attr:`basepoint` is passed then it is prepended to the path before the lead-lag transform is applied.)
+            This is computed without ever constructing the lead-lag transformed path, and so is more efficient than
+            applying the lead-lag transform to the path and then computing its signature. If :attr:`stream` is True
+            then the signatures of every prefix of the lead-lag transformed path are returned, so the stream dimension
+            of the result is twice as long. Everywhere else :math:`C` should be replaced with :math:`2C`; in
+            particular the signature has :math:`2C + (2C)^2 + \cdots + (2C)^\text{depth}` channels, and this is the
+            size that :attr:`initial` should have.
+
+        accumulate_dtype (None or :class:`torch.dtype`, optional): Defaults to None. If it is a :class:`torch.dtype`
+            then the running signature is kept in this dtype whilst it is computed, and only the result is converted
+            back to the dtype of :attr:`path`. For example passing :code:`torch.float64` when :attr:`path` is of dtype
+            :code:`torch.float32` greatly reduces the rounding error that builds up over very long streams, without
+            converting the whole path to :code:`torch.float64`. If None then the dtype of :attr:`path` is used.
+
+        checkpoint (None or int or str, optional): Defaults to None. Only used if :attr:`stream` is True, in which
+            case the backward pass normally needs every signature along the stream, i.e. memory proportional to the
+            whole output. If :attr:`checkpoint` is an integer :math:`k` then only every :math:`k`-th of these is saved
+            for the backward pass, and the rest are recomputed one segment of length :math:`k` at a time during the
+            backward pass. This costs roughly one extra forward pass, and means that only about :math:`L / k + k`
+            signatures need to be held in memory at once. Passing a value of :math:`k` at least as large as the
+            length of the stream means that just the first one is saved, and everything is recomputed. Alternatively
+            it may be :code:`"auto"`, in which case :math:`k = \lceil\sqrt{L}\rceil` is used, which minimises the
+            memory used.
+
+        checkpoint_budget (None or int, optional): Defaults to None. May only be passed if :attr:`checkpoint` is
+            :code:`"auto"`. A memory budget, in bytes. If the whole of the output fits within the budget then no
+            checkpointing is performed at all (which is faster), else :code:`checkpoint="auto"` behaves as before.
+
+        layout (str, optional): Defaults to :code:`"batch"`. Either :code:`"batch"` or :code:`"stream"`. If
+            :code:`"stream"` then the batch and stream dimensions of :attr:`path` are swapped over, so that it should
+            be of shape :math:`(L, N, C)`, and likewise so are those of the result if :attr:`stream` is True. This is
+            the layout that the computation is natively performed in. Either way no copy is made of :attr:`path` to
+            change its layout, and if :attr:`stream` is True then the result is contiguous in the requested layout.
+            (The shapes of :attr:`basepoint` and :attr:`initial`, and of the result if :attr:`stream` is False, are
+            unaffected.)
+
+        out (None or :class:`torch.Tensor`, optional): Defaults to None. If it is a :class:`torch.Tensor` then the
+            result is written into it, and it is returned, rather than new memory being allocated for the result. It
+            must have the same shape as the result, and the same dtype and device as :attr:`path`. It need not be
+            contiguous, and may for example be a slice of a larger buffer, or a memory-mapped tensor. As with
+            PyTorch's own :code:`out=` arguments this does not support automatic differentiation, so none of the
+            inputs may require gradients unless this is called under :code:`torch.no_grad()`.
+
     Returns:
         A :class:`torch.Tensor`. Given an input :class:`torch.Tensor` of shape :math:`(N, L, C)`, and input arguments
         :attr:`depth`, :attr:`basepoint`, :attr:`stream`, then the return value is, in pseudocode:
@@ -243,19 +623,551 @@ def signature(path, depth, stream=False, basepoint=False, inverse=False, initial
                       "    https://signatory.readthedocs.io/en/latest/pages/examples/online.html\n"
                       "for more information.")
 
-    _signature_checkargs(path, depth, basepoint, initial, scalar_term)
-
-    result = _signature_batch_trick(path, depth, stream, basepoint, inverse, initial, scalar_term)
+    _signature_checkargs(path, depth, basepoint, initial, scalar_term, leadlag, accumulate_dtype, layout=layout)
+    _signature_checkpoint_checkargs(checkpoint, checkpoint_budget)
+
+    batch_first = layout == 'batch'
+    if out is not None:
+        if batch_first:
+            path = path.transpose(0, 1)  # (batch, stream, channel) to (stream, batch, channel)
+        # No batch trick, as that would allocate memory for the result anyway.
+        return _signature_out(path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag, batch_first,
+                              accumulate_dtype, out)
+
+    if not autotuning.is_enabled():
+        return _signature(path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag, batch_first,
+                          accumulate_dtype, checkpoint, checkpoint_budget, batch_trick=None)
+
+    def run(plan):
+        with parallelism.thread_plan(plan[:2]):
+            return _signature(path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag, batch_first,
+                              accumulate_dtype, checkpoint, checkpoint_budget, batch_trick=plan.batch_trick)
+
+    batch_size, stream_size = (path.size(0), path.size(1)) if batch_first else (path.size(1), path.size(0))
+    grad = requires_grad((path, basepoint, initial))
+    plan = autotuning.choose(run, batch_size, stream_size, path.size(-1), depth, path.dtype, path.device, grad, stream,
+                             basepoint is not False, inverse, initial is not None, scalar_term, leadlag,
+                             accumulate_dtype, '{}/{}'.format(checkpoint, checkpoint_budget), layout,
+                             batch_trick=batch_first and not stream)
+    return run(plan)
+
+
+def _signature(path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag, batch_first, accumulate_dtype,
+               checkpoint, checkpoint_budget, batch_trick):
+    # batch_trick may be None to use the batch trick only where it's expected to help, or True or False to force
+    # whether it's used (where possible).
+    result = None
+    # The batch trick needs to reshape the path, which would mean a copy if it isn't batch-major.
+    if batch_first and batch_trick is not False:
+        result = _signature_batch_trick(path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag,
+                                        accumulate_dtype, force=batch_trick is True)
     if result is None:  # Either because we disabled use of the batch trick, or because the batch trick doesn't apply
-        result = _SignatureFunction.apply(path.transpose(0, 1), depth, stream, basepoint, inverse, initial, scalar_term)
+        if batch_first:
+            path = path.transpose(0, 1)  # (batch, stream, channel) to (stream, batch, channel); no copy is made
+        result = _signature_function(path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag, False,
+                                     batch_first, accumulate_dtype, checkpoint, checkpoint_budget)
 
     # We have to do the transpose outside of autograd.Function.apply to avoid PyTorch bug 24413
-    if stream:
+    if stream and batch_first:
         # NOT .transpose_ - the underlying TensorImpl (in C++) is used elsewhere and we don't want to change it.
+        # The result was laid out in memory so that this is contiguous.
         result = result.transpose(0, 1)
     return result
 
 
+def signature_from_increments(increments, depth, stream=False, inverse=False, initial=None, scalar_term=False,
+                              leadlag=False, accumulate_dtype=None, checkpoint=None, checkpoint_budget=None,
+                              layout='batch'):
+    # type: (torch.Tensor, int, bool, bool, Union[None, torch.Tensor], bool, bool, Union[None, torch.dtype], Union[None, int, str], Union[None, int], str) -> torch.Tensor
+    r"""Applies the signature transform to a stream of data, given by its increments rather than its values.
+
+    That is, :code:`signatory.signature_from_increments(increments, depth, ...)` computes the same thing as
+
+    .. code-block:: python
+
+        path = increments.cumsum(dim=1)
+        signatory.signature(path, depth, basepoint=True, ...)
+
+    but without ever constructing :code:`path`: the increments are used by the signature computation directly. This
+    saves both memory and time if the data is naturally described by its increments (for example returns, or
+    differences), and gradients are returned with respect to the increments directly.
+
+    Arguments:
+        increments (:class:`torch.Tensor`): The batch of increments of the input paths, of shape :math:`(N, L, C)`.
+            Each batch element is interpreted as the path whose :math:`i`-th increment is :code:`increments[:, i]`.
+            Unlike :func:`signatory.signature`, :math:`L = 1` is allowed, as this is already a straight line.
+
+        depth (int): As :func:`signatory.signature`.
+
+        stream (bool, optional): As :func:`signatory.signature`. If True then the signatures of the paths given by
+            the first :math:`j` increments, for :math:`j = 1, \ldots, L`, are returned.
+
+        inverse (bool, optional): As :func:`signatory.signature`.
+
+        initial (None or :class:`torch.Tensor`, optional): As :func:`signatory.signature`.
+
+        scalar_term (bool, optional): As :func:`signatory.signature`.
+
+        leadlag (bool, optional): As :func:`signatory.signature`. The lead-lag transform is taken of the path
+            described by the increments, starting from zero.
+
+        accumulate_dtype (None or :class:`torch.dtype`, optional): As :func:`signatory.signature`.
+
+        checkpoint (None or int or str, optional): As :func:`signatory.signature`.
+
+        checkpoint_budget (None or int, optional): As :func:`signatory.signature`.
+
+        layout (str, optional): As :func:`signatory.signature`.
+
+    Returns:
+        A :class:`torch.Tensor`, of shape :math:`(N, L, C + C^2 + \cdots + C^\text{depth})` if :attr:`stream` is True,
+        and of shape :math:`(N, C + C^2 + \cdots + C^\text{depth})` if :attr:`stream` is False.
+    """
+
+    _signature_checkargs(increments, depth, False, initial, scalar_term, leadlag, accumulate_dtype,
+                         from_increments=True, layout=layout)
+    _signature_checkpoint_checkargs(checkpoint, checkpoint_budget)
+
+    batch_first = layout == 'batch'
+    if batch_first:
+        increments = increments.transpose(0, 1)  # (batch, stream, channel) to (stream, batch, channel)
+    # No batch trick here: it works by splitting the path up into pieces with basepoints, which is precisely what
+    # we're avoiding computing.
+    result = _signature_function(increments, depth, stream, False, inverse, initial, scalar_term, leadlag, True,
+                                 batch_first, accumulate_dtype, checkpoint, checkpoint_budget)
+
+    # We have to do the transpose outside of autograd.Function.apply to avoid PyTorch bug 24413
+    if stream and batch_first:
+        # NOT .transpose_ - the underlying TensorImpl (in C++) is used elsewhere and we don't want to change it.
+        result = result.transpose(0, 1)
+    return result
+
+
+class _RaggedSignatureFunction(autograd.Function):
+    @staticmethod
+    def forward(ctx, increments, batch_sizes, depth, stream, inverse, scalar_term):
+        signature_ = impl.ragged_signature_forward(increments, batch_sizes, depth, stream, inverse, scalar_term)
+        ctx.save_for_backward(signature_, increments)
+        ctx.batch_sizes = batch_sizes
+        ctx.depth = depth
+        ctx.stream = stream
+        ctx.inverse = inverse
+        ctx.scalar_term = scalar_term
+
+        return signature_
+
+    @staticmethod
+    @autograd_function.once_differentiable  # Our backward function uses in-place operations for memory efficiency
+    def backward(ctx, grad_result):
+        signature_, increments = ctx.saved_tensors
+
+        grad_increments = impl.ragged_signature_backward(grad_result, signature_, increments, ctx.batch_sizes,
+                                                         ctx.depth, ctx.stream, ctx.inverse, ctx.scalar_term)
+
+        return grad_increments, None, None, None, None, None
+
+
+def _ragged_signature_checkargs(path, lengths, offsets, basepoint):
+    if (lengths is None) == (offsets is None):
+        raise ValueError("Precisely one of the arguments 'lengths' and 'offsets' must be passed.")
+    if lengths is not None:
+        if path.ndimension() != 3:
+            raise ValueError("Argument 'path' must be a 3-dimensional tensor, with dimensions corresponding to (batch, "
+                             "stream, channel) respectively, when argument 'lengths' is passed.")
+        if lengths.ndimension() != 1 or lengths.size(0) != path.size(0):
+            raise ValueError("Argument 'lengths' must be a 1-dimensional tensor, with one entry for each batch "
+                             "element of 'path'.")
+        if (lengths > path.size(1)).any():
+            raise ValueError("Argument 'lengths' cannot have entries larger than the stream dimension of 'path'.")
+    else:
+        if path.ndimension() != 2:
+            raise ValueError("Argument 'path' must be a 2-dimensional tensor, with dimensions corresponding to "
+                             "(packed stream, channel) respectively, when argument 'offsets' is passed.")
+        if offsets.ndimension() != 1 or offsets.size(0) < 2:
+            raise ValueError("Argument 'offsets' must be a 1-dimensional tensor with at least two entries.")
+        if offsets[0] != 0 or offsets[-1] != path.size(0):
+            raise ValueError("Argument 'offsets' must start at zero and end at the size of the packed stream "
+                             "dimension of 'path'.")
+    if isinstance(basepoint, torch.Tensor):
+        if basepoint.ndimension() != 2:
+            raise ValueError("Argument 'basepoint' must be a 2-dimensional tensor, corresponding to (batch, channel) "
+                             "respectively.")
+        batch_size = lengths.size(0) if lengths is not None else offsets.size(0) - 1
+        if basepoint.size(0) != batch_size or basepoint.size(1) != path.size(-1):
+            raise ValueError("Arguments 'basepoint' and 'path' must have dimensions of the same size.")
+
+
+def _ragged_increments(path, lengths, offsets, basepoint, inverse):
+    """Computes the path increments of a ragged batch of paths, packed in the time-major order expected by
+    impl.ragged_signature_forward, with batch elements sorted by length, longest first. Only the increments actually
+    needed are computed: no work is done on any padding.
+
+    Returns a tuple of the packed increments, the list of batch sizes at each step, the sort order of the batch
+    elements, the number of increments in each batch element, and for each packed increment, the step it is at and the
+    (unsorted) batch element it belongs to.
+    """
+    device = path.device
+    channel_size = path.size(-1)
+    if lengths is not None:
+        batch_size, stream_size = path.shape[:2]
+        lengths = lengths.to(device=device, dtype=torch.int64)
+        points = path.reshape(batch_size * stream_size, channel_size)
+        starts = torch.arange(batch_size, device=device) * stream_size
+    else:
+        batch_size = offsets.size(0) - 1
+        offsets = offsets.to(device=device, dtype=torch.int64)
+        lengths = offsets[1:] - offsets[:-1]
+        points = path
+        starts = offsets[:-1]
+
+    use_basepoint = basepoint is True or isinstance(basepoint, torch.Tensor)
+    num_increments = lengths if use_basepoint else lengths - 1
+    if (num_increments < 1).any():
+        raise ValueError("Every path must have at least two points. (Need at least this many points to define a "
+                         "path.) If a basepoint is used then every path must have at least one point.")
+
+    # Sort by length, longest first, so that at every step the batch elements that still have increments are a prefix
+    # of the batch.
+    order = torch.argsort(num_increments, descending=True)
+    sorted_num_increments = num_increments[order]
+    num_steps = int(sorted_num_increments[0])
+    # batch_sizes[step] is the number of batch elements with more than 'step' increments
+    counts = torch.bincount(sorted_num_increments, minlength=num_steps + 1)
+    batch_sizes = batch_size - torch.cumsum(counts, dim=0)[:num_steps]
+    step_offsets = torch.cumsum(batch_sizes, dim=0) - batch_sizes
+
+    # For each packed increment, which step it is at and which (sorted) batch element it belongs to.
+    step_of_row = torch.repeat_interleave(torch.arange(num_steps, device=device), batch_sizes)
+    total = step_of_row.size(0)
+    batch_of_row = torch.arange(total, device=device) - step_offsets[step_of_row]
+    original_batch_of_row = order[batch_of_row]
+
+    def difference(later, earlier):
+        return earlier - later if inverse else later - earlier
+
+    # 'upper' indexes into 'points', giving the point at the end of each increment.
+    if use_basepoint:
+        upper = starts[original_batch_of_row] + step_of_row
+        if basepoint is True:
+            basepoint = torch.zeros(batch_size, channel_size, dtype=path.dtype, device=device)
+        # Every batch element has at least one increment, so the first batch_size rows are the first increment of
+        # every batch element, which starts at its basepoint. These are computed directly, rather than copying the
+        # whole path to append the basepoints to it.
+        increments = torch.empty(total, channel_size, dtype=path.dtype, device=device)
+        increments[:batch_size] = difference(points.index_select(0, upper[:batch_size]),
+                                             basepoint.index_select(0, order))
+        upper = upper[batch_size:]
+        increments[batch_size:] = difference(points.index_select(0, upper), points.index_select(0, upper - 1))
+    else:
+        upper = starts[original_batch_of_row] + step_of_row + 1
+        increments = difference(points.index_select(0, upper), points.index_select(0, upper - 1))
+    return increments, batch_sizes.tolist(), order, num_increments, step_of_row, original_batch_of_row
+
+
+def ragged_signature(path, depth, lengths=None, offsets=None, stream=False, basepoint=False, inverse=False,
+                     scalar_term=False):
+    # type: (torch.Tensor, int, Union[None, torch.Tensor], Union[None, torch.Tensor], bool, Union[bool, torch.Tensor], bool, bool) -> torch.Tensor
+    r"""Applies the signature transform to a batch of streams of data of different lengths.
+
+    The batch may either be given padded, as a tensor of shape :math:`(N, L, C)` together with the argument
+    :attr:`lengths`, or packed, as a tensor of shape :math:`(T, C)` together with the argument :attr:`offsets`.
+    Either way, the signature of each batch element is computed over just its own stream: no work is done on any
+    padding, in either the forward or backward pass.
+
+    Arguments:
+        path (:class:`torch.Tensor`): The batch of input paths to apply the signature transform to. Either of shape
+            :math:`(N, L, C)`, if :attr:`lengths` is passed, or of shape :math:`(T, C)`, if :attr:`offsets` is passed.
+
+        depth (int): As :func:`signatory.signature`.
+
+        lengths (None or :class:`torch.Tensor`, optional): A tensor of integers of shape :math:`(N,)`, specifying the
+            length of the stream of each batch element. Batch element :code:`i` is then :code:`path[i, :lengths[i]]`.
+
+        offsets (None or :class:`torch.Tensor`, optional): A tensor of integers of shape :math:`(N + 1,)`, with
+            :code:`offsets[0] == 0` and :code:`offsets[-1] == T`. Batch element :code:`i` is then
+            :code:`path[offsets[i]:offsets[i + 1]]`. Precisely one of :attr:`lengths` and :attr:`offsets` must be passed.
+
+        stream (bool, optional): As :func:`signatory.signature`.
+
+        basepoint (bool or :class:`torch.Tensor`, optional): As :func:`signatory.signature`.
+
+        inverse (bool, optional): As :func:`signatory.signature`.
+
+        scalar_term (bool, optional): As :func:`signatory.signature`.
+
+    Returns:
+        If :attr:`stream` is False then a :class:`torch.Tensor` of shape :math:`(N, C + C^2 + \cdots + C^\text{depth})`,
+        whose :code:`i`-th element is the signature of the :code:`i`-th batch element.
+
+        If :attr:`stream` is True then a packed :class:`torch.Tensor` of shape
+        :math:`(T', C + C^2 + \cdots + C^\text{depth})`. This is equal to the concatenation along the first dimension
+        of :code:`signatory.signature(path_i, depth, stream=True, ...)[0]` for every batch element :code:`path_i`,
+        where :math:`T'` is the sum of their lengths.
+    """
+    _ragged_signature_checkargs(path, lengths, offsets, basepoint)
+    if depth < 1:
+        raise ValueError("Argument 'depth' must be an integer greater than or equal to one.")
+
+    (increments, batch_sizes, order, num_increments, step_of_row,
+     original_batch_of_row) = _ragged_increments(path, lengths, offsets, basepoint, inverse)
+
+    result = _RaggedSignatureFunction.apply(increments, batch_sizes, depth, stream, inverse, scalar_term)
+
+    # Undo the sorting and packing
+    if stream:
+        starts = torch.cumsum(num_increments, dim=0) - num_increments
+        unpacked_index = torch.empty_like(step_of_row)
+        unpacked_index[starts[original_batch_of_row] + step_of_row] = torch.arange(step_of_row.size(0),
+                                                                                  device=step_of_row.device)
+        result = result.index_select(0, unpacked_index)
+    else:
+        result = result.index_select(0, torch.argsort(order))
+    return result
+
+
+class _ProjectedSignatureFunction(autograd.Function):
+    @staticmethod
+    def forward(ctx, path, depth, words, prefixes, lengths, basepoint):
+        ctx.basepoint_is_tensor = isinstance(basepoint, torch.Tensor)
+        basepoint, basepoint_value = interpret_basepoint(basepoint, path.size(-2), path.size(-1), path.dtype,
+                                                         path.device)
+
+        values, path_increments = impl.projected_signature_forward(path, depth, words, prefixes, lengths, basepoint,
+                                                                   basepoint_value)
+        ctx.save_for_backward(values, path_increments, words, prefixes, lengths)
+        ctx.depth = depth
+        ctx.basepoint = basepoint
+
+        return values
+
+    @staticmethod
+    @autograd_function.once_differentiable  # Our backward function uses in-place operations for memory efficiency
+    def backward(ctx, grad_result):
+        values, path_increments, words, prefixes, lengths = ctx.saved_tensors
+
+        grad_path, grad_basepoint = impl.projected_signature_backward(grad_result, values, path_increments, ctx.depth,
+                                                                      words, prefixes, lengths, ctx.basepoint)
+
+        if not ctx.basepoint_is_tensor:
+            grad_basepoint = None
+
+        return grad_path, None, None, None, None, grad_basepoint
+
+
+def _projected_signature_words(words, channels):
+    """Finds the collection of every prefix of every word in :attr:`words`, as the coefficients of these are what must
+    be computed, in the format expected by impl.projected_signature_forward. Also returns the position of every word
+    in :attr:`words` within that collection."""
+
+    words = [tuple(word) for word in words]
+    if len(words) == 0:
+        raise ValueError("Argument 'words' must contain at least one word.")
+    for word in words:
+        if len(word) == 0:
+            raise ValueError("Argument 'words' cannot contain the empty word.")
+        for letter in word:
+            if not 0 <= letter < channels:
+                raise ValueError("Argument 'words' must only contain letters in the range 0, ..., channels - 1.")
+
+    all_prefixes = set(word[:length] for word in words for length in range(1, len(word) + 1))
+    all_prefixes = sorted(all_prefixes, key=lambda word: (len(word), word))
+    position = {word: index for index, word in enumerate(all_prefixes)}
+    depth = len(all_prefixes[-1])
+
+    padded_words = []
+    prefixes = []
+    for word in all_prefixes:
+        padding = [0] * (depth - len(word))
+        padded_words.append(list(word) + padding)
+        prefixes.append([position[word[:length]] for length in range(1, len(word) + 1)] + padding)
+    padded_words = torch.tensor(padded_words, dtype=torch.int64)
+    prefixes = torch.tensor(prefixes, dtype=torch.int64)
+    lengths = torch.tensor([len(word) for word in all_prefixes], dtype=torch.int64)
+    indices = torch.tensor([position[word] for word in words], dtype=torch.int64)
+    return depth, padded_words, prefixes, lengths, indices
+
+
+def projected_signature(path, words, basepoint=False):
+    # type: (torch.Tensor, List[List[int]], Union[bool, torch.Tensor]) -> torch.Tensor
+    r"""Computes just some of the coefficients of the signature transform of a stream of data.
+
+    Each coefficient of the signature corresponds to a word in the channels of the path; see
+    :func:`signatory.all_words`. This computes the coefficients for just the words in :attr:`words`, without computing
+    the rest of the signature. The time and memory taken scale with the total number of distinct prefixes of the
+    requested words, rather than with the size of the whole signature, which makes this much cheaper than calling
+    :func:`signatory.signature` and then selecting the desired channels, if only a few coefficients are desired.
+
+    Arguments:
+        path (:class:`torch.Tensor`): As :func:`signatory.signature`.
+
+        words (list of list of int): The words whose coefficients should be computed. Each word should be a nonempty
+            sequence of integers in the range :math:`0 \leq i < C`, for example as produced by
+            :func:`signatory.all_words`.
+
+        basepoint (bool or :class:`torch.Tensor`, optional): As :func:`signatory.signature`.
+
+    Returns:
+        A :class:`torch.Tensor` of shape :math:`(N, \text{len}(\text{words}))`. Given :code:`words = all_words(C,
+        depth)` then this is equal to :code:`signatory.signature(path, depth)`.
+    """
+
+    depth, words_, prefixes, lengths, indices = _projected_signature_words(words, path.size(-1))
+    device = path.device
+    # transpose to go from Python convention of (batch, stream, channel) to autograd/C++ convention of
+    # (stream, batch, channel)
+    result = _ProjectedSignatureFunction.apply(path.transpose(0, 1), depth, words_.to(device), prefixes.to(device),
+                                               lengths.to(device), basepoint)
+    return result.index_select(-1, indices.to(device))
+
+
+def _sliding_signature_checkargs(path, depth, window, stride):
+    _signature_checkargs(path, depth, False, None, False, False, None)
+    if window < 2:
+        raise ValueError("Argument 'window' must be an integer greater than or equal to two. (Need at least this many "
+                         "points to define a path.)")
+    if window > path.size(1):
+        raise ValueError("Argument 'window' cannot be larger than the stream dimension of 'path'.")
+    if stride < 1:
+        raise ValueError("Argument 'stride' must be an integer greater than or equal to one.")
+
+
+def sliding_signature(path, depth, window, stride=1):
+    # type: (torch.Tensor, int, int, int) -> torch.Tensor
+    r"""Computes the signature transform over every window of a stream of data.
+
+    The windows are the subpaths :math:`(x_{a + 1}, \ldots, x_{a + \text{window}})` for
+    :math:`a = 0, \text{stride}, 2 \cdot \text{stride}, \ldots`, for as long as they fit inside the path.
+
+    This reuses the work shared between overlapping windows, and so is much faster than computing the signature of
+    each window separately. The stream is split into blocks of :code:`window - 1` increments, and the signature of
+    every prefix and every suffix of every block is computed. Every window then covers the end of one block and the
+    start of the next, so its signature is given by a single :func:`signatory.signature_combine`. (This is the same
+    idea as a queue implemented with two stacks.) The total cost is about that of two signatures of the whole path,
+    plus one combination per window, however much the windows overlap.
+
+    Arguments:
+        path (:class:`torch.Tensor`): As :func:`signatory.signature`.
+
+        depth (int): As :func:`signatory.signature`.
+
+        window (int): The number of points in each window. Must be at least two.
+
+        stride (int, optional): Defaults to 1. How far apart the start of each window is.
+
+    Returns:
+        A :class:`torch.Tensor` of shape :math:`(N, W, C + C^2 + \cdots + C^\text{depth})`, where
+        :math:`W = \lfloor (L - \text{window}) / \text{stride} \rfloor + 1` is the number of windows. It is equal to
+        :code:`torch.stack([signatory.signature(path[:, a:a + window], depth) for a in range(0, L - window + 1,
+        stride)], dim=1)`.
+    """
+
+    _sliding_signature_checkargs(path, depth, window, stride)
+
+    batch_size, stream_size, channel_size = path.shape
+    num_windows = (stream_size - window) // stride + 1
+    block = window - 1
+
+    if block <= 2 * stride:
+        # The windows overlap so little that there's little work to reuse, so just compute every window directly.
+        windows = path.unfold(1, window, stride)  # (batch, num_windows, channel, window)
+        windows = windows.transpose(-1, -2).reshape(batch_size * num_windows, window, channel_size)
+        return signature(windows, depth).view(batch_size, num_windows, -1)
+
+    # Pad the path with copies of its final point (i.e. zero increments) until it is an exact number of blocks long.
+    num_blocks = -(-(stream_size - 1) // block)
+    padding = num_blocks * block + 1 - stream_size
+    if padding != 0:
+        path = torch.cat([path, path[:, -1:].expand(batch_size, padding, channel_size)], dim=1)
+    # Consecutive blocks share their boundary point.
+    blocks = path.unfold(1, block + 1, block)  # (batch, num_blocks, channel, block + 1)
+    blocks = blocks.transpose(-1, -2).reshape(batch_size * num_blocks, block + 1, channel_size)
+
+    # prefixes[:, p - 1] is the signature from the start of the block containing point p, up to point p.
+    prefixes = signature(blocks, depth, stream=True)
+    prefixes = prefixes.reshape(batch_size, num_blocks * block, -1)
+    # suffixes[:, p] is the signature from point p to the end of the block containing it. The inverse signature of the
+    # reversed path is the signature of the original path, and stream=True gives it for every suffix.
+    suffixes = signature(blocks.flip(-2), depth, stream=True, inverse=True).flip(-2)
+    suffixes = suffixes.reshape(batch_size, num_blocks * block, -1)
+    signature_channels_ = suffixes.size(-1)
+
+    starts = torch.arange(num_windows, device=path.device) * stride
+    # Windows starting at the start of a block are just that whole block.
+    result = suffixes.index_select(1, starts)
+    unaligned = (starts % block != 0).nonzero().squeeze(-1)
+    if unaligned.size(0) != 0:
+        unaligned_starts = starts.index_select(0, unaligned)
+        heads = suffixes.index_select(1, unaligned_starts).reshape(-1, signature_channels_)
+        tails = prefixes.index_select(1, unaligned_starts + block - 1).reshape(-1, signature_channels_)
+        combined = signature_combine(heads, tails, channel_size, depth)
+        result = result.index_copy(1, unaligned, combined.view(batch_size, -1, signature_channels_))
+    return result
+
+
+def _signature_pyramid_checkargs(path, depth, levels):
+    _signature_checkargs(path, depth, False, None, False, False, None)
+    if levels < 1:
+        raise ValueError("Argument 'levels' must be an integer greater than or equal to one.")
+    if path.size(1) - 1 < 2 ** (levels - 1):
+        raise ValueError("Argument 'path' must have at least 2 ** (levels - 1) + 1 points along its stream dimension, "
+                         "so that every interval of the finest level contains at least one increment.")
+
+
+def signature_pyramid(path, depth, levels):
+    # type: (torch.Tensor, int, int) -> List[torch.Tensor]
+    r"""Computes the signature transform over every dyadic interval of a stream of data, down to some level.
+
+    Level :math:`0` is the whole path. Level :math:`k` splits the path into :math:`2^k` intervals, by splitting every
+    interval of level :math:`k - 1` in half. (If the number of increments :math:`L - 1` is not divisible by
+    :math:`2^k` then the :math:`j`-th interval ends at point :math:`\lfloor j (L - 1) / 2^k \rfloor`.)
+
+    Only the signatures of the finest level are computed from the path, in a single call. Every coarser level is then
+    computed from the level below it by combining pairs of signatures with :func:`signatory.signature_combine`, with
+    all of the pairs of a level being combined together.
+
+    Arguments:
+        path (:class:`torch.Tensor`): As :func:`signatory.signature`.
+
+        depth (int): As :func:`signatory.signature`.
+
+        levels (int): The number of levels to compute. The path must have at least :code:`2 ** (levels - 1)`
+            increments.
+
+    Returns:
+        A list of :attr:`levels` many :class:`torch.Tensor` s. The :math:`k`-th one is of shape
+        :math:`(N, 2^k, C + C^2 + \cdots + C^\text{depth})`, and gives the signatures of the intervals of level
+        :math:`k`, in order.
+    """
+
+    _signature_pyramid_checkargs(path, depth, levels)
+
+    batch_size, stream_size, channel_size = path.shape
+    device = path.device
+    num_leaves = 2 ** (levels - 1)
+
+    # The points at which each leaf starts and ends.
+    boundaries = (torch.arange(num_leaves + 1, device=device) * (stream_size - 1)) // num_leaves
+    starts = boundaries[:-1]
+    ends = boundaries[1:]
+    # Leaves may differ in length by one, so shorter leaves are padded with copies of their final point. This is a zero
+    # increment, which doesn't change the signature.
+    leaf_size = int((ends - starts).max()) + 1
+    indices = starts.unsqueeze(-1) + torch.arange(leaf_size, device=device)
+    indices = torch.min(indices, ends.unsqueeze(-1))
+    leaves = path.index_select(1, indices.view(-1)).view(batch_size * num_leaves, leaf_size, channel_size)
+
+    level = signature(leaves, depth).view(batch_size, num_leaves, -1)
+    signature_channels_ = level.size(-1)
+    result = [level]
+    for _ in range(levels - 1):
+        left = level[:, 0::2].reshape(-1, signature_channels_)
+        right = level[:, 1::2].reshape(-1, signature_channels_)
+        level = signature_combine(left, right, channel_size, depth).view(batch_size, -1, signature_channels_)
+        result.append(level)
+    result.reverse()
+    return result
+
+
 class Signature(nn.Module):
     """:class:`torch.nn.Module` wrapper around the :func:`signatory.signature` function.
 
@@ -267,18 +1179,34 @@ class Signature(nn.Module):
         inverse (bool, optional): as :func:`signatory.signature`.
 
         scalar_term (bool, optional): as :func:`signatory.signature`.
+
+        leadlag (bool, optional): as :func:`signatory.signature`.
+
+        accumulate_dtype (None or :class:`torch.dtype`, optional): as :func:`signatory.signature`.
+
+        checkpoint (None or int or str, optional): as :func:`signatory.signature`.
+
+        checkpoint_budget (None or int, optional): as :func:`signatory.signature`.
+
+        layout (str, optional): as :func:`signatory.signature`.
     """
 
-    def __init__(self, depth, stream=False, inverse=False, scalar_term=False, **kwargs):
-        # type: (int, bool, bool, bool, **Any) -> None
+    def __init__(self, depth, stream=False, inverse=False, scalar_term=False, leadlag=False, accumulate_dtype=None,
+                 checkpoint=None, checkpoint_budget=None, layout='batch', **kwargs):
+        # type: (int, bool, bool, bool, bool, Union[None, torch.dtype], Union[None, int, str], Union[None, int], str, **Any) -> None
         super(Signature, self).__init__(**kwargs)
         self.depth = depth
         self.stream = stream
         self.inverse = inverse
         self.scalar_term = scalar_term
-
-    def forward(self, path, basepoint=False, initial=None):
-        # type: (torch.Tensor, Union[bool, torch.Tensor], Union[None, torch.Tensor]) -> torch.Tensor
+        self.leadlag = leadlag
+        self.accumulate_dtype = accumulate_dtype
+        self.checkpoint = checkpoint
+        self.checkpoint_budget = checkpoint_budget
+        self.layout = layout
+
+    def forward(self, path, basepoint=False, initial=None, out=None):
+        # type: (torch.Tensor, Union[bool, torch.Tensor], Union[None, torch.Tensor], Union[None, torch.Tensor]) -> torch.Tensor
         """The forward operation.
 
         Arguments:
@@ -288,15 +1216,112 @@ class Signature(nn.Module):
 
             initial (None or :class:`torch.Tensor`, optional): As :func:`signatory.signature`.
 
+            out (None or :class:`torch.Tensor`, optional): As :func:`signatory.signature`.
+
         Returns:
             As :func:`signatory.signature`.
         """
+        if torch.jit.is_scripting():
+            return self._forward_op(path, basepoint, initial, out)
+        else:
+            return self._forward(path, basepoint, initial, out)
+
+    @torch.jit.unused
+    def _forward(self, path, basepoint, initial, out):
+        # type: (torch.Tensor, Union[bool, torch.Tensor], Optional[torch.Tensor], Optional[torch.Tensor]) -> torch.Tensor
+        if is_compiling():
+            return self._forward_op(path, basepoint, initial, out)
         return signature(path, self.depth, stream=self.stream, basepoint=basepoint, inverse=self.inverse,
-                         initial=initial, scalar_term=self.scalar_term)
+                         initial=initial, scalar_term=self.scalar_term, leadlag=self.leadlag,
+                         accumulate_dtype=self.accumulate_dtype, checkpoint=self.checkpoint,
+                         checkpoint_budget=self.checkpoint_budget, layout=self.layout, out=out)
+
+    def _forward_op(self, path, basepoint, initial, out):
+        # type: (torch.Tensor, Union[bool, torch.Tensor], Optional[torch.Tensor], Optional[torch.Tensor]) -> torch.Tensor
+        # As forward, but via the torch.ops.signatory operators, so that it may be scripted or compiled.
+        if self.checkpoint is not None or self.checkpoint_budget is not None:
+            raise ValueError("Arguments 'checkpoint' and 'checkpoint_budget' are not supported when the Signature "
+                             "module is scripted or compiled.")
+        stream_path = path.transpose(0, 1) if self.layout == 'batch' else path  # to (stream, batch, channel)
+        basepoint_ = op_basepoint(basepoint, stream_path)
+        signature_, _ = torch.ops.signatory.signature_forward(stream_path, self.depth, self.stream, basepoint_,
+                                                              self.inverse, initial, self.scalar_term, self.leadlag,
+                                                              self.accumulate_dtype)
+        if self.stream and self.layout == 'batch':
+            signature_ = signature_.transpose(0, 1)  # (stream, batch, channel) to (batch, stream, channel)
+        if out is not None:
+            op_out_checkargs(out, signature_, path, [path, basepoint_, initial])
+            signature_ = out.copy_(signature_)
+        return signature_
 
     def extra_repr(self):
-        return 'depth={depth}, stream={stream}, inverse={inverse}'.format(depth=self.depth, stream=self.stream,
-                                                                          inverse=self.inverse)
+        return ('depth={depth}, stream={stream}, inverse={inverse}, leadlag={leadlag}, '
+                'accumulate_dtype={accumulate_dtype}, checkpoint={checkpoint}, layout={layout}'
+                .format(depth=self.depth, stream=self.stream, inverse=self.inverse, leadlag=self.leadlag,
+                        accumulate_dtype=self.accumulate_dtype, checkpoint=repr(self.checkpoint),
+                        layout=repr(self.layout)))
+
+
+class SignatureFromIncrements(nn.Module):
+    """:class:`torch.nn.Module` wrapper around the :func:`signatory.signature_from_increments` function.
+
+    Arguments:
+        depth (int): as :func:`signatory.signature_from_increments`.
+
+        stream (bool, optional): as :func:`signatory.signature_from_increments`.
+
+        inverse (bool, optional): as :func:`signatory.signature_from_increments`.
+
+        scalar_term (bool, optional): as :func:`signatory.signature_from_increments`.
+
+        leadlag (bool, optional): as :func:`signatory.signature_from_increments`.
+
+        accumulate_dtype (None or :class:`torch.dtype`, optional): as :func:`signatory.signature_from_increments`.
+
+        checkpoint (None or int or str, optional): as :func:`signatory.signature_from_increments`.
+
+        checkpoint_budget (None or int, optional): as :func:`signatory.signature_from_increments`.
+
+        layout (str, optional): as :func:`signatory.signature_from_increments`.
+    """
+
+    def __init__(self, depth, stream=False, inverse=False, scalar_term=False, leadlag=False, accumulate_dtype=None,
+                 checkpoint=None, checkpoint_budget=None, layout='batch', **kwargs):
+        # type: (int, bool, bool, bool, bool, Union[None, torch.dtype], Union[None, int, str], Union[None, int], str, **Any) -> None
+        super(SignatureFromIncrements, self).__init__(**kwargs)
+        self.depth = depth
+        self.stream = stream
+        self.inverse = inverse
+        self.scalar_term = scalar_term
+        self.leadlag = leadlag
+        self.accumulate_dtype = accumulate_dtype
+        self.checkpoint = checkpoint
+        self.checkpoint_budget = checkpoint_budget
+        self.layout = layout
+
+    def forward(self, increments, initial=None):
+        # type: (torch.Tensor, Union[None, torch.Tensor]) -> torch.Tensor
+        """The forward operation.
+
+        Arguments:
+            increments (:class:`torch.Tensor`): As :func:`signatory.signature_from_increments`.
+
+            initial (None or :class:`torch.Tensor`, optional): As :func:`signatory.signature_from_increments`.
+
+        Returns:
+            As :func:`signatory.signature_from_increments`.
+        """
+        return signature_from_increments(increments, self.depth, stream=self.stream, inverse=self.inverse,
+                                         initial=initial, scalar_term=self.scalar_term, leadlag=self.leadlag,
+                                         accumulate_dtype=self.accumulate_dtype, checkpoint=self.checkpoint,
+                                         checkpoint_budget=self.checkpoint_budget, layout=self.layout)
+
+    def extra_repr(self):
+        return ('depth={depth}, stream={stream}, inverse={inverse}, leadlag={leadlag}, '
+                'accumulate_dtype={accumulate_dtype}, checkpoint={checkpoint}, layout={layout}'
+                .format(depth=self.depth, stream=self.stream, inverse=self.inverse, leadlag=self.leadlag,
+                        accumulate_dtype=self.accumulate_dtype, checkpoint=repr(self.checkpoint),
+                        layout=repr(self.layout)))
 
 
 # A wrapper for the sake of consistent documentation
@@ -362,17 +1387,19 @@ class _SignatureCombineFunction(autograd.Function):
         ctx.depth = depth
         ctx.scalar_term = scalar_term
         ctx.save_for_backward(*sigtensors)
-        return impl.signature_combine_forward(list(sigtensors), input_channels, depth, scalar_term)
+        return impl.signature_combine_forward(list(sigtensors), input_channels, depth, scalar_term, False,
+                                              torch.Tensor())
 
     @staticmethod
+    @autograd_function.once_differentiable  # Our backward function is computed without tracking gradients
     def backward(ctx, grad):
         sigtensors = ctx.saved_tensors
         grad = impl.signature_combine_backward(grad, list(sigtensors), ctx.input_channels, ctx.depth, ctx.scalar_term)
         return (None, None, None) + tuple(grad)
 
 
-def signature_combine(sigtensor1, sigtensor2, input_channels, depth, inverse=False, scalar_term=False):
-    # type: (torch.Tensor, torch.Tensor, int, int, bool, bool) -> torch.Tensor
+def signature_combine(sigtensor1, sigtensor2, input_channels, depth, inverse=False, scalar_term=False, out=None):
+    # type: (torch.Tensor, torch.Tensor, int, int, bool, bool, Union[None, torch.Tensor]) -> torch.Tensor
     r"""Combines two signatures into a single signature.
 
     Usage is most clear by example. See :ref:`examples-combine`.
@@ -400,6 +1427,9 @@ def signature_combine(sigtensor1, sigtensor2, input_channels, depth, inverse=Fal
         scalar_term (bool, optional): Defaults to False. Whether :attr:`sigtensor1` and :attr:`sigtensor2` were created
             with :attr:`scalar_term=True`. This must the same for both :attr:`sigtensor1` and :attr:`sigtensor2`.
 
+        out (None or :class:`torch.Tensor`, optional): Defaults to None. As :func:`signatory.signature`. It must have
+            the same shape, dtype and device as :attr:`sigtensor1`.
+
     Returns:
         Let :attr:`path1` be the path whose signature is :attr:`sigtensor1`. Let :attr:`path2` be the path whose
         signature is :attr:`sigtensor2`. Then this function returns the signature of the concatenation of :attr:`path1`
@@ -412,11 +1442,11 @@ def signature_combine(sigtensor1, sigtensor2, input_channels, depth, inverse=Fal
 
         If this is not done then the return value of this function will be essentially meaningless numbers.
     """
-    return multi_signature_combine([sigtensor1, sigtensor2], input_channels, depth, inverse, scalar_term)
+    return multi_signature_combine([sigtensor1, sigtensor2], input_channels, depth, inverse, scalar_term, out)
 
 
-def multi_signature_combine(sigtensors, input_channels, depth, inverse=False, scalar_term=False):
-    # type: (List[torch.Tensor], int, int, bool, bool) -> torch.Tensor
+def multi_signature_combine(sigtensors, input_channels, depth, inverse=False, scalar_term=False, out=None):
+    # type: (List[torch.Tensor], int, int, bool, bool, Union[None, torch.Tensor]) -> torch.Tensor
     r"""Combines multiple signatures into a single signature.
 
     See also :func:`signatory.signature_combine` for a simpler version.
@@ -433,12 +1463,22 @@ def multi_signature_combine(sigtensors, input_channels, depth, inverse=False, sc
 
         scalar_term (bool, optional): As :func:`signatory.signature_combine`.
 
+        out (None or :class:`torch.Tensor`, optional): As :func:`signatory.signature_combine`.
+
     Returns:
         Let :attr:`sigtensors` be a list of tensors, call them :math:`\text{sigtensor}_i` for
         :math:`i = 0, 1, \ldots, k`. Let :math:`\text{path}_i` be the path whose signature is
         :math:`\text{sigtensor}_i`. Then this function returns the signature of the concatenation of
         :math:`\text{path}_i` along their stream dimension.
 
+    .. note::
+
+        On the CPU, :attr:`sigtensors` are split into one contiguous chunk per thread, and the products of each chunk
+        are then multiplied together as a balanced binary tree. On the GPU they are simply multiplied together one
+        after the other, as each multiplication is already parallelised over the batch and channel dimensions. Either
+        way the backward pass only keeps about the square root of the number of intermediate products (per thread),
+        and recomputes the rest.
+
     .. danger::
 
         Make sure that each element of :attr:`sigtensors` is created with an appropriate :attr:`basepoint`, as with
@@ -446,4 +1486,8 @@ def multi_signature_combine(sigtensors, input_channels, depth, inverse=False, sc
     """
     if inverse:
         sigtensors = reversed(sigtensors)
+    sigtensors = list(sigtensors)
+    if out is not None and len(sigtensors) > 0:  # Leave the empty case for the C++ side to complain about.
+        out_checkargs(out, sigtensors[0].shape, sigtensors[0], sigtensors)
+        return impl.signature_combine_forward(sigtensors, input_channels, depth, scalar_term, True, out)
     return _SignatureCombineFunction.apply(input_channels, depth, scalar_term, *sigtensors)
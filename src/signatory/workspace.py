@@ -0,0 +1,33 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#    http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Provides control over the scratch memory that Signatory keeps hold of between calls."""
+
+
+from . import impl
+
+
+def clear_workspace():
+    # type: () -> None
+    """Releases the scratch memory that Signatory keeps hold of between calls.
+
+    To avoid allocating it afresh every time, the scratch memory used by Signatory's CPU computations is kept around and
+    reused by later computations on inputs with the same dtype, number of channels and depth. Each thread keeps at most
+    64MB of such memory. This function releases all of it.
+
+    There is never any need to call this function for correctness. It is only useful for reclaiming memory, for example
+    after a one-off computation on unusually large inputs.
+    """
+
+    impl.clear_workspace()
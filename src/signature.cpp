@@ -15,7 +15,8 @@
 
 
 #include <torch/extension.h>
-#include <algorithm>  // std::min
+#include <ATen/OpMathType.h>  // at::toOpMathType
+#include <algorithm>  // std::max, std::min
 #include <cstdint>    // int64_t
 #include <cmath>      // std::sqrt
 #include <omp.h>
@@ -23,8 +24,10 @@
 #include <vector>     // std::vector
 
 #include "misc.hpp"
+#include "parallelism.hpp"
 #include "signature.hpp"
 #include "tensor_algebra_ops.hpp"
+#include "workspace.hpp"
 
 namespace signatory {
     namespace signature {
@@ -33,49 +36,59 @@ namespace signatory {
             // roamed the earth.
             #if _OPENMP == 200203
             struct omp_nested {
-                omp_nested() :
-                was_omp_nested(omp_get_nested()), was_omp_in_parallel(omp_in_parallel())
+                explicit omp_nested(bool enable) :
+                was_omp_nested(omp_get_nested()), enabled(enable && !omp_in_parallel())
                 {
-                    if (!was_omp_in_parallel) {
+                    if (enabled) {
                         // parallelising over batch and stream
                         omp_set_nested(true);
                     }
                 }
                 ~omp_nested() {
-                    if (!was_omp_in_parallel) {
+                    if (enabled) {
                         omp_set_nested(was_omp_nested);
                     }
                 }
             private:
                 int was_omp_nested;
-                int was_omp_in_parallel;
+                bool enabled;
             };
             #else
             struct omp_nested {
-                omp_nested() :
-                was_omp_max_active_levels(omp_get_max_active_levels()), was_omp_in_parallel(omp_in_parallel())
+                explicit omp_nested(bool enable) :
+                was_omp_max_active_levels(omp_get_max_active_levels()), enabled(enable && !omp_in_parallel())
                 {
-                    if (!was_omp_in_parallel) {
+                    if (enabled) {
                         // parallelising over batch and stream
                         omp_set_max_active_levels(2);
                     }
                 }
                 ~omp_nested() {
-                    if (!was_omp_in_parallel) {
+                    if (enabled) {
                         omp_set_max_active_levels(was_omp_max_active_levels);
                     }
                 }
             private:
                 int was_omp_max_active_levels;
-                int was_omp_in_parallel;
+                bool enabled;
             };
             #endif
 
             struct bool_wrapper { bool value; };
 
             // Takes the path and basepoint and returns the path increments
+            // If from_increments==true then 'path' is already the increments of the path, and there is no basepoint.
             torch::Tensor compute_path_increments(torch::Tensor path, bool basepoint, torch::Tensor basepoint_value,
-                                                  bool inverse) {
+                                                  bool inverse, bool from_increments=false) {
+                if (from_increments) {
+                    // No copy in the common case.
+                    if (inverse) {
+                        return -path;
+                    }
+                    else {
+                        return path;
+                    }
+                }
                 int64_t num_increments {path.size(stream_dim) - 1};
                 // The difference between these cases: basepoint/no basepoint + inverse/no inverse are basically just
                 // niceties.
@@ -84,40 +97,54 @@ namespace signatory {
                 // All that's going on if inverse is passed is just to multiply everything by -1.
                 // We break it up into special cases like this because doing either of the above operations naively involves
                 // unnecessary extra operations.
+                // The memory is drawn from this thread's workspace, as for small inputs allocating it is a large part
+                // of the cost. (The result may be kept around for the backward pass, in which case the workspace just
+                // won't hand the memory out again until it's been freed.)
+                int64_t num_outputs = basepoint ? num_increments + 1 : num_increments;
+                torch::Tensor path_increments = workspace::empty({num_outputs, path.size(batch_dim),
+                                                                  path.size(channel_dim)},
+                                                                 path.options(), /*depth=*/0,
+                                                                 workspace::Slot::PathIncrements);
                 if (basepoint) {
                     if (inverse) {
-                        torch::Tensor path_increments = torch::empty_like(path);
                         path_increments[0].copy_(basepoint_value);
                         path_increments.narrow(/*dim=*/stream_dim, /*start=*/1, /*len=*/num_increments).copy_(
                                 path.narrow(/*dim=*/stream_dim, /*start=*/0, /*len=*/num_increments));
                         path_increments -= path;
-                        return path_increments;
                     }
                     else {
-                        torch::Tensor path_increments = path.clone();
+                        path_increments.copy_(path);
                         path_increments[0] -= basepoint_value;
                         path_increments.narrow(/*dim=*/stream_dim, /*start=*/1, /*len=*/num_increments) -=
                                 path.narrow(/*dim=*/stream_dim, /*start=*/0, /*len=*/num_increments);
-                        return path_increments;
                     }
                 }
                 else {
                     if (inverse) {
-                        return path.narrow(/*dim=*/stream_dim, /*start=*/0, /*len=*/num_increments) -
-                               path.narrow(/*dim=*/stream_dim, /*start=*/1, /*len=*/num_increments);
+                        torch::sub_out(path_increments,
+                                       path.narrow(/*dim=*/stream_dim, /*start=*/0, /*len=*/num_increments),
+                                       path.narrow(/*dim=*/stream_dim, /*start=*/1, /*len=*/num_increments));
                     }
                     else {
-                        return path.narrow(/*dim=*/stream_dim, /*start=*/1, /*len=*/num_increments) -
-                               path.narrow(/*dim=*/stream_dim, /*start=*/0, /*len=*/num_increments);
+                        torch::sub_out(path_increments,
+                                       path.narrow(/*dim=*/stream_dim, /*start=*/1, /*len=*/num_increments),
+                                       path.narrow(/*dim=*/stream_dim, /*start=*/0, /*len=*/num_increments));
                     }
                 }
+                return path_increments;
             }
 
             // Computes the backward pass through the path increments operation.
             // Returns the gradients for the original path, and for the basepoint.
             std::tuple<torch::Tensor, torch::Tensor>
             compute_path_increments_backward(torch::Tensor grad_path_increments, bool basepoint, bool inverse,
-                                             torch::TensorOptions opts) {
+                                             torch::TensorOptions opts, bool from_increments=false) {
+                if (from_increments) {
+                    if (inverse) {
+                        grad_path_increments = -grad_path_increments;
+                    }
+                    return std::tuple<torch::Tensor, torch::Tensor> {grad_path_increments, torch::empty({0}, opts)};
+                }
                 int64_t batch_size {grad_path_increments.size(batch_dim)};
                 int64_t input_stream_size {grad_path_increments.size(stream_dim)};
                 int64_t input_channel_size {grad_path_increments.size(channel_dim)};
@@ -168,7 +195,176 @@ namespace signatory {
                 }
             }
 
-            void signature_forward_inner(torch::Tensor path_increments,
+            // Decides how much OpenMP-based parallelism to use. Default is no parallelism.
+            // We can try to parallelise along the stream dimension and along the batch dimension. The total number of
+            // threads used, batch_threads * stream_threads, is at most parallelism::max_threads().
+            void decide_threads(bool is_cuda, int64_t batch_size, int64_t input_stream_size,
+                                int64_t output_stream_size, int64_t output_channel_size, bool stream,
+                                int64_t& stream_threads, int64_t& batch_threads) {
+                stream_threads = 1;
+                batch_threads = 1;
+                if (is_cuda) {
+                    // OpenMP is only for the CPU.
+                    return;
+                }
+                int64_t max_threads = parallelism::max_threads();
+                int64_t plan_batch_threads;
+                int64_t plan_stream_threads;
+                std::tie(plan_batch_threads, plan_stream_threads) = parallelism::get_plan();
+                if (plan_batch_threads > 0) {
+                    // The choice has already been made for us; see parallelism::set_plan.
+                    batch_threads = std::max(std::min({plan_batch_threads, batch_size, max_threads}),
+                                             static_cast<int64_t>(1));
+                    stream_threads = std::max(std::min({plan_stream_threads, output_stream_size - 1,
+                                                        max_threads / batch_threads}),
+                                              static_cast<int64_t>(1));
+                    return;
+                }
+                if (batch_size * output_stream_size * output_channel_size < 81899) {
+                    // Don't use parallelism if the problem is small.
+                    // The magic number 81899 was chosen as being roughly the point at which the small/large threshold
+                    // is crossed. (81899 = batch size 1 * stream size 4096 * signature_channels(channels 4, depth 2)
+                    // - 1, false)
+                    return;
+                }
+
+                parallelism::Strategy strategy = parallelism::strategy();
+                if (strategy == parallelism::Strategy::Batch) {
+                    batch_threads = std::min(batch_size, max_threads);
+                    return;
+                }
+
+                // The most threads it's worth parallelising along the stream with.
+                // Don't want to cut the stream dimension _too_ small, or we'll lose the benefits of the fused
+                // mult-restricted-exp operation
+                int64_t max_stream_threads = std::min(static_cast<int64_t>(std::sqrt(input_stream_size)),
+                                                      (input_stream_size + 2) / 3);
+                // Every chunk must be nonempty
+                max_stream_threads = std::min(max_stream_threads, output_stream_size - 1);
+
+                if (strategy == parallelism::Strategy::Stream) {
+                    // Parallelise along the stream dimension first, then use any threads left over to parallelise
+                    // across the batch dimension.
+                    stream_threads = std::min(max_threads, max_stream_threads);
+                    if (stream && stream_threads < 3) {
+                        // See below.
+                        stream_threads = 1;
+                    }
+                    if (stream_threads < 1) {
+                        stream_threads = 1;
+                    }
+                    batch_threads = std::max(std::min(batch_size, max_threads / stream_threads),
+                                             static_cast<int64_t>(1));
+                    return;
+                }
+
+                // We want to parallelise across the batch dimension first, as that's most efficient.
+                batch_threads = std::min(batch_size, max_threads);
+
+                // Then use any threads left over to parallelise along the stream dimension.
+                stream_threads = std::min(max_threads / batch_threads, max_stream_threads);
+
+                if (stream && stream_threads < 3) {
+                    // In the stream==true case then parallelising along the stream is done via a prefix scan, which
+                    // does about twice as much work as the serial computation. So it only pays off with at least three
+                    // threads.
+                    stream_threads = 1;
+                }
+                if (stream_threads < 1) {
+                    stream_threads = 1;
+                }
+            }
+
+            // When parallelising along the stream dimension, the stream indices [1, output_stream_size) are split up
+            // into stream_threads many contiguous chunks. This gives the first stream index of a chunk. (And the end
+            // of a chunk is the start of the next one.)
+            int64_t chunk_start(int64_t output_stream_size, int64_t stream_threads, int64_t chunk_index) {
+                return 1 + ((output_stream_size - 1) * chunk_index) / stream_threads;
+            }
+
+            // Gives the increments of the path whose signature is being computed.
+            // If leadlag==false then these are just the path increments.
+            // If leadlag==true then these are the increments of the lead-lag transform of the path, with channels
+            // ordered (lead, lag). Every increment dx of the path corresponds to two increments of the lead-lag path:
+            // first (dx, 0) and then (0, dx). These are formed one at a time as they are needed, so that the lead-lag
+            // path is never materialised. As they are formed in scratch memory, in this case it is not safe to use
+            // the same increments_accessor from multiple threads.
+            // The increments are given in the dtype 'dtype', which is the dtype that the signature is accumulated in.
+            // This need not be the dtype of 'path_increments', in which case each increment is converted as it is
+            // needed.
+            struct increments_accessor {
+                increments_accessor(torch::Tensor path_increments, bool leadlag, torch::ScalarType dtype) :
+                path_increments{path_increments}, leadlag{leadlag}, dtype{dtype}
+                {
+                    if (leadlag) {
+                        int64_t path_channels = path_increments.size(channel_dim);
+                        lead = torch::zeros({path_increments.size(batch_dim), 2 * path_channels},
+                                            path_increments.options().dtype(dtype));
+                        lag = torch::zeros_like(lead);
+                        grad = torch::empty_like(lead);
+                        lead_path = lead.narrow(/*dim=*/channel_dim, /*start=*/0, /*length=*/path_channels);
+                        lag_path = lag.narrow(/*dim=*/channel_dim, /*start=*/path_channels, /*length=*/path_channels);
+                    }
+                }
+
+                // The number of increments
+                int64_t size() const {
+                    return (leadlag ? 2 : 1) * path_increments.size(stream_dim);
+                }
+
+                // The number of channels in each increment
+                int64_t channels() const {
+                    return (leadlag ? 2 : 1) * path_increments.size(channel_dim);
+                }
+
+                torch::Tensor operator[](int64_t stream_index) {
+                    if (!leadlag) {
+                        // A no-op if the dtypes are the same
+                        return path_increments[stream_index].to(dtype);
+                    }
+                    if (stream_index % 2 == 0) {
+                        lead_path.copy_(path_increments[stream_index / 2]);
+                        return lead;
+                    }
+                    else {
+                        lag_path.copy_(path_increments[stream_index / 2]);
+                        return lag;
+                    }
+                }
+
+                // Where the gradient through the increment at stream_index should be placed.
+                torch::Tensor grad_at(torch::Tensor grad_path_increments, int64_t stream_index) {
+                    return leadlag ? grad : grad_path_increments[stream_index];
+                }
+
+                // To be called once the gradient through the increment at stream_index has been placed in grad_at(...).
+                // Must be called for stream indices in decreasing order.
+                void grad_done(torch::Tensor grad_path_increments, int64_t stream_index) {
+                    if (leadlag) {
+                        int64_t path_channels = path_increments.size(channel_dim);
+                        torch::Tensor grad_path_increment = grad_path_increments[stream_index / 2];
+                        if (stream_index % 2 == 0) {
+                            grad_path_increment += grad.narrow(/*dim=*/channel_dim, /*start=*/0,
+                                                               /*length=*/path_channels);
+                        }
+                        else {
+                            grad_path_increment.copy_(grad.narrow(/*dim=*/channel_dim, /*start=*/path_channels,
+                                                                  /*length=*/path_channels));
+                        }
+                    }
+                }
+            private:
+                torch::Tensor path_increments;
+                bool leadlag;
+                torch::ScalarType dtype;
+                torch::Tensor lead;
+                torch::Tensor lag;
+                torch::Tensor grad;
+                torch::Tensor lead_path;
+                torch::Tensor lag_path;
+            };
+
+            void signature_forward_inner(increments_accessor& increments,
                                          torch::Tensor reciprocals,
                                          torch::Tensor signature,
                                          const std::vector<torch::Tensor>& signature_by_term,
@@ -183,18 +379,226 @@ namespace signatory {
                         signature[stream_index].copy_(signature[stream_index - 1]);
                         misc::slice_at_stream(signature_by_term, signature_by_term_at_stream, stream_index);
                     }
-                    ta_ops::mult_fused_restricted_exp(path_increments[stream_index],
+                    ta_ops::mult_fused_restricted_exp(increments[stream_index],
                                                       signature_by_term_at_stream,
                                                       inverse,
                                                       reciprocals,
                                                       batch_threads);
                 }
             }
+
+            // Computes the signature of just the part of the path corresponding to the increments [start, end), and
+            // stores it in 'chunk_by_term'.
+            // Only used when parallelising along the stream, which we don't do in the leadlag==true case, so it is
+            // safe to share 'increments' between threads.
+            void signature_chunk(increments_accessor& increments,
+                                 torch::Tensor reciprocals,
+                                 std::vector<torch::Tensor>& chunk_by_term,
+                                 bool inverse,
+                                 int64_t start,
+                                 int64_t end,
+                                 s_size_type depth,
+                                 int64_t output_channel_size,
+                                 int64_t batch_threads) {
+                torch::Tensor first_increment = increments[start];
+                int64_t batch_size = first_increment.size(batch_dim);
+                int64_t input_channel_size = first_increment.size(channel_dim);
+                // Drawn from this thread's workspace; the chunk is only freed once the caller is done with it.
+                torch::Tensor chunk = workspace::empty({batch_size, output_channel_size}, first_increment.options(),
+                                                       depth, workspace::Slot::SignatureChunk);
+                misc::slice_by_term(chunk, chunk_by_term, input_channel_size, depth);
+                ta_ops::restricted_exp(first_increment, chunk_by_term, reciprocals);
+                signature_forward_inner(increments,
+                                        reciprocals,
+                                        torch::Tensor {},               // unused because stream==false
+                                        std::vector<torch::Tensor> {},  // unused because stream==false
+                                        chunk_by_term,
+                                        inverse,
+                                        /*stream=*/false,
+                                        /*start=*/start + 1,
+                                        /*end=*/end,
+                                        batch_threads);
+            }
+
+            // Computes the inverse of the signature of just the part of the path corresponding to the increments
+            // [start, end), and stores it in 'chunk_by_term'. Multiplying by this (on the same side as the signature
+            // is multiplied on to) is equivalent to the steps that signature_backward_inner takes to recompute the
+            // signature backwards through these increments.
+            // Only used when parallelising along the stream, which we don't do in the leadlag==true case, so it is
+            // safe to share 'increments' between threads.
+            void signature_reverse_chunk(increments_accessor& increments,
+                                         torch::Tensor reciprocals,
+                                         std::vector<torch::Tensor>& chunk_by_term,
+                                         bool inverse,
+                                         int64_t start,
+                                         int64_t end,
+                                         s_size_type depth,
+                                         int64_t output_channel_size) {
+                torch::Tensor last_increment = increments[end - 1];
+                int64_t batch_size = last_increment.size(batch_dim);
+                int64_t input_channel_size = last_increment.size(channel_dim);
+                // Zero represents the identity, as the scalar term isn't stored.
+                torch::Tensor chunk = workspace::empty({batch_size, output_channel_size}, last_increment.options(),
+                                                       depth, workspace::Slot::SignatureChunk).zero_();
+                misc::slice_by_term(chunk, chunk_by_term, input_channel_size, depth);
+                for (int64_t stream_index = end - 1; stream_index >= start; --stream_index) {
+                    ta_ops::mult_fused_restricted_exp(-increments[stream_index], chunk_by_term, inverse, reciprocals);
+                }
+            }
+
+            // Backward through signature_forward_inner in the stream==false case, for the stream indices
+            // [start, end).
+            // On entry 'signature_by_term_at_stream' should hold the signature at stream index end - 1, and
+            // 'grad_signature_by_term_at_stream' should hold the gradient through it. On exit they will hold the
+            // signature at stream index start - 1, and the gradient through it, respectively. The signature is
+            // recomputed backwards as we go, via a particular reversibility property of the signature.
+            // The gradients through the path increments are placed in 'grad_path_increments'.
+            // 'batch_threads' is the number of OpenMP threads used to parallelise over the batch dimension.
+            void signature_backward_inner(std::vector<torch::Tensor>& grad_signature_by_term_at_stream,
+                                          std::vector<torch::Tensor>& signature_by_term_at_stream,
+                                          increments_accessor& increments,
+                                          torch::Tensor grad_path_increments,
+                                          torch::Tensor reciprocals,
+                                          bool inverse,
+                                          int64_t start,
+                                          int64_t end,
+                                          int64_t batch_threads=1) {
+                for (int64_t stream_index = end - 1; stream_index >= start; --stream_index) {
+                    torch::Tensor grad_next = increments.grad_at(grad_path_increments, stream_index);
+                    torch::Tensor next = increments[stream_index];
+
+                    // Recompute signature_by_term_at_stream
+                    ta_ops::mult_fused_restricted_exp(-next, signature_by_term_at_stream, inverse, reciprocals,
+                                                      batch_threads);
+
+                    ta_ops::mult_fused_restricted_exp_backward(grad_next, grad_signature_by_term_at_stream, next,
+                                                               signature_by_term_at_stream, inverse, reciprocals,
+                                                               batch_threads);
+                    increments.grad_done(grad_path_increments, stream_index);
+                }
+            }
+
+            // Backward through signature_forward_inner in the stream==true case, for the stream indices
+            // [start, end).
+            // On entry 'grad_signature_by_term_at_stream' should hold the gradient through the signature at
+            // stream index end - 1. On exit it will hold the gradient through the signature at stream index
+            // start - 1; this includes grad_signature[start - 1] only if 'add_final' is true.
+            // The gradients through the path increments are placed in 'grad_path_increments', unless
+            // 'grad_next_scratch' is defined, in which case they are written into that and thrown away.
+            // 'signature_by_term' should hold the signature at stream indices 'signature_offset' onwards; this is
+            // used when only part of the stream has been (re)computed.
+            // 'batch_threads' is the number of OpenMP threads used to parallelise over the batch dimension.
+            void signature_backward_stream_inner(torch::Tensor grad_signature,
+                                                 torch::Tensor grad_signature_at_stream,
+                                                 std::vector<torch::Tensor>& grad_signature_by_term_at_stream,
+                                                 const std::vector<torch::Tensor>& signature_by_term,
+                                                 std::vector<torch::Tensor>& signature_by_term_at_stream,
+                                                 increments_accessor& increments,
+                                                 torch::Tensor grad_path_increments,
+                                                 torch::Tensor grad_next_scratch,
+                                                 torch::Tensor reciprocals,
+                                                 bool inverse,
+                                                 int64_t start,
+                                                 int64_t end,
+                                                 bool add_final,
+                                                 int64_t signature_offset=0,
+                                                 int64_t batch_threads=1) {
+                for (int64_t stream_index = end - 1; stream_index >= start; --stream_index) {
+                    torch::Tensor grad_next = grad_next_scratch.defined() ?
+                                              grad_next_scratch :
+                                              increments.grad_at(grad_path_increments, stream_index);
+                    torch::Tensor next = increments[stream_index];
+
+                    // Just look up signature_by_term_at_stream because we saved it for output
+                    misc::slice_at_stream(signature_by_term, signature_by_term_at_stream,
+                                          stream_index - 1 - signature_offset);
+
+                    ta_ops::mult_fused_restricted_exp_backward(grad_next, grad_signature_by_term_at_stream, next,
+                                                               signature_by_term_at_stream, inverse, reciprocals,
+                                                               batch_threads);
+                    if (!grad_next_scratch.defined()) {
+                        increments.grad_done(grad_path_increments, stream_index);
+                    }
+
+                    if (stream_index > start || add_final) {
+                        // Gradients may well have accumulated on the signatures of the partial paths, so add those on
+                        // here.
+                        grad_signature_at_stream += grad_signature[stream_index - 1];
+                    }
+                }
+            }
+
+            // Reverses the order of the letters in every word, in a member of the tensor algebra whose channels are in
+            // the last dimension. This is an anti-automorphism of the tensor algebra, and so converts between
+            // multiplying on the left and multiplying on the right, i.e. between signatures and inverse signatures.
+            torch::Tensor reverse_words(torch::Tensor tensor, int64_t input_channel_size, s_size_type depth) {
+                std::vector<int64_t> batch_sizes (tensor.sizes().begin(), tensor.sizes().end() - 1);
+                int64_t num_batch_dims = batch_sizes.size();
+
+                std::vector<torch::Tensor> reversed_terms;
+                reversed_terms.reserve(depth);
+                int64_t start = 0;
+                int64_t length = input_channel_size;
+                for (s_size_type depth_index = 0; depth_index < depth; ++depth_index) {
+                    std::vector<int64_t> term_sizes (batch_sizes);
+                    std::vector<int64_t> permutation;
+                    for (int64_t batch_dim_index = 0; batch_dim_index < num_batch_dims; ++batch_dim_index) {
+                        permutation.push_back(batch_dim_index);
+                    }
+                    for (s_size_type letter_index = 0; letter_index <= depth_index; ++letter_index) {
+                        term_sizes.push_back(input_channel_size);
+                        permutation.push_back(num_batch_dims + depth_index - letter_index);
+                    }
+                    torch::Tensor term = tensor.narrow(/*dim=*/channel_dim, /*start=*/start, /*length=*/length);
+                    reversed_terms.push_back(term.reshape(term_sizes).permute(permutation).reshape(term.sizes()));
+                    start += length;
+                    length *= input_channel_size;
+                }
+                return torch::cat(reversed_terms, /*dim=*/channel_dim);
+            }
+
+            // Backwards through ta_ops::mult_fused_restricted_exp_tangent, with inverse==false.
+            // 'next', 'tangent_next', 'signature_by_term' and 'tangent_signature_by_term' should be as
+            // mult_fused_restricted_exp_tangent was called with. (Not as it returns.)
+            // 'grad_signature_by_term' and 'grad_tangent_signature_by_term' are the input gradients, and will be
+            // modified in-place to hold the gradients through 'signature_by_term' and 'tangent_signature_by_term'.
+            // The gradient through 'next' is copied into 'grad_next'. (The gradient through 'tangent_next' is not
+            // computed.)
+            // 'exp_by_term', 'tangent_exp_by_term', 'grad_exp_by_term' and 'grad_tangent_exp_by_term' are scratch
+            // space.
+            void signature_tangent_step_backward(torch::Tensor grad_next,
+                                                 std::vector<torch::Tensor>& grad_signature_by_term,
+                                                 std::vector<torch::Tensor>& grad_tangent_signature_by_term,
+                                                 torch::Tensor next,
+                                                 torch::Tensor tangent_next,
+                                                 const std::vector<torch::Tensor>& signature_by_term,
+                                                 const std::vector<torch::Tensor>& tangent_signature_by_term,
+                                                 std::vector<torch::Tensor>& exp_by_term,
+                                                 std::vector<torch::Tensor>& tangent_exp_by_term,
+                                                 std::vector<torch::Tensor>& grad_exp_by_term,
+                                                 std::vector<torch::Tensor>& grad_tangent_exp_by_term,
+                                                 torch::Tensor reciprocals) {
+                ta_ops::restricted_exp(next, exp_by_term, reciprocals);
+                ta_ops::restricted_exp_tangent(next, tangent_next, exp_by_term, tangent_exp_by_term, reciprocals);
+
+                ta_ops::mult_backward</*add_not_copy=*/false>(grad_signature_by_term, grad_exp_by_term,
+                                                              signature_by_term, exp_by_term);
+                for (auto& elem : grad_tangent_exp_by_term) {
+                    elem.zero_();
+                }
+                ta_ops::mult_tangent_backward(grad_tangent_signature_by_term, grad_tangent_exp_by_term,
+                                              grad_signature_by_term, grad_exp_by_term, tangent_signature_by_term,
+                                              tangent_exp_by_term, signature_by_term, exp_by_term);
+
+                ta_ops::restricted_exp_tangent_backward(grad_next, grad_exp_by_term, grad_tangent_exp_by_term, next,
+                                                        tangent_next, exp_by_term, tangent_exp_by_term, reciprocals);
+            }
         }  // namespace signatory::signature::detail
     }  // namespace signatory::signature
 
     void signature_checkargs(torch::Tensor path, s_size_type depth, bool basepoint, torch::Tensor basepoint_value,
-                             bool initial, torch::Tensor initial_value, bool scalar_term) {
+                             bool initial, torch::Tensor initial_value, bool scalar_term, bool leadlag,
+                             bool from_increments) {
         if (path.ndimension() == 2) {
             // Friendlier help message for a common mess-up.
             throw std::invalid_argument("Argument 'path' must be a 3-dimensional tensor, with dimensions "
@@ -210,7 +614,12 @@ namespace signatory {
         if (path.size(batch_dim) == 0 || path.size(stream_dim) == 0 || path.size(channel_dim) == 0) {
             throw std::invalid_argument("Argument 'path' cannot have dimensions of size zero.");
         }
-        if (!basepoint && path.size(stream_dim) == 1) {
+        if (from_increments && basepoint) {
+            throw std::invalid_argument("Argument 'basepoint' cannot be used when computing the signature from the "
+                                        "increments of a path.");
+        }
+        // A single increment is already enough to define a path.
+        if (!basepoint && !from_increments && path.size(stream_dim) == 1) {
             throw std::invalid_argument("Argument 'path' must have stream dimension of size at least 2. (Need at "
                                         "least this many points to define a path.)");
         }
@@ -242,7 +651,8 @@ namespace signatory {
                 throw std::invalid_argument("Argument 'initial' must be a 2-dimensional tensor, corresponding to "
                                             "(batch, signature_channels) respectively.");
             }
-            if (initial_value.size(channel_dim) != signature_channels(path.size(channel_dim), depth, scalar_term) ||
+            int64_t input_channel_size = (leadlag ? 2 : 1) * path.size(channel_dim);
+            if (initial_value.size(channel_dim) != signature_channels(input_channel_size, depth, scalar_term) ||
                 initial_value.size(batch_dim) != path.size(batch_dim)) {
                 throw std::invalid_argument("Argument 'initial' must have correctly sized batch and channel "
                                             "dimensions.");
@@ -258,10 +668,15 @@ namespace signatory {
 
     std::tuple<torch::Tensor, torch::Tensor>
     signature_forward(torch::Tensor path, s_size_type depth, bool stream, bool basepoint, torch::Tensor basepoint_value,
-                      bool inverse, bool initial, torch::Tensor initial_value, bool scalar_term) {
-        signature_checkargs(path, depth, basepoint, basepoint_value, initial, initial_value, scalar_term);
+                      bool inverse, bool initial, torch::Tensor initial_value, bool scalar_term, bool leadlag,
+                      bool from_increments, bool batch_first, torch::Tensor accumulate_like, bool out,
+                      torch::Tensor out_value, bool check) {
+        if (check) {
+            signature_checkargs(path, depth, basepoint, basepoint_value, initial, initial_value, scalar_term, leadlag,
+                                from_increments);
+        }
 
-        py::gil_scoped_release release;
+        misc::GILRelease release;
 
         // No sense keeping track of gradients when we have a dedicated backwards function (and in-place operations mean
         // that in any case one cannot autograd through this function)
@@ -277,15 +692,24 @@ namespace signatory {
         // Some constants to pass around
         int64_t batch_size = path.size(batch_dim);
         int64_t input_stream_size = path.size(stream_dim);
-        int64_t input_channel_size = path.size(channel_dim);
-        int64_t output_stream_size = path.size(stream_dim) - (basepoint ? 0 : 1);
-        int64_t output_channel_size = signature_channels(input_channel_size, depth, false);
         torch::TensorOptions opts = path.options();
-        torch::Tensor reciprocals = misc::make_reciprocals(depth, opts);
+        // The running signature is kept in the dtype of accumulate_like, which may be of higher precision than the
+        // dtype of the path. (In which case we say that we're in 'mixed' precision.) The inputs and outputs stay in
+        // the dtype of the path.
+        torch::TensorOptions accumulate_opts = opts.dtype(accumulate_like.scalar_type());
+        bool mixed = accumulate_like.scalar_type() != path.scalar_type();
+        torch::Tensor reciprocals = workspace::reciprocals(depth, accumulate_opts);
 
-        // Compute path increments. Obviously.
+        // Compute path increments. Obviously. (Or just use them directly, if we were given them.)
         torch::Tensor path_increments = signature::detail::compute_path_increments(path, basepoint, basepoint_value,
-                                                                                   inverse);
+                                                                                   inverse, from_increments);
+        // These are the increments of the path we actually compute the signature of; different to the above if
+        // leadlag==true or mixed==true.
+        signature::detail::increments_accessor increments {path_increments, leadlag, accumulate_like.scalar_type()};
+
+        int64_t input_channel_size = increments.channels();
+        int64_t output_stream_size = increments.size();
+        int64_t output_channel_size = signature_channels(input_channel_size, depth, false);
 
         // Allocate memory for the computation.
         torch::Tensor first_term;
@@ -297,10 +721,26 @@ namespace signatory {
         int64_t output_channel_size_with_scalar = scalar_term ? (output_channel_size + 1) : output_channel_size;
         if (stream) {
             // if stream == true then we want to store all intermediate results
-            signature = torch::empty({output_stream_size, batch_size, output_channel_size_with_scalar}, opts);
+            if (out) {
+                // Everything below is indifferent to the strides of 'signature', so we can write straight into it.
+                signature = out_value;
+            }
+            else if (batch_first) {
+                // Laid out in memory as (batch, stream, channel), so that it is contiguous once the stream and batch
+                // dimensions are swapped back over. Everything below is indifferent to the strides of 'signature'.
+                signature = torch::empty({batch_size, output_stream_size, output_channel_size_with_scalar},
+                                         opts).transpose(0, 1);
+            }
+            else {
+                signature = torch::empty({output_stream_size, batch_size, output_channel_size_with_scalar}, opts);
+            }
+        }
+        else if (out && !mixed) {
+            signature = out_value;
         }
         else {
-            signature = torch::empty({batch_size, output_channel_size_with_scalar}, opts);
+            // If mixed==true then this is converted to the dtype of the path at the end.
+            signature = torch::empty({batch_size, output_channel_size_with_scalar}, accumulate_opts);
         }
         if (scalar_term) {
             signature.narrow(/*dim=*/channel_dim, /*start=*/0, /*length=*/1) = 1;
@@ -311,7 +751,13 @@ namespace signatory {
             signature_with_scalar = signature;
         }
         if (stream) {
-            first_term = signature[0];
+            if (mixed) {
+                // The running signature is kept here, and copied into the output after every step.
+                first_term = torch::empty({batch_size, output_channel_size}, accumulate_opts);
+            }
+            else {
+                first_term = signature[0];
+            }
             misc::slice_by_term(signature, signature_by_term, input_channel_size, depth);
         }
         else {
@@ -322,61 +768,136 @@ namespace signatory {
         // Compute the first term.
         if (initial) {
             first_term.copy_(initial_value);
-            ta_ops::mult_fused_restricted_exp(path_increments[0],
+            ta_ops::mult_fused_restricted_exp(increments[0],
                                               signature_by_term_at_stream,
                                               inverse,
                                               reciprocals);
         }
         else {
-            ta_ops::restricted_exp(path_increments[0],
+            ta_ops::restricted_exp(increments[0],
                                    signature_by_term_at_stream,
                                    reciprocals);
         }
 
-        // Decide how much OpenMP-based parallelism to use. Default is no parallelism.
-        int64_t stream_threads = 1;  // We can try to parallelise along the stream dimension...
-        int64_t batch_threads = 1;   // ...and along the batch dimension.
-        if (!path.is_cuda()) {
-            // If we're on the CPU then we can try parallelising with OpenMP
-            if (batch_size * output_stream_size * output_channel_size < 81899) {
-                // Don't use parallelism if the problem is small.
-                // The magic number 81899 was chosen as being roughly the point at which the small/large threshold is
-                // crossed. (81899 = batch size 1 * stream size 4096 * signature_channels(channels 4, depth 2) - 1, false)
-                stream_threads = 1;
-                batch_threads = 1;
+        // Decide how much OpenMP-based parallelism to use.
+        int64_t stream_threads;
+        int64_t batch_threads;
+        signature::detail::decide_threads(path.is_cuda(), batch_size, input_stream_size, output_stream_size,
+                                          output_channel_size, stream, stream_threads, batch_threads);
+        if (leadlag) {
+            // The lead-lag increments are formed in memory shared across the whole stream.
+            stream_threads = 1;
+        }
+        if (stream && mixed) {
+            // The running signature is kept in memory shared across the whole stream.
+            stream_threads = 1;
+        }
+
+        // Now actually do the computation!
+        if (stream && mixed) {
+            signature[0].copy_(first_term);
+            for (int64_t stream_index = 1; stream_index < output_stream_size; ++stream_index) {
+                ta_ops::mult_fused_restricted_exp(increments[stream_index],
+                                                  signature_by_term_at_stream,
+                                                  inverse,
+                                                  reciprocals,
+                                                  batch_threads);
+                signature[stream_index].copy_(first_term);
             }
-            else {
-                // We want to parallelise across the batch dimension first, as that's most efficient.
-                batch_threads = std::min(batch_size, static_cast<int64_t>(omp_get_max_threads()));
+        }
+        else if (stream_threads == 1) {
+            signature::detail::signature_forward_inner(increments, reciprocals, signature, signature_by_term,
+                                                       signature_by_term_at_stream, inverse, stream, /*start=*/1,
+                                                       /*end=*/output_stream_size, batch_threads);
+        }
+        else if (stream) {
+            // If we get here then we're going to parallelise along the stream dimension in the stream==true case.
+            // This is a prefix scan, which we do in the reduce-then-scan manner:
+            // (a) The first chunk knows where it starts (the first term), so it just computes its part of the stream
+            //     directly. Meanwhile every other chunk (except the last) computes the signature of just its own
+            //     chunk.
+            // (b) These are combined together serially with ta_ops::mult to get the value of the signature at the
+            //     start of every chunk.
+            // (c) Every chunk (except the first) now computes its part of the stream, starting from that value.
 
-                if (stream) {
-                    // Can't parallelise along the stream dimension in this inherently-serial case.
-                    stream_threads = 1;
+            // Enable nested OpenMP, so we can parallelise over both stream and batch. (Only if we're actually going to
+            // parallelise over the batch as well; the setting is shared with every other thread.)
+            signature::detail::omp_nested nested {batch_threads > 1};
+
+            std::vector<std::vector<torch::Tensor>> omp_results(stream_threads);
+
+            // (a)
+            // The last chunk has nothing to do until (c), so it doesn't get a thread.
+            #pragma omp parallel for default(none) \
+                                     num_threads(stream_threads - 1) \
+                                     schedule(static, 1) \
+                                     shared(omp_results, increments, inverse, reciprocals, \
+                                            signature, signature_by_term, output_stream_size, \
+                                            output_channel_size, depth, stream_threads, batch_threads)
+            for (int64_t chunk_index = 0; chunk_index < stream_threads - 1; ++chunk_index) {
+                int64_t start = signature::detail::chunk_start(output_stream_size, stream_threads, chunk_index);
+                int64_t end = signature::detail::chunk_start(output_stream_size, stream_threads, chunk_index + 1);
+                if (chunk_index == 0) {
+                    std::vector<torch::Tensor> omp_signature_by_term_at_stream;
+                    signature::detail::signature_forward_inner(increments, reciprocals, signature,
+                                                               signature_by_term, omp_signature_by_term_at_stream,
+                                                               inverse, /*stream=*/true, start, end, batch_threads);
                 }
                 else {
-                    stream_threads = (omp_get_max_threads() + batch_threads - 1) / batch_threads;
-                    stream_threads = std::min(stream_threads, static_cast<int64_t>(std::sqrt(input_stream_size)));
-                    // Don't want to cut the stream dimension _too_ small, or we'll lose the benefits of the fused
-                    // mult-restricted-exp operation
-                    stream_threads = std::min(stream_threads, (input_stream_size + 2) / 3);
+                    signature::detail::signature_chunk(increments, reciprocals, omp_results[chunk_index],
+                                                       inverse, start, end, depth, output_channel_size,
+                                                       batch_threads);
                 }
             }
-        }
 
-        // Now actually do the computation!
-        if (stream_threads == 1) {
-            signature::detail::signature_forward_inner(path_increments, reciprocals, signature, signature_by_term,
-                                                       signature_by_term_at_stream, inverse, stream, /*start=*/1,
-                                                       /*end=*/output_stream_size, batch_threads);
+            // (b)
+            // We store the value of the signature at the start of each chunk in the first stream index of that chunk;
+            // it will be updated in-place from there in (c).
+            for (int64_t chunk_index = 1; chunk_index < stream_threads; ++chunk_index) {
+                int64_t start = signature::detail::chunk_start(output_stream_size, stream_threads, chunk_index);
+                if (chunk_index == 1) {
+                    signature[start].copy_(signature[start - 1]);
+                }
+                else {
+                    int64_t prev_start = signature::detail::chunk_start(output_stream_size, stream_threads,
+                                                                        chunk_index - 1);
+                    signature[start].copy_(signature[prev_start]);
+                    std::vector<torch::Tensor> chunk_start_by_term;
+                    misc::slice_at_stream(signature_by_term, chunk_start_by_term, start);
+                    ta_ops::mult(chunk_start_by_term, omp_results[chunk_index - 1], inverse);
+                }
+            }
+            omp_results.clear();
+
+            // (c)
+            #pragma omp parallel for default(none) \
+                                     num_threads(stream_threads - 1) \
+                                     schedule(static, 1) \
+                                     shared(increments, inverse, reciprocals, signature, \
+                                            signature_by_term, output_stream_size, stream_threads, batch_threads)
+            for (int64_t chunk_index = 1; chunk_index < stream_threads; ++chunk_index) {
+                int64_t start = signature::detail::chunk_start(output_stream_size, stream_threads, chunk_index);
+                int64_t end = signature::detail::chunk_start(output_stream_size, stream_threads, chunk_index + 1);
+                std::vector<torch::Tensor> omp_signature_by_term_at_stream;
+                misc::slice_at_stream(signature_by_term, omp_signature_by_term_at_stream, start);
+                ta_ops::mult_fused_restricted_exp(increments[start],
+                                                  omp_signature_by_term_at_stream,
+                                                  inverse,
+                                                  reciprocals,
+                                                  batch_threads);
+                signature::detail::signature_forward_inner(increments, reciprocals, signature, signature_by_term,
+                                                           omp_signature_by_term_at_stream, inverse,
+                                                           /*stream=*/true, start + 1, end, batch_threads);
+            }
         }
         else {
             // If we get here then it's because we can use OpenMP to parallelise across the stream dimension as well
             // as the batch dimension.
-            // stream_threads == 1 is special-cased above primarily for the stream==true case, which this branch
-            // doesn't handle. Furthermore even in the stream==false case, this branch would needlessly allocate extra
-            // memory.
+            // stream_threads == 1 is special-cased above as this branch would needlessly allocate extra memory.
 
-            signature::detail::omp_nested nested;  // Enable nested OpenMP, so we can parallelise over both stream and batch
+            // Enable nested OpenMP, so we can parallelise over both stream and batch. (Only if we're actually going to
+            // parallelise over the batch as well; the setting is shared with every other thread.)
+            signature::detail::omp_nested nested {batch_threads > 1};
 
             std::vector<std::vector<torch::Tensor>> omp_results(stream_threads);
             // There's no guarantee that we actually get the maximum number of threads, so we have to check
@@ -388,33 +909,20 @@ namespace signatory {
 
             #pragma omp parallel default(none) \
                                  num_threads(stream_threads) \
-                                 shared(omp_results, omp_used, path_increments, inverse, reciprocals, \
-                                        output_stream_size, batch_size, output_channel_size, input_channel_size, \
-                                        depth, opts, batch_threads)
+                                 shared(omp_results, omp_used, increments, inverse, reciprocals, \
+                                        output_stream_size, output_channel_size, depth, batch_threads)
             {
                 // Split up the stream dimension into chunks
-                int64_t start = 1 + ((output_stream_size - 1) * omp_get_thread_num()) / omp_get_num_threads();
-                int64_t end = 1 + ((output_stream_size - 1) * (1 + omp_get_thread_num())) / omp_get_num_threads();
+                int64_t start = signature::detail::chunk_start(output_stream_size, omp_get_num_threads(),
+                                                               omp_get_thread_num());
+                int64_t end = signature::detail::chunk_start(output_stream_size, omp_get_num_threads(),
+                                                             omp_get_thread_num() + 1);
                 if (start < end) {
                     // Compute the signature of each chunk separately
-                    torch::Tensor omp_signature = torch::empty({batch_size, output_channel_size}, opts);
-                    std::vector<torch::Tensor> omp_signature_by_term_at_stream;
-                    misc::slice_by_term(omp_signature, omp_signature_by_term_at_stream, input_channel_size, depth);
-                    ta_ops::restricted_exp(path_increments[start], omp_signature_by_term_at_stream, reciprocals);
-
-
-                    signature::detail::signature_forward_inner(path_increments,
-                                                               reciprocals,
-                                                               torch::Tensor {},               // unused because stream==false
-                                                               std::vector<torch::Tensor> {},  // unused because stream==false
-                                                               omp_signature_by_term_at_stream,
-                                                               inverse,
-                                                               /*stream=*/false,
-                                                               /*start=*/start + 1,
-                                                               /*end=*/end,
-                                                               batch_threads);
+                    signature::detail::signature_chunk(increments, reciprocals,
+                                                       omp_results[omp_get_thread_num()], inverse, start, end, depth,
+                                                       output_channel_size, batch_threads);
                     // Record results
-                    omp_results[omp_get_thread_num()] = std::move(omp_signature_by_term_at_stream);
                     omp_used[omp_get_thread_num()] = {true};
                 }
             }
@@ -429,14 +937,33 @@ namespace signatory {
             }
         }
 
+        if (!stream) {
+            if (out && mixed) {
+                out_value.copy_(signature_with_scalar);
+                signature_with_scalar = out_value;
+            }
+            else {
+                // A no-op if mixed==false
+                signature_with_scalar = signature_with_scalar.to(path.scalar_type());
+            }
+        }
+
         return std::tuple<torch::Tensor, torch::Tensor> {signature_with_scalar, path_increments};
     }
 
     std::tuple<torch::Tensor, torch::Tensor, torch::Tensor>
     signature_backward(torch::Tensor grad_signature, torch::Tensor signature, torch::Tensor path_increments,
-                       s_size_type depth, bool stream, bool basepoint, bool inverse, bool initial, bool scalar_term) {
+                       s_size_type depth, bool stream, bool basepoint, bool inverse, bool initial, bool scalar_term,
+                       bool leadlag, bool from_increments, torch::Tensor accumulate_like, int64_t checkpoint_every) {
+        if (checkpoint_every < 0) {
+            throw std::invalid_argument("Argument 'checkpoint_every' must be nonnegative.");
+        }
+        if (!stream) {
+            // Nothing to checkpoint.
+            checkpoint_every = 0;
+        }
 
-        py::gil_scoped_release release;
+        misc::GILRelease release;
 
         if (scalar_term) {
             grad_signature = grad_signature.narrow(/*dim=*/channel_dim, /*start=*/1,
@@ -444,14 +971,24 @@ namespace signatory {
             signature = signature.narrow(/*dim=*/channel_dim, /*start=*/1, /*length=*/signature.size(channel_dim) - 1);
         }
 
-        grad_signature = grad_signature.detach();
-        signature = signature.detach();
+        // If the signature was accumulated in a higher precision than the path then we do the backward computation
+        // in that precision too. (These conversions are no-ops otherwise.) Only the results are converted back.
+        // Half and BFloat16 are always upcast to float, as the backward computation sums the gradients through every
+        // step of the stream, and rounding each partial sum would lose the smaller ones.
+        torch::ScalarType path_dtype = path_increments.scalar_type();
+        torch::ScalarType backward_dtype = at::toOpMathType(accumulate_like.scalar_type());
+        grad_signature = grad_signature.detach().to(backward_dtype);
+        signature = signature.detach().to(backward_dtype);
         path_increments = path_increments.detach();
 
         torch::TensorOptions opts = signature.options();
-        torch::Tensor reciprocals = misc::make_reciprocals(depth, opts);
-        int64_t output_stream_size = path_increments.size(stream_dim);
-        int64_t input_channel_size = path_increments.size(channel_dim);
+        torch::Tensor reciprocals = workspace::reciprocals(depth, opts);
+        signature::detail::increments_accessor increments {path_increments, leadlag, backward_dtype};
+        int64_t batch_size = path_increments.size(batch_dim);
+        int64_t input_stream_size = path_increments.size(stream_dim) + ((basepoint || from_increments) ? 0 : 1);
+        int64_t output_stream_size = increments.size();
+        int64_t input_channel_size = increments.channels();
+        int64_t output_channel_size = signature_channels(input_channel_size, depth, false);
 
         std::vector<torch::Tensor> signature_by_term;
         misc::slice_by_term(signature, signature_by_term, input_channel_size, depth);
@@ -465,6 +1002,8 @@ namespace signatory {
         // Note the asymmetry.
         std::vector<torch::Tensor> grad_signature_by_term_at_stream;
         std::vector<torch::Tensor> signature_by_term_at_stream;
+        // Only used if stream==false, in which case it is the memory that signature_by_term_at_stream refers to.
+        torch::Tensor signature_at_stream;
 
         // There's some differences between the stream==true and stream==false cases.
         // The essential difference is that in the stream==true case, we have recorded a lot more information, which we
@@ -523,36 +1062,351 @@ namespace signatory {
             // pass we do it for k going from n to 2.
             // In particular we clone the signature here as we're going to modify it in-place during these computations
             // and we don't want to leak changes to the original output.
-            misc::slice_by_term(signature.clone(), signature_by_term_at_stream, input_channel_size, depth);
+            signature_at_stream = signature.clone();
+            misc::slice_by_term(signature_at_stream, signature_by_term_at_stream, input_channel_size, depth);
         }
 
-        torch::Tensor grad_path_increments = torch::empty_like(path_increments);
+        torch::Tensor grad_path_increments = torch::empty(path_increments.sizes(), opts);
 
-        for (int64_t stream_index = output_stream_size - 1; stream_index >= 1; --stream_index) {
-            torch::Tensor grad_next = grad_path_increments[stream_index];
-            torch::Tensor next = path_increments[stream_index];
+        // Decide how much OpenMP-based parallelism to use.
+        int64_t stream_threads;
+        int64_t batch_threads;
+        signature::detail::decide_threads(signature.is_cuda(), batch_size, input_stream_size, output_stream_size,
+                                          output_channel_size, stream, stream_threads, batch_threads);
+        if (leadlag) {
+            // The lead-lag increments are formed in memory shared across the whole stream.
+            stream_threads = 1;
+        }
+        if (checkpoint_every > 0) {
+            // Only one segment of the stream is held in memory at a time.
+            stream_threads = 1;
+        }
 
-            if (stream) {
-                // Just look up signature_by_term_at_stream because we saved it for output
-                misc::slice_at_stream(signature_by_term, signature_by_term_at_stream, stream_index - 1);
+        if (checkpoint_every > 0) {
+            // If we get here then 'signature' doesn't hold the signature at every stream index, just at the stream
+            // indices 0, checkpoint_every, 2 * checkpoint_every, .... So we go backwards through the stream one segment
+            // at a time, recomputing the signature within each segment from its checkpoint.
+            // This is exactly the same computation as the stream_threads == 1 branch below, just split up.
+            int64_t segment_size = std::min(checkpoint_every, output_stream_size);
+            torch::Tensor segment = torch::empty({segment_size, batch_size, output_channel_size}, opts);
+            std::vector<torch::Tensor> segment_by_term;
+            misc::slice_by_term(segment, segment_by_term, input_channel_size, depth);
+            for (int64_t segment_start = ((output_stream_size - 1) / checkpoint_every) * checkpoint_every;
+                 segment_start >= 0;
+                 segment_start -= checkpoint_every) {
+                int64_t segment_end = std::min(segment_start + checkpoint_every, output_stream_size);
+                // Recompute the signature at stream indices [segment_start, segment_end)
+                segment[0].copy_(signature[segment_start / checkpoint_every]);
+                for (int64_t stream_index = segment_start + 1; stream_index < segment_end; ++stream_index) {
+                    int64_t segment_index = stream_index - segment_start;
+                    segment[segment_index].copy_(segment[segment_index - 1]);
+                    std::vector<torch::Tensor> segment_by_term_at_stream;
+                    misc::slice_at_stream(segment_by_term, segment_by_term_at_stream, segment_index);
+                    ta_ops::mult_fused_restricted_exp(increments[stream_index], segment_by_term_at_stream, inverse,
+                                                      reciprocals, batch_threads);
+                }
+                // These are the steps which use the signature at stream indices [segment_start, segment_end) as
+                // their starting point.
+                signature::detail::signature_backward_stream_inner(grad_signature,
+                                                                   grad_signature_at_stream,
+                                                                   grad_signature_by_term_at_stream,
+                                                                   segment_by_term,
+                                                                   signature_by_term_at_stream,
+                                                                   increments,
+                                                                   grad_path_increments,
+                                                                   /*grad_next_scratch=*/torch::Tensor {},
+                                                                   reciprocals,
+                                                                   inverse,
+                                                                   /*start=*/segment_start + 1,
+                                                                   /*end=*/std::min(segment_end + 1,
+                                                                                    output_stream_size),
+                                                                   /*add_final=*/true,
+                                                                   /*signature_offset=*/segment_start,
+                                                                   batch_threads);
+            }
+            // The final segment we processed starts at stream index 0, so signature_by_term_at_stream now refers to
+            // the signature at stream index 0, as required below. (It is set explicitly here as well, in case the
+            // loop above was empty because output_stream_size < 2.)
+            misc::slice_at_stream(segment_by_term, signature_by_term_at_stream, 0);
+        }
+        else if (stream) {
+            if (stream_threads == 1) {
+                signature::detail::signature_backward_stream_inner(grad_signature,
+                                                                   grad_signature_at_stream,
+                                                                   grad_signature_by_term_at_stream,
+                                                                   signature_by_term,
+                                                                   signature_by_term_at_stream,
+                                                                   increments,
+                                                                   grad_path_increments,
+                                                                   /*grad_next_scratch=*/torch::Tensor {},
+                                                                   reciprocals,
+                                                                   inverse,
+                                                                   /*start=*/1,
+                                                                   /*end=*/output_stream_size,
+                                                                   /*add_final=*/true,
+                                                                   /*signature_offset=*/0,
+                                                                   batch_threads);
             }
             else {
-                // Recompute signature_by_term_at_stream
-                ta_ops::mult_fused_restricted_exp(-next, signature_by_term_at_stream, inverse, reciprocals);
+                // If we get here then we're going to parallelise along the stream dimension. This is the backward
+                // through the prefix scan in signature_forward, and is done in the same reduce-then-scan manner.
+                // The gradient through the signature at the start of a chunk depends linearly on the gradient through
+                // the signature at the end of that chunk, via the adjoint of multiplying by the signature of the chunk.
+                // So:
+                // (a) Every chunk except the first computes the gradient through its start, using just the gradients
+                //     on the signatures within the chunk. The last chunk is then done, so it records the gradients
+                //     through its path increments as it goes. Every chunk except the first and last also computes the
+                //     signature of just its own chunk.
+                // (b) These are combined serially, from the end of the stream backwards, to get the total gradient
+                //     through the end of every chunk.
+                // (c) Every chunk except the last now computes its part of the backward pass.
+
+                int64_t last_chunk = stream_threads - 1;
+                std::vector<torch::Tensor> omp_grads(stream_threads);
+                std::vector<std::vector<torch::Tensor>> omp_results(stream_threads);
+
+                // (a)
+                #pragma omp parallel for default(none) \
+                                         num_threads(stream_threads - 1) \
+                                         schedule(static, 1) \
+                                         shared(omp_grads, omp_results, grad_signature, signature_by_term, \
+                                                increments, grad_path_increments, reciprocals, inverse, \
+                                                output_stream_size, output_channel_size, input_channel_size, \
+                                                batch_size, depth, opts, stream_threads, last_chunk)
+                for (int64_t chunk_index = 1; chunk_index < stream_threads; ++chunk_index) {
+                    int64_t start = signature::detail::chunk_start(output_stream_size, stream_threads, chunk_index);
+                    int64_t end = signature::detail::chunk_start(output_stream_size, stream_threads,
+                                                                 chunk_index + 1);
+                    torch::Tensor omp_grad = grad_signature[end - 1].clone();
+                    std::vector<torch::Tensor> omp_grad_by_term;
+                    misc::slice_by_term(omp_grad, omp_grad_by_term, input_channel_size, depth);
+                    std::vector<torch::Tensor> omp_signature_by_term_at_stream;
+                    torch::Tensor grad_next_scratch;
+                    if (chunk_index != last_chunk) {
+                        grad_next_scratch = torch::empty({batch_size, input_channel_size}, opts);
+                    }
+                    signature::detail::signature_backward_stream_inner(grad_signature,
+                                                                       omp_grad,
+                                                                       omp_grad_by_term,
+                                                                       signature_by_term,
+                                                                       omp_signature_by_term_at_stream,
+                                                                       increments,
+                                                                       grad_path_increments,
+                                                                       grad_next_scratch,
+                                                                       reciprocals,
+                                                                       inverse,
+                                                                       start,
+                                                                       end,
+                                                                       /*add_final=*/false);
+                    omp_grads[chunk_index] = omp_grad;
+                    if (chunk_index != last_chunk) {
+                        signature::detail::signature_chunk(increments, reciprocals, omp_results[chunk_index],
+                                                           inverse, start, end, depth, output_channel_size,
+                                                           /*batch_threads=*/1);
+                    }
+                }
+
+                // (b)
+                // After this, omp_grads[chunk_index] holds the total gradient through the end of chunk
+                // chunk_index - 1 that arises from all of the later chunks.
+                for (int64_t chunk_index = last_chunk - 1; chunk_index >= 1; --chunk_index) {
+                    int64_t start = signature::detail::chunk_start(output_stream_size, stream_threads, chunk_index);
+                    torch::Tensor grad_chunk_end = omp_grads[chunk_index + 1].clone();
+                    std::vector<torch::Tensor> grad_chunk_end_by_term;
+                    misc::slice_by_term(grad_chunk_end, grad_chunk_end_by_term, input_channel_size, depth);
+                    torch::Tensor grad_scratch = torch::empty_like(grad_chunk_end);
+                    std::vector<torch::Tensor> grad_scratch_by_term;
+                    misc::slice_by_term(grad_scratch, grad_scratch_by_term, input_channel_size, depth);
+                    std::vector<torch::Tensor> chunk_start_by_term;
+                    misc::slice_at_stream(signature_by_term, chunk_start_by_term, start - 1);
+                    if (inverse) {
+                        ta_ops::mult_backward</*add_not_copy=*/false>(grad_chunk_end_by_term, grad_scratch_by_term,
+                                                                      omp_results[chunk_index], chunk_start_by_term);
+                        omp_grads[chunk_index] += grad_scratch;
+                    }
+                    else {
+                        ta_ops::mult_backward</*add_not_copy=*/false>(grad_chunk_end_by_term, grad_scratch_by_term,
+                                                                      chunk_start_by_term, omp_results[chunk_index]);
+                        omp_grads[chunk_index] += grad_chunk_end;
+                    }
+                }
+                omp_results.clear();
+
+                // (c)
+                #pragma omp parallel for default(none) \
+                                         num_threads(stream_threads - 1) \
+                                         schedule(static, 1) \
+                                         shared(omp_grads, grad_signature, grad_signature_at_stream, \
+                                                grad_signature_by_term_at_stream, signature_by_term, \
+                                                signature_by_term_at_stream, increments, grad_path_increments, \
+                                                reciprocals, inverse, output_stream_size, input_channel_size, depth, \
+                                                stream_threads, last_chunk)
+                for (int64_t chunk_index = 0; chunk_index < last_chunk; ++chunk_index) {
+                    int64_t start = signature::detail::chunk_start(output_stream_size, stream_threads, chunk_index);
+                    int64_t end = signature::detail::chunk_start(output_stream_size, stream_threads,
+                                                                 chunk_index + 1);
+                    if (chunk_index == 0) {
+                        // The first chunk uses the same memory as the serial case, as the gradient through the first
+                        // term is computed from there afterwards.
+                        grad_signature_at_stream.copy_(grad_signature[end - 1]);
+                        grad_signature_at_stream += omp_grads[1];
+                        signature::detail::signature_backward_stream_inner(grad_signature,
+                                                                           grad_signature_at_stream,
+                                                                           grad_signature_by_term_at_stream,
+                                                                           signature_by_term,
+                                                                           signature_by_term_at_stream,
+                                                                           increments,
+                                                                           grad_path_increments,
+                                                                           /*grad_next_scratch=*/torch::Tensor {},
+                                                                           reciprocals,
+                                                                           inverse,
+                                                                           start,
+                                                                           end,
+                                                                           /*add_final=*/true);
+                    }
+                    else {
+                        torch::Tensor omp_grad = grad_signature[end - 1] + omp_grads[chunk_index + 1];
+                        std::vector<torch::Tensor> omp_grad_by_term;
+                        misc::slice_by_term(omp_grad, omp_grad_by_term, input_channel_size, depth);
+                        std::vector<torch::Tensor> omp_signature_by_term_at_stream;
+                        signature::detail::signature_backward_stream_inner(grad_signature,
+                                                                           omp_grad,
+                                                                           omp_grad_by_term,
+                                                                           signature_by_term,
+                                                                           omp_signature_by_term_at_stream,
+                                                                           increments,
+                                                                           grad_path_increments,
+                                                                           /*grad_next_scratch=*/torch::Tensor {},
+                                                                           reciprocals,
+                                                                           inverse,
+                                                                           start,
+                                                                           end,
+                                                                           /*add_final=*/false);
+                    }
+                }
             }
+        }
+        else if (stream_threads == 1) {
+            signature::detail::signature_backward_inner(grad_signature_by_term_at_stream,
+                                                        signature_by_term_at_stream,
+                                                        increments,
+                                                        grad_path_increments,
+                                                        reciprocals,
+                                                        inverse,
+                                                        /*start=*/1,
+                                                        /*end=*/output_stream_size,
+                                                        batch_threads);
+        }
+        else {
+            // If we get here then we're going to parallelise along the stream dimension in the stream==false case.
+            // Every chunk needs to know the signature at its end (to recompute backwards from), and the gradient
+            // through it. So:
+            // (a) Every chunk except the first computes the signature of just its own chunk, and its inverse.
+            // (b) These are combined serially, from the end of the stream backwards: the inverses give the signature
+            //     at the end of every chunk, and the chunk signatures are backpropagated through to give the gradient
+            //     through the end of every chunk.
+            // (c) Every chunk now computes its part of the backward pass, exactly as in the serial case.
 
-            ta_ops::mult_fused_restricted_exp_backward(grad_next, grad_signature_by_term_at_stream, next,
-                                                       signature_by_term_at_stream, inverse, reciprocals);
+            int64_t last_chunk = stream_threads - 1;
+            std::vector<std::vector<torch::Tensor>> omp_results(stream_threads);
+            std::vector<std::vector<torch::Tensor>> omp_reverse_results(stream_threads);
 
-            if (stream) {
-                // If stream then gradients may well have accumulated on the signatures of the partial paths, so
-                // add those on here.
-                grad_signature_at_stream += grad_signature[stream_index - 1];
+            // (a)
+            #pragma omp parallel for default(none) \
+                                     num_threads(stream_threads - 1) \
+                                     schedule(static, 1) \
+                                     shared(omp_results, omp_reverse_results, increments, reciprocals, inverse, \
+                                            output_stream_size, output_channel_size, depth, stream_threads)
+            for (int64_t chunk_index = 1; chunk_index < stream_threads; ++chunk_index) {
+                int64_t start = signature::detail::chunk_start(output_stream_size, stream_threads, chunk_index);
+                int64_t end = signature::detail::chunk_start(output_stream_size, stream_threads, chunk_index + 1);
+                signature::detail::signature_chunk(increments, reciprocals, omp_results[chunk_index], inverse, start,
+                                                   end, depth, output_channel_size, /*batch_threads=*/1);
+                signature::detail::signature_reverse_chunk(increments, reciprocals, omp_reverse_results[chunk_index],
+                                                           inverse, start, end, depth, output_channel_size);
+            }
+
+            // (b)
+            // After this, omp_signatures[chunk_index] holds the signature at the end of chunk chunk_index, and
+            // omp_grads[chunk_index] holds the gradient through it.
+            std::vector<torch::Tensor> omp_signatures(stream_threads);
+            std::vector<torch::Tensor> omp_grads(stream_threads);
+            omp_signatures[last_chunk] = signature_at_stream.clone();
+            omp_grads[last_chunk] = grad_signature_at_stream.clone();
+            for (int64_t chunk_index = last_chunk; chunk_index >= 1; --chunk_index) {
+                torch::Tensor chunk_start_signature = omp_signatures[chunk_index].clone();
+                std::vector<torch::Tensor> chunk_start_by_term;
+                misc::slice_by_term(chunk_start_signature, chunk_start_by_term, input_channel_size, depth);
+                ta_ops::mult(chunk_start_by_term, omp_reverse_results[chunk_index], inverse);
+                omp_signatures[chunk_index - 1] = chunk_start_signature;
+
+                torch::Tensor grad_chunk_end = omp_grads[chunk_index].clone();
+                std::vector<torch::Tensor> grad_chunk_end_by_term;
+                misc::slice_by_term(grad_chunk_end, grad_chunk_end_by_term, input_channel_size, depth);
+                torch::Tensor grad_scratch = torch::empty_like(grad_chunk_end);
+                std::vector<torch::Tensor> grad_scratch_by_term;
+                misc::slice_by_term(grad_scratch, grad_scratch_by_term, input_channel_size, depth);
+                if (inverse) {
+                    ta_ops::mult_backward</*add_not_copy=*/false>(grad_chunk_end_by_term, grad_scratch_by_term,
+                                                                  omp_results[chunk_index], chunk_start_by_term);
+                    omp_grads[chunk_index - 1] = grad_scratch;
+                }
+                else {
+                    ta_ops::mult_backward</*add_not_copy=*/false>(grad_chunk_end_by_term, grad_scratch_by_term,
+                                                                  chunk_start_by_term, omp_results[chunk_index]);
+                    omp_grads[chunk_index - 1] = grad_chunk_end;
+                }
+            }
+            omp_results.clear();
+            omp_reverse_results.clear();
+
+            // (c)
+            #pragma omp parallel for default(none) \
+                                     num_threads(stream_threads) \
+                                     schedule(static, 1) \
+                                     shared(omp_signatures, omp_grads, signature_at_stream, \
+                                            signature_by_term_at_stream, grad_signature_at_stream, \
+                                            grad_signature_by_term_at_stream, increments, grad_path_increments, \
+                                            reciprocals, inverse, output_stream_size, input_channel_size, depth, \
+                                            stream_threads)
+            for (int64_t chunk_index = 0; chunk_index < stream_threads; ++chunk_index) {
+                int64_t start = signature::detail::chunk_start(output_stream_size, stream_threads, chunk_index);
+                int64_t end = signature::detail::chunk_start(output_stream_size, stream_threads, chunk_index + 1);
+                if (chunk_index == 0) {
+                    // The first chunk uses the same memory as the serial case, as the gradient through the first
+                    // term is computed from there afterwards.
+                    signature_at_stream.copy_(omp_signatures[0]);
+                    grad_signature_at_stream.copy_(omp_grads[0]);
+                    signature::detail::signature_backward_inner(grad_signature_by_term_at_stream,
+                                                                signature_by_term_at_stream,
+                                                                increments,
+                                                                grad_path_increments,
+                                                                reciprocals,
+                                                                inverse,
+                                                                start,
+                                                                end);
+                }
+                else {
+                    // We own this memory, so we can modify it in-place.
+                    std::vector<torch::Tensor> omp_signature_by_term_at_stream;
+                    misc::slice_by_term(omp_signatures[chunk_index], omp_signature_by_term_at_stream,
+                                        input_channel_size, depth);
+                    std::vector<torch::Tensor> omp_grad_by_term;
+                    misc::slice_by_term(omp_grads[chunk_index], omp_grad_by_term, input_channel_size, depth);
+                    signature::detail::signature_backward_inner(omp_grad_by_term,
+                                                                omp_signature_by_term_at_stream,
+                                                                increments,
+                                                                grad_path_increments,
+                                                                reciprocals,
+                                                                inverse,
+                                                                start,
+                                                                end);
+                }
             }
         }
 
-        torch::Tensor grad_next = grad_path_increments[0];
-        torch::Tensor next = path_increments[0];
+        torch::Tensor grad_next = increments.grad_at(grad_path_increments, 0);
+        torch::Tensor next = increments[0];
         if (initial) {
             if (stream) {
                 // We're using memory we own if stream==false, but we're using memory we don't own if stream==true. So
@@ -562,16 +1416,18 @@ namespace signatory {
                 }
             }
             // Recover initial_value in signature_by_term_at_stream
-            ta_ops::mult_fused_restricted_exp(-next, signature_by_term_at_stream, inverse, reciprocals);
+            ta_ops::mult_fused_restricted_exp(-next, signature_by_term_at_stream, inverse, reciprocals, batch_threads);
             // grad_signature_by_term_at_stream is using the same memory as grad_signature_at_stream, which uses the
             // same memory as grad_initial_value, which represents the gradient through initial_value.
             ta_ops::mult_fused_restricted_exp_backward(grad_next, grad_signature_by_term_at_stream, next,
-                                                       signature_by_term_at_stream, inverse, reciprocals);
+                                                       signature_by_term_at_stream, inverse, reciprocals,
+                                                       batch_threads);
         }
         else {
             ta_ops::restricted_exp_backward(grad_next, grad_signature_by_term_at_stream, next,
                                             signature_by_term_at_stream, reciprocals);
         }
+        increments.grad_done(grad_path_increments, 0);
 
         // Find the gradient on the path from the gradient on the path increments.
         torch::Tensor grad_path;
@@ -580,9 +1436,675 @@ namespace signatory {
                                                                                                    grad_path_increments,
                                                                                                    basepoint,
                                                                                                    inverse,
-                                                                                                   opts);
+                                                                                                   opts,
+                                                                                                   from_increments);
 
         return std::tuple<torch::Tensor, torch::Tensor, torch::Tensor>
-               {grad_path, grad_basepoint_value, grad_initial_value};
+               {grad_path.to(path_dtype), grad_basepoint_value.to(path_dtype), grad_initial_value.to(path_dtype)};
+    }
+
+    std::tuple<torch::Tensor, torch::Tensor, torch::Tensor, torch::Tensor>
+    signature_double_backward(torch::Tensor grad_signature, torch::Tensor path_increments, torch::Tensor tangent_path,
+                              torch::Tensor tangent_basepoint_value, torch::Tensor initial_value,
+                              torch::Tensor tangent_initial_value, s_size_type depth, bool stream, bool basepoint,
+                              bool inverse, bool initial, bool scalar_term, bool leadlag, bool from_increments,
+                              torch::Tensor accumulate_like) {
+        misc::GILRelease release;
+
+        if (scalar_term) {
+            grad_signature = grad_signature.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                   /*length=*/grad_signature.size(channel_dim) - 1);
+            if (initial) {
+                initial_value = initial_value.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                     /*length=*/initial_value.size(channel_dim) - 1);
+                tangent_initial_value = tangent_initial_value.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                                     /*length=*/tangent_initial_value.size(channel_dim)
+                                                                                - 1);
+            }
+        }
+
+        // As in signature_backward, we do the computation in the precision that the signature was accumulated in.
+        torch::ScalarType path_dtype = path_increments.scalar_type();
+        torch::ScalarType accumulate_dtype = accumulate_like.scalar_type();
+        grad_signature = grad_signature.detach().to(accumulate_dtype);
+        path_increments = path_increments.detach();
+        // Computing the path increments is a linear operation, so the perturbation to the path increments is found by
+        // applying the same operation to the perturbation to the path.
+        torch::Tensor tangent_path_increments =
+                signature::detail::compute_path_increments(tangent_path.detach(), basepoint,
+                                                           tangent_basepoint_value.detach(), inverse,
+                                                           from_increments);
+
+        torch::TensorOptions opts = path_increments.options().dtype(accumulate_dtype);
+        torch::Tensor reciprocals = workspace::reciprocals(depth, opts);
+        signature::detail::increments_accessor increments {path_increments, leadlag, accumulate_dtype};
+        signature::detail::increments_accessor tangent_increments {tangent_path_increments, leadlag, accumulate_dtype};
+        int64_t batch_size = path_increments.size(batch_dim);
+        int64_t output_stream_size = increments.size();
+        int64_t input_channel_size = increments.channels();
+        int64_t output_channel_size = signature_channels(input_channel_size, depth, false);
+
+        // We only parallelise over the batch dimension here.
+        int64_t stream_threads;
+        int64_t batch_threads;
+        signature::detail::decide_threads(path_increments.is_cuda(), batch_size, path_increments.size(stream_dim),
+                                          output_stream_size, output_channel_size, stream, stream_threads,
+                                          batch_threads);
+
+        // The inverse signature is computed by multiplying on the left rather than on the right. Reversing the letters
+        // of every word swaps these over, so by doing that we can treat everything as if inverse==false. (The path
+        // increments have already been negated if inverse==true.)
+        if (inverse) {
+            grad_signature = signature::detail::reverse_words(grad_signature, input_channel_size, depth);
+        }
+
+        // Memory for the signature, and its perturbation when the path is perturbed by 'tangent_path'.
+        torch::Tensor signature_at_stream = torch::empty({batch_size, output_channel_size}, opts);
+        torch::Tensor tangent_signature_at_stream = torch::empty_like(signature_at_stream);
+        std::vector<torch::Tensor> signature_by_term_at_stream;
+        std::vector<torch::Tensor> tangent_signature_by_term_at_stream;
+        misc::slice_by_term(signature_at_stream, signature_by_term_at_stream, input_channel_size, depth);
+        misc::slice_by_term(tangent_signature_at_stream, tangent_signature_by_term_at_stream, input_channel_size,
+                            depth);
+
+        // The perturbation to the output. This is the forward-mode derivative of the signature.
+        torch::Tensor tangent_signature;
+        if (stream) {
+            tangent_signature = torch::empty({output_stream_size, batch_size, output_channel_size}, opts);
+        }
+
+        // Scratch space for the exponential of each increment, its perturbation, and the gradients through them.
+        torch::Tensor scratch = torch::empty({4, batch_size, output_channel_size}, opts);
+        std::vector<torch::Tensor> exp_by_term;
+        std::vector<torch::Tensor> tangent_exp_by_term;
+        std::vector<torch::Tensor> grad_exp_by_term;
+        std::vector<torch::Tensor> grad_tangent_exp_by_term;
+        misc::slice_by_term(scratch[0], exp_by_term, input_channel_size, depth);
+        misc::slice_by_term(scratch[1], tangent_exp_by_term, input_channel_size, depth);
+        misc::slice_by_term(scratch[2], grad_exp_by_term, input_channel_size, depth);
+        misc::slice_by_term(scratch[3], grad_tangent_exp_by_term, input_channel_size, depth);
+
+        if (initial) {
+            initial_value = initial_value.detach().to(accumulate_dtype);
+            tangent_initial_value = tangent_initial_value.detach().to(accumulate_dtype);
+            if (inverse) {
+                initial_value = signature::detail::reverse_words(initial_value, input_channel_size, depth);
+                tangent_initial_value = signature::detail::reverse_words(tangent_initial_value, input_channel_size,
+                                                                         depth);
+            }
+            signature_at_stream.copy_(initial_value);
+            tangent_signature_at_stream.copy_(tangent_initial_value);
+        }
+        else {
+            // Corresponds to starting from the identity element of the tensor algebra, with no perturbation.
+            signature_at_stream.zero_();
+            tangent_signature_at_stream.zero_();
+        }
+
+        // Compute the signature and its perturbation, forwards along the stream.
+        for (int64_t stream_index = 0; stream_index < output_stream_size; ++stream_index) {
+            ta_ops::mult_fused_restricted_exp_tangent(increments[stream_index], tangent_increments[stream_index],
+                                                      signature_by_term_at_stream,
+                                                      tangent_signature_by_term_at_stream, /*inverse=*/false,
+                                                      reciprocals, batch_threads);
+            if (stream) {
+                tangent_signature[stream_index].copy_(tangent_signature_at_stream);
+            }
+        }
+        if (!stream) {
+            // Copied, as tangent_signature_at_stream is recomputed backwards along the stream below.
+            tangent_signature = tangent_signature_at_stream.clone();
+        }
+
+        // Now go backwards along the stream, computing the gradient of <grad_signature, tangent_signature> with respect
+        // to the path increments, with tangent_path held fixed. This is the Hessian-vector product.
+        // The signature and its perturbation are recomputed backwards as we go, in the same way as in
+        // signature_backward: exp(-x) is the inverse of exp(x), and negating the perturbation to x as well gives the
+        // perturbation to exp(-x).
+        torch::Tensor grad_signature_at_stream = torch::zeros_like(signature_at_stream);
+        torch::Tensor grad_tangent_signature_at_stream = stream ? grad_signature[-1].clone() : grad_signature.clone();
+        std::vector<torch::Tensor> grad_signature_by_term_at_stream;
+        std::vector<torch::Tensor> grad_tangent_signature_by_term_at_stream;
+        misc::slice_by_term(grad_signature_at_stream, grad_signature_by_term_at_stream, input_channel_size, depth);
+        misc::slice_by_term(grad_tangent_signature_at_stream, grad_tangent_signature_by_term_at_stream,
+                            input_channel_size, depth);
+
+        torch::Tensor grad_path_increments = torch::empty(path_increments.sizes(), opts);
+        for (int64_t stream_index = output_stream_size - 1; stream_index >= 0; --stream_index) {
+            torch::Tensor next = increments[stream_index];
+            torch::Tensor tangent_next = tangent_increments[stream_index];
+
+            // Recompute the signature and its perturbation from before this step.
+            if (stream_index > 0 || initial) {
+                ta_ops::mult_fused_restricted_exp_tangent(-next, -tangent_next, signature_by_term_at_stream,
+                                                          tangent_signature_by_term_at_stream, /*inverse=*/false,
+                                                          reciprocals, batch_threads);
+            }
+            else {
+                // Set it exactly, rather than leaving it to accumulate rounding errors.
+                signature_at_stream.zero_();
+                tangent_signature_at_stream.zero_();
+            }
+
+            torch::Tensor grad_next = increments.grad_at(grad_path_increments, stream_index);
+            signature::detail::signature_tangent_step_backward(grad_next, grad_signature_by_term_at_stream,
+                                                               grad_tangent_signature_by_term_at_stream, next,
+                                                               tangent_next, signature_by_term_at_stream,
+                                                               tangent_signature_by_term_at_stream, exp_by_term,
+                                                               tangent_exp_by_term, grad_exp_by_term,
+                                                               grad_tangent_exp_by_term, reciprocals);
+            increments.grad_done(grad_path_increments, stream_index);
+
+            if (stream && stream_index > 0) {
+                grad_tangent_signature_at_stream += grad_signature[stream_index - 1];
+            }
+        }
+        // If initial==true then this now holds the gradient through the initial value.
+        torch::Tensor grad_initial_value = grad_signature_at_stream;
+
+        if (inverse) {
+            tangent_signature = signature::detail::reverse_words(tangent_signature, input_channel_size, depth);
+            grad_initial_value = signature::detail::reverse_words(grad_initial_value, input_channel_size, depth);
+        }
+        if (scalar_term) {
+            // The scalar term is constant.
+            tangent_signature = torch::cat({torch::zeros_like(tangent_signature.narrow(/*dim=*/channel_dim,
+                                                                                       /*start=*/0,
+                                                                                       /*length=*/1)),
+                                            tangent_signature}, /*dim=*/channel_dim);
+            grad_initial_value = torch::cat({torch::zeros_like(grad_initial_value.narrow(/*dim=*/channel_dim,
+                                                                                         /*start=*/0,
+                                                                                         /*length=*/1)),
+                                             grad_initial_value}, /*dim=*/channel_dim);
+        }
+
+        // Find the gradient on the path from the gradient on the path increments.
+        torch::Tensor grad_path;
+        torch::Tensor grad_basepoint_value;
+        std::tie(grad_path, grad_basepoint_value) = signature::detail::compute_path_increments_backward(
+                                                                                                   grad_path_increments,
+                                                                                                   basepoint,
+                                                                                                   inverse,
+                                                                                                   opts,
+                                                                                                   from_increments);
+
+        return std::tuple<torch::Tensor, torch::Tensor, torch::Tensor, torch::Tensor>
+               {tangent_signature.to(path_dtype), grad_path.to(path_dtype), grad_basepoint_value.to(path_dtype),
+                grad_initial_value.to(path_dtype)};
+    }
+
+    torch::Tensor signature_jvp(torch::Tensor path_increments, torch::Tensor tangent_path,
+                                torch::Tensor tangent_basepoint_value, torch::Tensor initial_value,
+                                torch::Tensor tangent_initial_value, s_size_type depth, bool stream, bool basepoint,
+                                bool inverse, bool initial, bool scalar_term, bool leadlag, bool from_increments,
+                                torch::Tensor accumulate_like) {
+        misc::GILRelease release;
+
+        if (scalar_term && initial) {
+            initial_value = initial_value.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                 /*length=*/initial_value.size(channel_dim) - 1);
+            tangent_initial_value = tangent_initial_value.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                                 /*length=*/tangent_initial_value.size(channel_dim)
+                                                                            - 1);
+        }
+
+        torch::ScalarType path_dtype = path_increments.scalar_type();
+        torch::ScalarType accumulate_dtype = accumulate_like.scalar_type();
+        path_increments = path_increments.detach();
+        // Computing the path increments is a linear operation, so the perturbation to the path increments is found by
+        // applying the same operation to the perturbation to the path.
+        torch::Tensor tangent_path_increments =
+                signature::detail::compute_path_increments(tangent_path.detach(), basepoint,
+                                                           tangent_basepoint_value.detach(), inverse,
+                                                           from_increments);
+
+        torch::TensorOptions opts = path_increments.options().dtype(accumulate_dtype);
+        torch::Tensor reciprocals = workspace::reciprocals(depth, opts);
+        signature::detail::increments_accessor increments {path_increments, leadlag, accumulate_dtype};
+        signature::detail::increments_accessor tangent_increments {tangent_path_increments, leadlag, accumulate_dtype};
+        int64_t batch_size = path_increments.size(batch_dim);
+        int64_t output_stream_size = increments.size();
+        int64_t input_channel_size = increments.channels();
+        int64_t output_channel_size = signature_channels(input_channel_size, depth, false);
+
+        // We only parallelise over the batch dimension here.
+        int64_t stream_threads;
+        int64_t batch_threads;
+        signature::detail::decide_threads(path_increments.is_cuda(), batch_size, path_increments.size(stream_dim),
+                                          output_stream_size, output_channel_size, stream, stream_threads,
+                                          batch_threads);
+
+        // Memory for the signature, and its perturbation when the path is perturbed by 'tangent_path'.
+        torch::Tensor signature_at_stream = torch::empty({batch_size, output_channel_size}, opts);
+        torch::Tensor tangent_signature_at_stream = torch::empty_like(signature_at_stream);
+        std::vector<torch::Tensor> signature_by_term_at_stream;
+        std::vector<torch::Tensor> tangent_signature_by_term_at_stream;
+        misc::slice_by_term(signature_at_stream, signature_by_term_at_stream, input_channel_size, depth);
+        misc::slice_by_term(tangent_signature_at_stream, tangent_signature_by_term_at_stream, input_channel_size,
+                            depth);
+
+        torch::Tensor tangent_signature;
+        if (stream) {
+            tangent_signature = torch::empty({output_stream_size, batch_size, output_channel_size}, opts);
+        }
+        else {
+            tangent_signature = tangent_signature_at_stream;
+        }
+
+        if (initial) {
+            signature_at_stream.copy_(initial_value);
+            tangent_signature_at_stream.copy_(tangent_initial_value);
+        }
+        else {
+            // Corresponds to starting from the identity element of the tensor algebra, with no perturbation.
+            signature_at_stream.zero_();
+            tangent_signature_at_stream.zero_();
+        }
+
+        for (int64_t stream_index = 0; stream_index < output_stream_size; ++stream_index) {
+            ta_ops::mult_fused_restricted_exp_tangent(increments[stream_index], tangent_increments[stream_index],
+                                                      signature_by_term_at_stream,
+                                                      tangent_signature_by_term_at_stream, inverse, reciprocals,
+                                                      batch_threads);
+            if (stream) {
+                tangent_signature[stream_index].copy_(tangent_signature_at_stream);
+            }
+        }
+
+        if (scalar_term) {
+            // The scalar term is constant.
+            tangent_signature = torch::cat({torch::zeros_like(tangent_signature.narrow(/*dim=*/channel_dim,
+                                                                                       /*start=*/0,
+                                                                                       /*length=*/1)),
+                                            tangent_signature}, /*dim=*/channel_dim);
+        }
+
+        return tangent_signature.to(path_dtype);
+    }
+
+    void ragged_signature_checkargs(torch::Tensor increments, const std::vector<int64_t>& batch_sizes,
+                                    s_size_type depth) {
+        if (increments.ndimension() != 2) {
+            throw std::invalid_argument("Argument 'increments' must be a 2-dimensional tensor, with dimensions "
+                                        "corresponding to (packed stream, channel) respectively.");
+        }
+        if (increments.size(0) == 0 || increments.size(channel_dim) == 0) {
+            throw std::invalid_argument("Argument 'increments' cannot have dimensions of size zero.");
+        }
+        if (depth < 1) {
+            throw std::invalid_argument("Argument 'depth' must be an integer greater than or equal to one.");
+        }
+        if (!increments.is_floating_point()) {
+            throw std::invalid_argument("Argument 'increments' must be of floating point type.");
+        }
+        if (batch_sizes.size() == 0) {
+            throw std::invalid_argument("Argument 'batch_sizes' must be of nonzero length.");
+        }
+        int64_t total = 0;
+        int64_t prev_batch_size = batch_sizes[0];
+        for (auto batch_size : batch_sizes) {
+            if (batch_size < 1 || batch_size > prev_batch_size) {
+                throw std::invalid_argument("Argument 'batch_sizes' must be a nonincreasing sequence of positive "
+                                            "integers.");
+            }
+            prev_batch_size = batch_size;
+            total += batch_size;
+        }
+        if (total != increments.size(0)) {
+            throw std::invalid_argument("Argument 'batch_sizes' must sum to the size of the packed stream dimension of "
+                                        "'increments'.");
+        }
+    }
+
+    torch::Tensor ragged_signature_forward(torch::Tensor increments, std::vector<int64_t> batch_sizes,
+                                           s_size_type depth, bool stream, bool inverse, bool scalar_term) {
+        ragged_signature_checkargs(increments, batch_sizes, depth);
+
+        misc::GILRelease release;
+
+        increments = increments.detach().contiguous();
+
+        // Some constants to pass around
+        int64_t batch_size = batch_sizes[0];
+        int64_t num_steps = batch_sizes.size();
+        int64_t input_channel_size = increments.size(channel_dim);
+        int64_t output_channel_size = signature_channels(input_channel_size, depth, false);
+        int64_t output_channel_size_with_scalar = scalar_term ? (output_channel_size + 1) : output_channel_size;
+        torch::TensorOptions opts = increments.options();
+        torch::Tensor reciprocals = workspace::reciprocals(depth, opts);
+
+        // Decide how much OpenMP-based parallelism to use. We only parallelise over the batch dimension here.
+        int64_t stream_threads;
+        int64_t batch_threads;
+        signature::detail::decide_threads(increments.is_cuda(), batch_size, num_steps + 1, num_steps,
+                                          output_channel_size, stream, stream_threads, batch_threads);
+
+        torch::Tensor signature_with_scalar;
+        if (stream) {
+            signature_with_scalar = torch::empty({increments.size(0), output_channel_size_with_scalar}, opts);
+        }
+        else {
+            signature_with_scalar = torch::empty({batch_size, output_channel_size_with_scalar}, opts);
+        }
+        torch::Tensor signature;
+        if (scalar_term) {
+            signature_with_scalar.narrow(/*dim=*/channel_dim, /*start=*/0, /*length=*/1).fill_(1);
+            signature = signature_with_scalar.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                     /*length=*/output_channel_size);
+        }
+        else {
+            signature = signature_with_scalar;
+        }
+
+        // The batch elements are sorted by length, longest first, so that at every step the batch elements still
+        // being computed are a prefix of the batch. Thus we never do any work on the batch elements that have
+        // already finished.
+        std::vector<torch::Tensor> signature_by_term_at_stream;
+        misc::slice_by_term(signature.narrow(/*dim=*/0, /*start=*/0, /*length=*/batch_size),
+                            signature_by_term_at_stream, input_channel_size, depth);
+        ta_ops::restricted_exp(increments.narrow(/*dim=*/0, /*start=*/0, /*length=*/batch_size),
+                               signature_by_term_at_stream, reciprocals);
+
+        int64_t prev_offset = 0;
+        int64_t offset = batch_size;
+        for (int64_t step = 1; step < num_steps; ++step) {
+            int64_t step_batch_size = batch_sizes[step];
+            torch::Tensor signature_at_stream;
+            if (stream) {
+                signature_at_stream = signature.narrow(/*dim=*/0, /*start=*/offset, /*length=*/step_batch_size);
+                signature_at_stream.copy_(signature.narrow(/*dim=*/0, /*start=*/prev_offset,
+                                                           /*length=*/step_batch_size));
+            }
+            else {
+                signature_at_stream = signature.narrow(/*dim=*/0, /*start=*/0, /*length=*/step_batch_size);
+            }
+            misc::slice_by_term(signature_at_stream, signature_by_term_at_stream, input_channel_size, depth);
+            ta_ops::mult_fused_restricted_exp(increments.narrow(/*dim=*/0, /*start=*/offset,
+                                                                /*length=*/step_batch_size),
+                                              signature_by_term_at_stream,
+                                              inverse,
+                                              reciprocals,
+                                              batch_threads);
+            prev_offset = offset;
+            offset += step_batch_size;
+        }
+
+        return signature_with_scalar;
+    }
+
+    torch::Tensor ragged_signature_backward(torch::Tensor grad_signature, torch::Tensor signature,
+                                            torch::Tensor increments, std::vector<int64_t> batch_sizes,
+                                            s_size_type depth, bool stream, bool inverse, bool scalar_term) {
+        misc::GILRelease release;
+
+        if (scalar_term) {
+            grad_signature = grad_signature.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                                   /*length=*/grad_signature.size(channel_dim) - 1);
+            signature = signature.narrow(/*dim=*/channel_dim, /*start=*/1, /*length=*/signature.size(channel_dim) - 1);
+        }
+
+        grad_signature = grad_signature.detach();
+        signature = signature.detach();
+        increments = increments.detach().contiguous();
+
+        int64_t batch_size = batch_sizes[0];
+        int64_t num_steps = batch_sizes.size();
+        int64_t input_channel_size = increments.size(channel_dim);
+        torch::TensorOptions opts = signature.options();
+        torch::Tensor reciprocals = workspace::reciprocals(depth, opts);
+
+        std::vector<int64_t> offsets;
+        offsets.reserve(num_steps);
+        int64_t offset = 0;
+        for (auto step_batch_size : batch_sizes) {
+            offsets.push_back(offset);
+            offset += step_batch_size;
+        }
+
+        torch::Tensor grad_increments = torch::empty_like(increments);
+
+        // Decide how much OpenMP-based parallelism to use. As in the forward, we only parallelise over the batch
+        // dimension here.
+        int64_t stream_threads;
+        int64_t batch_threads;
+        signature::detail::decide_threads(increments.is_cuda(), batch_size, num_steps + 1, num_steps,
+                                          signature.size(channel_dim), stream, stream_threads, batch_threads);
+
+        // The gradient through the signature of each batch element, at the current step.
+        torch::Tensor grad_signature_at_stream;
+        // The signature of each batch element, at the current step. In the stream==true case we just look it up from
+        // the saved output. In the stream==false case we recompute it backwards, as in signature_backward.
+        torch::Tensor signature_at_stream;
+        if (stream) {
+            grad_signature_at_stream = torch::zeros({batch_size, signature.size(channel_dim)}, opts);
+        }
+        else {
+            grad_signature_at_stream = grad_signature.clone();
+            signature_at_stream = signature.clone();
+        }
+
+        std::vector<torch::Tensor> grad_signature_by_term_at_stream;
+        std::vector<torch::Tensor> signature_by_term_at_stream;
+        for (int64_t step = num_steps - 1; step >= 0; --step) {
+            int64_t step_batch_size = batch_sizes[step];
+            torch::Tensor grad_next = grad_increments.narrow(/*dim=*/0, /*start=*/offsets[step],
+                                                             /*length=*/step_batch_size);
+            torch::Tensor next = increments.narrow(/*dim=*/0, /*start=*/offsets[step], /*length=*/step_batch_size);
+            torch::Tensor grad_signature_at_stream_narrow = grad_signature_at_stream.narrow(/*dim=*/0, /*start=*/0,
+                                                                                            /*length=*/step_batch_size);
+            if (stream) {
+                // Gradients may well have accumulated on the signatures of the partial paths, so add those on here.
+                grad_signature_at_stream_narrow += grad_signature.narrow(/*dim=*/0, /*start=*/offsets[step],
+                                                                         /*length=*/step_batch_size);
+            }
+            misc::slice_by_term(grad_signature_at_stream_narrow, grad_signature_by_term_at_stream, input_channel_size,
+                                depth);
+
+            torch::Tensor signature_at_stream_narrow;
+            if (stream) {
+                if (step > 0) {
+                    signature_at_stream_narrow = signature.narrow(/*dim=*/0, /*start=*/offsets[step - 1],
+                                                                  /*length=*/step_batch_size);
+                }
+                else {
+                    signature_at_stream_narrow = signature.narrow(/*dim=*/0, /*start=*/0, /*length=*/batch_size);
+                }
+            }
+            else {
+                signature_at_stream_narrow = signature_at_stream.narrow(/*dim=*/0, /*start=*/0,
+                                                                        /*length=*/step_batch_size);
+            }
+            misc::slice_by_term(signature_at_stream_narrow, signature_by_term_at_stream, input_channel_size, depth);
+
+            if (step > 0) {
+                if (!stream) {
+                    // Recompute signature_by_term_at_stream
+                    ta_ops::mult_fused_restricted_exp(-next, signature_by_term_at_stream, inverse, reciprocals,
+                                                      batch_threads);
+                }
+                ta_ops::mult_fused_restricted_exp_backward(grad_next, grad_signature_by_term_at_stream, next,
+                                                           signature_by_term_at_stream, inverse, reciprocals,
+                                                           batch_threads);
+            }
+            else {
+                ta_ops::restricted_exp_backward(grad_next, grad_signature_by_term_at_stream, next,
+                                                signature_by_term_at_stream, reciprocals);
+            }
+        }
+
+        return grad_increments;
+    }
+
+    namespace signature {
+        namespace detail {
+            // Index information describing a prefix-closed collection of words, in the format expected by
+            // projected_signature_forward and projected_signature_backward.
+            struct projection {
+                projection(torch::Tensor words, torch::Tensor prefixes, torch::Tensor lengths, s_size_type depth,
+                           torch::TensorOptions opts) :
+                num_words{words.size(0)}, depth{depth}
+                {
+                    letters = words.reshape({num_words * depth});
+                    last_letter = (lengths - 1).view({1, num_words, 1});
+                    for (s_size_type depth_index = 0; depth_index < depth - 1; ++depth_index) {
+                        torch::Tensor active_at = lengths > depth_index + 1;
+                        prefix_index.push_back(prefixes.select(/*dim=*/1, /*index=*/depth_index));
+                        active.push_back(active_at);
+                        scale.push_back(active_at.to(opts.dtype()) /
+                                        (lengths - depth_index).clamp_min(1).to(opts.dtype()));
+                    }
+                }
+
+                int64_t num_words;
+                s_size_type depth;
+                // The letters of every word, of shape (num_words * depth).
+                torch::Tensor letters;
+                // The position of the last letter of every word, of shape (1, num_words, 1).
+                torch::Tensor last_letter;
+                // For each depth_index, the position of the prefix of length depth_index + 1 of every word.
+                std::vector<torch::Tensor> prefix_index;
+                // For each depth_index, whether every word has length greater than depth_index + 1.
+                std::vector<torch::Tensor> active;
+                // For each depth_index, 1 / (length - depth_index) for every active word, and zero otherwise.
+                std::vector<torch::Tensor> scale;
+            };
+
+            // Let w = (i_1, ..., i_k) be a word, S be a signature, and x be an increment. Then the coefficient of w in
+            // S \otimes \exp(x) is
+            // S(w) + x_{i_k} q_k,
+            // where q_1 = 1 and q_{j + 1} = S(i_1, ..., i_j) + q_j x_{i_j} / (k + 1 - j).
+            // This computes q_k for every word at once, and also returns every q_j in 'qs' if it is passed.
+            // 'increment_letters' is set to hold x_{i_j} for every word and every j.
+            torch::Tensor projected_q(torch::Tensor values, torch::Tensor increment, const projection& proj,
+                                      torch::Tensor& increment_letters, std::vector<torch::Tensor>* qs) {
+                increment_letters = increment.index_select(/*dim=*/channel_dim, proj.letters).view(
+                        {increment.size(batch_dim), proj.num_words, proj.depth});
+                torch::Tensor q = torch::ones_like(values);
+                if (qs != nullptr) {
+                    qs->push_back(q);
+                }
+                for (s_size_type depth_index = 0; depth_index < proj.depth - 1; ++depth_index) {
+                    torch::Tensor next_q = values.index_select(/*dim=*/channel_dim, proj.prefix_index[depth_index]) +
+                                           q * increment_letters.select(/*dim=*/2, /*index=*/depth_index) *
+                                           proj.scale[depth_index];
+                    q = torch::where(proj.active[depth_index], next_q, q);
+                    if (qs != nullptr) {
+                        qs->push_back(q);
+                    }
+                }
+                return q;
+            }
+
+            // Gives the value of x_{i_k} for every word (i_1, ..., i_k); c.f. projected_q.
+            torch::Tensor projected_last(torch::Tensor increment_letters, const projection& proj) {
+                return increment_letters.gather(/*dim=*/2, proj.last_letter.expand({increment_letters.size(0),
+                                                                                    proj.num_words,
+                                                                                    1})).squeeze(2);
+            }
+
+            // Modifies 'values' to hold the coefficients of 'values' \otimes \exp('increment'), for every word.
+            // As the collection of words is prefix-closed then this only depends on the coefficients of 'values' for
+            // those same words.
+            void projected_mult_exp(torch::Tensor values, torch::Tensor increment, const projection& proj) {
+                torch::Tensor increment_letters;
+                torch::Tensor q = projected_q(values, increment, proj, increment_letters, nullptr);
+                values += q * projected_last(increment_letters, proj);
+            }
+
+            // Backwards through projected_mult_exp.
+            // 'grad_values' should be the gradient through the result, and will be modified in-place to hold the
+            // gradient through the input 'values'.
+            // 'values' should be the input 'values'.
+            // 'grad_increment' will have the gradient through 'increment' copied into it.
+            void projected_mult_exp_backward(torch::Tensor grad_values, torch::Tensor grad_increment,
+                                             torch::Tensor values, torch::Tensor increment, const projection& proj) {
+                torch::Tensor increment_letters;
+                std::vector<torch::Tensor> qs;
+                projected_q(values, increment, proj, increment_letters, &qs);
+
+                torch::Tensor grad_increment_letters = torch::zeros_like(increment_letters);
+                torch::Tensor last_letter = proj.last_letter.expand({increment_letters.size(0), proj.num_words, 1});
+                grad_increment_letters.scatter_(/*dim=*/2, last_letter, (grad_values * qs.back()).unsqueeze(2));
+                torch::Tensor grad_q = grad_values * projected_last(increment_letters, proj);
+                for (s_size_type depth_index = proj.depth - 2; depth_index >= 0; --depth_index) {
+                    torch::Tensor grad_next_q = torch::where(proj.active[depth_index], grad_q,
+                                                             torch::zeros_like(grad_q));
+                    grad_values.index_add_(/*dim=*/1, proj.prefix_index[depth_index], grad_next_q);
+                    grad_increment_letters.select(/*dim=*/2, /*index=*/depth_index) += grad_next_q * qs[depth_index] *
+                                                                                       proj.scale[depth_index];
+                    grad_q = torch::where(proj.active[depth_index],
+                                          grad_q * increment_letters.select(/*dim=*/2, /*index=*/depth_index) *
+                                          proj.scale[depth_index],
+                                          grad_q);
+                }
+                grad_increment.zero_();
+                grad_increment.index_add_(/*dim=*/1, proj.letters,
+                                          grad_increment_letters.view({increment_letters.size(0),
+                                                                       proj.num_words * proj.depth}));
+            }
+        }  // namespace signatory::signature::detail
+    }  // namespace signatory::signature
+
+    std::tuple<torch::Tensor, torch::Tensor>
+    projected_signature_forward(torch::Tensor path, s_size_type depth, torch::Tensor words, torch::Tensor prefixes,
+                                torch::Tensor lengths, bool basepoint, torch::Tensor basepoint_value) {
+        signature_checkargs(path, depth, basepoint, basepoint_value, /*initial=*/false,
+                            /*initial_value=*/torch::Tensor {}, /*scalar_term=*/false, /*leadlag=*/false,
+                            /*from_increments=*/false);
+
+        misc::GILRelease release;
+
+        path = path.detach();
+        basepoint_value = basepoint_value.detach();
+
+        torch::TensorOptions opts = path.options();
+        signature::detail::projection proj {words, prefixes, lengths, depth, opts};
+        torch::Tensor path_increments = signature::detail::compute_path_increments(path, basepoint, basepoint_value,
+                                                                                   /*inverse=*/false);
+
+        // Starting from zero rather than from the empty signature is fine, as every word is nonempty.
+        torch::Tensor values = torch::zeros({path.size(batch_dim), proj.num_words}, opts);
+        for (int64_t stream_index = 0; stream_index < path_increments.size(stream_dim); ++stream_index) {
+            signature::detail::projected_mult_exp(values, path_increments[stream_index], proj);
+        }
+
+        return std::tuple<torch::Tensor, torch::Tensor> {values, path_increments};
+    }
+
+    std::tuple<torch::Tensor, torch::Tensor>
+    projected_signature_backward(torch::Tensor grad_values, torch::Tensor values, torch::Tensor path_increments,
+                                 s_size_type depth, torch::Tensor words, torch::Tensor prefixes, torch::Tensor lengths,
+                                 bool basepoint) {
+        misc::GILRelease release;
+
+        // We modify these in-place
+        grad_values = grad_values.detach().clone();
+        values = values.detach().clone();
+        path_increments = path_increments.detach();
+
+        torch::TensorOptions opts = values.options();
+        signature::detail::projection proj {words, prefixes, lengths, depth, opts};
+        torch::Tensor grad_path_increments = torch::empty_like(path_increments);
+
+        // As in signature_backward, we recompute the intermediate values backwards, using the reversibility of the
+        // signature.
+        for (int64_t stream_index = path_increments.size(stream_dim) - 1; stream_index >= 1; --stream_index) {
+            torch::Tensor next = path_increments[stream_index];
+            signature::detail::projected_mult_exp(values, -next, proj);
+            signature::detail::projected_mult_exp_backward(grad_values, grad_path_increments[stream_index], values,
+                                                           next, proj);
+        }
+        values.zero_();
+        signature::detail::projected_mult_exp_backward(grad_values, grad_path_increments[0], values,
+                                                       path_increments[0], proj);
+
+        torch::Tensor grad_path;
+        torch::Tensor grad_basepoint_value;
+        std::tie(grad_path, grad_basepoint_value) = signature::detail::compute_path_increments_backward(
+                                                                                                   grad_path_increments,
+                                                                                                   basepoint,
+                                                                                                   /*inverse=*/false,
+                                                                                                   opts);
+        return std::tuple<torch::Tensor, torch::Tensor> {grad_path, grad_basepoint_value};
     }
 }  // namespace signatory
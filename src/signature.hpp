@@ -21,17 +21,92 @@
 namespace signatory {
     // Checks the arguments for the signature_forward function.
     void signature_checkargs(torch::Tensor path, s_size_type depth, bool basepoint, torch::Tensor basepoint_value,
-                             bool initial, torch::Tensor initial_value, bool scalar_term);
+                             bool initial, torch::Tensor initial_value, bool scalar_term, bool leadlag,
+                             bool from_increments);
 
     // See signatory.signature for documentation
+    // The running signature is accumulated in the dtype of 'accumulate_like', whose values are not used. The inputs and
+    // outputs are in the dtype of 'path'.
+    // If 'from_increments' is true then 'path' is instead taken to already be the increments of the path (see
+    // signatory.signature_from_increments), in which case 'basepoint' must be false. The same flag must then be passed
+    // to signature_backward, signature_double_backward and signature_jvp.
+    // If 'batch_first' is true and stream==true then the result is of shape (stream, batch, channel) as usual, but is
+    // laid out in memory as (batch, stream, channel), i.e. it is contiguous once transposed.
+    // If 'out' is true then the result is written into 'out_value' (which is then returned), which must already have
+    // been checked to be of the correct shape, dtype and device. The value of 'batch_first' is then irrelevant.
+    // If 'check' is false then the arguments are assumed to have already been checked with signature_checkargs.
     std::tuple<torch::Tensor, torch::Tensor>
     signature_forward(torch::Tensor path, s_size_type depth, bool stream, bool basepoint, torch::Tensor basepoint_value,
-                      bool inverse, bool initial, torch::Tensor initial_value, bool scalar_term);
+                      bool inverse, bool initial, torch::Tensor initial_value, bool scalar_term, bool leadlag,
+                      bool from_increments, bool batch_first, torch::Tensor accumulate_like, bool out,
+                      torch::Tensor out_value, bool check);
 
     // See signatory.signature for documentation
     std::tuple<torch::Tensor, torch::Tensor, torch::Tensor>
     signature_backward(torch::Tensor grad_signature, torch::Tensor signature, torch::Tensor path_increments,
-                       s_size_type depth, bool stream, bool basepoint, bool inverse, bool initial, bool scalar_term);
+                       s_size_type depth, bool stream, bool basepoint, bool inverse, bool initial, bool scalar_term,
+                       bool leadlag, bool from_increments, torch::Tensor accumulate_like, int64_t checkpoint_every);
+
+    // Backwards through signature_backward. Given the gradient 'grad_signature' and perturbations 'tangent_path',
+    // 'tangent_basepoint_value' and 'tangent_initial_value' to the inputs of signature_forward, returns the
+    // corresponding perturbation to the signature, and the gradients of <grad_signature, perturbation to the
+    // signature> with respect to the path, basepoint value and initial value. (That is, Hessian-vector products.)
+    // The signature is recomputed from 'path_increments' and 'initial_value' rather than being saved.
+    std::tuple<torch::Tensor, torch::Tensor, torch::Tensor, torch::Tensor>
+    signature_double_backward(torch::Tensor grad_signature, torch::Tensor path_increments, torch::Tensor tangent_path,
+                              torch::Tensor tangent_basepoint_value, torch::Tensor initial_value,
+                              torch::Tensor tangent_initial_value, s_size_type depth, bool stream, bool basepoint,
+                              bool inverse, bool initial, bool scalar_term, bool leadlag, bool from_increments,
+                              torch::Tensor accumulate_like);
+
+    // Forward-mode differentiation of signature_forward. Given perturbations 'tangent_path', 'tangent_basepoint_value'
+    // and 'tangent_initial_value' to its inputs, returns the corresponding perturbation to the signature.
+    // 'path_increments' is as returned by signature_forward.
+    torch::Tensor signature_jvp(torch::Tensor path_increments, torch::Tensor tangent_path,
+                                torch::Tensor tangent_basepoint_value, torch::Tensor initial_value,
+                                torch::Tensor tangent_initial_value, s_size_type depth, bool stream, bool basepoint,
+                                bool inverse, bool initial, bool scalar_term, bool leadlag, bool from_increments,
+                                torch::Tensor accumulate_like);
+
+    // Checks the arguments for the ragged_signature_forward function.
+    void ragged_signature_checkargs(torch::Tensor increments, const std::vector<int64_t>& batch_sizes,
+                                    s_size_type depth);
+
+    // Computes the signatures of a batch of paths of different lengths.
+    // 'increments' should be of shape (packed stream, channel), holding the path increments of every batch element,
+    // packed in a time-major order: first the first increment of every batch element, then the second increment of
+    // every batch element that has one, and so on.
+    // The batch elements should be sorted by length, longest first.
+    // 'batch_sizes' should specify how many batch elements have an increment at each step.
+    // If stream==false then the result is of shape (batch, channel). If stream==true then the result is packed in the
+    // same way as 'increments'.
+    // See also signatory.ragged_signature.
+    torch::Tensor ragged_signature_forward(torch::Tensor increments, std::vector<int64_t> batch_sizes,
+                                           s_size_type depth, bool stream, bool inverse, bool scalar_term);
+
+    // Backwards through ragged_signature_forward. Returns the gradient through 'increments'.
+    torch::Tensor ragged_signature_backward(torch::Tensor grad_signature, torch::Tensor signature,
+                                            torch::Tensor increments, std::vector<int64_t> batch_sizes,
+                                            s_size_type depth, bool stream, bool inverse, bool scalar_term);
+
+    // Computes just some of the coefficients of the signature.
+    // 'words' should be of shape (num_words, depth), and specifies a prefix-closed collection of nonempty words,
+    // ordered by length. Each row holds the letters of one word, padded with zeros.
+    // 'prefixes' should be of the same shape, and each row should hold the positions in 'words' of the prefixes of that
+    // word, of length one, two, etc., padded with zeros.
+    // 'lengths' should be of shape (num_words,) and specifies the length of each word.
+    // Returns the coefficients of the signature corresponding to these words, of shape (batch, num_words), and the
+    // path increments.
+    // See also signatory.projected_signature.
+    std::tuple<torch::Tensor, torch::Tensor>
+    projected_signature_forward(torch::Tensor path, s_size_type depth, torch::Tensor words, torch::Tensor prefixes,
+                                torch::Tensor lengths, bool basepoint, torch::Tensor basepoint_value);
+
+    // Backwards through projected_signature_forward. Returns the gradients through the path and the basepoint.
+    std::tuple<torch::Tensor, torch::Tensor>
+    projected_signature_backward(torch::Tensor grad_values, torch::Tensor values, torch::Tensor path_increments,
+                                 s_size_type depth, torch::Tensor words, torch::Tensor prefixes, torch::Tensor lengths,
+                                 bool basepoint);
 }  // namespace signatory
 
 #endif //SIGNATORY_SIGNATURE_HPP
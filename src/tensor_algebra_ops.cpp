@@ -15,14 +15,18 @@
 
 
 #include <torch/extension.h>
+#include <algorithm>  // std::min
 #include <cstdint>    // int64_t
 #include <stdexcept>  // std::invalid_argument
 #include <type_traits>  // std::is_same
-#include <utility>    // std::pair
+#include <utility>    // std::pair, std::swap
 #include <vector>     // std::vector
 
+#include "cpu_kernels.hpp"
 #include "misc.hpp"
+#include "parallelism.hpp"
 #include "tensor_algebra_ops.hpp"
+#include "workspace.hpp"
 
 
 namespace signatory {
@@ -105,6 +109,38 @@ namespace signatory {
                                                            const std::vector<torch::Tensor>& arg1,
                                                            const std::vector<torch::Tensor>& arg2);
 
+        void mult_tangent(std::vector<torch::Tensor>& tangent_arg1, const std::vector<torch::Tensor>& tangent_arg2,
+                          const std::vector<torch::Tensor>& arg1, const std::vector<torch::Tensor>& arg2) {
+            s_size_type depth = arg1.size();
+            for (s_size_type depth_index = depth - 1; depth_index >= 0; --depth_index) {
+                torch::Tensor tangent_at_depth = tangent_arg1[depth_index];
+                // tangent_arg1 \otimes arg2, where arg2 has scalar value one...
+                detail::mult_inner(tangent_at_depth, tangent_arg1, arg2, depth_index);
+                // ...plus arg1 \otimes tangent_arg2, where arg1 has scalar value one.
+                detail::mult_inner(tangent_at_depth, arg1, tangent_arg2, depth_index);
+                tangent_at_depth += tangent_arg2[depth_index];
+            }
+        }
+
+        void mult_tangent_backward(std::vector<torch::Tensor>& grad_tangent_arg1,
+                                   std::vector<torch::Tensor>& grad_tangent_arg2,
+                                   std::vector<torch::Tensor>& grad_arg1,
+                                   std::vector<torch::Tensor>& grad_arg2,
+                                   const std::vector<torch::Tensor>& tangent_arg1,
+                                   const std::vector<torch::Tensor>& tangent_arg2,
+                                   const std::vector<torch::Tensor>& arg1,
+                                   const std::vector<torch::Tensor>& arg2) {
+            s_size_type depth = arg1.size();
+            for (s_size_type depth_index = 0; depth_index < depth; ++depth_index) {
+                torch::Tensor grad_tangent_at_depth = grad_tangent_arg1[depth_index];
+                grad_tangent_arg2[depth_index] += grad_tangent_at_depth;
+                detail::mult_inner_backward(grad_tangent_at_depth, grad_tangent_arg1, grad_arg2, tangent_arg1, arg2,
+                                            depth_index);
+                detail::mult_inner_backward(grad_tangent_at_depth, grad_arg1, grad_tangent_arg2, arg1, tangent_arg2,
+                                            depth_index);
+            }
+        }
+
         /**********************************************************
          * Forward and backward computations for 'restricted_exp' *
          **********************************************************/
@@ -160,6 +196,58 @@ namespace signatory {
             }
         }
 
+        void restricted_exp_tangent(torch::Tensor in, torch::Tensor tangent_in, const std::vector<torch::Tensor>& out,
+                                    std::vector<torch::Tensor>& tangent_out, torch::Tensor reciprocals) {
+            // out[i + 1] = (in \otimes out[i]) * reciprocals[i], so its derivative is
+            // (tangent_in \otimes out[i] + in \otimes tangent_out[i]) * reciprocals[i].
+            int64_t batch_size = in.size(batch_dim);
+            int64_t input_channel_size = in.size(channel_dim);
+            tangent_out[0].copy_(tangent_in);
+            for (s_size_type i = 0; i < static_cast<s_size_type>(tangent_out.size()) - 1; ++i) {
+                torch::Tensor view_tangent_out = tangent_out[i + 1].view({batch_size,
+                                                                          input_channel_size,
+                                                                          out[i].size(channel_dim)});
+                torch::mul_out(view_tangent_out, out[i].unsqueeze(channel_dim - 1), tangent_in.unsqueeze(channel_dim));
+                view_tangent_out.addcmul_(tangent_out[i].unsqueeze(channel_dim - 1), in.unsqueeze(channel_dim));
+                tangent_out[i + 1] *= reciprocals[i];
+            }
+        }
+
+        void restricted_exp_tangent_backward(torch::Tensor grad_in,
+                                             std::vector<torch::Tensor>& grad_out,
+                                             std::vector<torch::Tensor>& grad_tangent_out,
+                                             torch::Tensor in,
+                                             torch::Tensor tangent_in,
+                                             const std::vector<torch::Tensor>& out,
+                                             const std::vector<torch::Tensor>& tangent_out,
+                                             torch::Tensor reciprocals) {
+            int64_t batch_size = in.size(batch_dim);
+            int64_t input_channel_size = in.size(channel_dim);
+            s_size_type depth = out.size();
+            torch::Tensor grad_in_unsqueeze = grad_in.unsqueeze(channel_dim);
+            grad_in.zero_();
+            for (s_size_type i = depth - 2; i >= 0; --i) {
+                grad_out[i + 1] *= reciprocals[i];
+                grad_tangent_out[i + 1] *= reciprocals[i];
+                torch::Tensor view_grad_out = grad_out[i + 1].view({batch_size,
+                                                                    input_channel_size,
+                                                                    out[i].size(channel_dim)});
+                torch::Tensor view_grad_tangent_out = grad_tangent_out[i + 1].view({batch_size,
+                                                                                    input_channel_size,
+                                                                                    out[i].size(channel_dim)});
+                // Through in \otimes out[i]
+                grad_in_unsqueeze.baddbmm_(view_grad_out, out[i].unsqueeze(channel_dim));
+                grad_out[i].unsqueeze(channel_dim - 1).baddbmm_(in.unsqueeze(channel_dim - 1), view_grad_out);
+                // Through tangent_in \otimes out[i] + in \otimes tangent_out[i]
+                grad_in_unsqueeze.baddbmm_(view_grad_tangent_out, tangent_out[i].unsqueeze(channel_dim));
+                grad_out[i].unsqueeze(channel_dim - 1).baddbmm_(tangent_in.unsqueeze(channel_dim - 1),
+                                                                view_grad_tangent_out);
+                grad_tangent_out[i].unsqueeze(channel_dim - 1).baddbmm_(in.unsqueeze(channel_dim - 1),
+                                                                        view_grad_tangent_out);
+            }
+            grad_in += grad_out[0];
+        }
+
         /*********************************************************************
          * Forward and backward computations for 'mult_fused_restricted_exp' *
          *********************************************************************/
@@ -177,30 +265,6 @@ namespace signatory {
          */
 
         namespace detail {
-            // Adapted from https://stackoverflow.com/a/21028912/12254339
-            // Substitutes value initialisation for default initialisation, which for basic types means that they're not
-            // initialised, which is a performance improvement.
-            template <typename T, typename A=std::allocator<T>>
-            class default_init_allocator : public A {
-                using a_t = std::allocator_traits<A>;
-            public:
-                template <typename U>
-                struct rebind {
-                    using other = default_init_allocator<U, typename a_t::template rebind_alloc<U>>;
-                };
-
-                using A::A;
-
-                template <typename U>
-                void construct(U* ptr) noexcept(std::is_nothrow_default_constructible<U>::value) {
-                    ::new(static_cast<void*>(ptr)) U;
-                }
-                template <typename U, typename...Args>
-                void construct(U* ptr, Args&&... args) {
-                    a_t::construct(static_cast<A&>(*this), ptr, std::forward<Args>(args)...);
-                }
-            };
-
             void mult_fused_restricted_exp_cuda(torch::Tensor next, std::vector<torch::Tensor>& prev, bool inverse,
                                                 torch::Tensor reciprocals) {
                 // We haven't tried writing custom GPU code. But if we did it would go here. Instead this is
@@ -261,28 +325,211 @@ namespace signatory {
             }
             // That's the forward operation, written in terms of high-level PyTorch tensors. That wasn't so bad, was it?
 
-            // This describes the forward operation for a single batch element on the CPU.
-            // No parallelisation is performed in this computation at the moment. We could probably add it on but it
-            // probably won't give a huge advantage.
-            // We already parallelise over the batch and stream dimensions. So to see a speedup from parallelisation
-            // here, we'd need to be computing signatures of just a few short paths, to high depths. Still, worth
-            // thinking about.
-            template <typename scalar_t, bool inverse>
-            void mult_fused_restricted_exp_cpu_inner(torch::TensorAccessor<scalar_t, 2> next_a,
-                                                     std::vector<torch::TensorAccessor<scalar_t, 2>>& prev_a,
-                                                     torch::TensorAccessor<scalar_t, 1> reciprocals_a,
-                                                     int64_t batch_index,
-                                                     std::vector<scalar_t, default_init_allocator<scalar_t>>& next_divided,
-                                                     std::vector<scalar_t, default_init_allocator<scalar_t>>& new_scratch,
-                                                     std::vector<scalar_t, default_init_allocator<scalar_t>>& old_scratch) {
+            // This basically just parallelises over the batch elements, calling mult_fused_restricted_exp_cpu_inner on
+            // each one.
+            template <typename scalar_t>
+            void mult_fused_restricted_exp_cpu(torch::Tensor next, std::vector<torch::Tensor>& prev, bool inverse,
+                                               torch::Tensor reciprocals, int64_t batch_threads) {
+                int64_t batch_size = next.size(batch_dim);
+                int64_t input_channel_size = next.size(channel_dim);
+                s_size_type depth = prev.size();
+
+                using acc_t = typename accumulate_type<scalar_t>::type;
+
+                // The kernels just get the memory of each tensor; see cpu_kernels.hpp.
+                std::vector<scalar_t*> prev_data;
+                std::vector<int64_t> prev_batch_strides;
+                std::vector<int64_t> prev_channel_strides;
+                prev_data.reserve(depth);
+                prev_batch_strides.reserve(depth);
+                prev_channel_strides.reserve(depth);
+                for (const auto& elem : prev) {
+                    prev_data.push_back(elem.data_ptr<scalar_t>());
+                    prev_batch_strides.push_back(elem.stride(batch_dim));
+                    prev_channel_strides.push_back(elem.stride(channel_dim));
+                }
+                mult_fused_restricted_exp_cpu_args<scalar_t> args;
+                args.next = next.data_ptr<scalar_t>();
+                args.next_batch_stride = next.stride(batch_dim);
+                args.next_channel_stride = next.stride(channel_dim);
+                args.prev = prev_data.data();
+                args.prev_batch_strides = prev_batch_strides.data();
+                args.prev_channel_strides = prev_channel_strides.data();
+                args.reciprocals = reciprocals.data_ptr<scalar_t>();
+                args.reciprocals_stride = reciprocals.stride(0);
+                args.reciprocals_size = reciprocals.size(0);
+                args.input_channel_size = input_channel_size;
+                args.depth = depth;
+                args.inverse = inverse;
+                // The vectorised loops are only written for when no mixed precision is involved. They read along the
+                // channel dimension directly, so it has to be contiguous.
+                args.vectorise = std::is_same<scalar_t, acc_t>::value && next.stride(channel_dim) == 1;
+                for (const auto& elem : prev) {
+                    args.vectorise = args.vectorise && elem.stride(channel_dim) == 1;
+                }
+
+                // The version of mult_fused_restricted_exp_cpu_inner for the best instruction set this CPU supports.
+                mult_fused_restricted_exp_cpu_inner_fn<scalar_t> inner =
+                        mult_fused_restricted_exp_cpu_inner_dispatch<scalar_t>();
+
+                // commented out because of what I think is an MSVC bug?
+                #pragma omp parallel /*default(none)*/ \
+                                     if(batch_threads > 1) \
+                                     num_threads(batch_threads) \
+                                     shared(batch_size, args, input_channel_size, depth, inner)
+                {
+                    // Get scratch space outside of the hot loop. This is drawn from this thread's workspace, so that
+                    // it's only actually allocated the first time around.
+                    // Figure out how large each piece is going to get by the end of the computation.
+                    int64_t next_divided_size = args.reciprocals_size * input_channel_size;
+                    int64_t old_scratch_size = 0;
+                    int64_t new_scratch_size = 0;
+                    if (depth > 1) {
+                        if ((depth % 2) == 0) {
+                            old_scratch_size = pow(input_channel_size, depth - 2);
+                            new_scratch_size = old_scratch_size * input_channel_size;
+                        }
+                        else {
+                            new_scratch_size = pow(input_channel_size, depth - 2);
+                            old_scratch_size = new_scratch_size * input_channel_size;
+                        }
+                    }
+                    workspace::Block block = workspace::get(next.scalar_type(), input_channel_size, depth,
+                                                            workspace::Slot::MultFusedRestrictedExp,
+                                                            (next_divided_size + old_scratch_size + new_scratch_size) *
+                                                            sizeof(acc_t));
+                    acc_t* next_divided = block.data<acc_t>();
+                    acc_t* old_scratch = next_divided + next_divided_size;
+                    acc_t* new_scratch = old_scratch + old_scratch_size;
+
+                    #pragma omp for schedule(static)
+                    for (int64_t batch_index = 0; batch_index < batch_size; ++batch_index) {
+                        // Actually do the computation.
+                        inner(args, batch_index, next_divided, new_scratch, old_scratch);
+                    }
+                }
+
+            }
+
+            // As mult_fused_restricted_exp_cuda, additionally propagating a perturbation 'tangent_next' to 'next' and
+            // a perturbation 'tangent_prev' to 'prev'. Every operation is replaced by the corresponding operation on
+            // dual numbers.
+            void mult_fused_restricted_exp_tangent_cuda(torch::Tensor next, torch::Tensor tangent_next,
+                                                        std::vector<torch::Tensor>& prev,
+                                                        std::vector<torch::Tensor>& tangent_prev, bool inverse,
+                                                        torch::Tensor reciprocals) {
+                int64_t batch_size = next.size(batch_dim);
+                int64_t input_channel_size = next.size(channel_dim);
+                s_size_type depth = prev.size();
+
+                torch::Tensor next_divided = next.unsqueeze(0) * reciprocals.unsqueeze(1).unsqueeze(2);
+                torch::Tensor tangent_next_divided = tangent_next.unsqueeze(0) * reciprocals.unsqueeze(1).unsqueeze(2);
+
+                int64_t left_channel_dim;
+                int64_t right_channel_dim;
+                if (inverse) {
+                    left_channel_dim = channel_dim - 1;
+                    right_channel_dim = channel_dim;
+                }
+                else {
+                    left_channel_dim = channel_dim;
+                    right_channel_dim = channel_dim - 1;
+                }
+                auto view_as_matrix = [&](torch::Tensor tensor, int64_t scratch_size) -> torch::Tensor {
+                    if (inverse) {
+                        return tensor.view({batch_size, input_channel_size, scratch_size});
+                    }
+                    else {
+                        return tensor.view({batch_size, scratch_size, input_channel_size});
+                    }
+                };
+
+                for (s_size_type depth_index = depth - 1; depth_index >= 1; --depth_index) {
+                    torch::Tensor scratch = prev[0] + next_divided[depth_index - 1];
+                    torch::Tensor tangent_scratch = tangent_prev[0] + tangent_next_divided[depth_index - 1];
+                    for (s_size_type j = 1, k = depth_index - 2; j < depth_index; ++j, --k) {
+                        auto old_scratch_size = scratch.size(channel_dim);
+                        torch::Tensor scratch_left = scratch.unsqueeze(left_channel_dim);
+                        tangent_scratch = view_as_matrix(tangent_prev[j], old_scratch_size)
+                                .addcmul(tangent_scratch.unsqueeze(left_channel_dim),
+                                         next_divided[k].unsqueeze(right_channel_dim))
+                                .addcmul_(scratch_left, tangent_next_divided[k].unsqueeze(right_channel_dim));
+                        scratch = view_as_matrix(prev[j], old_scratch_size)
+                                .addcmul(scratch_left, next_divided[k].unsqueeze(right_channel_dim));
+                        scratch = scratch.view({batch_size, old_scratch_size * input_channel_size});
+                        tangent_scratch = tangent_scratch.view({batch_size, old_scratch_size * input_channel_size});
+                    }
+                    view_as_matrix(tangent_prev[depth_index], scratch.size(channel_dim))
+                            .addcmul_(tangent_scratch.unsqueeze(left_channel_dim), next.unsqueeze(right_channel_dim))
+                            .addcmul_(scratch.unsqueeze(left_channel_dim), tangent_next.unsqueeze(right_channel_dim));
+                    view_as_matrix(prev[depth_index], scratch.size(channel_dim))
+                            .addcmul_(scratch.unsqueeze(left_channel_dim), next.unsqueeze(right_channel_dim));
+                }
+                prev[0] += next;
+                tangent_prev[0] += tangent_next;
+            }
+
+            // Scratch space for mult_fused_restricted_exp_tangent_cpu_inner. As with backward_scratch, this is drawn
+            // from each thread's workspace, so that it's only actually allocated the first time around.
+            template <typename acc_t>
+            struct tangent_scratch {
+                // The largest that any scratch vector gets.
+                static int64_t scratch_size(int64_t input_channel_size, s_size_type depth) {
+                    return depth > 1 ? static_cast<int64_t>(pow(input_channel_size, depth - 1)) : 0;
+                }
+
+                tangent_scratch(torch::ScalarType dtype, int64_t input_channel_size, s_size_type depth,
+                                int64_t num_reciprocals) :
+                block{workspace::get(dtype, input_channel_size, depth, workspace::Slot::MultFusedRestrictedExpTangent,
+                                     (2 * num_reciprocals * input_channel_size +
+                                      4 * scratch_size(input_channel_size, depth)) * sizeof(acc_t))}
+                {
+                    next_divided = block.data<acc_t>();
+                    tangent_next_divided = next_divided + num_reciprocals * input_channel_size;
+                    old_scratch = tangent_next_divided + num_reciprocals * input_channel_size;
+                    new_scratch = old_scratch + scratch_size(input_channel_size, depth);
+                    old_tangent_scratch = new_scratch + scratch_size(input_channel_size, depth);
+                    new_tangent_scratch = old_tangent_scratch + scratch_size(input_channel_size, depth);
+                }
+
+                workspace::Block block;
+                acc_t* next_divided;
+                acc_t* tangent_next_divided;
+                acc_t* old_scratch;
+                acc_t* new_scratch;
+                acc_t* old_tangent_scratch;
+                acc_t* new_tangent_scratch;
+            };
+
+            // As mult_fused_restricted_exp_cpu_inner, additionally propagating the perturbations 'tangent_next_a' and
+            // 'tangent_prev_a'. This follows the same loop structure, just operating on dual numbers.
+            template <typename scalar_t, typename acc_t, bool inverse>
+            void mult_fused_restricted_exp_tangent_cpu_inner(
+                    torch::TensorAccessor<scalar_t, 2> next_a,
+                    torch::TensorAccessor<scalar_t, 2> tangent_next_a,
+                    std::vector<torch::TensorAccessor<scalar_t, 2>>& prev_a,
+                    std::vector<torch::TensorAccessor<scalar_t, 2>>& tangent_prev_a,
+                    torch::TensorAccessor<scalar_t, 1> reciprocals_a,
+                    int64_t batch_index,
+                    tangent_scratch<acc_t>& scratch_space) {
                 int64_t input_channel_size = next_a.size(1);  // 1 is the channel dimension
                 s_size_type depth = prev_a.size();
 
+                auto& next_divided = scratch_space.next_divided;
+                auto& tangent_next_divided = scratch_space.tangent_next_divided;
+                auto& old_scratch = scratch_space.old_scratch;
+                auto& new_scratch = scratch_space.new_scratch;
+                auto& old_tangent_scratch = scratch_space.old_tangent_scratch;
+                auto& new_tangent_scratch = scratch_space.new_tangent_scratch;
+
                 int64_t next_divided_index = 0;
                 for (int64_t reciprocal_index = 0; reciprocal_index < reciprocals_a.size(0); ++reciprocal_index) {
+                    acc_t reciprocal = static_cast<acc_t>(reciprocals_a[reciprocal_index]);
                     for (int64_t channel_index = 0; channel_index < input_channel_size; ++channel_index) {
-                        next_divided[next_divided_index] = reciprocals_a[reciprocal_index] *
-                                                           next_a[batch_index][channel_index];
+                        next_divided[next_divided_index] =
+                                reciprocal * static_cast<acc_t>(next_a[batch_index][channel_index]);
+                        tangent_next_divided[next_divided_index] =
+                                reciprocal * static_cast<acc_t>(tangent_next_a[batch_index][channel_index]);
                         ++next_divided_index;
                     }
                 }
@@ -293,14 +540,20 @@ namespace signatory {
                     int64_t next_divided_index_part = (depth_index - 1) * input_channel_size;
 
                     for (int64_t scratch_index = 0; scratch_index < input_channel_size; ++scratch_index) {
-                        new_scratch[scratch_index] = prev_a[0][batch_index][scratch_index] +
+                        new_scratch[scratch_index] = static_cast<acc_t>(prev_a[0][batch_index][scratch_index]) +
                                                      next_divided[next_divided_index_part + scratch_index];
+                        new_tangent_scratch[scratch_index] =
+                                static_cast<acc_t>(tangent_prev_a[0][batch_index][scratch_index]) +
+                                tangent_next_divided[next_divided_index_part + scratch_index];
                     }
 
                     for (s_size_type j = 1, k = depth_index - 2; j < depth_index; ++j, --k) {
-                        old_scratch.swap(new_scratch);
+                        std::swap(old_scratch, new_scratch);
+                        std::swap(old_tangent_scratch, new_tangent_scratch);
                         int64_t next_divided_index_part2 = k * input_channel_size;
                         for (int64_t old_scratch_index = 0; old_scratch_index < scratch_size; ++old_scratch_index) {
+                            acc_t old_scratch_value = old_scratch[old_scratch_index];
+                            acc_t old_tangent_scratch_value = old_tangent_scratch[old_scratch_index];
                             for (int64_t channel_index = 0; channel_index < input_channel_size; ++channel_index) {
                                 int64_t new_scratch_index;
                                 if (inverse) {
@@ -309,9 +562,16 @@ namespace signatory {
                                 else {
                                     new_scratch_index = old_scratch_index * input_channel_size + channel_index;
                                 }
-                                new_scratch[new_scratch_index] = prev_a[j][batch_index][new_scratch_index] +
-                                                                 old_scratch[old_scratch_index] *
-                                                                 next_divided[next_divided_index_part2 + channel_index];
+                                acc_t next_divided_value = next_divided[next_divided_index_part2 + channel_index];
+                                acc_t tangent_next_divided_value =
+                                        tangent_next_divided[next_divided_index_part2 + channel_index];
+                                new_scratch[new_scratch_index] =
+                                        static_cast<acc_t>(prev_a[j][batch_index][new_scratch_index]) +
+                                        old_scratch_value * next_divided_value;
+                                new_tangent_scratch[new_scratch_index] =
+                                        static_cast<acc_t>(tangent_prev_a[j][batch_index][new_scratch_index]) +
+                                        old_tangent_scratch_value * next_divided_value +
+                                        old_scratch_value * tangent_next_divided_value;
                             }
                         }
 
@@ -319,6 +579,8 @@ namespace signatory {
                     }
 
                     for (int64_t new_scratch_index = 0; new_scratch_index < scratch_size; ++new_scratch_index) {
+                        acc_t new_scratch_value = new_scratch[new_scratch_index];
+                        acc_t new_tangent_scratch_value = new_tangent_scratch[new_scratch_index];
                         for (int64_t next_index = 0; next_index < input_channel_size; ++next_index) {
                             int64_t prev_a_index;
                             if (inverse) {
@@ -327,94 +589,81 @@ namespace signatory {
                             else {
                                 prev_a_index = new_scratch_index * input_channel_size + next_index;
                             }
-                            prev_a[depth_index][batch_index][prev_a_index] += new_scratch[new_scratch_index] *
-                                                                 next_a[batch_index][next_index];
+                            acc_t next_value = static_cast<acc_t>(next_a[batch_index][next_index]);
+                            acc_t tangent_next_value = static_cast<acc_t>(tangent_next_a[batch_index][next_index]);
+                            tangent_prev_a[depth_index][batch_index][prev_a_index] = static_cast<scalar_t>(
+                                    static_cast<acc_t>(tangent_prev_a[depth_index][batch_index][prev_a_index]) +
+                                    new_tangent_scratch_value * next_value +
+                                    new_scratch_value * tangent_next_value);
+                            prev_a[depth_index][batch_index][prev_a_index] = static_cast<scalar_t>(
+                                    static_cast<acc_t>(prev_a[depth_index][batch_index][prev_a_index]) +
+                                    new_scratch_value * next_value);
                         }
                     }
                 }
 
                 for (int64_t channel_index = 0; channel_index < input_channel_size; ++channel_index) {
-                    prev_a[0][batch_index][channel_index] += next_a[batch_index][channel_index];
-                }
-
-                // This corresponds to whether the triangle number of index 'depth' is odd.
-                // In this case we have performed an odd number of swaps above, so we perform one more here to leave the
-                // memory size unchanged.
-                auto depth_mod = depth % 4;
-                if (depth_mod == 0 || depth_mod == 3) {
-                    old_scratch.swap(new_scratch);
+                    prev_a[0][batch_index][channel_index] = static_cast<scalar_t>(
+                            static_cast<acc_t>(prev_a[0][batch_index][channel_index]) +
+                            static_cast<acc_t>(next_a[batch_index][channel_index]));
+                    tangent_prev_a[0][batch_index][channel_index] = static_cast<scalar_t>(
+                            static_cast<acc_t>(tangent_prev_a[0][batch_index][channel_index]) +
+                            static_cast<acc_t>(tangent_next_a[batch_index][channel_index]));
                 }
             }
 
-            // This basically just parallelises over the batch elements, calling mult_fused_restricted_exp_cpu_inner on
-            // each one.
+            // This basically just parallelises over the batch elements, calling
+            // mult_fused_restricted_exp_tangent_cpu_inner on each one.
             template <typename scalar_t>
-            void mult_fused_restricted_exp_cpu(torch::Tensor next, std::vector<torch::Tensor>& prev, bool inverse,
-                                               torch::Tensor reciprocals, int64_t batch_threads) {
-                // Convert from Tensors to TensorAccessors
+            void mult_fused_restricted_exp_tangent_cpu(torch::Tensor next, torch::Tensor tangent_next,
+                                                       std::vector<torch::Tensor>& prev,
+                                                       std::vector<torch::Tensor>& tangent_prev, bool inverse,
+                                                       torch::Tensor reciprocals, int64_t batch_threads) {
                 auto next_a = next.accessor<scalar_t, 2>();
+                auto tangent_next_a = tangent_next.accessor<scalar_t, 2>();
                 std::vector<torch::TensorAccessor<scalar_t, 2>> prev_a;
+                std::vector<torch::TensorAccessor<scalar_t, 2>> tangent_prev_a;
                 prev_a.reserve(prev.size());
+                tangent_prev_a.reserve(tangent_prev.size());
                 for (auto elem : prev) {
                     prev_a.push_back(elem.accessor<scalar_t, 2>());
                 }
+                for (auto elem : tangent_prev) {
+                    tangent_prev_a.push_back(elem.accessor<scalar_t, 2>());
+                }
                 auto reciprocals_a = reciprocals.accessor<scalar_t, 1>();
 
                 int64_t batch_size = next.size(batch_dim);
                 int64_t input_channel_size = next.size(channel_dim);
                 s_size_type depth = prev.size();
 
+                using acc_t = typename accumulate_type<scalar_t>::type;
+
                 // commented out because of what I think is an MSVC bug?
                 #pragma omp parallel /*default(none)*/ \
                                      if(batch_threads > 1) \
                                      num_threads(batch_threads) \
-                                     shared(batch_size, next_a, prev_a, inverse, reciprocals_a, input_channel_size, \
-                                            depth)
+                                     shared(batch_size, next_a, tangent_next_a, prev_a, tangent_prev_a, inverse, \
+                                            reciprocals_a, input_channel_size, depth)
                 {
-                    // Allocate scratch space outside of the hot loop
-                    std::vector<scalar_t, default_init_allocator<scalar_t>> next_divided (reciprocals_a.size(0) * input_channel_size);
-                    std::vector<scalar_t, default_init_allocator<scalar_t>> old_scratch;
-                    std::vector<scalar_t, default_init_allocator<scalar_t>> new_scratch;
-                    // Figure out how large each vector is going to get by the end of the computation.
-                    if (depth > 1) {
-                        if ((depth % 2) == 0) {
-                            old_scratch.resize(pow(input_channel_size, depth - 2));
-                            new_scratch.resize(old_scratch.size() * input_channel_size);
-                        }
-                        else {
-                            new_scratch.resize(pow(input_channel_size, depth - 2));
-                            old_scratch.resize(new_scratch.size() * input_channel_size);
-                        }
-                    }
+                    // Get scratch space outside of the hot loop
+                    tangent_scratch<acc_t> scratch_space (next.scalar_type(), input_channel_size, depth,
+                                                          reciprocals_a.size(0));
 
                     #pragma omp for schedule(static)
                     for (int64_t batch_index = 0; batch_index < batch_size; ++batch_index) {
-                        // Actually do the computation.
-                        // Note that we pass in the 2-dimensional TensorAccessors and batch_index and let
-                        // mult_fused_restricted_exp_cpu_inner reduce them to 1-dimensional TensorAccessors. This gives
-                        // a small speedup over creating the 1-dimensional TensorAccessors out here and passing just
-                        // those in.
                         if (inverse) {
-                            mult_fused_restricted_exp_cpu_inner<scalar_t, /*inverse=*/true>(next_a,
-                                                                                            prev_a,
-                                                                                            reciprocals_a,
-                                                                                            batch_index,
-                                                                                            next_divided,
-                                                                                            new_scratch,
-                                                                                            old_scratch);
+                            mult_fused_restricted_exp_tangent_cpu_inner<scalar_t, acc_t, /*inverse=*/true>(
+                                    next_a, tangent_next_a, prev_a, tangent_prev_a, reciprocals_a, batch_index,
+                                    scratch_space);
                         }
                         else {
-                            mult_fused_restricted_exp_cpu_inner<scalar_t, /*inverse=*/false>(next_a,
-                                                                                             prev_a,
-                                                                                             reciprocals_a,
-                                                                                             batch_index,
-                                                                                             next_divided,
-                                                                                             new_scratch,
-                                                                                             old_scratch);
+                            mult_fused_restricted_exp_tangent_cpu_inner<scalar_t, acc_t, /*inverse=*/false>(
+                                    next_a, tangent_next_a, prev_a, tangent_prev_a, reciprocals_a, batch_index,
+                                    scratch_space);
                         }
                     }
                 }
-
             }
 
             // If you're reading this function and trying to understand it...
@@ -668,6 +917,101 @@ namespace signatory {
                 }
             }
 
+            // A piece of a workspace::Block, standing in for a std::vector in
+            // mult_fused_restricted_exp_backward_cpu_inner.
+            template <typename scalar_t>
+            class scratch_vector {
+            public:
+                scratch_vector(scalar_t* data, int64_t size) : data_{data}, size_{size} {}
+
+                scalar_t& operator[](int64_t index) const { return data_[index]; }
+                int64_t size() const { return size_; }
+            private:
+                scalar_t* data_;
+                int64_t size_;
+            };
+
+            template <typename scalar_t>
+            int64_t mvsize(scratch_vector<scalar_t> obj) {
+                return obj.size();
+            }
+
+            template <typename scalar_t>
+            scalar_t mvindex(scratch_vector<scalar_t> matrix, int64_t index, int64_t out_index, int64_t vector_index) {
+                return matrix[index];
+            }
+
+            template <typename scalar_t, typename accessor>
+            scalar_t mvindex(const std::vector<scratch_vector<scalar_t>, accessor>& matrix, int64_t index,
+                             int64_t out_index, int64_t vector_index) {
+                return matrix[vector_index][out_index];
+            }
+
+            // Scratch space for mult_fused_restricted_exp_backward_cpu_inner. This is drawn from each thread's
+            // workspace, and then reused for every batch element that that thread handles, so that no memory is
+            // allocated in the hot loop, and only the first call actually allocates it at all.
+            template <typename scalar_t>
+            struct backward_scratch {
+                using vector_t = scratch_vector<scalar_t>;
+
+                // How many elements of scalar_t are needed in total.
+                static int64_t size(int64_t input_channel_size, s_size_type depth, int64_t num_reciprocals) {
+                    int64_t size = num_reciprocals * input_channel_size;
+                    for (s_size_type depth_index = depth - 1; depth_index >= 1; --depth_index) {
+                        int64_t scratch_size = input_channel_size;
+                        for (s_size_type j = 0; j < depth_index; ++j) {
+                            size += scratch_size;
+                            scratch_size *= input_channel_size;
+                        }
+                    }
+                    // Everything is needed twice: once for the values and once for their gradients.
+                    return 2 * size;
+                }
+
+                backward_scratch(torch::ScalarType dtype, int64_t input_channel_size, s_size_type depth,
+                                 int64_t num_reciprocals) :
+                block{workspace::get(dtype, input_channel_size, depth, workspace::Slot::MultFusedRestrictedExpBackward,
+                                     size(input_channel_size, depth, num_reciprocals) * sizeof(scalar_t))}
+                {
+                    scalar_t* data = block.data<scalar_t>();
+                    auto take = [&data](int64_t size_) -> vector_t {
+                        vector_t piece {data, size_};
+                        data += size_;
+                        return piece;
+                    };
+
+                    next_divided.reserve(num_reciprocals);
+                    grad_next_divided.reserve(num_reciprocals);
+                    for (int64_t reciprocal_index = 0; reciprocal_index < num_reciprocals; ++reciprocal_index) {
+                        next_divided.push_back(take(input_channel_size));
+                        grad_next_divided.push_back(take(input_channel_size));
+                    }
+                    // all_scratches[back_index] is used for depth_index == depth - 1 - back_index, and holds
+                    // depth_index many vectors, of sizes input_channel_size, input_channel_size^2, ...,
+                    // input_channel_size^depth_index.
+                    all_scratches.reserve(depth - 1);
+                    all_grad_scratches.reserve(depth - 1);
+                    for (s_size_type depth_index = depth - 1; depth_index >= 1; --depth_index) {
+                        all_scratches.emplace_back();
+                        all_grad_scratches.emplace_back();
+                        all_scratches.back().reserve(depth_index);
+                        all_grad_scratches.back().reserve(depth_index);
+                        int64_t scratch_size = input_channel_size;
+                        for (s_size_type j = 0; j < depth_index; ++j) {
+                            all_scratches.back().push_back(take(scratch_size));
+                            all_grad_scratches.back().push_back(take(scratch_size));
+                            scratch_size *= input_channel_size;
+                        }
+                    }
+                }
+
+                workspace::Block block;
+                std::vector<vector_t> next_divided;
+                std::vector<vector_t> grad_next_divided;
+                std::vector<std::vector<vector_t>> all_scratches;
+                std::vector<std::vector<vector_t>> all_grad_scratches;
+            };
+
             template <typename scalar_t, bool inverse>
             void
             mult_fused_restricted_exp_backward_cpu_inner(torch::TensorAccessor<scalar_t, 2> grad_next_a,
@@ -675,102 +1019,62 @@ namespace signatory {
                                                          torch::TensorAccessor<scalar_t, 2> next_a,
                                                          const std::vector<torch::TensorAccessor<scalar_t, 2>>& prev_a,
                                                          torch::TensorAccessor<scalar_t, 1> reciprocals_a,
-                                                         int64_t batch_index) {
+                                                         int64_t batch_index,
+                                                         backward_scratch<scalar_t>& scratch_space) {
+                using vector_t = typename backward_scratch<scalar_t>::vector_t;
+
                 int64_t input_channel_size = next_a.size(1);  // 1 is the channel dimension
                 s_size_type depth = prev_a.size();
 
-                std::vector<std::vector<std::vector<scalar_t, default_init_allocator<scalar_t>>>> all_scratches;
-                all_scratches.reserve(depth - 1);
+                std::vector<vector_t>& next_divided = scratch_space.next_divided;
+                std::vector<vector_t>& grad_next_divided = scratch_space.grad_next_divided;
+                std::vector<std::vector<vector_t>>& all_scratches = scratch_space.all_scratches;
+                std::vector<std::vector<vector_t>>& all_grad_scratches = scratch_space.all_grad_scratches;
 
-                std::vector<std::vector<scalar_t, default_init_allocator<scalar_t>>>
-                        next_divided (reciprocals_a.size(0),
-                                      std::vector<scalar_t, default_init_allocator<scalar_t>> (input_channel_size));
                 for (int64_t reciprocal_index = 0; reciprocal_index < reciprocals_a.size(0); ++reciprocal_index) {
                     for (int64_t channel_index = 0; channel_index < input_channel_size; ++channel_index) {
                         next_divided[reciprocal_index][channel_index] = reciprocals_a[reciprocal_index] *
                                                                         next_a[batch_index][channel_index];
+                        // Deliberately initialising to zero here. It would just be rather a faff to write code that
+                        // pulls out the first iteration we use this, and set rather than add in that iteration.
+                        grad_next_divided[reciprocal_index][channel_index] = 0;
                     }
                 }
 
-                if (depth > 1) {
-                    std::vector<scalar_t, default_init_allocator<scalar_t>> new_scratch;
-                    std::vector<scalar_t, default_init_allocator<scalar_t>> old_scratch;
-                    if ((depth % 2) == 0) {
-                        old_scratch.reserve(pow(input_channel_size, depth - 2));
-                        new_scratch.reserve(old_scratch.size() * input_channel_size);
-                    }
-                    else {
-                        new_scratch.reserve(pow(input_channel_size, depth - 2));
-                        old_scratch.reserve(new_scratch.size() * input_channel_size);
-                    }
+                // Recompute the forward pass, recording all of the intermediate scratches.
+                for (s_size_type depth_index = depth - 1, back_index = 0;
+                     depth_index >= 1;
+                     --depth_index, ++back_index) {
+                    std::vector<vector_t>& scratches = all_scratches[back_index];
 
-                    for (s_size_type depth_index = depth - 1; depth_index >= 1; --depth_index) {
-                        all_scratches.emplace_back();
-                        std::vector<std::vector<scalar_t, default_init_allocator<scalar_t>>>&
-                                scratches = all_scratches.back();
-                        scratches.reserve(depth_index);
-
-                        new_scratch.resize(input_channel_size);
-                        for (int64_t scratch_index = 0; scratch_index < input_channel_size; ++scratch_index) {
-                            new_scratch[scratch_index] = prev_a[0][batch_index][scratch_index] +
-                                                         next_divided[depth_index - 1][scratch_index];
-                        }
+                    vector_t& first_scratch = scratches[0];
+                    for (int64_t scratch_index = 0; scratch_index < input_channel_size; ++scratch_index) {
+                        first_scratch[scratch_index] = prev_a[0][batch_index][scratch_index] +
+                                                       next_divided[depth_index - 1][scratch_index];
+                    }
 
-                        scratches.push_back(new_scratch);
-
-                        for (s_size_type j = 1, k = depth_index - 2; j < depth_index; ++j, --k) {
-                            old_scratch.swap(new_scratch);
-                            new_scratch.resize(old_scratch.size() * input_channel_size);
-                            for (int64_t old_scratch_index = 0;
-                                 old_scratch_index < static_cast<int64_t>(old_scratch.size());
-                                 ++old_scratch_index) {
-                                for (int64_t channel_index = 0; channel_index < input_channel_size; ++channel_index) {
-                                    int64_t new_scratch_index;
-                                    if (inverse) {
-                                        new_scratch_index = channel_index * old_scratch.size() + old_scratch_index;
-                                    }
-                                    else {
-                                        new_scratch_index = old_scratch_index * input_channel_size + channel_index;
-                                    }
-                                    new_scratch[new_scratch_index] = prev_a[j][batch_index][new_scratch_index] +
-                                                                     old_scratch[old_scratch_index] *
-                                                                     next_divided[k][channel_index];
+                    for (s_size_type j = 1, k = depth_index - 2; j < depth_index; ++j, --k) {
+                        const vector_t& old_scratch = scratches[j - 1];
+                        vector_t& new_scratch = scratches[j];
+                        for (int64_t old_scratch_index = 0;
+                             old_scratch_index < static_cast<int64_t>(old_scratch.size());
+                             ++old_scratch_index) {
+                            for (int64_t channel_index = 0; channel_index < input_channel_size; ++channel_index) {
+                                int64_t new_scratch_index;
+                                if (inverse) {
+                                    new_scratch_index = channel_index * old_scratch.size() + old_scratch_index;
+                                }
+                                else {
+                                    new_scratch_index = old_scratch_index * input_channel_size + channel_index;
                                 }
+                                new_scratch[new_scratch_index] = prev_a[j][batch_index][new_scratch_index] +
+                                                                 old_scratch[old_scratch_index] *
+                                                                 next_divided[k][channel_index];
                             }
-
-                            scratches.push_back(new_scratch);
                         }
                     }
                 }
 
-                // Allocate memory for the gradient through next_divided
-
-                std::vector<std::vector<scalar_t>> grad_next_divided;
-                grad_next_divided.reserve(next_divided.size());
-                for (s_size_type next_divided_index = 0;
-                     next_divided_index < static_cast<s_size_type>(next_divided.size());
-                     ++next_divided_index)
-                {
-                    // Deliberately initialising to zero here, rather than empty. It would just be rather a faff to
-                    // write code that pulls out the first iteration we use this, and set rather than add in that
-                    // iteration.
-                    grad_next_divided.push_back(std::vector<scalar_t> (input_channel_size, 0));
-                }
-
-                // Allocate memory for the gradient through the scratches
-
-                std::vector<std::vector<std::vector<scalar_t, default_init_allocator<scalar_t>>>> all_grad_scratches;
-                all_grad_scratches.reserve(all_scratches.size());
-                for (const auto& scratches : all_scratches) {
-                    all_grad_scratches.emplace_back();
-                    std::vector<std::vector<scalar_t, default_init_allocator<scalar_t>>>& grad_scratches =
-                            all_grad_scratches.back();
-                    grad_scratches.reserve(scratches.size());
-                    for (const auto& elem : scratches) {
-                        grad_scratches.push_back(std::vector<scalar_t, default_init_allocator<scalar_t>> (elem.size()));
-                    }
-                }
-
                 // Do the backward computation
 
                 for (int64_t index = 0; index < grad_prev_a[0].size(1); ++index) {
@@ -779,13 +1083,11 @@ namespace signatory {
                 for (s_size_type depth_index = 1, back_index = all_scratches.size() - 1;
                      depth_index < depth;
                      ++depth_index, --back_index) {
-                    std::vector<std::vector<scalar_t, default_init_allocator<scalar_t>>>& grad_scratches =
-                            all_grad_scratches[back_index];
-                    const std::vector<std::vector<scalar_t, default_init_allocator<scalar_t>>>& scratches =
-                            all_scratches[back_index];
+                    std::vector<vector_t>& grad_scratches = all_grad_scratches[back_index];
+                    const std::vector<vector_t>& scratches = all_scratches[back_index];
 
-                    std::vector<scalar_t, default_init_allocator<scalar_t>>& grad_scratch = grad_scratches.back();
-                    const std::vector<scalar_t, default_init_allocator<scalar_t>>& scratch = scratches.back();
+                    vector_t& grad_scratch = grad_scratches.back();
+                    const vector_t& scratch = scratches.back();
 
                     mv<scalar_t, /*flip=*/inverse, /*add=*/false>(grad_scratch,
                                                                   grad_prev_a[depth_index][batch_index],
@@ -796,15 +1098,11 @@ namespace signatory {
                                                                   scratch);
 
                     for (s_size_type j = depth_index - 1, k = 0; j >= 1; --j, ++k) {
-                        const std::vector<scalar_t, default_init_allocator<scalar_t>>& grad_scratch =
-                                grad_scratches[j];
-                        std::vector<scalar_t, default_init_allocator<scalar_t>>& grad_old_scratch =
-                                grad_scratches[j - 1];
-                        const std::vector<scalar_t, default_init_allocator<scalar_t>>& old_scratch =
-                                scratches[j - 1];
-                        const std::vector<scalar_t, default_init_allocator<scalar_t>>& next_divided_narrow =
-                                next_divided[k];
-                        std::vector<scalar_t>& grad_next_divided_narrow = grad_next_divided[k];
+                        const vector_t& grad_scratch = grad_scratches[j];
+                        vector_t& grad_old_scratch = grad_scratches[j - 1];
+                        const vector_t& old_scratch = scratches[j - 1];
+                        const vector_t& next_divided_narrow = next_divided[k];
+                        vector_t& grad_next_divided_narrow = grad_next_divided[k];
 
                         for (s_size_type index = 0; index < static_cast<s_size_type>(grad_scratch.size()); ++index) {
                             grad_prev_a[j][batch_index][index] += grad_scratch[index];
@@ -830,13 +1128,16 @@ namespace signatory {
                 }
             }
 
+            // This basically just parallelises over the batch elements, calling
+            // mult_fused_restricted_exp_backward_cpu_inner on each one.
             template <typename scalar_t>
             void mult_fused_restricted_exp_backward_cpu(torch::Tensor grad_next,
                                                         std::vector<torch::Tensor>& grad_prev,
                                                         torch::Tensor next,
                                                         const std::vector<torch::Tensor>& prev,
                                                         bool inverse,
-                                                        torch::Tensor reciprocals) {
+                                                        torch::Tensor reciprocals,
+                                                        int64_t batch_threads) {
                 auto grad_next_a = grad_next.accessor<scalar_t, 2>();
 
                 std::vector<torch::TensorAccessor<scalar_t, 2>> grad_prev_a;
@@ -856,30 +1157,75 @@ namespace signatory {
                 auto reciprocals_a = reciprocals.accessor<scalar_t, 1>();
 
                 int64_t batch_size = next.size(batch_dim);
-                #pragma omp parallel for default(none) \
-                                         shared(batch_size, grad_next_a, grad_prev_a, next_a, prev_a, inverse, \
-                                                reciprocals_a)
-                for (int64_t batch_index = 0; batch_index < batch_size; ++batch_index) {
-                    if (inverse) {
-                        mult_fused_restricted_exp_backward_cpu_inner<scalar_t,
-                                                                     /*inverse=*/true>(grad_next_a,
-                                                                                       grad_prev_a,
-                                                                                       next_a,
-                                                                                       prev_a,
-                                                                                       reciprocals_a,
-                                                                                       batch_index);
-                    }
-                    else {
-                        mult_fused_restricted_exp_backward_cpu_inner<scalar_t,
-                                                                     /*inverse=*/false>(grad_next_a,
-                                                                                        grad_prev_a,
-                                                                                        next_a,
-                                                                                        prev_a,
-                                                                                        reciprocals_a,
-                                                                                        batch_index);
+                int64_t input_channel_size = next.size(channel_dim);
+                s_size_type depth = prev.size();
+
+                // commented out because of what I think is an MSVC bug?
+                #pragma omp parallel /*default(none)*/ \
+                                     if(batch_threads > 1) \
+                                     num_threads(batch_threads) \
+                                     shared(batch_size, grad_next_a, grad_prev_a, next_a, prev_a, inverse, \
+                                            reciprocals_a, input_channel_size, depth)
+                {
+                    // Get scratch space outside of the hot loop
+                    backward_scratch<scalar_t> scratch_space (next.scalar_type(), input_channel_size, depth,
+                                                              reciprocals_a.size(0));
+
+                    #pragma omp for schedule(static)
+                    for (int64_t batch_index = 0; batch_index < batch_size; ++batch_index) {
+                        if (inverse) {
+                            mult_fused_restricted_exp_backward_cpu_inner<scalar_t,
+                                                                         /*inverse=*/true>(grad_next_a,
+                                                                                           grad_prev_a,
+                                                                                           next_a,
+                                                                                           prev_a,
+                                                                                           reciprocals_a,
+                                                                                           batch_index,
+                                                                                           scratch_space);
+                        }
+                        else {
+                            mult_fused_restricted_exp_backward_cpu_inner<scalar_t,
+                                                                         /*inverse=*/false>(grad_next_a,
+                                                                                            grad_prev_a,
+                                                                                            next_a,
+                                                                                            prev_a,
+                                                                                            reciprocals_a,
+                                                                                            batch_index,
+                                                                                            scratch_space);
+                        }
                     }
                 }
             }
+
+            // As mult_fused_restricted_exp_backward_cpu, for the reduced precision floating point types.
+            void mult_fused_restricted_exp_backward_cpu_reduced(torch::Tensor grad_next,
+                                                                std::vector<torch::Tensor>& grad_prev,
+                                                                torch::Tensor next,
+                                                                const std::vector<torch::Tensor>& prev,
+                                                                bool inverse,
+                                                                torch::Tensor reciprocals,
+                                                                int64_t batch_threads) {
+                torch::Tensor grad_next_float = torch::empty(grad_next.sizes(),
+                                                             grad_next.options().dtype(torch::kFloat32));
+                std::vector<torch::Tensor> grad_prev_float;
+                std::vector<torch::Tensor> prev_float;
+                grad_prev_float.reserve(grad_prev.size());
+                prev_float.reserve(prev.size());
+                for (const auto& elem : grad_prev) {
+                    grad_prev_float.push_back(elem.to(torch::kFloat32));
+                }
+                for (const auto& elem : prev) {
+                    prev_float.push_back(elem.to(torch::kFloat32));
+                }
+                mult_fused_restricted_exp_backward_cpu<float>(grad_next_float, grad_prev_float,
+                                                              next.to(torch::kFloat32), prev_float, inverse,
+                                                              reciprocals.to(torch::kFloat32), batch_threads);
+                grad_next.copy_(grad_next_float);
+                for (s_size_type depth_index = 0; depth_index < static_cast<s_size_type>(grad_prev.size());
+                     ++depth_index) {
+                    grad_prev[depth_index].copy_(grad_prev_float[depth_index]);
+                }
+            }
         }  // namespace signatory::ta_ops::detail
 
         void mult_fused_restricted_exp(torch::Tensor next, std::vector<torch::Tensor>& prev, bool inverse,
@@ -888,25 +1234,51 @@ namespace signatory {
                 detail::mult_fused_restricted_exp_cuda(next, prev, inverse, reciprocals);
             }
             else{
-                AT_DISPATCH_FLOATING_TYPES(next.scalar_type(), "mult_fused_restricted_exp_cpu", ([&] {
+                AT_DISPATCH_FLOATING_TYPES_AND2(at::ScalarType::Half, at::ScalarType::BFloat16, next.scalar_type(),
+                                                "mult_fused_restricted_exp_cpu", ([&] {
                     detail::mult_fused_restricted_exp_cpu<scalar_t>(next, prev, inverse, reciprocals, batch_threads);
                 }));
             }
         }
 
+        void mult_fused_restricted_exp_tangent(torch::Tensor next, torch::Tensor tangent_next,
+                                               std::vector<torch::Tensor>& prev,
+                                               std::vector<torch::Tensor>& tangent_prev, bool inverse,
+                                               torch::Tensor reciprocals, int64_t batch_threads) {
+            if (next.is_cuda()) {
+                detail::mult_fused_restricted_exp_tangent_cuda(next, tangent_next, prev, tangent_prev, inverse,
+                                                               reciprocals);
+            }
+            else{
+                AT_DISPATCH_FLOATING_TYPES_AND2(at::ScalarType::Half, at::ScalarType::BFloat16, next.scalar_type(),
+                                                "mult_fused_restricted_exp_tangent_cpu", ([&] {
+                    detail::mult_fused_restricted_exp_tangent_cpu<scalar_t>(next, tangent_next, prev, tangent_prev,
+                                                                            inverse, reciprocals, batch_threads);
+                }));
+            }
+        }
+
         void mult_fused_restricted_exp_backward(torch::Tensor grad_next,
                                                 std::vector<torch::Tensor>& grad_prev,
                                                 torch::Tensor next,
                                                 const std::vector<torch::Tensor>& prev,
                                                 bool inverse,
-                                                torch::Tensor reciprocals) {
+                                                torch::Tensor reciprocals,
+                                                int64_t batch_threads) {
             if (grad_next.is_cuda()) {
                 detail::mult_fused_restricted_exp_backward_cuda(grad_next, grad_prev, next, prev, inverse, reciprocals);
             }
+            else if (grad_next.scalar_type() == at::ScalarType::Half ||
+                     grad_next.scalar_type() == at::ScalarType::BFloat16) {
+                // The backward pass accumulates into its outputs many times over, so for the reduced precision types
+                // we perform it in float32 and only round once at the end.
+                detail::mult_fused_restricted_exp_backward_cpu_reduced(grad_next, grad_prev, next, prev, inverse,
+                                                                       reciprocals, batch_threads);
+            }
             else{
                 AT_DISPATCH_FLOATING_TYPES(grad_next.scalar_type(), "mult_fused_restricted_exp_backward_cpu", ([&] {
                     detail::mult_fused_restricted_exp_backward_cpu<scalar_t>(grad_next, grad_prev, next, prev, inverse,
-                                                                             reciprocals);
+                                                                             reciprocals, batch_threads);
                 }));
             }
         }
@@ -964,6 +1336,63 @@ namespace signatory {
                     grad_tensor_at_depth.zero_();
                 }
             }
+
+            // The derivative of mult_partial. 'arg1', 'arg2', 'scalar_term_value' and 'top_terms_to_skip' are as in
+            // mult_partial, and are modified in the same way. 'tangent_arg1' and 'tangent_arg2' are perturbations to
+            // arg1 and arg2 (so with assumed scalar value zero), and 'tangent_arg1' is modified to hold the
+            // corresponding perturbation to the result.
+            void mult_partial_tangent(std::vector<torch::Tensor>& tangent_arg1, std::vector<torch::Tensor>& arg1,
+                                      const std::vector<torch::Tensor>& arg2,
+                                      const std::vector<torch::Tensor>& tangent_arg2,
+                                      torch::Scalar scalar_term_value, s_size_type top_terms_to_skip) {
+                auto depth = arg1.size();
+                for (s_size_type depth_index = depth - top_terms_to_skip - 1; depth_index >= 0; --depth_index) {
+                    // Must come first, as it uses the value of arg1 from before this step.
+                    torch::Tensor tangent_at_depth = tangent_arg1[depth_index];
+                    tangent_at_depth.zero_();
+                    mult_inner(tangent_at_depth, tangent_arg1, arg2, depth_index);
+                    mult_inner(tangent_at_depth, arg1, tangent_arg2, depth_index);
+                    tangent_at_depth.add_(tangent_arg2[depth_index], scalar_term_value);
+
+                    torch::Tensor tensor_at_depth = arg1[depth_index];
+                    tensor_at_depth.zero_();
+                    mult_inner(tensor_at_depth, arg1, arg2, depth_index);
+                    tensor_at_depth.add_(arg2[depth_index], scalar_term_value);
+                }
+            }
+
+            // Backwards through mult_partial_tangent.
+            // 'tangent_arg1', 'arg1', 'arg2', 'tangent_arg2', 'scalar_value_term' and 'top_terms_to_skip' should be as
+            // in the forward call to mult_partial_tangent.
+            // 'grad_tangent_arg1' and 'grad_arg1' are the input gradients, and will be modified in-place.
+            // 'grad_arg2' and 'grad_tangent_arg2' are the output gradients, and will have the result of this operation
+            // added on to them.
+            void mult_partial_tangent_backward(std::vector<torch::Tensor>& grad_tangent_arg1,
+                                               std::vector<torch::Tensor>& grad_arg1,
+                                               std::vector<torch::Tensor>& grad_arg2,
+                                               std::vector<torch::Tensor>& grad_tangent_arg2,
+                                               const std::vector<torch::Tensor>& tangent_arg1,
+                                               const std::vector<torch::Tensor>& arg1,
+                                               const std::vector<torch::Tensor>& arg2,
+                                               const std::vector<torch::Tensor>& tangent_arg2,
+                                               torch::Scalar scalar_value_term,
+                                               s_size_type top_terms_to_skip) {
+                s_size_type depth = arg1.size();
+                for (s_size_type depth_index = 0; depth_index < depth - top_terms_to_skip; ++depth_index) {
+                    torch::Tensor grad_tangent_at_depth = grad_tangent_arg1[depth_index];
+                    grad_tangent_arg2[depth_index].add_(grad_tangent_at_depth, scalar_value_term);
+                    mult_inner_backward(grad_tangent_at_depth, grad_tangent_arg1, grad_arg2, tangent_arg1, arg2,
+                                        depth_index);
+                    mult_inner_backward(grad_tangent_at_depth, grad_arg1, grad_tangent_arg2, arg1, tangent_arg2,
+                                        depth_index);
+                    grad_tangent_at_depth.zero_();
+
+                    torch::Tensor grad_tensor_at_depth = grad_arg1[depth_index];
+                    grad_arg2[depth_index].add_(grad_tensor_at_depth, scalar_value_term);
+                    mult_inner_backward(grad_tensor_at_depth, grad_arg1, grad_arg2, arg1, arg2, depth_index);
+                    grad_tensor_at_depth.zero_();
+                }
+            }
         }  // namespace signatory::ta_ops::detail
 
         void log(std::vector<torch::Tensor>& output_vector, const std::vector<torch::Tensor>& input_vector,
@@ -1047,16 +1476,405 @@ namespace signatory {
             grad_input_vector[0].add_(grad_output_vector[0],
                                       detail::log_coefficient_at_depth(depth - 2, reciprocals));
         }
+
+        void log_tangent(std::vector<torch::Tensor>& tangent_output_vector,
+                         std::vector<torch::Tensor>& output_vector,
+                         const std::vector<torch::Tensor>& input_vector,
+                         const std::vector<torch::Tensor>& tangent_input_vector,
+                         torch::Tensor reciprocals) {
+            s_size_type depth = input_vector.size();
+            if (depth == 1) {
+                output_vector[0].copy_(input_vector[0]);
+                tangent_output_vector[0].copy_(tangent_input_vector[0]);
+                return;
+            }
+            torch::Scalar first_coefficient = detail::log_coefficient_at_depth(depth - 2, reciprocals);
+            output_vector[0].copy_(input_vector[0] * first_coefficient);
+            tangent_output_vector[0].copy_(tangent_input_vector[0] * first_coefficient);
+            for (s_size_type depth_index = depth - 3; depth_index >= 0; --depth_index) {
+                detail::mult_partial_tangent(tangent_output_vector,
+                                             output_vector,
+                                             input_vector,
+                                             tangent_input_vector,
+                                             /*scalar_value_term=*/detail::log_coefficient_at_depth(depth_index,
+                                                                                                    reciprocals),
+                                             /*top_terms_to_skip=*/depth_index + 1);
+            }
+            detail::mult_partial_tangent(tangent_output_vector, output_vector, input_vector, tangent_input_vector,
+                                         /*scalar_value_term=*/1, /*top_terms_to_skip=*/0);
+        }
+
+        void log_tangent_backward(std::vector<torch::Tensor>& grad_tangent_output_vector,
+                                  std::vector<torch::Tensor>& grad_input_vector,
+                                  std::vector<torch::Tensor>& grad_tangent_input_vector,
+                                  const std::vector<torch::Tensor>& input_vector,
+                                  const std::vector<torch::Tensor>& tangent_input_vector,
+                                  torch::Tensor reciprocals) {
+            s_size_type depth = input_vector.size();
+            if (depth == 1) {
+                grad_tangent_input_vector[0] += grad_tangent_output_vector[0];
+                return;
+            }
+
+            // Will have the logarithm and its tangent progressively computed in them
+            std::vector<torch::Tensor> scratch_vector;
+            std::vector<torch::Tensor> tangent_scratch_vector;
+            // Will hold the gradient through scratch_vector. As we're only given a gradient through the tangent, this
+            // starts off as zero.
+            std::vector<torch::Tensor> grad_scratch_vector;
+            scratch_vector.reserve(depth);
+            tangent_scratch_vector.reserve(depth);
+            grad_scratch_vector.reserve(depth);
+            for (s_size_type depth_index = 0; depth_index < depth; ++depth_index) {
+                scratch_vector.push_back(input_vector[depth_index].clone());
+                tangent_scratch_vector.push_back(tangent_input_vector[depth_index].clone());
+                grad_scratch_vector.push_back(torch::zeros_like(input_vector[depth_index]));
+            }
+
+            // Records all the partially-computed logarithms and tangents
+            std::vector<std::vector<torch::Tensor>> record_vector;
+            std::vector<std::vector<torch::Tensor>> tangent_record_vector;
+            record_vector.reserve(depth - 1);
+            tangent_record_vector.reserve(depth - 1);
+
+            // Compute the logarithm and its tangent forwards and remember every intermediate tensor
+            scratch_vector[0] *= detail::log_coefficient_at_depth(depth - 2, reciprocals);
+            tangent_scratch_vector[0] *= detail::log_coefficient_at_depth(depth - 2, reciprocals);
+            for (s_size_type depth_index = depth - 3; depth_index >= 0; --depth_index) {
+                record_vector.emplace_back();
+                tangent_record_vector.emplace_back();
+                for (s_size_type index = 0; index < depth; ++index) {
+                    record_vector.back().push_back(scratch_vector[index].clone());
+                    tangent_record_vector.back().push_back(tangent_scratch_vector[index].clone());
+                }
+                detail::mult_partial_tangent(tangent_scratch_vector,
+                                             scratch_vector,
+                                             input_vector,
+                                             tangent_input_vector,
+                                             /*scalar_value_term=*/detail::log_coefficient_at_depth(depth_index,
+                                                                                                    reciprocals),
+                                             /*top_terms_to_skip=*/depth_index + 1);
+            }
+            record_vector.push_back(scratch_vector);
+            tangent_record_vector.push_back(tangent_scratch_vector);
+
+            // Now actually perform the backwards operation
+            s_size_type backward_index = record_vector.size() - 1;
+            detail::mult_partial_tangent_backward(grad_tangent_output_vector,
+                                                  grad_scratch_vector,
+                                                  grad_input_vector,
+                                                  grad_tangent_input_vector,
+                                                  tangent_record_vector[backward_index],
+                                                  record_vector[backward_index],
+                                                  input_vector,
+                                                  tangent_input_vector,
+                                                  /*scalar_value_term=*/1,
+                                                  /*top_terms_to_skip=*/0);
+
+            for (s_size_type depth_index = 0; depth_index < depth - 2; ++depth_index) {
+                --backward_index;
+                detail::mult_partial_tangent_backward(grad_tangent_output_vector,
+                                                      grad_scratch_vector,
+                                                      grad_input_vector,
+                                                      grad_tangent_input_vector,
+                                                      tangent_record_vector[backward_index],
+                                                      record_vector[backward_index],
+                                                      input_vector,
+                                                      tangent_input_vector,
+                                                      /*scalar_value_term=*/
+                                                      detail::log_coefficient_at_depth(depth_index, reciprocals),
+                                                      /*top_terms_to_skip=*/depth_index + 1);
+            }
+
+            grad_input_vector[0].add_(grad_scratch_vector[0],
+                                      detail::log_coefficient_at_depth(depth - 2, reciprocals));
+            grad_tangent_input_vector[0].add_(grad_tangent_output_vector[0],
+                                              detail::log_coefficient_at_depth(depth - 2, reciprocals));
+        }
     }  // namespace signatory::ta_ops
 
     /*************************************************************
      * Forward and backward computations for 'signature_combine' *
      *************************************************************/
 
+    namespace ta_ops {
+        namespace detail {
+            // Removes the scalar term from a sigtensor, if it has one.
+            torch::Tensor without_scalar(torch::Tensor sigtensor, bool scalar_term) {
+                if (scalar_term) {
+                    return sigtensor.narrow(/*dim=*/channel_dim, /*start=*/1,
+                                            /*length=*/sigtensor.size(channel_dim) - 1);
+                }
+                return sigtensor;
+            }
+
+            // Multiplies 'out' by 'right', in-place in 'out'. Both should include the scalar term iff
+            // scalar_term==true.
+            void mult_sigtensors(torch::Tensor out, torch::Tensor right, int64_t input_channels, s_size_type depth,
+                                 bool scalar_term) {
+                std::vector<torch::Tensor> out_vector;
+                std::vector<torch::Tensor> right_vector;
+                misc::slice_by_term(without_scalar(out, scalar_term), out_vector, input_channels, depth);
+                misc::slice_by_term(without_scalar(right, scalar_term), right_vector, input_channels, depth);
+                ta_ops::mult(out_vector, right_vector, /*inverse=*/false);
+            }
+
+            // Backwards through mult_sigtensors. 'left' and 'right' are the values that were multiplied together.
+            // On entry 'grad_left' should hold the gradient through their product. On exit it holds the gradient
+            // through 'left', and 'grad_right' holds the gradient through 'right'.
+            // 'left' and 'right' should include the scalar term iff scalar_term==true; the gradients should not.
+            void mult_sigtensors_backward(torch::Tensor grad_left, torch::Tensor grad_right, torch::Tensor left,
+                                          torch::Tensor right, int64_t input_channels, s_size_type depth,
+                                          bool scalar_term) {
+                std::vector<torch::Tensor> grad_left_vector;
+                std::vector<torch::Tensor> grad_right_vector;
+                std::vector<torch::Tensor> left_vector;
+                std::vector<torch::Tensor> right_vector;
+                misc::slice_by_term(grad_left, grad_left_vector, input_channels, depth);
+                misc::slice_by_term(grad_right, grad_right_vector, input_channels, depth);
+                misc::slice_by_term(without_scalar(left, scalar_term), left_vector, input_channels, depth);
+                misc::slice_by_term(without_scalar(right, scalar_term), right_vector, input_channels, depth);
+                ta_ops::mult_backward</*add_not_copy=*/false>(grad_left_vector, grad_right_vector, left_vector,
+                                                              right_vector);
+            }
+
+            // Splits 'sigtensors' up into contiguous chunks, one for each thread. Returns the index of the start of
+            // each chunk, followed by sigtensors.size().
+            std::vector<s_size_type> chunk_bounds(const std::vector<torch::Tensor>& sigtensors) {
+                s_size_type num_sigtensors = sigtensors.size();
+                s_size_type num_chunks = sigtensors[0].is_cuda() ? 1 : parallelism::max_threads();
+                if (num_chunks > num_sigtensors) {
+                    num_chunks = num_sigtensors;
+                }
+                std::vector<s_size_type> bounds;
+                bounds.reserve(num_chunks + 1);
+                for (s_size_type chunk_index = 0; chunk_index <= num_chunks; ++chunk_index) {
+                    bounds.push_back((chunk_index * num_sigtensors) / num_chunks);
+                }
+                return bounds;
+            }
+
+            // Computes the product of all of 'sigtensors', of which there must be at least two.
+            // Each thread multiplies together a contiguous chunk of the sigtensors, and then the results from each
+            // thread are multiplied together as a balanced binary tree of multiplications, each level of which is
+            // computed in parallel. This performs the same number of multiplications as multiplying them together
+            // one after the other, with only one extra sigtensor's worth of memory per thread.
+            // Every element of 'sigtensors' is assumed to include the scalar term iff scalar_term==true; so does the
+            // return value.
+            // If 'result' is defined then it is used instead of newly-allocated memory for the return value.
+            torch::Tensor tree_combine(const std::vector<torch::Tensor>& sigtensors, int64_t input_channels,
+                                       s_size_type depth, bool scalar_term, torch::Tensor result=torch::Tensor()) {
+                bool is_cuda = sigtensors[0].is_cuda();
+                std::vector<s_size_type> bounds = chunk_bounds(sigtensors);
+                int64_t num_chunks = bounds.size() - 1;
+
+                std::vector<torch::Tensor> level (num_chunks);
+                #pragma omp parallel for default(none) \
+                                         num_threads(parallelism::max_threads()) \
+                                         if(!is_cuda && num_chunks > 1) \
+                                         schedule(static) \
+                                         shared(sigtensors, bounds, level, num_chunks, input_channels, depth, \
+                                                scalar_term, result)
+                for (int64_t chunk_index = 0; chunk_index < num_chunks; ++chunk_index) {
+                    // The product always accumulates in the memory of the leftmost element, which we must copy as
+                    // it belongs to the caller.
+                    torch::Tensor out;
+                    if (chunk_index == 0 && result.defined()) {
+                        out = result.copy_(sigtensors[bounds[chunk_index]]);
+                    }
+                    else {
+                        out = sigtensors[bounds[chunk_index]].clone();
+                    }
+                    for (s_size_type index = bounds[chunk_index] + 1; index < bounds[chunk_index + 1]; ++index) {
+                        mult_sigtensors(out, sigtensors[index], input_channels, depth, scalar_term);
+                    }
+                    level[chunk_index] = out;
+                }
+
+                // Every tensor in 'level' is now memory that we own, so we can just multiply in-place.
+                while (level.size() > 1) {
+                    int64_t num_pairs = level.size() / 2;
+                    #pragma omp parallel for default(none) \
+                                             num_threads(parallelism::max_threads()) \
+                                             if(!is_cuda && num_pairs > 1) \
+                                             schedule(static) \
+                                             shared(level, num_pairs, input_channels, depth, scalar_term)
+                    for (int64_t pair_index = 0; pair_index < num_pairs; ++pair_index) {
+                        mult_sigtensors(level[2 * pair_index], level[2 * pair_index + 1], input_channels, depth,
+                                        scalar_term);
+                    }
+                    std::vector<torch::Tensor> next_level;
+                    next_level.reserve((level.size() + 1) / 2);
+                    for (s_size_type index = 0; index < static_cast<s_size_type>(level.size()); index += 2) {
+                        next_level.push_back(level[index]);
+                    }
+                    level = std::move(next_level);
+                }
+                return level[0];
+            }
+
+            // The spacing between the partial products of a chunk of 'length' sigtensors that tree_combine_backward
+            // keeps, about the square root of the length.
+            s_size_type checkpoint_stride(s_size_type length) {
+                s_size_type stride = 1;
+                while (stride * stride < length) {
+                    ++stride;
+                }
+                return stride;
+            }
+
+            // Backwards through tree_combine.
+            // On entry grad_sigtensors[0] should hold the gradient through the product. On exit grad_sigtensors will
+            // hold the gradients through each element of 'sigtensors'. (So every element of grad_sigtensors should
+            // already have had memory allocated for it.)
+            // The products are recomputed in the same way as in tree_combine. Every node of the tree is kept, but
+            // within each thread's chunk of L sigtensors only every checkpoint_stride(L)-th partial product is kept.
+            // The partial products in between are recomputed, a stretch at a time, during the backward pass through
+            // that chunk. So this performs about twice as many multiplications as the forward pass, and uses memory
+            // proportional to the square root of the number of sigtensors per thread (plus the number of threads).
+            // The gradient through each product is placed in the memory for the gradient through its leftmost term,
+            // so no extra memory is needed for gradients.
+            // 'sigtensors' should include scalar terms iff scalar_term==true; 'grad_sigtensors' should not.
+            void tree_combine_backward(std::vector<torch::Tensor>& grad_sigtensors,
+                                       const std::vector<torch::Tensor>& sigtensors,
+                                       int64_t input_channels,
+                                       s_size_type depth,
+                                       bool scalar_term) {
+                bool is_cuda = sigtensors[0].is_cuda();
+                std::vector<s_size_type> bounds = chunk_bounds(sigtensors);
+                int64_t num_chunks = bounds.size() - 1;
+
+                // Recompute each thread's chunk. checkpoints[chunk_index][j] is the product of the first
+                // j * stride + 1 elements of that chunk, where stride is checkpoint_stride of its length; only those
+                // that are needed for the backward pass are kept.
+                std::vector<std::vector<torch::Tensor>> checkpoints (num_chunks);
+                std::vector<torch::Tensor> chunk_products (num_chunks);
+                #pragma omp parallel for default(none) \
+                                         num_threads(parallelism::max_threads()) \
+                                         if(!is_cuda && num_chunks > 1) \
+                                         schedule(static) \
+                                         shared(sigtensors, bounds, checkpoints, chunk_products, num_chunks, \
+                                                input_channels, depth, scalar_term)
+                for (int64_t chunk_index = 0; chunk_index < num_chunks; ++chunk_index) {
+                    s_size_type start = bounds[chunk_index];
+                    s_size_type end = bounds[chunk_index + 1];
+                    s_size_type stride = checkpoint_stride(end - start);
+                    std::vector<torch::Tensor>& checkpoint = checkpoints[chunk_index];
+                    checkpoint.push_back(sigtensors[start]);
+                    if (end - start == 1) {
+                        chunk_products[chunk_index] = sigtensors[start];
+                        continue;
+                    }
+                    torch::Tensor out = sigtensors[start].clone();
+                    for (s_size_type index = start + 1; index < end; ++index) {
+                        mult_sigtensors(out, sigtensors[index], input_channels, depth, scalar_term);
+                        // The partial product ending at 'index' is needed by the backward pass through index + 1.
+                        if ((index - start) % stride == 0 && index < end - 1) {
+                            checkpoint.push_back(out.clone());
+                        }
+                    }
+                    chunk_products[chunk_index] = out;
+                }
+
+                // Recompute the tree, keeping every node. levels[level_index][node_index] is the product of the
+                // chunks starting at firsts[level_index][node_index].
+                std::vector<std::vector<torch::Tensor>> levels;
+                std::vector<std::vector<s_size_type>> firsts;
+                levels.push_back(chunk_products);
+                firsts.emplace_back();
+                for (s_size_type chunk_index = 0; chunk_index < num_chunks; ++chunk_index) {
+                    firsts.back().push_back(chunk_index);
+                }
+                while (levels.back().size() > 1) {
+                    const std::vector<torch::Tensor>& level = levels.back();
+                    int64_t num_pairs = level.size() / 2;
+                    std::vector<torch::Tensor> next_level ((level.size() + 1) / 2);
+                    std::vector<s_size_type> next_firsts;
+                    #pragma omp parallel for default(none) \
+                                             num_threads(parallelism::max_threads()) \
+                                             if(!is_cuda && num_pairs > 1) \
+                                             schedule(static) \
+                                             shared(level, next_level, num_pairs, input_channels, depth, scalar_term)
+                    for (int64_t pair_index = 0; pair_index < num_pairs; ++pair_index) {
+                        torch::Tensor out = level[2 * pair_index].clone();
+                        mult_sigtensors(out, level[2 * pair_index + 1], input_channels, depth, scalar_term);
+                        next_level[pair_index] = out;
+                    }
+                    if (level.size() % 2 == 1) {
+                        next_level.back() = level.back();
+                    }
+                    for (s_size_type index = 0; index < static_cast<s_size_type>(level.size()); index += 2) {
+                        next_firsts.push_back(firsts.back()[index]);
+                    }
+                    levels.push_back(std::move(next_level));
+                    firsts.push_back(std::move(next_firsts));
+                }
+
+                // Backwards through the tree, from the top down.
+                for (s_size_type level_index = levels.size() - 2; level_index >= 0; --level_index) {
+                    const std::vector<torch::Tensor>& level = levels[level_index];
+                    const std::vector<s_size_type>& level_firsts = firsts[level_index];
+                    int64_t num_pairs = level.size() / 2;
+                    #pragma omp parallel for default(none) \
+                                             num_threads(parallelism::max_threads()) \
+                                             if(!is_cuda && num_pairs > 1) \
+                                             schedule(static) \
+                                             shared(grad_sigtensors, level, level_firsts, bounds, num_pairs, \
+                                                    input_channels, depth, scalar_term)
+                    for (int64_t pair_index = 0; pair_index < num_pairs; ++pair_index) {
+                        mult_sigtensors_backward(grad_sigtensors[bounds[level_firsts[2 * pair_index]]],
+                                                 grad_sigtensors[bounds[level_firsts[2 * pair_index + 1]]],
+                                                 level[2 * pair_index], level[2 * pair_index + 1], input_channels,
+                                                 depth, scalar_term);
+                    }
+                }
+
+                // Backwards through each thread's chunk, one stretch of stride multiplications at a time, from the
+                // end. The partial products within each stretch are recomputed from its checkpoint.
+                #pragma omp parallel for default(none) \
+                                         num_threads(parallelism::max_threads()) \
+                                         if(!is_cuda && num_chunks > 1) \
+                                         schedule(static) \
+                                         shared(grad_sigtensors, sigtensors, bounds, checkpoints, num_chunks, \
+                                                input_channels, depth, scalar_term)
+                for (int64_t chunk_index = 0; chunk_index < num_chunks; ++chunk_index) {
+                    s_size_type start = bounds[chunk_index];
+                    s_size_type end = bounds[chunk_index + 1];
+                    s_size_type stride = checkpoint_stride(end - start);
+                    const std::vector<torch::Tensor>& checkpoint = checkpoints[chunk_index];
+                    std::vector<torch::Tensor> prefixes;
+                    prefixes.reserve(stride);
+                    for (s_size_type checkpoint_index = checkpoint.size() - 1;
+                         checkpoint_index >= 0;
+                         --checkpoint_index) {
+                        // prefixes[i] is the product of the elements from 'start' up to and including
+                        // stretch_start + i.
+                        s_size_type stretch_start = start + checkpoint_index * stride;
+                        s_size_type stretch_end = std::min(stretch_start + stride, end - 1);
+                        prefixes.clear();
+                        prefixes.push_back(checkpoint[checkpoint_index]);
+                        for (s_size_type index = stretch_start + 1; index < stretch_end; ++index) {
+                            torch::Tensor out = prefixes.back().clone();
+                            mult_sigtensors(out, sigtensors[index], input_channels, depth, scalar_term);
+                            prefixes.push_back(out);
+                        }
+                        for (s_size_type index = stretch_end; index > stretch_start; --index) {
+                            mult_sigtensors_backward(grad_sigtensors[start], grad_sigtensors[index],
+                                                     prefixes[index - stretch_start - 1], sigtensors[index],
+                                                     input_channels, depth, scalar_term);
+                        }
+                    }
+                }
+            }
+        }  // namespace signatory::ta_ops::detail
+    }  // namespace signatory::ta_ops
+
     torch::Tensor signature_combine_forward(std::vector<torch::Tensor> sigtensors, // copy not reference as we modify it
                                             int64_t input_channels,
                                             s_size_type depth,
-                                            bool scalar_term) {
+                                            bool scalar_term,
+                                            bool out,
+                                            torch::Tensor out_value) {
         // Perform a bunch of argument checking
 
         misc::checkargs_channels_depth(input_channels, depth);
@@ -1070,7 +1888,7 @@ namespace signatory {
                                         "(batch, signature_channels(input_channels, depth, scalar_term))");
         }
 
-        py::gil_scoped_release release;
+        misc::GILRelease release;
 
         int64_t batch_size = sigtensors[0].size(batch_dim);
         for (auto& elem : sigtensors) {
@@ -1091,30 +1909,17 @@ namespace signatory {
 
         // Actually do the computation
 
-        torch::Tensor out;
-        torch::Tensor out_with_scalar = sigtensors[0].clone();
-        if (scalar_term) {
-            out = out_with_scalar.narrow(/*dim=*/channel_dim, /*start=*/1,
-                                         /*length=*/out_with_scalar.size(channel_dim) - 1);
-        }
-        else {
-            out = out_with_scalar;
-        }
-        std::vector<torch::Tensor> out_vector;
-        misc::slice_by_term(out, out_vector, input_channels, depth);
-        for (s_size_type sigtensor_index = 1;
-             sigtensor_index < static_cast<s_size_type>(sigtensors.size());
-             ++sigtensor_index) {
-            std::vector<torch::Tensor> sigtensor_vector;
-            torch::Tensor sigtensor = sigtensors[sigtensor_index];
-            if (scalar_term) {
-                sigtensor = sigtensor.narrow(/*dim=*/channel_dim, /*start=*/1,
-                                             /*length=*/sigtensor.size(channel_dim) - 1);
+        if (sigtensors.size() == 1) {
+            if (out) {
+                return out_value.copy_(sigtensors[0]);
             }
-            misc::slice_by_term(sigtensor, sigtensor_vector, input_channels, depth);
-            ta_ops::mult(out_vector, sigtensor_vector, /*inverse=*/false);
+            return sigtensors[0].clone();
+        }
+        if (!out) {
+            // So that tree_combine knows not to use it.
+            out_value = torch::Tensor();
         }
-        return out_with_scalar;
+        return ta_ops::detail::tree_combine(sigtensors, input_channels, depth, scalar_term, out_value);
     }
 
     std::vector<torch::Tensor> signature_combine_backward(torch::Tensor grad_out,
@@ -1124,7 +1929,7 @@ namespace signatory {
                                                           s_size_type depth,
                                                           bool scalar_term) {
 
-        py::gil_scoped_release release;
+        misc::GILRelease release;
 
         grad_out = grad_out.detach();
         for (auto& elem : sigtensors) {
@@ -1136,122 +1941,29 @@ namespace signatory {
         std::vector<torch::Tensor> grad_sigtensors_with_scalars;
         grad_sigtensors.reserve(sigtensors.size());
         grad_sigtensors_with_scalars.reserve(sigtensors.size());
-        grad_sigtensors.emplace_back();  // we'll fill in the first slot at the very end
-        grad_sigtensors_with_scalars.emplace_back();
+
+        // The gradient through the whole product is stored in the memory for the gradient through the first
+        // sigtensor; tree_combine_backward then operates on it in-place.
+        torch::Tensor grad_scratch_with_scalar = grad_out.clone();
+        if (scalar_term) {
+            grad_scratch_with_scalar.narrow(/*dim=*/channel_dim, /*start=*/0, /*length=*/1).zero_();
+        }
+        grad_sigtensors_with_scalars.push_back(grad_scratch_with_scalar);
+        grad_sigtensors.push_back(ta_ops::detail::without_scalar(grad_scratch_with_scalar, scalar_term));
         for (s_size_type sigtensors_index = 1;
              sigtensors_index < static_cast<s_size_type>(sigtensors.size());
              ++sigtensors_index) {
             torch::Tensor grad_sigtensor_with_scalar = torch::empty_like(sigtensors[sigtensors_index]);
-            torch::Tensor grad_sigtensor;
             if (scalar_term) {
                 grad_sigtensor_with_scalar.narrow(/*dim=*/channel_dim, /*start=*/0, /*length=*/1).zero_();
-                grad_sigtensor = grad_sigtensor_with_scalar.narrow(/*dim=*/channel_dim, /*start=*/1,
-                                                                   /*length=*/grad_sigtensor_with_scalar.size(channel_dim) - 1);
-            }
-            else {
-                grad_sigtensor = grad_sigtensor_with_scalar;
             }
-            grad_sigtensors.push_back(grad_sigtensor);
+            grad_sigtensors.push_back(ta_ops::detail::without_scalar(grad_sigtensor_with_scalar, scalar_term));
             grad_sigtensors_with_scalars.push_back(grad_sigtensor_with_scalar);
         }
 
-        // Recompute the inputs to each tensor multiplication
-        std::vector<std::vector<torch::Tensor>> scratch_vector_vector;
-        auto reserve_amount = sigtensors.size();
-        if (reserve_amount < 2) {
-            reserve_amount = 0;
-        }
-        else {
-            reserve_amount -= 2;
-        }
-        scratch_vector_vector.reserve(reserve_amount);
-        torch::Tensor scratch = sigtensors[0];  // no clone necessary here, we're going to do it in the loop below
-        if (scalar_term) {
-            scratch = scratch.narrow(/*dim=*/channel_dim, /*start=*/1, /*length=*/scratch.size(channel_dim) - 1);
-        }
-        // -1 to the size because we don't need to store the final output
-        for (s_size_type sigtensor_index = 1;
-             sigtensor_index < static_cast<s_size_type>(sigtensors.size()) - 1;
-             ++sigtensor_index) {
-            scratch = scratch.clone();
-            std::vector<torch::Tensor> scratch_vector;
-            misc::slice_by_term(scratch, scratch_vector, input_channels, depth);
-
-            std::vector<torch::Tensor> sigtensor_vector;
-            torch::Tensor sigtensor = sigtensors[sigtensor_index];
-            if (scalar_term) {
-                sigtensor = sigtensor.narrow(/*dim=*/channel_dim, /*start=*/1,
-                                             /*length=*/sigtensor.size(channel_dim) - 1);
-            }
-            misc::slice_by_term(sigtensor, sigtensor_vector, input_channels, depth);
-            ta_ops::mult(scratch_vector, sigtensor_vector, /*inverse=*/false);
-
-            scratch_vector_vector.push_back(scratch_vector);
-        }
-
-        // Allocate memory for the gradient when computing backward through the tensor multiplications
-        torch::Tensor grad_scratch_with_scalar = grad_out.clone();
-        torch::Tensor grad_scratch;
-        if (scalar_term) {
-            grad_scratch_with_scalar.narrow(/*dim=*/channel_dim, /*start=*/0, /*length=*/1).zero_();
-            grad_scratch = grad_scratch_with_scalar.narrow(/*dim=*/channel_dim, /*start=*/1,
-                                                           /*length=*/grad_out.size(channel_dim) - 1);
-        }
-        else {
-            grad_scratch = grad_scratch_with_scalar;
-        }
-        std::vector<torch::Tensor> grad_scratch_vector;
-        misc::slice_by_term(grad_scratch, grad_scratch_vector, input_channels, depth);
-
         // Actually do the computation
-        for (s_size_type sigtensors_index = sigtensors.size() - 1; sigtensors_index >= 2; --sigtensors_index) {
-            // Recompute the inputs of each multiplication
-            std::vector<torch::Tensor> sigtensor_vector;
-            torch::Tensor sigtensor = sigtensors[sigtensors_index];
-            if (scalar_term) {
-                sigtensor = sigtensor.narrow(/*dim=*/channel_dim, /*start=*/1,
-                                             /*length=*/sigtensor.size(channel_dim) - 1);
-            }
-            misc::slice_by_term(sigtensor, sigtensor_vector, input_channels, depth);
-
-            // Actually perform the backward operation
-            std::vector<torch::Tensor> grad_sigtensor_vector;
-            misc::slice_by_term(grad_sigtensors[sigtensors_index], grad_sigtensor_vector, input_channels, depth);
-            ta_ops::mult_backward</*add_not_copy=*/false>(grad_scratch_vector, grad_sigtensor_vector,
-                                                          // -1 because we're getting the input to this operation, so we
-                                                          // need to look one step into the past
-                                                          // -1 again because we don't store this input for the very
-                                                          // first operation (we don't need to for that one), and it's
-                                                          // pulled out as a special case below.
-                                                          scratch_vector_vector[sigtensors_index - 2],
-                                                          sigtensor_vector);
-        }
-        if (sigtensors.size() > 1) {
-            // Correponds to sigtensors_index == 1
-            // This iteration pulled out because we don't need to do the final division
-            std::vector<torch::Tensor> sigtensor_vector;
-            torch::Tensor sigtensor_one = sigtensors[1];
-            if (scalar_term) {
-                sigtensor_one = sigtensor_one.narrow(/*dim=*/channel_dim, /*start=*/1,
-                                                     /*length=*/sigtensor_one.size(channel_dim) - 1);
-            }
-            misc::slice_by_term(sigtensor_one, sigtensor_vector, input_channels, depth);
-            std::vector<torch::Tensor> first_sigtensor_vector;
-            torch::Tensor sigtensor_zero = sigtensors[0];
-            if (scalar_term) {
-                sigtensor_zero = sigtensor_zero.narrow(/*dim=*/channel_dim, /*start=*/1,
-                                                       /*length=*/sigtensor_zero.size(channel_dim) - 1);
-            }
-            misc::slice_by_term(sigtensor_zero, first_sigtensor_vector, input_channels, depth);
-            std::vector<torch::Tensor> grad_sigtensor_vector;
-            misc::slice_by_term(grad_sigtensors[1], grad_sigtensor_vector, input_channels, depth);
-            ta_ops::mult_backward</*add_not_copy=*/false>(grad_scratch_vector, grad_sigtensor_vector,
-                                                          first_sigtensor_vector, sigtensor_vector);
-        }
-        // Fill in the gradient for the very first sigtensor.
-        grad_sigtensors_with_scalars[0] = grad_scratch_with_scalar;
-        grad_sigtensors[0] = grad_scratch;  // unnecessary, I'm pretty sure. TODO: remove this + shorten grad_sigtensors by one?
+        ta_ops::detail::tree_combine_backward(grad_sigtensors, sigtensors, input_channels, depth, scalar_term);
 
         return grad_sigtensors_with_scalars;
     }
-}  // namespace signatory
\ No newline at end of file
+}  // namespace signatory
@@ -54,6 +54,31 @@ namespace signatory {
                            const std::vector<torch::Tensor>& arg1,
                            const std::vector<torch::Tensor>& arg2);
 
+        // Computes the derivative of mult(..., /*inverse=*/false).
+        // 'arg1' and 'arg2' are both general members of the tensor algebra, as mult is called with. (Not as it
+        // returns.)
+        // 'tangent_arg1' and 'tangent_arg2' are perturbations to arg1 and arg2 respectively, so they are members of the
+        // tensor algebra with assumed scalar value zero.
+        // Then 'tangent_arg1' is modified to hold the corresponding perturbation to arg1 \otimes arg2, that is,
+        // tangent_arg1 \otimes arg2 + arg1 \otimes tangent_arg2.
+        void mult_tangent(std::vector<torch::Tensor>& tangent_arg1, const std::vector<torch::Tensor>& tangent_arg2,
+                          const std::vector<torch::Tensor>& arg1, const std::vector<torch::Tensor>& arg2);
+
+        // Backwards through mult_tangent.
+        // 'tangent_arg1', 'tangent_arg2', 'arg1', 'arg2' should be as mult_tangent was called with.
+        // 'grad_tangent_arg1' is the input gradient, and will be modified in-place to hold the gradient through
+        // tangent_arg1.
+        // The gradients through 'tangent_arg2', 'arg1' and 'arg2' will be added onto 'grad_tangent_arg2', 'grad_arg1'
+        // and 'grad_arg2' respectively.
+        void mult_tangent_backward(std::vector<torch::Tensor>& grad_tangent_arg1,
+                                   std::vector<torch::Tensor>& grad_tangent_arg2,
+                                   std::vector<torch::Tensor>& grad_arg1,
+                                   std::vector<torch::Tensor>& grad_arg2,
+                                   const std::vector<torch::Tensor>& tangent_arg1,
+                                   const std::vector<torch::Tensor>& tangent_arg2,
+                                   const std::vector<torch::Tensor>& arg1,
+                                   const std::vector<torch::Tensor>& arg2);
+
         // Computes a restricted exponential in the tensor algebra.
         //
         // That is, it computes the exponential of 'in', and places the result in 'out'. It is restricted because 'in'
@@ -74,6 +99,28 @@ namespace signatory {
                                      torch::Tensor in, const std::vector<torch::Tensor>& out,
                                      torch::Tensor reciprocals);
 
+        // Computes the derivative of the restricted exponential.
+        // 'in' and 'out' should be as passed to and returned from restricted_exp.
+        // 'tangent_in' is a perturbation to 'in', and 'tangent_out' will have the corresponding perturbation to 'out'
+        // placed in it. It should already be of the appropriate size corresponding to the depth.
+        void restricted_exp_tangent(torch::Tensor in, torch::Tensor tangent_in, const std::vector<torch::Tensor>& out,
+                                    std::vector<torch::Tensor>& tangent_out, torch::Tensor reciprocals);
+
+        // Backwards through restricted_exp and restricted_exp_tangent together.
+        // 'in', 'tangent_in', 'out', 'tangent_out' should be as passed to and returned from restricted_exp and
+        // restricted_exp_tangent.
+        // 'grad_in' will have the gradient through 'in' copied into it. (The gradient through 'tangent_in' is not
+        // computed.)
+        // 'grad_out' and 'grad_tangent_out' are the input gradients to this function, and will be modified in-place.
+        void restricted_exp_tangent_backward(torch::Tensor grad_in,
+                                             std::vector<torch::Tensor>& grad_out,
+                                             std::vector<torch::Tensor>& grad_tangent_out,
+                                             torch::Tensor in,
+                                             torch::Tensor tangent_in,
+                                             const std::vector<torch::Tensor>& out,
+                                             const std::vector<torch::Tensor>& tangent_out,
+                                             torch::Tensor reciprocals);
+
         // Computes a fused multiply-exponentiate.
         // 'next' should be a member of the lowest nonscalar level of the tensor algebra.
         // 'prev' should be a general member of the tensor algebra.
@@ -82,17 +129,29 @@ namespace signatory {
         void mult_fused_restricted_exp(torch::Tensor next, std::vector<torch::Tensor>& prev, bool inverse,
                                        torch::Tensor reciprocals, int64_t batch_threads=1);
 
+        // Computes the fused multiply-exponentiate, and its derivative.
+        // 'next', 'prev', 'inverse' and 'batch_threads' are as in mult_fused_restricted_exp, and 'prev' is modified in
+        // the same way.
+        // 'tangent_next' and 'tangent_prev' are perturbations to 'next' and 'prev', and 'tangent_prev' is modified to
+        // hold the corresponding perturbation to the result.
+        void mult_fused_restricted_exp_tangent(torch::Tensor next, torch::Tensor tangent_next,
+                                               std::vector<torch::Tensor>& prev,
+                                               std::vector<torch::Tensor>& tangent_prev, bool inverse,
+                                               torch::Tensor reciprocals, int64_t batch_threads=1);
+
         // Backwards through the fused multiply-exponentiate.
         // 'grad_next' will have the gradient from this operation copied in to it.
         // 'grad_prev' is the input gradient to this function, and will be modified in-place.
         // 'next' should be as passed to mult_fused_restricted_exp
         // 'prev' should as passed to mult_fused_restricted_exp
+        // 'batch_threads' is the number of OpenMP threads used to parallelise over the batch dimension.
         void mult_fused_restricted_exp_backward(torch::Tensor grad_next,
                                                 std::vector<torch::Tensor>& grad_prev,
                                                 torch::Tensor next,
                                                 const std::vector<torch::Tensor>& prev,
                                                 bool inverse,
-                                                torch::Tensor reciprocals);
+                                                torch::Tensor reciprocals,
+                                                int64_t batch_threads=1);
 
         // Computes the logarithm in the tensor algebra
         // 'output_vector' and 'input_vector' are both members of the tensor algebra, with assumed scalar values 1.
@@ -109,11 +168,35 @@ namespace signatory {
                           std::vector<torch::Tensor>& grad_input_vector,
                           const std::vector<torch::Tensor>& input_vector,
                           torch::Tensor reciprocals);
+
+        // Computes the logarithm in the tensor algebra, and its derivative.
+        // 'output_vector' and 'input_vector' are as in log, and 'output_vector' is modified to be log(input_vector).
+        // 'tangent_input_vector' is a perturbation to 'input_vector' (so with assumed scalar value zero), and
+        // 'tangent_output_vector' is modified to hold the corresponding perturbation to log(input_vector).
+        void log_tangent(std::vector<torch::Tensor>& tangent_output_vector,
+                         std::vector<torch::Tensor>& output_vector,
+                         const std::vector<torch::Tensor>& input_vector,
+                         const std::vector<torch::Tensor>& tangent_input_vector,
+                         torch::Tensor reciprocals);
+
+        // Computes the backwards pass through the tangent computed by log_tangent.
+        // 'input_vector' and 'tangent_input_vector' are as passed to log_tangent.
+        // 'grad_tangent_output_vector' is the input gradient, and will be modified in-place.
+        // 'grad_input_vector' and 'grad_tangent_input_vector' are the output gradients, and will have the result of
+        // this operation added on to them.
+        void log_tangent_backward(std::vector<torch::Tensor>& grad_tangent_output_vector,
+                                  std::vector<torch::Tensor>& grad_input_vector,
+                                  std::vector<torch::Tensor>& grad_tangent_input_vector,
+                                  const std::vector<torch::Tensor>& input_vector,
+                                  const std::vector<torch::Tensor>& tangent_input_vector,
+                                  torch::Tensor reciprocals);
     }  // namespace signatory::ta_ops
 
     // See signatory.signature_combine
+    // If 'out' is true then the result is written into 'out_value' (which is then returned), which must already have
+    // been checked to be of the correct shape, dtype and device.
     torch::Tensor signature_combine_forward(std::vector<torch::Tensor> sigtensors, int64_t input_channels,
-                                            s_size_type depth, bool scalar_term);
+                                            s_size_type depth, bool scalar_term, bool out, torch::Tensor out_value);
 
     // See signatory.signature_combine
     std::vector<torch::Tensor> signature_combine_backward(torch::Tensor grad_out,
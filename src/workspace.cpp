@@ -0,0 +1,174 @@
+/* Copyright 2019 Patrick Kidger. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *    http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ * ========================================================================= */
+
+
+#include <torch/extension.h>
+#include <cstdint>        // int64_t
+#include <map>            // std::map
+#include <memory>         // std::shared_ptr, std::default_delete
+#include <mutex>          // std::mutex, std::lock_guard
+#include <tuple>          // std::tuple, std::make_tuple
+#include <unordered_set>  // std::unordered_set
+
+#include "misc.hpp"
+#include "workspace.hpp"
+
+
+namespace signatory {
+    namespace workspace {
+        namespace detail {
+            using Key = std::tuple<int, int64_t, s_size_type, int>;
+
+            struct Entry {
+                std::shared_ptr<char> memory;
+                int64_t bytes;
+            };
+
+            struct Pool;
+
+            // Keeps track of every thread's pool, so that they can all be cleared at once.
+            struct Registry {
+                std::mutex mutex;
+                std::unordered_set<Pool*> pools;
+            };
+
+            Registry& registry() {
+                static Registry registry_;
+                return registry_;
+            }
+
+            // Each thread's pool. It's only ever touched by its own thread, except when being cleared, which is
+            // what the mutex is for. (So in practice the mutex is essentially never contended.)
+            struct Pool {
+                Pool() {
+                    std::lock_guard<std::mutex> lock {registry().mutex};
+                    registry().pools.insert(this);
+                }
+
+                ~Pool() {
+                    std::lock_guard<std::mutex> lock {registry().mutex};
+                    registry().pools.erase(this);
+                }
+
+                void clear() {
+                    blocks.clear();
+                    reciprocals.clear();
+                    bytes = 0;
+                }
+
+                // Makes room for 'extra' more bytes, by throwing everything away if necessary. Returns whether there
+                // is now enough room.
+                bool make_room(int64_t extra) {
+                    if (bytes + extra > max_bytes) {
+                        clear();
+                    }
+                    return extra <= max_bytes;
+                }
+
+                std::mutex mutex;
+                std::map<Key, Entry> blocks;
+                std::map<Key, torch::Tensor> reciprocals;
+                int64_t bytes {0};
+            };
+
+            Pool& pool() {
+                thread_local Pool pool_;
+                return pool_;
+            }
+
+            std::shared_ptr<char> allocate(int64_t bytes) {
+                return std::shared_ptr<char>(new char[bytes], std::default_delete<char[]>());
+            }
+        }  // namespace signatory::workspace::detail
+
+        Block::Block(std::shared_ptr<char> memory) : memory_{memory} {}
+
+        torch::Tensor Block::as_tensor(torch::IntArrayRef sizes, torch::TensorOptions opts) const {
+            std::shared_ptr<char> memory = memory_;
+            return torch::from_blob(memory.get(), sizes, [memory](void*) mutable { memory.reset(); }, opts);
+        }
+
+        Block get(torch::ScalarType dtype, int64_t channels, s_size_type depth, Slot slot, int64_t bytes) {
+            // Always allocate something, so that data() is never a null pointer.
+            if (bytes < 1) {
+                bytes = 1;
+            }
+            detail::Pool& pool = detail::pool();
+            std::lock_guard<std::mutex> lock {pool.mutex};
+            detail::Key key = std::make_tuple(static_cast<int>(dtype), channels, depth, static_cast<int>(slot));
+            auto found = pool.blocks.find(key);
+            if (found != pool.blocks.end()) {
+                // If anything other than the pool holds the memory then it's still in use. Nothing else can start
+                // holding it in the meantime, as only this thread hands it out, so checking the count is enough.
+                if (found->second.bytes >= bytes && found->second.memory.use_count() == 1) {
+                    return Block {found->second.memory};
+                }
+                pool.bytes -= found->second.bytes;
+                pool.blocks.erase(found);
+            }
+            std::shared_ptr<char> memory = detail::allocate(bytes);
+            if (pool.make_room(bytes)) {
+                pool.blocks[key] = {memory, bytes};
+                pool.bytes += bytes;
+            }
+            return Block {memory};
+        }
+
+        torch::Tensor empty(torch::IntArrayRef sizes, torch::TensorOptions opts, s_size_type depth, Slot slot) {
+            if (opts.device().type() != torch::kCPU) {
+                return torch::empty(sizes, opts);
+            }
+            torch::ScalarType dtype = c10::typeMetaToScalarType(opts.dtype());
+            int64_t numel = 1;
+            for (int64_t size : sizes) {
+                numel *= size;
+            }
+            int64_t channels = sizes.empty() ? 0 : sizes.back();
+            Block block = get(dtype, channels, depth, slot, numel * static_cast<int64_t>(c10::elementSize(dtype)));
+            return block.as_tensor(sizes, opts);
+        }
+
+        torch::Tensor reciprocals(s_size_type depth, torch::TensorOptions opts) {
+            // Tensors on other devices aren't cached, as their lifetime would then extend until the thread exits,
+            // which may be after the device has been torn down.
+            if (opts.device().type() != torch::kCPU) {
+                return misc::make_reciprocals(depth, opts);
+            }
+            detail::Pool& pool = detail::pool();
+            std::lock_guard<std::mutex> lock {pool.mutex};
+            detail::Key key = std::make_tuple(static_cast<int>(c10::typeMetaToScalarType(opts.dtype())),
+                                                /*channels=*/0, depth, /*slot=*/-1);
+            auto found = pool.reciprocals.find(key);
+            if (found != pool.reciprocals.end()) {
+                return found->second;
+            }
+            torch::Tensor result = misc::make_reciprocals(depth, opts);
+            int64_t bytes = result.numel() * result.element_size();
+            if (pool.make_room(bytes)) {
+                pool.reciprocals[key] = result;
+                pool.bytes += bytes;
+            }
+            return result;
+        }
+
+        void clear() {
+            std::lock_guard<std::mutex> registry_lock {detail::registry().mutex};
+            for (detail::Pool* pool : detail::registry().pools) {
+                std::lock_guard<std::mutex> lock {pool->mutex};
+                pool->clear();
+            }
+        }
+    }  // namespace signatory::workspace
+}  // namespace signatory
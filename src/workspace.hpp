@@ -0,0 +1,88 @@
+/* Copyright 2019 Patrick Kidger. All Rights Reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ * 
+ *    http://www.apache.org/licenses/LICENSE-2.0
+ * 
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ * ========================================================================= */
+ // Provides a pool of scratch memory that is reused between calls.
+ //
+ // The CPU kernels need scratch space whose size depends only on the dtype, the number of channels and the depth. For
+ // small inputs, allocating it afresh on every call is a large part of the overall cost. So instead every thread keeps
+ // its own pool of scratch memory, keyed by (dtype, channels, depth), which is reused the next time the same kernel is
+ // called with the same key.
+ //
+ // The total amount of memory that each thread keeps hold of is capped at max_bytes; anything beyond that is simply
+ // allocated and freed as normal.
+ //
+ // A block of memory is only handed out again once nothing else holds on to it, so memory from the pool may safely
+ // outlive the kernel that asked for it; for example by being returned to the caller as a tensor.
+
+
+#ifndef SIGNATORY_WORKSPACE_HPP
+#define SIGNATORY_WORKSPACE_HPP
+
+#include <torch/extension.h>
+#include <cstdint>  // int64_t
+#include <memory>   // std::shared_ptr
+
+#include "misc.hpp"
+
+
+namespace signatory {
+    namespace workspace {
+        // The maximum number of bytes that any one thread will keep hold of.
+        constexpr int64_t max_bytes = 64 * 1024 * 1024;
+
+        // Identifies which kernel a block of scratch memory belongs to, so that different kernels with the same
+        // (dtype, channels, depth) don't tread on each other's toes.
+        enum class Slot {
+            MultFusedRestrictedExp,
+            MultFusedRestrictedExpTangent,
+            MultFusedRestrictedExpBackward,
+            PathIncrements,
+            SignatureChunk
+        };
+
+        // A block of uninitialised scratch memory. The memory stays valid for as long as the block exists, even if
+        // the pool is cleared in the meantime.
+        class Block {
+        public:
+            explicit Block(std::shared_ptr<char> memory);
+
+            template <typename T>
+            T* data() const { return reinterpret_cast<T*>(memory_.get()); }
+
+            // Wraps the memory as a tensor, which keeps the memory alive for as long as it (or any view of it) exists.
+            torch::Tensor as_tensor(torch::IntArrayRef sizes, torch::TensorOptions opts) const;
+        private:
+            std::shared_ptr<char> memory_;
+        };
+
+        // Gets a block of at least 'bytes' many bytes from the calling thread's pool. If the pooled block for this key
+        // is still in use (by an earlier Block or tensor that hasn't been freed yet) then fresh memory is returned
+        // instead.
+        Block get(torch::ScalarType dtype, int64_t channels, s_size_type depth, Slot slot, int64_t bytes);
+
+        // As torch::empty, except that on the CPU the memory is drawn from the calling thread's pool. The result is
+        // contiguous, and its last dimension is used as the number of channels in the key.
+        torch::Tensor empty(torch::IntArrayRef sizes, torch::TensorOptions opts, s_size_type depth, Slot slot);
+
+        // As misc::make_reciprocals, except that the result is cached when on the CPU. The result must not be modified
+        // in-place.
+        torch::Tensor reciprocals(s_size_type depth, torch::TensorOptions opts);
+
+        // Releases the memory held by every thread's pool. Memory currently in use is released once it stops being
+        // used.
+        void clear();
+    }  // namespace signatory::workspace
+}  // namespace signatory
+
+#endif //SIGNATORY_WORKSPACE_HPP
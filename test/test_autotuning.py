@@ -0,0 +1,92 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Tests autotuning how signature computations are parallelised."""
+
+
+import json
+import os
+import torch
+
+from helpers import helpers as h
+from helpers import validation as v
+
+
+tests = ['autotune']
+depends = ['signature']
+signatory = v.validate_tests(tests, depends)
+
+
+def test_autotune(tmpdir):
+    """Tests that autotuning gives the same values and gradients as not autotuning, and that the plans it chooses are
+    saved to and reused from the cache."""
+    cache_path = os.path.join(str(tmpdir), 'autotune.json')
+    was_enabled = signatory.autotune()
+    # Setting the cache path is global state, so put back the original afterwards rather than leaving it pointing at
+    # a temporary directory.
+    _cache_path = signatory.autotune.__globals__['_cache_path']
+    _cache = signatory.autotune.__globals__['_cache']
+    was_cache_path = _cache_path[0]
+    try:
+        for stream in (False, True):
+            for batch_size, input_stream in ((1, 300), (16, 20)):
+                path = torch.rand(batch_size, input_stream, 3, dtype=torch.double, requires_grad=True)
+                signatory.autotune(False)
+                expected = signatory.signature(path, 3, stream=stream)
+                grad = torch.rand_like(expected)
+                expected_grad, = torch.autograd.grad(expected, path, grad)
+
+                signatory.autotune(True, cache_path=cache_path)
+                for _ in range(2):  # the second time around uses the cached plan
+                    signature = signatory.signature(path, 3, stream=stream)
+                    h.diff(signature, expected)
+                    signature_grad, = torch.autograd.grad(signature, path, grad)
+                    h.diff(signature_grad, expected_grad)
+
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+        assert len(cache) == 4
+
+        # A new cache location starts from scratch
+        new_cache_path = os.path.join(str(tmpdir), 'new', 'autotune.json')
+        signatory.autotune(cache_path=new_cache_path)
+        signatory.signature(torch.rand(2, 10, 2), 2)
+        with open(new_cache_path, 'r') as f:
+            assert len(json.load(f)) == 1
+    finally:
+        signatory.autotune(was_enabled)
+        _cache_path[0] = was_cache_path
+        _cache[0] = None
+
+
+def test_autotune_key(tmpdir):
+    """Tests that computations differing only in their layout or scalar term are given separate plans."""
+    cache_path = os.path.join(str(tmpdir), 'autotune.json')
+    was_enabled = signatory.autotune()
+    _cache_path = signatory.autotune.__globals__['_cache_path']
+    _cache = signatory.autotune.__globals__['_cache']
+    was_cache_path = _cache_path[0]
+    try:
+        signatory.autotune(True, cache_path=cache_path)
+        path = torch.rand(2, 10, 3)
+        for scalar_term in (False, True):
+            signatory.signature(path, 2, scalar_term=scalar_term)
+            signatory.signature(path.transpose(0, 1), 2, scalar_term=scalar_term, layout='stream')
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+        assert len(cache) == 4
+    finally:
+        signatory.autotune(was_enabled)
+        _cache_path[0] = was_cache_path
+        _cache[0] = None
@@ -433,3 +433,148 @@ def _test_repeat_and_memory_leaks(class_, path_grad, batch_size, input_stream, i
         except AssertionError:
             print(repeat)
             raise
+
+
+def test_bch():
+    """Tests that computing the logsignature via the Baker-Campbell-Hausdorff formula gives the same values and
+    gradients as the usual computation."""
+    for class_ in (False, True):
+        for device in h.get_devices():
+            for batch_size in (1, 3):
+                for input_stream in (2, 5):
+                    for input_channels in (1, 2, 3):
+                        for depth in (1, 2, 3, 4):
+                            for mode in ('words', 'brackets'):
+                                stream = random.choice([False, True])
+                                basepoint = random.choice([False, True, h.with_grad])
+                                inverse = random.choice([False, True])
+                                _test_bch(class_, device, batch_size, input_stream, input_channels, depth, stream,
+                                          basepoint, inverse, mode)
+
+
+def _test_bch(class_, device, batch_size, input_stream, input_channels, depth, stream, basepoint, inverse, mode):
+    path = h.get_path(batch_size, input_stream, input_channels, device, path_grad=True)
+    basepoint = h.get_basepoint(batch_size, input_channels, device, basepoint)
+    tensors = [path]
+    if isinstance(basepoint, torch.Tensor):
+        tensors.append(basepoint)
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message="The logsignature with mode='brackets' has been requested on the "
+                                                  "GPU.", category=UserWarning)
+        if class_:
+            bch_logsignature = signatory.LogSignature(depth, stream=stream, inverse=inverse, mode=mode,
+                                                      bch=True)(path, basepoint=basepoint)
+        else:
+            bch_logsignature = signatory.logsignature(path, depth, stream=stream, basepoint=basepoint, inverse=inverse,
+                                                      mode=mode, bch=True)
+        logsignature = signatory_logsignature(class_, path, depth, stream, basepoint, inverse, mode)
+    assert bch_logsignature.device == logsignature.device
+    h.diff(bch_logsignature, logsignature)
+
+    grad = torch.rand_like(logsignature)
+    bch_grads = torch.autograd.grad(bch_logsignature, tensors, grad)
+    grads = torch.autograd.grad(logsignature, tensors, grad)
+    for bch_grad, grad_ in zip(bch_grads, grads):
+        h.diff(bch_grad, grad_)
+
+
+def test_bch_errors():
+    """Tests that computing the logsignature via the Baker-Campbell-Hausdorff formula raises errors on unsupported
+    arguments."""
+    path = torch.rand(2, 4, 3)
+    with pytest.raises(ValueError):
+        signatory.logsignature(path, 5, bch=True)
+    with pytest.raises(ValueError):
+        signatory.logsignature(path, 3, mode='expand', bch=True)
+
+
+def test_out():
+    """Tests that passing 'out' writes the same values into it as are otherwise returned."""
+    for device in h.get_devices():
+        for input_channels in (1, 3):
+            for depth in (1, 2, 4):
+                for stream in (False, True):
+                    for mode in h.all_modes:
+                        for bch in (False, True):
+                            if bch and mode == 'expand':
+                                continue
+                            path = h.get_path(2, 4, input_channels, device, path_grad=False)
+                            with warnings.catch_warnings():
+                                warnings.filterwarnings('ignore', message="The logsignature with mode='brackets' has "
+                                                                          "been requested on the GPU.",
+                                                        category=UserWarning)
+                                logsignature = signatory.logsignature(path, depth, stream=stream, mode=mode, bch=bch)
+                                out = torch.empty_like(logsignature)
+                                result = signatory.logsignature(path, depth, stream=stream, mode=mode, bch=bch,
+                                                                out=out)
+                            assert result is out
+                            h.diff(out, logsignature)
+
+
+def test_script():
+    """Tests that the LogSignature module may be scripted, and then gives the same values and gradients."""
+    for device in h.get_devices():
+        for stream in (False, True):
+            for basepoint in (False, True, h.with_grad):
+                for mode in h.all_modes:
+                    _test_script_or_compile(torch.jit.script, device, stream, basepoint, mode)
+
+
+@pytest.mark.skipif(not hasattr(torch, 'compile'), reason='torch.compile not available')
+def test_compile():
+    """Tests that the LogSignature module may be compiled without graph breaks, and then gives the same values and
+    gradients."""
+    def compile_fn(module):
+        return torch.compile(module, backend='aot_eager', fullgraph=True)
+
+    for stream in (False, True):
+        for mode in h.all_modes:
+            _test_script_or_compile(compile_fn, 'cpu', stream, h.with_grad, mode)
+
+
+def _test_script_or_compile(compile_fn, device, stream, basepoint, mode):
+    path = h.get_path(2, 5, 3, device, path_grad=True)
+    basepoint = h.get_basepoint(2, 3, device, basepoint)
+    tensors = [tensor for tensor in (path, basepoint) if isinstance(tensor, torch.Tensor)]
+
+    module = signatory.LogSignature(3, stream=stream, mode=mode)
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message="The logsignature with mode='brackets' has been requested on the "
+                                                  "GPU.", category=UserWarning)
+        expected = module(path, basepoint=basepoint)
+    # The module has already been used, so this also checks that what it caches doesn't get in the way.
+    result = compile_fn(module)(path, basepoint=basepoint)
+    h.diff(result, expected)
+
+    grad = torch.rand_like(expected)
+    expected_grads = torch.autograd.grad(expected, tensors, grad)
+    grads = torch.autograd.grad(result, tensors, grad)
+    for grad_value, expected_grad_value in zip(grads, expected_grads):
+        h.diff(grad_value, expected_grad_value)
+
+
+def test_script_errors():
+    """Tests that the scripted LogSignature module rejects the same 'out' arguments as the unscripted one, and that it
+    rejects the arguments that it doesn't support."""
+    for device in h.get_devices():
+        for stream in (False, True):
+            module = signatory.LogSignature(3, stream=stream)
+            scripted = torch.jit.script(module)
+            path = torch.rand(2, 5, 3, device=device)
+            shape = module(path).shape
+            wrong_shape = torch.empty(shape[:-1] + (shape[-1] + 1,), device=device)
+            wrong_dtype = torch.empty(shape, dtype=torch.float64, device=device)
+            for fn in (module, scripted):
+                with pytest.raises((ValueError, torch.jit.Error), match="Argument 'out' must be of shape"):
+                    fn(path, out=wrong_shape)
+                with pytest.raises((ValueError, torch.jit.Error), match="Argument 'out' must be of dtype"):
+                    fn(path, out=wrong_dtype)
+                with pytest.raises((ValueError, torch.jit.Error), match="does not support automatic"):
+                    fn(path.clone().requires_grad_(), out=torch.empty(shape, device=device))
+
+    path = torch.rand(2, 5, 3)
+    module = signatory.LogSignature(3, bch=True)
+    module(path)
+    with pytest.raises(torch.jit.Error, match="Argument 'bch' is not supported"):
+        torch.jit.script(module)(path)
@@ -0,0 +1,240 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Tests the custom operators, through which the kernels are available as torch.ops.signatory.*"""
+
+
+import pytest
+import torch
+
+from helpers import helpers as h
+from helpers import validation as v
+
+
+tests = []
+depends = ['signature', 'multi_signature_combine', 'signature_to_logsignature']
+signatory = v.validate_tests(tests, depends)
+
+
+def _ops():
+    # Only available once Signatory has been imported, which v.validate_tests does.
+    return torch.ops.signatory
+
+
+def _signature_args(device, stream, basepoint, inverse, initial, scalar_term, leadlag):
+    batch_size, input_stream, input_channels, depth = 2, 5, 3, 3
+    path = torch.rand(batch_size, input_stream, input_channels, dtype=torch.double, device=device,
+                      requires_grad=True)
+    basepoint_value = None
+    if basepoint:
+        basepoint_value = torch.rand(batch_size, input_channels, dtype=torch.double, device=device,
+                                     requires_grad=True)
+    initial_value = None
+    if initial:
+        initial_path = torch.rand(batch_size, 2, input_channels, dtype=torch.double, device=device)
+        initial_value = signatory.signature(initial_path, depth, scalar_term=scalar_term, leadlag=leadlag)
+        initial_value.requires_grad_()
+    return path, depth, stream, basepoint_value, inverse, initial_value, scalar_term, leadlag
+
+
+def _all_signature_args():
+    for device in h.get_devices():
+        for stream in (False, True):
+            for basepoint in (False, True):
+                for inverse in (False, True):
+                    for initial in (False, True):
+                        for scalar_term in (False, True):
+                            for leadlag in (False, True):
+                                yield _signature_args(device, stream, basepoint, inverse, initial, scalar_term,
+                                                      leadlag)
+
+
+def test_signature():
+    """Tests that the signature operators agree with signatory.signature, including gradients."""
+    for path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag in _all_signature_args():
+        expected = signatory.signature(path, depth, stream=stream,
+                                       basepoint=False if basepoint is None else basepoint, inverse=inverse,
+                                       initial=initial, scalar_term=scalar_term, leadlag=leadlag)
+        signature, _ = _ops().signature_forward(path.transpose(0, 1), depth, stream, basepoint, inverse, initial,
+                                                scalar_term, leadlag)
+        if stream:
+            signature = signature.transpose(0, 1)
+        h.diff(signature, expected)
+
+        inputs = [tensor for tensor in (path, basepoint, initial) if tensor is not None]
+        grad = torch.rand_like(expected)
+        expected_grads = torch.autograd.grad(expected, inputs, grad)
+        grads = torch.autograd.grad(signature, inputs, grad)
+        for grad_value, expected_grad_value in zip(grads, expected_grads):
+            h.diff(grad_value, expected_grad_value)
+
+
+def test_signature_combine():
+    """Tests that the combine operator agrees with signatory.multi_signature_combine, including gradients."""
+    for device in h.get_devices():
+        for amount in (1, 2, 3):
+            for scalar_term in (False, True):
+                paths = [torch.rand(2, 4, 3, dtype=torch.double, device=device) for _ in range(amount)]
+                sigtensors = [signatory.signature(path, 3, scalar_term=scalar_term).requires_grad_()
+                              for path in paths]
+                expected = signatory.multi_signature_combine(sigtensors, 3, 3, scalar_term=scalar_term)
+                result = _ops().signature_combine_forward(sigtensors, 3, 3, scalar_term)
+                h.diff(result, expected)
+
+                grad = torch.rand_like(expected)
+                expected_grads = torch.autograd.grad(expected, sigtensors, grad)
+                grads = torch.autograd.grad(result, sigtensors, grad)
+                for grad_value, expected_grad_value in zip(grads, expected_grads):
+                    h.diff(grad_value, expected_grad_value)
+
+
+def test_signature_to_logsignature():
+    """Tests that the logsignature operator agrees with signatory.signature_to_logsignature, including gradients."""
+    for device in h.get_devices():
+        for stream in (False, True):
+            for mode in h.all_modes:
+                for scalar_term in (False, True):
+                    path = torch.rand(2, 4, 3, dtype=torch.double, device=device)
+                    signature = signatory.signature(path, 3, stream=stream, scalar_term=scalar_term)
+                    signature.requires_grad_()
+                    expected = signatory.signature_to_logsignature(signature, 3, 3, stream=stream, mode=mode,
+                                                                   scalar_term=scalar_term)
+                    signature_ = signature.transpose(0, 1) if stream else signature
+                    result = _ops().signature_to_logsignature_forward(signature_, 3, 3, stream, mode, scalar_term)
+                    if stream:
+                        result = result.transpose(0, 1)
+                    h.diff(result, expected)
+
+                    grad = torch.rand_like(expected)
+                    expected_grad, = torch.autograd.grad(expected, signature, grad)
+                    grad_signature, = torch.autograd.grad(result, signature, grad)
+                    h.diff(grad_signature, expected_grad)
+
+
+def test_double_backward():
+    """Tests that the signature and logsignature operators may be differentiated twice."""
+    for device in h.get_devices():
+        for stream in (False, True):
+            for basepoint in (False, True):
+                for initial in (False, True):
+                    path, depth, stream, basepoint_value, inverse, initial_value, scalar_term, leadlag = \
+                        _signature_args(device, stream, basepoint, False, initial, False, False)
+                    path = path.transpose(0, 1).detach().requires_grad_()
+                    inputs = [tensor for tensor in (path, basepoint_value, initial_value) if tensor is not None]
+
+                    def check_fn(*args):
+                        args = list(args)
+                        path_ = args.pop(0)
+                        basepoint_ = args.pop(0) if basepoint else None
+                        initial_ = args.pop(0) if initial else None
+                        return _ops().signature_forward(path_, depth, stream, basepoint_, inverse, initial_,
+                                                        scalar_term, leadlag)[0]
+
+                    assert torch.autograd.gradgradcheck(check_fn, inputs)
+
+            for mode in h.all_modes:
+                signature = torch.rand(3, 2, 12, dtype=torch.double, device=device) if stream else \
+                    torch.rand(2, 12, dtype=torch.double, device=device)
+                signature.requires_grad_()
+
+                def check_fn(signature_):
+                    return _ops().signature_to_logsignature_forward(signature_, 3, 2, stream, mode)
+
+                assert torch.autograd.gradgradcheck(check_fn, (signature,))
+
+
+def test_meta():
+    """Tests that the shape-only implementations agree with the real ones."""
+    def to_meta(tensor):
+        return None if tensor is None else torch.empty_like(tensor, device='meta')
+
+    for path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag in _all_signature_args():
+        path = path.detach().transpose(0, 1)
+        basepoint = None if basepoint is None else basepoint.detach()
+        initial = None if initial is None else initial.detach()
+        results = _ops().signature_forward(path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag)
+        meta_results = _ops().signature_forward(to_meta(path), depth, stream, to_meta(basepoint), inverse,
+                                                to_meta(initial), scalar_term, leadlag)
+        signature, path_increments = results
+        grad_results = _ops().signature_backward(torch.rand_like(signature), path, basepoint, initial, signature,
+                                                 path_increments, depth, stream, inverse, scalar_term, leadlag)
+        meta_grad_results = _ops().signature_backward(to_meta(signature), to_meta(path), to_meta(basepoint),
+                                                      to_meta(initial), to_meta(signature), to_meta(path_increments),
+                                                      depth, stream, inverse, scalar_term, leadlag)
+        for result, meta_result in zip(results + grad_results, meta_results + meta_grad_results):
+            assert meta_result.device.type == 'meta'
+            assert result.shape == meta_result.shape
+            assert result.dtype == meta_result.dtype
+
+    for mode in h.all_modes:
+        for stream in (False, True):
+            signature = torch.rand(4, 2, 40) if stream else torch.rand(2, 40)
+            result = _ops().signature_to_logsignature_forward(signature, 3, 3, stream, mode, True)
+            meta_result = _ops().signature_to_logsignature_forward(to_meta(signature), 3, 3, stream, mode, True)
+            assert result.shape == meta_result.shape
+
+
+def test_script():
+    """Tests that the operators may be used from TorchScript."""
+    @torch.jit.script
+    def logsignature(path, depth):
+        # type: (torch.Tensor, int) -> torch.Tensor
+        signature, _ = torch.ops.signatory.signature_forward(path.transpose(0, 1), depth)
+        combined = torch.ops.signatory.signature_combine_forward([signature, signature], path.size(-1), depth)
+        return torch.ops.signatory.signature_to_logsignature_forward(combined, path.size(-1), depth)
+
+    path = torch.rand(2, 5, 3, dtype=torch.double, requires_grad=True)
+    signature = signatory.signature(path, 3)
+    combined = signatory.multi_signature_combine([signature, signature], 3, 3)
+    expected = signatory.signature_to_logsignature(combined, 3, 3)
+    result = logsignature(path, 3)
+    h.diff(result, expected)
+
+    grad = torch.rand_like(expected)
+    expected_grad, = torch.autograd.grad(expected, path, grad)
+    grad_path, = torch.autograd.grad(result, path, grad)
+    h.diff(grad_path, expected_grad)
+
+
+@pytest.mark.skipif(not hasattr(torch, 'compile'), reason='torch.compile not available')
+def test_compile():
+    """Tests that the operators may be compiled without graph breaks."""
+    def logsignature(path):
+        signature, _ = torch.ops.signatory.signature_forward(path.transpose(0, 1), 3, True)
+        return torch.ops.signatory.signature_to_logsignature_forward(signature, 3, 3, True)
+
+    compiled = torch.compile(logsignature, backend='aot_eager', fullgraph=True)
+    path = torch.rand(2, 5, 3, dtype=torch.double, requires_grad=True)
+    expected = logsignature(path)
+    result = compiled(path)
+    h.diff(result, expected)
+
+    grad = torch.rand_like(expected)
+    expected_grad, = torch.autograd.grad(expected, path, grad)
+    grad_path, = torch.autograd.grad(result, path, grad)
+    h.diff(grad_path, expected_grad)
+
+
+def test_errors():
+    """Tests that invalid arguments raise errors."""
+    # Depending on the version of PyTorch, errors from operators are raised as either RuntimeError or ValueError.
+    errors = (RuntimeError, ValueError)
+    path = torch.rand(5, 2, 3)
+    with pytest.raises(errors):
+        _ops().signature_forward(path, 0)
+    signature, _ = _ops().signature_forward(path, 2)
+    with pytest.raises(errors):
+        _ops().signature_to_logsignature_forward(signature, 3, 2, False, 'sideways')
+    with pytest.raises(errors):
+        _ops().signature_combine_forward([signature, signature[:, 1:]], 3, 2)
@@ -394,3 +394,24 @@ def _test_operation(path_obj, candidate, true, extra, backward_name, extrarandom
         # This one seems to be a bit inconsistent with how much memory is used on each run, so we give some
         # leeway by doubling
         assert one_iteration(start, end) <= 2 * memory_used
+
+
+def test_accumulate_dtype():
+    """Tests that the signatures on intervals, and their gradients, agree with those computed entirely in float64 when
+    accumulate_dtype=torch.float64 is passed for a float32 path."""
+    for device in h.get_devices():
+        for scalar_term in (False, True):
+            path = torch.rand(2, 200, 3, device=device, requires_grad=True)
+            path64 = path.detach().double().requires_grad_()
+            path_obj = signatory.Path(path, 4, scalar_term=scalar_term, accumulate_dtype=torch.float64)
+            path_obj64 = signatory.Path(path64, 4, scalar_term=scalar_term)
+            for start, end in ((None, None), (50, 180)):
+                signature = path_obj.signature(start, end)
+                expected = path_obj64.signature(start, end)
+                assert signature.dtype == torch.float32
+                h.diff(signature.double(), expected, atol=1e-6 * expected.abs().max().item())
+
+                grad = torch.rand_like(expected)
+                grad_path, = torch.autograd.grad(signature, path, grad.float())
+                expected_grad_path, = torch.autograd.grad(expected, path64, grad)
+                h.diff(grad_path.double(), expected_grad_path, atol=1e-6 * expected_grad_path.abs().max().item())
@@ -0,0 +1,117 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Tests signature computations prepared in advance with signatory.plan."""
+
+
+import pytest
+import torch
+
+from helpers import helpers as h
+from helpers import validation as v
+
+
+tests = ['plan', 'SignaturePlan']
+depends = ['signature']
+signatory = v.validate_tests(tests, depends)
+
+
+def test_plan():
+    """Tests that a plan computes the same thing as signatory.signature."""
+    for layout in ('batch', 'stream'):
+        for stream in (False, True):
+            for basepoint in (False, True):
+                for initial in (False, True):
+                    for leadlag in (False, True):
+                        for accumulate_dtype in (None, torch.float64):
+                            for reuse_output in (False, True):
+                                _test_plan(layout, stream, basepoint, initial, leadlag, accumulate_dtype,
+                                           reuse_output)
+
+
+def _test_plan(layout, stream, basepoint, initial, leadlag, accumulate_dtype, reuse_output):
+    batch_size, stream_size, channels, depth = 3, 6, 2, 3
+    signature_plan = signatory.plan(batch_size, stream_size, channels, depth, stream=stream, basepoint=basepoint,
+                                    initial=initial, leadlag=leadlag, accumulate_dtype=accumulate_dtype,
+                                    layout=layout, reuse_output=reuse_output)
+    results = []
+    for _ in range(2):
+        if layout == 'batch':
+            path = torch.rand(batch_size, stream_size, channels)
+        else:
+            path = torch.rand(stream_size, batch_size, channels)
+        basepoint_value = torch.rand(batch_size, channels) if basepoint else None
+        initial_value = None
+        if initial:
+            initial_path = torch.rand(batch_size, 3, channels)
+            initial_value = signatory.signature(initial_path, depth, leadlag=leadlag)
+        expected = signatory.signature(path, depth, stream=stream,
+                                       basepoint=basepoint_value if basepoint else False, initial=initial_value,
+                                       leadlag=leadlag, accumulate_dtype=accumulate_dtype, layout=layout)
+        result = signature_plan(path, basepoint=basepoint_value, initial=initial_value)
+        h.diff(result, expected)
+        results.append(result)
+
+        # Basepoint defaults to zero
+        if basepoint:
+            expected = signatory.signature(path, depth, stream=stream, basepoint=True, initial=initial_value,
+                                           leadlag=leadlag, accumulate_dtype=accumulate_dtype, layout=layout)
+            h.diff(signature_plan(path, initial=initial_value), expected)
+
+        # Writing into a given tensor
+        out = torch.empty_like(expected)
+        assert signature_plan(path, basepoint=basepoint_value, initial=initial_value, out=out) is out
+    assert (results[0] is results[1]) == reuse_output
+
+
+def test_plan_grad():
+    """Tests that a plan falls back to signatory.signature if gradients, or forward-mode derivatives, are needed."""
+    signature_plan = signatory.plan(2, 5, 3, 3, dtype=torch.float64)
+    path = torch.rand(2, 5, 3, dtype=torch.float64, requires_grad=True)
+    result = signature_plan(path)
+    expected = signatory.signature(path, 3)
+    h.diff(result, expected)
+    grad = torch.rand_like(result)
+    h.diff(torch.autograd.grad(result, path, grad)[0], torch.autograd.grad(expected, path, grad)[0])
+
+    # Dual tensors need not require grad, but still need to go through autograd.
+    tangent = torch.rand_like(path)
+    with torch.no_grad(), torch.autograd.forward_ad.dual_level():
+        dual = torch.autograd.forward_ad.make_dual(path.detach(), tangent)
+        result = torch.autograd.forward_ad.unpack_dual(signature_plan(dual)).tangent
+        expected = torch.autograd.forward_ad.unpack_dual(signatory.signature(dual, 3)).tangent
+    assert result is not None
+    h.diff(result, expected)
+
+
+def test_plan_errors():
+    """Tests that invalid arguments raise errors, both when making the plan and when calling it."""
+    with pytest.raises(ValueError):
+        signatory.plan(2, 1, 3, 3)  # stream too short
+    with pytest.raises(ValueError):
+        signatory.plan(2, 5, 3, 0)  # depth too small
+    with pytest.raises(ValueError):
+        signatory.plan(2, 5, 3, 3, layout='channel')
+
+    signature_plan = signatory.plan(2, 5, 3, 3)
+    with pytest.raises(ValueError):
+        signature_plan(torch.rand(2, 6, 3))
+    with pytest.raises(ValueError):
+        signature_plan(torch.rand(2, 5, 3, dtype=torch.float64))
+    with pytest.raises(ValueError):
+        signature_plan(torch.rand(2, 5, 3), basepoint=torch.rand(2, 3))
+    with pytest.raises(ValueError):
+        signature_plan(torch.rand(2, 5, 3), initial=torch.rand(2, 39))
+    with pytest.raises(ValueError):
+        signature_plan(torch.rand(2, 5, 3), out=torch.rand(2, 38))
@@ -0,0 +1,82 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Tests the projected_signature function."""
+
+
+import pytest
+import random
+import torch
+
+from helpers import helpers as h
+from helpers import validation as v
+
+
+tests = ['projected_signature']
+depends = ['signature', 'all_words']
+signatory = v.validate_tests(tests, depends)
+
+
+def test_projected_signature():
+    """Tests that projected_signature gives the same values and gradients as selecting the corresponding channels of
+    the full signature."""
+    random.seed(0)
+    for device in h.get_devices():
+        for batch_size in (1, 3):
+            for input_stream in (2, 6):
+                for input_channels in (1, 2, 4):
+                    for depth in (1, 2, 4):
+                        for basepoint in (False, True, h.with_grad):
+                            for num_words in (1, 5, None):
+                                _test_projected_signature(device, batch_size, input_stream, input_channels, depth,
+                                                          basepoint, num_words)
+
+
+def _test_projected_signature(device, batch_size, input_stream, input_channels, depth, basepoint, num_words):
+    path = h.get_path(batch_size, input_stream, input_channels, device, True)
+    basepoint = h.get_basepoint(batch_size, input_channels, device, basepoint)
+    tensors = [path]
+    if isinstance(basepoint, torch.Tensor):
+        tensors.append(basepoint)
+
+    all_words = signatory.all_words(input_channels, depth)
+    if num_words is None:
+        indices = list(range(len(all_words)))
+    else:
+        # with replacement, so that repeated words are also tested
+        indices = [random.randrange(len(all_words)) for _ in range(num_words)]
+    words = [all_words[index] for index in indices]
+
+    projected = signatory.projected_signature(path, words, basepoint=basepoint)
+    expected = signatory.signature(path, depth, basepoint=basepoint)[:, indices]
+    h.diff(projected, expected)
+
+    grad = torch.rand_like(projected)
+    grads = torch.autograd.grad(projected, tensors, grad)
+    expected_grads = torch.autograd.grad(expected, tensors, grad)
+    for grad_, expected_grad in zip(grads, expected_grads):
+        h.diff(grad_, expected_grad)
+
+
+def test_projected_signature_errors():
+    """Tests that projected_signature raises errors on invalid arguments."""
+    path = torch.rand(2, 4, 3)
+    with pytest.raises(ValueError):
+        signatory.projected_signature(path, [])
+    with pytest.raises(ValueError):
+        signatory.projected_signature(path, [()])
+    with pytest.raises(ValueError):
+        signatory.projected_signature(path, [(0, 3)])
+    with pytest.raises(ValueError):
+        signatory.projected_signature(path, [(-1,)])
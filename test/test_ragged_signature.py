@@ -0,0 +1,108 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Tests the ragged_signature function."""
+
+
+import pytest
+import torch
+
+from helpers import helpers as h
+from helpers import validation as v
+
+
+tests = ['ragged_signature']
+depends = ['signature']
+signatory = v.validate_tests(tests, depends)
+
+
+def test_ragged_signature():
+    """Tests that ragged_signature gives the same values and gradients as computing the signature of each batch element
+    separately."""
+    for device in h.get_devices():
+        for packed in (False, True):
+            for lengths in ((2,), (5, 2, 7), (3, 3, 1, 6)):
+                for input_channels in (1, 3):
+                    for depth in (1, 2, 4):
+                        for stream in (False, True):
+                            for basepoint in (False, True, h.with_grad):
+                                for inverse in (False, True):
+                                    for scalar_term in (False, True):
+                                        _test_ragged_signature(device, packed, lengths, input_channels, depth, stream,
+                                                               basepoint, inverse, scalar_term)
+
+
+def _test_ragged_signature(device, packed, lengths, input_channels, depth, stream, basepoint, inverse, scalar_term):
+    batch_size = len(lengths)
+    paths = [h.get_path(1, length, input_channels, device, True) for length in lengths]
+    basepoint = h.get_basepoint(batch_size, input_channels, device, basepoint)
+    use_basepoint = basepoint is True or isinstance(basepoint, torch.Tensor)
+
+    if not use_basepoint and min(lengths) < 2:
+        with pytest.raises(ValueError):
+            _ragged_signature(paths, lengths, packed, depth, stream, basepoint, inverse, scalar_term)
+        return
+
+    signature = _ragged_signature(paths, lengths, packed, depth, stream, basepoint, inverse, scalar_term)
+
+    expected = []
+    for batch_index, path in enumerate(paths):
+        if isinstance(basepoint, torch.Tensor):
+            basepoint_ = basepoint[batch_index].unsqueeze(0)
+        else:
+            basepoint_ = basepoint
+        expected_ = signatory.signature(path, depth, stream=stream, basepoint=basepoint_, inverse=inverse,
+                                        scalar_term=scalar_term)
+        expected.append(expected_[0] if stream else expected_)
+    expected = torch.cat(expected, dim=0)
+    h.diff(signature, expected)
+
+    grad = torch.rand_like(signature)
+    tensors = list(paths)
+    if isinstance(basepoint, torch.Tensor):
+        tensors.append(basepoint)
+    grads = torch.autograd.grad(signature, tensors, grad)
+    expected_grads = torch.autograd.grad(expected, tensors, grad)
+    for grad_, expected_grad in zip(grads, expected_grads):
+        h.diff(grad_, expected_grad)
+
+
+def _ragged_signature(paths, lengths, packed, depth, stream, basepoint, inverse, scalar_term):
+    if packed:
+        path = torch.cat([path[0] for path in paths], dim=0)
+        offsets = torch.tensor([0] + list(lengths)).cumsum(dim=0)
+        return signatory.ragged_signature(path, depth, offsets=offsets, stream=stream, basepoint=basepoint,
+                                          inverse=inverse, scalar_term=scalar_term)
+    else:
+        max_length = max(lengths)
+        padding = [torch.zeros(1, max_length - path.size(1), path.size(2), dtype=path.dtype, device=path.device)
+                   for path in paths]
+        path = torch.cat([torch.cat([path, pad], dim=1) for path, pad in zip(paths, padding)], dim=0)
+        return signatory.ragged_signature(path, depth, lengths=torch.tensor(lengths), stream=stream,
+                                          basepoint=basepoint, inverse=inverse, scalar_term=scalar_term)
+
+
+def test_ragged_signature_errors():
+    """Tests that ragged_signature raises errors on invalid arguments."""
+    path = torch.rand(2, 4, 3)
+    with pytest.raises(ValueError):
+        signatory.ragged_signature(path, 2)
+    with pytest.raises(ValueError):
+        signatory.ragged_signature(path, 2, lengths=torch.tensor([2, 3]), offsets=torch.tensor([0, 2, 4]))
+    with pytest.raises(ValueError):
+        signatory.ragged_signature(path, 2, lengths=torch.tensor([2, 5]))
+    with pytest.raises(ValueError):
+        signatory.ragged_signature(path, 2, offsets=torch.tensor([0, 2, 4]))
+    with pytest.raises(ValueError):
+        signatory.ragged_signature(path[0], 2, offsets=torch.tensor([0, 2, 5]))
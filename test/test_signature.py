@@ -17,7 +17,10 @@
 
 import iisignature
 import gc
+import os
 import pytest
+import subprocess
+import sys
 import torch
 from torch import autograd
 import warnings
@@ -155,10 +158,14 @@ def _test_shape(signature, stream, basepoint, batch_size, input_stream, input_ch
 def test_batch_trick():
     """Tests that the batch trick method for computing signatures, which is sometimes selected for speed, does
     produce the correct values."""
-    if torch.cuda.is_available():
-        device_path_grad = ('cuda', False), ('cuda', True), ('cpu', True)
-    else:
-        device_path_grad = (('cpu', True),)
+    # On the CPU, parallelisation along the stream is done natively instead.
+    path = torch.rand(2, 10, 3, requires_grad=True)
+    assert signatory.signature.__globals__['_signature_batch_trick'](path, 2, False, False, False, None, False, False,
+                                                                     None) is None
+
+    if not torch.cuda.is_available():
+        return
+    device_path_grad = ('cuda', False), ('cuda', True)
 
     for class_ in (False, True):
         for device, path_grad in device_path_grad:
@@ -176,18 +183,31 @@ def test_batch_trick():
                                                               initial, scalar_term)
 
 
-def _no_batch_trick(path, depth, stream, basepoint, inverse, initial, scalar_term):
+def test_batch_trick_forced():
+    """Tests that the batch trick produces the correct values on the CPU, where it is only used if the autotuner forces
+    it."""
+    for class_ in (False, True):
+        for path_grad in (False, True):
+            for batch_size in (1, 5):
+                for input_channels in (1, 3):
+                    for depth in (1, 3):
+                        for basepoint in (False, h.without_grad, h.with_grad):
+                            for inverse in (False, True):
+                                for initial in (None, h.with_grad):
+                                    for scalar_term in (False, True):
+                                        _test_batch_trick(class_, 'cpu', path_grad, batch_size, 10, input_channels,
+                                                          depth, False, basepoint, inverse, initial, scalar_term,
+                                                          force=True)
+
+
+def _no_batch_trick(path, depth, stream, basepoint, inverse, initial, scalar_term, leadlag, accumulate_dtype,
+                    force=False):
     return
 
 
 def _test_batch_trick(class_, device, path_grad, batch_size, input_stream, input_channels, depth, stream, basepoint,
-                      inverse, initial, scalar_term):
-    if device == 'cuda':
-        threshold = 512
-    else:
-        threshold = torch.get_num_threads()
-        if threshold < 2:
-            return  # can't test the batch trick in this case
+                      inverse, initial, scalar_term, force=False):
+    threshold = 512
     if round(float(threshold) / batch_size) < 2:
         batch_size = int(threshold / 2)
 
@@ -209,7 +229,10 @@ def _test_batch_trick(class_, device, path_grad, batch_size, input_stream, input
                                                                                       basepoint=basepoint,
                                                                                       inverse=inverse,
                                                                                       initial=initial,
-                                                                                      scalar_term=scalar_term)
+                                                                                      scalar_term=scalar_term,
+                                                                                      leadlag=False,
+                                                                                      accumulate_dtype=None,
+                                                                                      force=force)
 
     assert batch_trick_signature is not None  # that the batch trick is viable in this case
 
@@ -247,6 +270,493 @@ def _test_batch_trick(class_, device, path_grad, batch_size, input_stream, input
         initial.grad.zero_()
 
 
+def test_stream_parallel():
+    """Tests that parallelising the computation along the stream dimension, which is done for long enough streams when
+    there are spare threads, gives the same results as the serial computation."""
+    for class_ in (False, True):
+        for batch_size in (1, 2):
+            for input_stream, input_channels, depth in ((300, 4, 4), (517, 3, 5)):
+                for stream in (False, True):
+                    for basepoint in (False, h.with_grad):
+                        for inverse in (False, True):
+                            for initial in (None, h.with_grad):
+                                for scalar_term in (False, True):
+                                    _test_stream_parallel(class_, batch_size, input_stream, input_channels, depth,
+                                                          stream, basepoint, inverse, initial, scalar_term)
+
+
+def _test_stream_parallel(class_, batch_size, input_stream, input_channels, depth, stream, basepoint, inverse,
+                          initial, scalar_term):
+    path = h.get_path(batch_size, input_stream, input_channels, 'cpu', True)
+    basepoint = h.get_basepoint(batch_size, input_channels, 'cpu', basepoint)
+    initial = h.get_initial(batch_size, input_channels, 'cpu', depth, initial, scalar_term)
+    tensors = [path]
+    if isinstance(basepoint, torch.Tensor):
+        tensors.append(basepoint)
+    if isinstance(initial, torch.Tensor):
+        tensors.append(initial)
+
+    num_threads = torch.get_num_threads()
+    results = []
+    try:
+        for threads in (8, 1):
+            torch.set_num_threads(threads)
+            signature = signatory_signature(class_, path, depth, stream, basepoint, inverse, initial, scalar_term)
+            grad = torch.rand(signature.shape, dtype=signature.dtype, generator=torch.Generator().manual_seed(0))
+            grads = torch.autograd.grad(signature, tensors, grad)
+            results.append((signature, grads))
+    finally:
+        torch.set_num_threads(num_threads)
+
+    (parallel_signature, parallel_grads), (serial_signature, serial_grads) = results
+    h.diff(parallel_signature, serial_signature)
+    for parallel_grad, serial_grad in zip(parallel_grads, serial_grads):
+        h.diff(parallel_grad, serial_grad)
+
+
+def test_leadlag():
+    """Tests that leadlag=True gives the same values and gradients as computing the signature of the explicitly
+    lead-lag transformed path."""
+    for class_ in (False, True):
+        for device in h.get_devices():
+            for batch_size in (1, 3):
+                for input_stream in (2, 5):
+                    for input_channels in (1, 3):
+                        for depth in (1, 2, 4):
+                            for stream in (False, True):
+                                for basepoint in (False, True, h.with_grad):
+                                    for inverse in (False, True):
+                                        for initial in (None, h.with_grad):
+                                            for scalar_term in (False, True):
+                                                _test_leadlag(class_, device, batch_size, input_stream,
+                                                              input_channels, depth, stream, basepoint, inverse,
+                                                              initial, scalar_term)
+
+
+def _test_leadlag(class_, device, batch_size, input_stream, input_channels, depth, stream, basepoint, inverse,
+                  initial, scalar_term):
+    path = h.get_path(batch_size, input_stream, input_channels, device, True)
+    basepoint = h.get_basepoint(batch_size, input_channels, device, basepoint)
+    initial = h.get_initial(batch_size, 2 * input_channels, device, depth, initial, scalar_term)
+    tensors = [path]
+    if isinstance(basepoint, torch.Tensor):
+        tensors.append(basepoint)
+    if isinstance(initial, torch.Tensor):
+        tensors.append(initial)
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message="Argument 'initial' has been set but argument 'basepoint' has not.",
+                                category=UserWarning)
+        if class_:
+            signature = signatory.Signature(depth, stream=stream, inverse=inverse, scalar_term=scalar_term,
+                                            leadlag=True)(path, basepoint=basepoint, initial=initial)
+        else:
+            signature = signatory.signature(path, depth, stream=stream, basepoint=basepoint, inverse=inverse,
+                                            initial=initial, scalar_term=scalar_term, leadlag=True)
+
+        if basepoint is True:
+            full_path = torch.cat([torch.zeros_like(path[:, :1]), path], dim=1)
+        elif isinstance(basepoint, torch.Tensor):
+            full_path = torch.cat([basepoint.unsqueeze(1), path], dim=1)
+        else:
+            full_path = path
+        repeated = full_path.repeat_interleave(2, dim=1)
+        leadlag_path = torch.cat([repeated[:, 1:], repeated[:, :-1]], dim=2)
+        expected = signatory.signature(leadlag_path, depth, stream=stream, inverse=inverse, initial=initial,
+                                       scalar_term=scalar_term)
+
+    h.diff(signature, expected)
+
+    grad = torch.rand_like(signature)
+    grads = torch.autograd.grad(signature, tensors, grad)
+    expected_grads = torch.autograd.grad(expected, tensors, grad)
+    for grad_, expected_grad in zip(grads, expected_grads):
+        h.diff(grad_, expected_grad)
+
+
+def test_reduced_precision():
+    """Tests that the signature may be computed at reduced precision on the CPU, and that it gives about the same
+    values and gradients as computing at double precision."""
+    for dtype in (torch.float16, torch.bfloat16):
+        for batch_size in (1, 4):
+            for input_stream in (2, 20):
+                for input_channels in (1, 3):
+                    for depth in (1, 2, 4):
+                        for stream in (False, True):
+                            for inverse in (False, True):
+                                _test_reduced_precision(dtype, batch_size, input_stream, input_channels, depth, stream,
+                                                        inverse)
+
+
+def _test_reduced_precision(dtype, batch_size, input_stream, input_channels, depth, stream, inverse):
+    # Small increments so that the signature doesn't get large, so that we can use a fixed tolerance.
+    path = torch.rand(batch_size, input_stream, input_channels, dtype=torch.double).div(input_stream).to(dtype)
+    reduced_path = path.clone().requires_grad_()
+    double_path = path.to(torch.double).requires_grad_()
+
+    reduced_signature = signatory.signature(reduced_path, depth, stream=stream, inverse=inverse)
+    double_signature = signatory.signature(double_path, depth, stream=stream, inverse=inverse)
+    assert reduced_signature.dtype == dtype
+    assert reduced_signature.to(torch.double).allclose(double_signature, rtol=2e-2, atol=2e-2)
+
+    grad = torch.rand_like(double_signature)
+    reduced_signature.backward(grad.to(dtype))
+    double_signature.backward(grad)
+    assert reduced_path.grad.dtype == dtype
+    assert reduced_path.grad.to(torch.double).allclose(double_path.grad, rtol=2e-2, atol=2e-2)
+
+
+def test_vectorised():
+    """Tests the vectorised CPU computations, for numbers of channels both above and below the vector width, and that
+    they agree with the unvectorised computations used when the channel dimension is not contiguous."""
+    for dtype in (torch.float32, torch.float64):
+        for input_channels in (4, 5, 8, 13, 16):
+            for depth in (2, 3, 4):
+                for inverse in (False, True):
+                    _test_vectorised(dtype, input_channels, depth, inverse)
+
+
+def _test_vectorised(dtype, input_channels, depth, inverse):
+    # Small increments so that the signature doesn't get large, so that we can use a fixed tolerance.
+    path = torch.rand(2, 6, input_channels, dtype=torch.double).div(6)
+    signature = signatory.signature(path.to(dtype), depth, inverse=inverse)
+    expected = iisignature_signature(path, depth, False, False, inverse, None, False)
+    atol = 1e-5 if dtype is torch.float32 else 1e-8
+    h.diff(signature.to(torch.double), expected, atol=atol)
+
+    # Every other element of a larger buffer, so that the channel dimension is not contiguous.
+    buffer = torch.empty(signature.shape[:-1] + (2 * signature.size(-1),), dtype=dtype)
+    out = buffer[..., ::2]
+    signatory.signature(path.to(dtype), depth, inverse=inverse, out=out)
+    h.diff(out, signature, atol=atol)
+
+
+def test_cpu_capability(tmpdir):
+    """Tests that the CPU kernels compiled for each instruction set agree with those compiled to run on any CPU. Which
+    is used is fixed once per process, so each is run in a separate process. (If this CPU doesn't support some
+    instruction set then the best one that it does support is used instead.)"""
+    path = torch.rand(3, 6, 9, dtype=torch.double).div(6)
+    path_file = os.path.join(str(tmpdir), 'path.pt')
+    torch.save(path, path_file)
+    # Covers both the vectorised loops (float32 and float64, contiguous) and the scalar loops (reduced precision, or
+    # not contiguous).
+    code = ("import signatory, sys, torch\n"
+            "path = torch.load(sys.argv[1])\n"
+            "paths = [path.to(dtype) for dtype in (torch.float32, torch.float64, torch.float16, torch.bfloat16)]\n"
+            "paths.append(path.transpose(1, 2).contiguous().transpose(1, 2))\n"
+            "torch.save([signatory.signature(path_, 4, inverse=inverse).double()\n"
+            "            for path_ in paths for inverse in (False, True)], sys.argv[2])\n")
+
+    results = {}
+    for capability in ('default', 'avx2', 'avx512'):
+        result_file = os.path.join(str(tmpdir), capability + '.pt')
+        env = dict(os.environ, ATEN_CPU_CAPABILITY=capability)
+        subprocess.check_call([sys.executable, '-c', code, path_file, result_file], env=env)
+        results[capability] = torch.load(result_file)
+
+    atols = [1e-5, 1e-5, 1e-8, 1e-8, 1e-2, 1e-2, 1e-1, 1e-1, 1e-8, 1e-8]
+    for capability in ('avx2', 'avx512'):
+        for result, expected, atol in zip(results[capability], results['default'], atols):
+            h.diff(result, expected, atol=atol)
+
+
+def test_accumulate_dtype():
+    """Tests that accumulating in double precision gives the same values and gradients as computing the signature at
+    double precision, up to the final rounding."""
+    for device in h.get_devices():
+        for batch_size in (1, 4):
+            for input_stream in (2, 50):
+                for input_channels in (1, 3):
+                    for depth in (1, 2, 4):
+                        for stream in (False, True):
+                            for basepoint in (False, True, h.with_grad):
+                                for inverse in (False, True):
+                                    for initial in (None, h.with_grad):
+                                        _test_accumulate_dtype(device, batch_size, input_stream, input_channels,
+                                                               depth, stream, basepoint, inverse, initial)
+
+    with pytest.raises(ValueError):
+        signatory.signature(torch.rand(2, 4, 3), 2, accumulate_dtype=torch.int64)
+
+
+def _test_accumulate_dtype(device, batch_size, input_stream, input_channels, depth, stream, basepoint, inverse,
+                           initial):
+    path = torch.rand(batch_size, input_stream, input_channels, device=device).div(input_stream).requires_grad_()
+    basepoint = h.get_basepoint(batch_size, input_channels, device, basepoint)
+    if isinstance(basepoint, torch.Tensor):
+        basepoint = basepoint.float().detach().requires_grad_()
+    if initial is not None:
+        initial = torch.rand(batch_size, signatory.signature_channels(input_channels, depth),
+                             device=device).div(input_stream).requires_grad_()
+    tensors = [tensor for tensor in (path, basepoint, initial) if isinstance(tensor, torch.Tensor)]
+    double_tensors = [tensor.detach().double().requires_grad_() for tensor in tensors]
+    double_path = double_tensors[0]
+    double_basepoint = double_tensors[1] if isinstance(basepoint, torch.Tensor) else basepoint
+    double_initial = double_tensors[-1] if initial is not None else None
+
+    signature = signatory.signature(path, depth, stream=stream, basepoint=basepoint, inverse=inverse,
+                                    initial=initial, accumulate_dtype=torch.double)
+    double_signature = signatory.signature(double_path, depth, stream=stream, basepoint=double_basepoint,
+                                           inverse=inverse, initial=double_initial)
+    assert signature.dtype == torch.float32
+    assert signature.double().allclose(double_signature, rtol=1e-6, atol=1e-6)
+
+    grad = torch.rand_like(double_signature)
+    grads = torch.autograd.grad(signature, tensors, grad.float())
+    double_grads = torch.autograd.grad(double_signature, double_tensors, grad)
+    for grad_, double_grad in zip(grads, double_grads):
+        assert grad_.dtype == torch.float32
+        assert grad_.double().allclose(double_grad, rtol=1e-5, atol=1e-5)
+
+
+def test_checkpoint():
+    """Tests that checkpointing the stream for the backward pass gives the same gradients as saving all of it."""
+    for device in h.get_devices():
+        for batch_size in (1, 4):
+            for input_stream in (2, 3, 10):
+                for input_channels in (1, 3):
+                    for depth in (1, 2, 4):
+                        for basepoint in (False, True, h.with_grad):
+                            for inverse in (False, True):
+                                for initial in (None, h.with_grad):
+                                    for scalar_term in (False, True):
+                                        for checkpoint in (1, 3, 20, "auto"):
+                                            _test_checkpoint(device, batch_size, input_stream, input_channels, depth,
+                                                             basepoint, inverse, initial, scalar_term, checkpoint)
+
+    path = torch.rand(2, 4, 3)
+    with pytest.raises(ValueError):
+        signatory.signature(path, 2, stream=True, checkpoint=0)
+    with pytest.raises(ValueError):
+        signatory.signature(path, 2, stream=True, checkpoint="all")
+    with pytest.raises(ValueError):
+        signatory.signature(path, 2, stream=True, checkpoint=2, checkpoint_budget=100)
+
+
+def _test_checkpoint(device, batch_size, input_stream, input_channels, depth, basepoint, inverse, initial,
+                     scalar_term, checkpoint):
+    path = h.get_path(batch_size, input_stream, input_channels, device, path_grad=True)
+    basepoint = h.get_basepoint(batch_size, input_channels, device, basepoint)
+    initial = h.get_initial(batch_size, input_channels, device, depth, initial, scalar_term)
+    tensors = [tensor for tensor in (path, basepoint, initial) if isinstance(tensor, torch.Tensor)]
+
+    signature = signatory.signature(path, depth, stream=True, basepoint=basepoint, inverse=inverse, initial=initial,
+                                    scalar_term=scalar_term)
+    checkpointed_signature = signatory.signature(path, depth, stream=True, basepoint=basepoint, inverse=inverse,
+                                                 initial=initial, scalar_term=scalar_term, checkpoint=checkpoint)
+    h.diff(checkpointed_signature, signature)
+
+    grad = torch.rand_like(signature)
+    grads = torch.autograd.grad(signature, tensors, grad)
+    checkpointed_grads = torch.autograd.grad(checkpointed_signature, tensors, grad)
+    for checkpointed_grad, grad_ in zip(checkpointed_grads, grads):
+        h.diff(checkpointed_grad, grad_)
+
+
+def test_layout():
+    """Tests that layout='stream' gives the same values and gradients as layout='batch', and that stream outputs are
+    contiguous in the requested layout."""
+    for device in h.get_devices():
+        for batch_size in (1, 4):
+            for input_stream in (2, 5):
+                for input_channels in (1, 3):
+                    for depth in (1, 3):
+                        for stream in (False, True):
+                            for basepoint in (False, True, h.with_grad):
+                                for inverse in (False, True):
+                                    for scalar_term in (False, True):
+                                        _test_layout(device, batch_size, input_stream, input_channels, depth, stream,
+                                                     basepoint, inverse, scalar_term)
+
+    with pytest.raises(ValueError):
+        signatory.signature(torch.rand(2, 4, 3), 2, layout='channel')
+
+
+def _test_layout(device, batch_size, input_stream, input_channels, depth, stream, basepoint, inverse, scalar_term):
+    path = h.get_path(batch_size, input_stream, input_channels, device, path_grad=True)
+    basepoint = h.get_basepoint(batch_size, input_channels, device, basepoint)
+    tensors = [tensor for tensor in (path, basepoint) if isinstance(tensor, torch.Tensor)]
+
+    signature = signatory.signature(path, depth, stream=stream, basepoint=basepoint, inverse=inverse,
+                                    scalar_term=scalar_term)
+    stream_path = path.transpose(0, 1)
+    stream_signature = signatory.signature(stream_path, depth, stream=stream, basepoint=basepoint, inverse=inverse,
+                                           scalar_term=scalar_term, layout='stream')
+    module_stream_signature = signatory.Signature(depth, stream=stream, inverse=inverse, scalar_term=scalar_term,
+                                                  layout='stream')(stream_path, basepoint=basepoint)
+    if stream:
+        assert signature.is_contiguous()
+        assert stream_signature.is_contiguous()
+        stream_signature = stream_signature.transpose(0, 1)
+        module_stream_signature = module_stream_signature.transpose(0, 1)
+    h.diff(stream_signature, signature)
+    h.diff(module_stream_signature, signature)
+
+    grad = torch.rand_like(signature)
+    grads = torch.autograd.grad(signature, tensors, grad)
+    stream_grads = torch.autograd.grad(stream_signature, tensors, grad)
+    for stream_grad, grad_ in zip(stream_grads, grads):
+        h.diff(stream_grad, grad_)
+
+
+def test_script():
+    """Tests that the Signature module may be scripted, and then gives the same values and gradients."""
+    for device in h.get_devices():
+        for stream in (False, True):
+            for basepoint in (False, True, h.with_grad):
+                for initial in (None, h.with_grad):
+                    for layout in ('batch', 'stream'):
+                        _test_script_or_compile(torch.jit.script, device, stream, basepoint, initial, layout)
+
+
+@pytest.mark.skipif(not hasattr(torch, 'compile'), reason='torch.compile not available')
+def test_compile():
+    """Tests that the Signature module may be compiled without graph breaks, and then gives the same values and
+    gradients."""
+    def compile_fn(module):
+        return torch.compile(module, backend='aot_eager', fullgraph=True)
+
+    for stream in (False, True):
+        for basepoint in (False, h.with_grad):
+            _test_script_or_compile(compile_fn, 'cpu', stream, basepoint, None, 'batch')
+
+
+def _test_script_or_compile(compile_fn, device, stream, basepoint, initial, layout):
+    depth = 3
+    path = h.get_path(2, 5, 3, device, path_grad=True)
+    basepoint = h.get_basepoint(2, 3, device, basepoint)
+    initial = h.get_initial(2, 3, device, depth, initial, scalar_term=False)
+    tensors = [tensor for tensor in (path, basepoint, initial) if isinstance(tensor, torch.Tensor)]
+    if layout == 'stream':
+        path_ = path.transpose(0, 1)
+    else:
+        path_ = path
+
+    module = signatory.Signature(depth, stream=stream, layout=layout)
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message="Argument 'initial' has been set but argument 'basepoint' has not.",
+                                category=UserWarning)
+        expected = module(path_, basepoint=basepoint, initial=initial)
+    result = compile_fn(module)(path_, basepoint=basepoint, initial=initial)
+    h.diff(result, expected)
+
+    grad = torch.rand_like(expected)
+    expected_grads = torch.autograd.grad(expected, tensors, grad)
+    grads = torch.autograd.grad(result, tensors, grad)
+    for grad_value, expected_grad_value in zip(grads, expected_grads):
+        h.diff(grad_value, expected_grad_value)
+
+
+def test_script_errors():
+    """Tests that the scripted Signature module rejects the same 'out' arguments as the unscripted one, and that it
+    rejects the arguments that it doesn't support."""
+    for device in h.get_devices():
+        for stream in (False, True):
+            for layout in ('batch', 'stream'):
+                module = signatory.Signature(3, stream=stream, layout=layout)
+                scripted = torch.jit.script(module)
+                path = torch.rand(2, 5, 3, device=device)
+                if layout == 'stream':
+                    path = path.transpose(0, 1)
+                shape = module(path).shape
+                basepoint_shape = module(path, basepoint=True).shape
+                wrong_shape = torch.empty(shape[:-1] + (shape[-1] + 1,), device=device)
+                wrong_dtype = torch.empty(shape, dtype=torch.float64, device=device)
+                for fn in (module, scripted):
+                    with pytest.raises((ValueError, torch.jit.Error), match="Argument 'out' must be of shape"):
+                        fn(path, out=wrong_shape)
+                    with pytest.raises((ValueError, torch.jit.Error), match="Argument 'out' must be of dtype"):
+                        fn(path, out=wrong_dtype)
+                    with pytest.raises((ValueError, torch.jit.Error), match="does not support automatic"):
+                        fn(path.clone().requires_grad_(), out=torch.empty(shape, device=device))
+                    with pytest.raises((ValueError, torch.jit.Error), match="does not support automatic"):
+                        fn(path, basepoint=torch.rand(2, 3, device=device, requires_grad=True),
+                           out=torch.empty(basepoint_shape, device=device))
+
+    path = torch.rand(2, 5, 3)
+    for kwargs in (dict(checkpoint=2), dict(checkpoint='auto', checkpoint_budget=100)):
+        module = signatory.Signature(3, stream=True, **kwargs)
+        module(path)
+        with pytest.raises(torch.jit.Error, match="Arguments 'checkpoint' and 'checkpoint_budget' are not supported"):
+            torch.jit.script(module)(path)
+
+
+def test_out():
+    """Tests that passing 'out' writes the same values into it as are otherwise returned."""
+    for device in h.get_devices():
+        for batch_size in (1, 4):
+            for input_stream in (2, 5):
+                for input_channels in (1, 3):
+                    for depth in (1, 3):
+                        for stream in (False, True):
+                            for basepoint in (False, True):
+                                for scalar_term in (False, True):
+                                    for leadlag in (False, True):
+                                        for layout in ('batch', 'stream'):
+                                            for accumulate_dtype in (None, torch.float64):
+                                                _test_out(device, batch_size, input_stream, input_channels, depth,
+                                                          stream, basepoint, scalar_term, leadlag, layout,
+                                                          accumulate_dtype)
+
+
+def _test_out(device, batch_size, input_stream, input_channels, depth, stream, basepoint, scalar_term, leadlag,
+              layout, accumulate_dtype):
+    path = torch.rand(batch_size, input_stream, input_channels, device=device, dtype=torch.float32)
+    if layout == 'stream':
+        path = path.transpose(0, 1)
+    kwargs = dict(stream=stream, basepoint=basepoint, scalar_term=scalar_term, leadlag=leadlag,
+                  accumulate_dtype=accumulate_dtype, layout=layout)
+    signature = signatory.signature(path, depth, **kwargs)
+
+    # Writing into a slice of a larger buffer, so that 'out' is not contiguous.
+    buffer = torch.full(signature.shape[:-1] + (signature.size(-1) + 2,), float('nan'), device=device,
+                        dtype=signature.dtype)
+    out = buffer[..., 1:-1]
+    result = signatory.signature(path, depth, out=out, **kwargs)
+    assert result is out
+    h.diff(out, signature)
+    assert torch.isnan(buffer[..., 0]).all()
+    assert torch.isnan(buffer[..., -1]).all()
+
+
+def test_out_errors():
+    """Tests that invalid values of 'out' are rejected."""
+    path = torch.rand(2, 4, 3)
+    channels = signatory.signature_channels(3, 2)
+    with pytest.raises(ValueError):
+        signatory.signature(path, 2, out=torch.empty(2, channels + 1))
+    with pytest.raises(ValueError):
+        signatory.signature(path, 2, out=torch.empty(2, channels, dtype=torch.float64))
+    with pytest.raises(ValueError):
+        signatory.signature(path, 2, stream=True, out=torch.empty(2, channels))
+    with pytest.raises(ValueError):
+        signatory.signature(path.requires_grad_(), 2, out=torch.empty(2, channels))
+    with torch.no_grad():
+        signatory.signature(path, 2, out=torch.empty(2, channels))
+
+
+def test_no_grad():
+    """Tests that computing the signature without gradients, which skips autograd, gives the same values as with
+    them."""
+    for device in h.get_devices():
+        for batch_size, input_stream, input_channels in ((1, 2, 1), (4, 10, 3), (16, 300, 2)):
+            for stream in (False, True):
+                for basepoint in (False, True, h.with_grad):
+                    for leadlag in (False, True):
+                        _test_no_grad(device, batch_size, input_stream, input_channels, stream, basepoint, leadlag)
+
+
+def _test_no_grad(device, batch_size, input_stream, input_channels, stream, basepoint, leadlag):
+    path = h.get_path(batch_size, input_stream, input_channels, device, path_grad=True)
+    basepoint = h.get_basepoint(batch_size, input_channels, device, basepoint)
+    signature = signatory.signature(path, 3, stream=stream, basepoint=basepoint, leadlag=leadlag)
+    assert signature.grad_fn is not None
+    with torch.no_grad():
+        no_grad_signature = signatory.signature(path, 3, stream=stream, basepoint=basepoint, leadlag=leadlag)
+    assert no_grad_signature.grad_fn is None
+    h.diff(no_grad_signature, signature)
+
+
 def test_backward():
     """Tests that the backwards operation through the signature gives the correct values."""
     for class_ in (False, True):
@@ -307,6 +817,108 @@ def _test_backward(class_, device, batch_size, input_stream, input_channels, dep
         h.diff(initial.grad, initial_grad, atol=1e-4)
 
 
+def test_double_backward():
+    """Tests that the double backward operation through the signature gives the correct values."""
+    for device in h.get_devices():
+        for batch_size, input_stream, input_channels in ((1, 2, 1), (2, 3, 2), (1, 4, 3)):
+            for depth in (1, 2, 3):
+                for stream in (False, True):
+                    for basepoint in (False, True, h.with_grad):
+                        for inverse in (False, True):
+                            for initial in (None, h.with_grad):
+                                for scalar_term in (False, True):
+                                    for leadlag in (False, True):
+                                        _test_double_backward(device, batch_size, input_stream, input_channels, depth,
+                                                              stream, basepoint, inverse, initial, scalar_term,
+                                                              leadlag)
+
+
+def _test_double_backward(device, batch_size, input_stream, input_channels, depth, stream, basepoint, inverse, initial,
+                          scalar_term, leadlag):
+    path = h.get_path(batch_size, input_stream, input_channels, device, path_grad=True)
+    basepoint = h.get_basepoint(batch_size, input_channels, device, basepoint)
+    if leadlag:
+        initial = h.get_initial(batch_size, 2 * input_channels, device, depth, initial, scalar_term)
+    else:
+        initial = h.get_initial(batch_size, input_channels, device, depth, initial, scalar_term)
+    tensors = [tensor for tensor in (path, basepoint, initial) if isinstance(tensor, torch.Tensor)]
+
+    def check_fn(*tensors_):
+        tensors_ = list(tensors_)
+        path_ = tensors_.pop(0)
+        basepoint_ = tensors_.pop(0) if isinstance(basepoint, torch.Tensor) else basepoint
+        initial_ = tensors_.pop(0) if isinstance(initial, torch.Tensor) else initial
+        return signatory.signature(path_, depth, stream=stream, basepoint=basepoint_, inverse=inverse,
+                                   initial=initial_, scalar_term=scalar_term, leadlag=leadlag)
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message="Argument 'initial' has been set but argument 'basepoint' has not.",
+                                category=UserWarning)
+        assert autograd.gradgradcheck(check_fn, tensors)
+
+
+@pytest.mark.skipif(not hasattr(autograd, 'forward_ad'), reason="Forward-mode autodifferentiation is not available.")
+def test_jvp():
+    """Tests that forward-mode differentiation through the signature gives the correct values."""
+    for device in h.get_devices():
+        for batch_size, input_stream, input_channels in ((1, 2, 1), (2, 3, 2), (3, 5, 3)):
+            for depth in (1, 2, 4):
+                for stream in (False, True):
+                    for basepoint in (False, True, h.with_grad):
+                        for inverse in (False, True):
+                            for initial in (None, h.with_grad):
+                                for scalar_term in (False, True):
+                                    for leadlag in (False, True):
+                                        _test_jvp(device, batch_size, input_stream, input_channels, depth, stream,
+                                                  basepoint, inverse, initial, scalar_term, leadlag, no_grad=False)
+
+
+def test_jvp_no_grad():
+    """Tests that forward-mode differentiation through the signature still happens when no gradients are needed, as
+    dual tensors need not require grad."""
+    for device in h.get_devices():
+        for stream in (False, True):
+            for basepoint in (False, h.with_grad):
+                for initial in (None, h.with_grad):
+                    for leadlag in (False, True):
+                        for no_grad in (False, True):
+                            _test_jvp(device, 2, 4, 2, 3, stream, basepoint, False, initial, False, leadlag,
+                                      no_grad)
+
+
+def _test_jvp(device, batch_size, input_stream, input_channels, depth, stream, basepoint, inverse, initial,
+              scalar_term, leadlag, no_grad):
+    path = h.get_path(batch_size, input_stream, input_channels, device, path_grad=True)
+    basepoint = h.get_basepoint(batch_size, input_channels, device, basepoint)
+    if leadlag:
+        initial = h.get_initial(batch_size, 2 * input_channels, device, depth, initial, scalar_term)
+    else:
+        initial = h.get_initial(batch_size, input_channels, device, depth, initial, scalar_term)
+    tensors = [tensor for tensor in (path, basepoint, initial) if isinstance(tensor, torch.Tensor)]
+    tangents = [torch.rand_like(tensor) for tensor in tensors]
+
+    def signature_fn(path_, basepoint_, initial_):
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message="Argument 'initial' has been set but argument 'basepoint' has "
+                                                      "not.", category=UserWarning)
+            return signatory.signature(path_, depth, stream=stream, basepoint=basepoint_, inverse=inverse,
+                                       initial=initial_, scalar_term=scalar_term, leadlag=leadlag)
+
+    with torch.no_grad() if no_grad else torch.enable_grad(), autograd.forward_ad.dual_level():
+        duals = [autograd.forward_ad.make_dual(tensor.detach(), tangent) for tensor, tangent in zip(tensors, tangents)]
+        path_ = duals.pop(0)
+        basepoint_ = duals.pop(0) if isinstance(basepoint, torch.Tensor) else basepoint
+        initial_ = duals.pop(0) if isinstance(initial, torch.Tensor) else initial
+        tangent_signature = autograd.forward_ad.unpack_dual(signature_fn(path_, basepoint_, initial_)).tangent
+
+    # Compare against reverse-mode: <grad, J tangent> = <J^T grad, tangent>
+    signature = signature_fn(path, basepoint, initial)
+    grad = torch.rand_like(signature)
+    grads = autograd.grad(signature, tensors, grad)
+    expected = sum((grad_ * tangent).sum() for grad_, tangent in zip(grads, tangents))
+    h.diff((grad * tangent_signature).sum(), expected)
+
+
 def test_no_adjustments():
     """Tests that the signature computations don't modify any memory that they're not supposed to."""
 
@@ -115,6 +115,38 @@ def _test_forward(signature_combine, signature_grad, amount, device, batch_size,
         assert combined_signatures.grad_fn is None
 
 
+def test_out():
+    """Tests that passing 'out' writes the same values into it as are otherwise returned."""
+    for device in h.get_devices():
+        for amount in (1, 2, 3, 10):
+            for input_channels in (1, 3):
+                for depth in (1, 2, 4):
+                    for inverse in (False, True):
+                        for scalar_term in (False, True):
+                            channels = sum(input_channels ** k for k in range(1, depth + 1)) + int(scalar_term)
+                            sigtensors = [torch.rand(3, channels, device=device, dtype=torch.double)
+                                          for _ in range(amount)]
+                            sigtensors_clone = [sigtensor.clone() for sigtensor in sigtensors]
+                            combined = signatory.multi_signature_combine(sigtensors, input_channels, depth,
+                                                                         inverse=inverse, scalar_term=scalar_term)
+                            out = torch.empty_like(combined)
+                            result = signatory.multi_signature_combine(sigtensors, input_channels, depth,
+                                                                       inverse=inverse, scalar_term=scalar_term,
+                                                                       out=out)
+                            assert result is out
+                            h.diff(out, combined)
+                            for sigtensor, sigtensor_clone in zip(sigtensors, sigtensors_clone):
+                                h.diff(sigtensor, sigtensor_clone)
+
+    sigtensors = [torch.rand(3, 12, requires_grad=True) for _ in range(2)]
+    with pytest.raises(ValueError):
+        signatory.signature_combine(sigtensors[0], sigtensors[1], 3, 2, out=torch.empty(3, 12))
+    with torch.no_grad():
+        with pytest.raises(ValueError):
+            signatory.signature_combine(sigtensors[0], sigtensors[1], 3, 2, out=torch.empty(3, 13))
+        signatory.signature_combine(sigtensors[0], sigtensors[1], 3, 2, out=torch.empty(3, 12))
+
+
 def test_backward():
     """Tests that the backwards calculation for combining signatures produces the correct values."""
     for signature_combine, amount in ((True, 2), (False, 1), (False, 2), (False, 3), (False, 10)):
@@ -173,6 +205,17 @@ def _test_backward(signature_combine, amount, device, batch_size, input_stream,
         h.diff(path_grad, path.grad)
 
 
+def test_backward_many():
+    """Tests the backwards calculation when combining many signatures, so that every thread has a long chunk of
+    signatures to combine and the tree of multiplications between threads is several levels deep.
+    """
+    for device in h.get_devices():
+        for inverse in (False, True):
+            for scalar_term in (False, True):
+                _test_backward(False, 1000, device, batch_size=2, input_stream=2, input_channels=2, depth=3,
+                               inverse=inverse, scalar_term=scalar_term)
+
+
 def test_no_adjustments():
     """Tests that the calculations for combining signatures don't modify memory they're not supposed to."""
     for signature_combine, amount in ((True, 2), (False, 1), (False, 2), (False, 3), (False, 10)):
@@ -0,0 +1,93 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Tests the signature_from_increments function."""
+
+
+import pytest
+import torch
+
+from helpers import helpers as h
+from helpers import validation as v
+
+
+tests = ['signature_from_increments', 'SignatureFromIncrements']
+depends = ['signature']
+signatory = v.validate_tests(tests, depends)
+
+
+def test_signature_from_increments():
+    """Tests that signature_from_increments gives the same values and gradients as the signature of the cumulative
+    sum of the increments, with a basepoint of zero."""
+    for device in h.get_devices():
+        for batch_size in (1, 3):
+            for input_stream in (1, 2, 6):
+                for input_channels in (1, 2, 4):
+                    for depth in (1, 2, 4):
+                        for stream in (False, True):
+                            for inverse in (False, True):
+                                for initial in (None, h.with_grad):
+                                    for scalar_term in (False, True):
+                                        for leadlag in (False, True):
+                                            _test_signature_from_increments(device, batch_size, input_stream,
+                                                                            input_channels, depth, stream, inverse,
+                                                                            initial, scalar_term, leadlag)
+
+
+def _test_signature_from_increments(device, batch_size, input_stream, input_channels, depth, stream, inverse, initial,
+                                    scalar_term, leadlag):
+    increments = h.get_path(batch_size, input_stream, input_channels, device, True)
+    initial_channels = 2 * input_channels if leadlag else input_channels
+    if initial is None:
+        tensors = [increments]
+    else:
+        initial_path = torch.rand(batch_size, 2, initial_channels, device=device, dtype=torch.double)
+        initial = signatory.signature(initial_path, depth, scalar_term=scalar_term).requires_grad_()
+        tensors = [increments, initial]
+
+    signature = signatory.signature_from_increments(increments, depth, stream=stream, inverse=inverse,
+                                                    initial=initial, scalar_term=scalar_term, leadlag=leadlag)
+    expected = signatory.signature(increments.cumsum(dim=1), depth, stream=stream, basepoint=True, inverse=inverse,
+                                   initial=initial, scalar_term=scalar_term, leadlag=leadlag)
+    h.diff(signature, expected)
+
+    module = signatory.SignatureFromIncrements(depth, stream=stream, inverse=inverse, scalar_term=scalar_term,
+                                               leadlag=leadlag)
+    h.diff(module(increments, initial=initial), expected)
+
+    grad = torch.rand_like(signature)
+    grads = torch.autograd.grad(signature, tensors, grad)
+    expected_grads = torch.autograd.grad(expected, tensors, grad)
+    for grad_, expected_grad in zip(grads, expected_grads):
+        h.diff(grad_, expected_grad)
+
+
+def test_signature_from_increments_double_backward():
+    """Tests that signature_from_increments can be differentiated twice."""
+    for stream in (False, True):
+        for inverse in (False, True):
+            increments = h.get_path(2, 4, 2, 'cpu', True)
+            torch.autograd.gradgradcheck(lambda x: signatory.signature_from_increments(x, 3, stream=stream,
+                                                                                       inverse=inverse),
+                                         (increments,))
+
+
+def test_signature_from_increments_errors():
+    """Tests that signature_from_increments raises errors on invalid arguments."""
+    with pytest.raises(ValueError):
+        signatory.signature_from_increments(torch.rand(4, 3), 2)
+    with pytest.raises(ValueError):
+        signatory.signature_from_increments(torch.rand(2, 0, 3), 2)
+    with pytest.raises(ValueError):
+        signatory.signature_from_increments(torch.rand(2, 4, 3), 0)
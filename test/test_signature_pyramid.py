@@ -0,0 +1,74 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Tests the signature_pyramid function."""
+
+
+import pytest
+import torch
+
+from helpers import helpers as h
+from helpers import validation as v
+
+
+tests = ['signature_pyramid']
+depends = ['signature', 'signature_combine']
+signatory = v.validate_tests(tests, depends)
+
+
+def test_signature_pyramid():
+    """Tests that signature_pyramid gives the same values and gradients as computing the signature of each interval
+    separately."""
+    for device in h.get_devices():
+        for batch_size in (1, 3):
+            for input_stream in (2, 5, 9, 14):
+                for input_channels in (1, 3):
+                    for depth in (1, 2, 4):
+                        for levels in (1, 2, 3, 4):
+                            if input_stream - 1 >= 2 ** (levels - 1):
+                                _test_signature_pyramid(device, batch_size, input_stream, input_channels, depth,
+                                                        levels)
+
+
+def _test_signature_pyramid(device, batch_size, input_stream, input_channels, depth, levels):
+    path = h.get_path(batch_size, input_stream, input_channels, device, True)
+
+    pyramid = signatory.signature_pyramid(path, depth, levels)
+    assert len(pyramid) == levels
+
+    expected = []
+    for level in range(levels):
+        num_intervals = 2 ** level
+        boundaries = [(index * (input_stream - 1)) // num_intervals for index in range(num_intervals + 1)]
+        expected.append(torch.stack([signatory.signature(path[:, start:end + 1], depth)
+                                     for start, end in zip(boundaries[:-1], boundaries[1:])], dim=1))
+    for pyramid_level, expected_level in zip(pyramid, expected):
+        assert pyramid_level.shape == expected_level.shape
+        h.diff(pyramid_level, expected_level)
+
+    grads = [torch.rand_like(pyramid_level) for pyramid_level in pyramid]
+    grad_path, = torch.autograd.grad(pyramid, path, grads)
+    expected_grad_path, = torch.autograd.grad(expected, path, grads)
+    h.diff(grad_path, expected_grad_path)
+
+
+def test_signature_pyramid_errors():
+    """Tests that signature_pyramid raises errors on invalid arguments."""
+    path = torch.rand(2, 4, 3)
+    with pytest.raises(ValueError):
+        signatory.signature_pyramid(path, 2, 0)
+    with pytest.raises(ValueError):
+        signatory.signature_pyramid(path, 2, 4)
+    with pytest.raises(ValueError):
+        signatory.signature_pyramid(path[0], 2, 2)
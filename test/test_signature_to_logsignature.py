@@ -80,6 +80,39 @@ def _test_forward(class_, device, batch_size, input_stream, input_channels, dept
         assert logsignature.grad_fn is None
 
 
+def test_out():
+    """Tests that passing 'out' writes the same values into it as are otherwise returned."""
+    for device in h.get_devices():
+        for input_channels in (1, 3):
+            for depth in (1, 2, 4):
+                for stream in (False, True):
+                    for mode in h.all_modes:
+                        for scalar_term in (False, True):
+                            path = h.get_path(2, 4, input_channels, device, path_grad=False)
+                            signature = signatory.signature(path, depth, stream=stream, scalar_term=scalar_term)
+                            with warnings.catch_warnings():
+                                warnings.filterwarnings('ignore', message="The logsignature with mode='brackets' has "
+                                                                          "been requested on the GPU.",
+                                                        category=UserWarning)
+                                logsignature = signatory.signature_to_logsignature(signature, input_channels, depth,
+                                                                                   stream=stream, mode=mode,
+                                                                                   scalar_term=scalar_term)
+                                out = torch.empty_like(logsignature)
+                                result = signatory.signature_to_logsignature(signature, input_channels, depth,
+                                                                             stream=stream, mode=mode,
+                                                                             scalar_term=scalar_term, out=out)
+                            assert result is out
+                            h.diff(out, logsignature)
+
+    signature = torch.rand(2, 12, requires_grad=True)
+    with pytest.raises(ValueError):
+        signatory.signature_to_logsignature(signature, 3, 2, out=torch.empty(2, 6))
+    with torch.no_grad():
+        with pytest.raises(ValueError):
+            signatory.signature_to_logsignature(signature, 3, 2, out=torch.empty(2, 12))
+        signatory.signature_to_logsignature(signature, 3, 2, out=torch.empty(2, 6))
+
+
 def test_backward_expand_words():
     """Tests that the backward calculations produce the correct values."""
     for class_ in (False, True):
@@ -147,6 +180,79 @@ def _test_backward(class_, device, batch_size, input_stream, input_channels, dep
     h.diff(path.grad, path_grad)
 
 
+def test_double_backward():
+    """Tests that the double backward operation through signature_to_logsignature gives the correct values."""
+    for device in h.get_devices():
+        for batch_size, input_stream, input_channels in ((1, 2, 1), (2, 3, 2), (1, 4, 3)):
+            for depth in (1, 2, 3, 4):
+                for stream in (False, True):
+                    for mode in h.all_modes:
+                        for scalar_term in (False, True):
+                            _test_double_backward(device, batch_size, input_stream, input_channels, depth, stream, mode,
+                                                  scalar_term)
+
+
+def _test_double_backward(device, batch_size, input_stream, input_channels, depth, stream, mode, scalar_term):
+    path = h.get_path(batch_size, input_stream, input_channels, device, path_grad=False)
+    signature = signatory.signature(path, depth, stream=stream, scalar_term=scalar_term)
+    signature.requires_grad_()
+
+    def check_fn(signature_):
+        return signatory.signature_to_logsignature(signature_, input_channels, depth, stream=stream, mode=mode,
+                                                   scalar_term=scalar_term)
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message="The logsignature with mode='brackets' has been requested on the "
+                                                  "GPU.", category=UserWarning)
+        assert torch.autograd.gradgradcheck(check_fn, (signature,))
+
+
+@pytest.mark.skipif(not hasattr(torch.autograd, 'forward_ad'),
+                    reason="Forward-mode autodifferentiation is not available.")
+def test_jvp():
+    """Tests that forward-mode differentiation through signature_to_logsignature gives the correct values."""
+    for device in h.get_devices():
+        for batch_size, input_stream, input_channels in ((1, 2, 1), (2, 3, 2), (3, 5, 3)):
+            for depth in (1, 2, 3, 4):
+                for stream in (False, True):
+                    for mode in h.all_modes:
+                        for scalar_term in (False, True):
+                            _test_jvp(device, batch_size, input_stream, input_channels, depth, stream, mode,
+                                      scalar_term, no_grad=False)
+
+
+def test_jvp_no_grad():
+    """Tests that forward-mode differentiation through signature_to_logsignature still happens when no gradients are
+    needed, as dual tensors need not require grad."""
+    for device in h.get_devices():
+        for stream in (False, True):
+            for mode in h.all_modes:
+                _test_jvp(device, 2, 4, 2, 3, stream, mode, False, no_grad=True)
+
+
+def _test_jvp(device, batch_size, input_stream, input_channels, depth, stream, mode, scalar_term, no_grad):
+    path = h.get_path(batch_size, input_stream, input_channels, device, path_grad=False)
+    signature = signatory.signature(path, depth, stream=stream, scalar_term=scalar_term)
+    tangent = torch.rand_like(signature)
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message="The logsignature with mode='brackets' has been requested on the "
+                                                  "GPU.", category=UserWarning)
+        with torch.no_grad() if no_grad else torch.enable_grad(), torch.autograd.forward_ad.dual_level():
+            dual = torch.autograd.forward_ad.make_dual(signature, tangent)
+            logsignature = signatory.signature_to_logsignature(dual, input_channels, depth, stream=stream, mode=mode,
+                                                               scalar_term=scalar_term)
+            tangent_logsignature = torch.autograd.forward_ad.unpack_dual(logsignature).tangent
+
+        # Compare against reverse-mode: <grad, J tangent> = <J^T grad, tangent>
+        signature.requires_grad_()
+        logsignature = signatory.signature_to_logsignature(signature, input_channels, depth, stream=stream, mode=mode,
+                                                           scalar_term=scalar_term)
+    grad = torch.rand_like(logsignature)
+    grad_signature, = torch.autograd.grad(logsignature, signature, grad)
+    h.diff((grad * tangent_logsignature).sum(), (grad_signature * tangent).sum())
+
+
 def test_no_adjustments():
     """Tests that no memory is modified that shouldn't be modified."""
     for class_ in (False, True):
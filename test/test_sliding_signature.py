@@ -0,0 +1,70 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Tests the sliding_signature function."""
+
+
+import pytest
+import torch
+
+from helpers import helpers as h
+from helpers import validation as v
+
+
+tests = ['sliding_signature']
+depends = ['signature', 'signature_combine']
+signatory = v.validate_tests(tests, depends)
+
+
+def test_sliding_signature():
+    """Tests that sliding_signature gives the same values and gradients as computing the signature of each window
+    separately."""
+    for device in h.get_devices():
+        for batch_size in (1, 3):
+            for input_stream in (2, 7, 16):
+                for input_channels in (1, 3):
+                    for depth in (1, 2, 4):
+                        for window in (2, 3, 5, 16):
+                            for stride in (1, 2, 4):
+                                if window <= input_stream:
+                                    _test_sliding_signature(device, batch_size, input_stream, input_channels, depth,
+                                                            window, stride)
+
+
+def _test_sliding_signature(device, batch_size, input_stream, input_channels, depth, window, stride):
+    path = h.get_path(batch_size, input_stream, input_channels, device, True)
+
+    sliding = signatory.sliding_signature(path, depth, window, stride)
+    expected = torch.stack([signatory.signature(path[:, start:start + window], depth)
+                            for start in range(0, input_stream - window + 1, stride)], dim=1)
+    assert sliding.shape == expected.shape
+    h.diff(sliding, expected)
+
+    grad = torch.rand_like(sliding)
+    grad_path, = torch.autograd.grad(sliding, path, grad)
+    expected_grad_path, = torch.autograd.grad(expected, path, grad)
+    h.diff(grad_path, expected_grad_path)
+
+
+def test_sliding_signature_errors():
+    """Tests that sliding_signature raises errors on invalid arguments."""
+    path = torch.rand(2, 4, 3)
+    with pytest.raises(ValueError):
+        signatory.sliding_signature(path, 2, 1)
+    with pytest.raises(ValueError):
+        signatory.sliding_signature(path, 2, 5)
+    with pytest.raises(ValueError):
+        signatory.sliding_signature(path, 2, 3, 0)
+    with pytest.raises(ValueError):
+        signatory.sliding_signature(path[0], 2, 3)
@@ -0,0 +1,82 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Tests controlling how many threads Signatory uses."""
+
+
+import pytest
+import threading
+import torch
+
+from helpers import helpers as h
+from helpers import validation as v
+
+
+tests = ['threading']
+depends = ['signature', 'signature_to_logsignature', 'impl']
+signatory = v.validate_tests(tests, depends)
+
+
+def test_threading():
+    """Tests that limiting the threads used, and changing the strategy, doesn't change the values or gradients."""
+    for stream in (False, True):
+        for batch_size, input_stream in ((1, 600), (64, 40), (8, 300)):
+            path = torch.rand(batch_size, input_stream, 4, dtype=torch.double, requires_grad=True)
+            expected = signatory.signature(path, 3, stream=stream)
+            expected_logsignature = signatory.signature_to_logsignature(expected, 4, 3, stream=stream)
+            grad = torch.rand_like(expected_logsignature)
+            expected_grad, = torch.autograd.grad(expected_logsignature, path, grad)
+
+            for max_threads in (None, 1, 2, 3):
+                for strategy in (None, 'auto', 'batch', 'stream'):
+                    with signatory.threading(max_threads=max_threads, strategy=strategy):
+                        signature = signatory.signature(path, 3, stream=stream)
+                        logsignature = signatory.signature_to_logsignature(signature, 4, 3, stream=stream)
+                    h.diff(logsignature, expected_logsignature)
+                    # outside of the context manager
+                    logsignature_grad, = torch.autograd.grad(logsignature, path, grad)
+                    h.diff(logsignature_grad, expected_grad)
+
+
+def test_nesting():
+    """Tests that the context manager nests, and only affects the current thread."""
+    impl = signatory.impl
+    default = impl.get_thread_limits()
+    assert default == (0, impl.ThreadingStrategy.Auto)
+    with signatory.threading(max_threads=4, strategy='stream'):
+        assert impl.get_thread_limits() == (4, impl.ThreadingStrategy.Stream)
+        assert impl.get_max_threads() <= 4
+        with signatory.threading(max_threads=8):
+            # Can only lower the limit
+            assert impl.get_thread_limits() == (4, impl.ThreadingStrategy.Stream)
+        with signatory.threading(max_threads=2, strategy='batch'):
+            assert impl.get_thread_limits() == (2, impl.ThreadingStrategy.Batch)
+
+            other_thread_limits = []
+            thread = threading.Thread(target=lambda: other_thread_limits.append(impl.get_thread_limits()))
+            thread.start()
+            thread.join()
+            assert other_thread_limits == [default]
+        assert impl.get_thread_limits() == (4, impl.ThreadingStrategy.Stream)
+    assert impl.get_thread_limits() == default
+
+
+def test_errors():
+    """Tests that invalid arguments raise errors."""
+    with pytest.raises(ValueError):
+        with signatory.threading(max_threads=0):
+            pass
+    with pytest.raises(ValueError):
+        with signatory.threading(strategy='sideways'):
+            pass
@@ -0,0 +1,84 @@
+# Copyright 2019 Patrick Kidger. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Tests the scratch memory that is reused between calls."""
+
+
+import threading
+import torch
+
+from helpers import helpers as h
+from helpers import validation as v
+
+
+tests = ['clear_workspace']
+depends = ['signature']
+signatory = v.validate_tests(tests, depends)
+
+
+def test_workspace_reuse():
+    """Tests that reusing scratch memory between calls, including calls of different sizes and dtypes, and across
+    clearing it, does not change the result."""
+    inputs = []
+    for dtype in (torch.float32, torch.float64):
+        for input_channels in (1, 2, 3):
+            for depth in (1, 2, 3, 4):
+                path = torch.rand(3, 5, input_channels, dtype=dtype)
+                inputs.append((path, depth))
+    expected = [signatory.signature(path, depth) for path, depth in inputs]
+
+    for clear in (False, True):
+        # Run through the inputs in a different order, so that the scratch memory is reused between different sizes
+        for (path, depth), expected_ in zip(reversed(inputs), reversed(expected)):
+            h.diff(signatory.signature(path, depth), expected_)
+            if clear:
+                signatory.clear_workspace()
+
+
+def test_workspace_in_use():
+    """Tests that scratch memory which outlives a call, such as the path increments saved for the backward pass, is not
+    reused by later calls whilst it is still in use."""
+    for basepoint in (False, True):
+        for inverse in (False, True):
+            paths = [torch.rand(3, 5, 2, dtype=torch.float64, requires_grad=True) for _ in range(3)]
+            # Each path is computed twice: once with every computation alive at the same time, and once on its own.
+            signatures = [signatory.signature(path, 3, basepoint=basepoint, inverse=inverse) for path in paths]
+            for path, signature in zip(paths, signatures):
+                grad = torch.rand_like(signature)
+                path_grad, = torch.autograd.grad(signature, path, grad)
+                expected = signatory.signature(path, 3, basepoint=basepoint, inverse=inverse)
+                expected_grad, = torch.autograd.grad(expected, path, grad)
+                h.diff(signature, expected)
+                h.diff(path_grad, expected_grad)
+
+
+def test_clear_workspace_concurrent():
+    """Tests that clearing the scratch memory whilst it is in use by another thread does not change the result."""
+    path = torch.rand(8, 20, 4, dtype=torch.float64)
+    expected = signatory.signature(path, 4)
+    results = []
+
+    def compute():
+        for _ in range(20):
+            results.append(signatory.signature(path, 4))
+
+    thread = threading.Thread(target=compute)
+    thread.start()
+    while thread.is_alive():
+        signatory.clear_workspace()
+    thread.join()
+
+    assert len(results) == 20
+    for result in results:
+        h.diff(result, expected)